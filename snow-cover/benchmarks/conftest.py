@@ -0,0 +1,13 @@
+#!/usr/bin/env python3
+"""
+Shared fixtures for the snow cover benchmark suite.
+
+Run with: pytest benchmarks --benchmark-only
+Skip the largest scales with: -m "not slow"
+"""
+
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+sys.path.insert(0, str(Path(__file__).parent))
@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+"""
+Benchmark HDF decode scaling across worker processes.
+
+Generates a set of synthetic VNP10A1F granules and decodes the same pixels
+from every granule with a thread pool (the old extraction path) and with
+process pools of increasing size, reporting granules/s and speedup.
+
+Usage:
+    python benchmarks/decode_scaling.py --granules 48 --pixels 20000 --workers 1 2 4 8
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import List
+import multiprocessing
+
+sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+sys.path.insert(0, str(Path(__file__).parent))
+
+from data_fetcher import decode_hdf_pixels, pixels_to_arrays
+from synthetic_granules import write_synthetic_granules, random_tile_pixels
+
+
+def time_decode(executor: Executor, paths: List[Path], rows, cols) -> float:
+    """Decode all granules with an executor and return the elapsed seconds."""
+    start = time.perf_counter()
+    futures = [executor.submit(decode_hdf_pixels, str(path), rows, cols) for path in paths]
+    for future in futures:
+        future.result()
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark HDF decode scaling')
+    parser.add_argument('--granules', type=int, default=32, help='Number of synthetic granules (default: 32)')
+    parser.add_argument('--pixels', type=int, default=20000, help='Pixels extracted per granule (default: 20000)')
+    parser.add_argument('--cluster-size', type=int, default=0,
+                        help='Cluster pixels like ski areas (radius in pixels, default: spread over tile)')
+    parser.add_argument('--workers', type=int, nargs='+',
+                        default=[1, 2, 4, os.cpu_count() or 1],
+                        help='Worker counts to benchmark')
+    args = parser.parse_args()
+    
+    with tempfile.TemporaryDirectory(prefix="viirs_bench_") as temp_dir:
+        dates = [datetime(2024, 1, 1) + timedelta(days=7 * i) for i in range(args.granules)]
+        print(f"Generating {args.granules} synthetic granules...")
+        paths = write_synthetic_granules(Path(temp_dir), "h18v04", dates)
+        rows, cols = pixels_to_arrays(random_tile_pixels(args.pixels, cluster_size=args.cluster_size))
+        
+        # Warm up the OS page cache
+        for path in paths:
+            path.read_bytes()
+        
+        print(f"\n{'executor':<12} {'workers':>7} {'seconds':>9} {'granules/s':>11} {'speedup':>8}")
+        baseline = None
+        for kind in ['thread', 'process']:
+            for workers in sorted(set(args.workers)):
+                if kind == 'thread':
+                    executor = ThreadPoolExecutor(max_workers=workers)
+                else:
+                    executor = ProcessPoolExecutor(max_workers=workers,
+                                                   mp_context=multiprocessing.get_context("spawn"))
+                    # Start the worker processes before timing
+                    list(executor.map(abs, range(workers)))
+                with executor:
+                    elapsed = time_decode(executor, paths, rows, cols)
+                if baseline is None:
+                    baseline = elapsed
+                print(f"{kind:<12} {workers:>7} {elapsed:>9.2f} {len(paths) / elapsed:>11.1f} "
+                      f"{baseline / elapsed:>7.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+"""
+End-to-end fetch throughput against the local NSIDC stand-in server.
+
+Runs VIIRSDataFetcher.process_tile_dates_parallel for a set of weekly dates
+at several download concurrencies, with configurable latency, bandwidth
+limits and error rates, and reports granules/s, MB/s and error counts.
+With --remote-reads only the chunks holding the pixels are fetched with HTTP
+Range requests. With --adaptive each concurrency is only the starting point of
+the AIMD controller, and the concurrency it ends at is reported.
+
+Usage:
+    python benchmarks/fetch_throughput.py --dates 24 --latency 0.3 --bandwidth 4000000 --workers 2 4 8 16
+    python benchmarks/fetch_throughput.py --dates 24 --pixels 200 --remote-reads
+    python benchmarks/fetch_throughput.py --dates 96 --latency 0.3 --throttle-concurrency 10 --workers 2 16 --adaptive
+"""
+
+import argparse
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+sys.path.insert(0, str(Path(__file__).parent))
+
+from concurrency import AIMDConcurrencyController, DEFAULT_MAX_CONCURRENCY
+from constants import ERROR_OLD_MISSING, ERROR_RECENT_MISSING, ERROR_OTHER
+from data_fetcher import VIIRSDataFetcher
+from nsidc_server import NSIDCStandInServer
+from synthetic_granules import random_tile_pixels
+
+TILE = "h18v04"
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark fetch throughput against a local NSIDC stand-in')
+    parser.add_argument('--dates', type=int, default=16, help='Weekly dates to fetch per run (default: 16)')
+    parser.add_argument('--pixels', type=int, default=2000, help='Pixels extracted per granule (default: 2000)')
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4, 8], help='Download concurrencies')
+    parser.add_argument('--decode-workers', type=int, default=None, help='HDF decode processes')
+    parser.add_argument('--latency', type=float, default=0.1, help='Seconds added to every response')
+    parser.add_argument('--bandwidth', type=float, help='Per-connection limit in bytes/s')
+    parser.add_argument('--total-bandwidth', type=float, help='Limit across all connections in bytes/s')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='Fraction of requests failing with 429/503')
+    parser.add_argument('--throttle-concurrency', type=int,
+                        help='Server answers 429 above this many concurrent granule requests')
+    parser.add_argument('--missing-rate', type=float, default=0.0, help='Fraction of dates returning 404')
+    parser.add_argument('--rate-limit-delay', type=float, default=0.0,
+                        help='Delay after each download, as in production (default: 0)')
+    parser.add_argument('--remote-reads', action='store_true',
+                        help='Read only the needed chunks with HTTP Range requests')
+    parser.add_argument('--adaptive', action='store_true',
+                        help='Adapt the concurrency with AIMD, starting at each --workers value')
+    parser.add_argument('--max-concurrency', type=int, default=DEFAULT_MAX_CONCURRENCY,
+                        help=f'Upper bound of the adaptive concurrency (default: {DEFAULT_MAX_CONCURRENCY})')
+    args = parser.parse_args()
+    
+    pixels = random_tile_pixels(args.pixels, cluster_size=40)
+    
+    with tempfile.TemporaryDirectory(prefix="nsidc_granules_") as granule_dir:
+        server = NSIDCStandInServer(
+            tiles=[TILE], latency=args.latency, bandwidth=args.bandwidth,
+            total_bandwidth=args.total_bandwidth, error_rate=args.error_rate,
+            missing_rate=args.missing_rate, granule_dir=granule_dir,
+            throttle_concurrency=args.throttle_concurrency
+        )
+        with server:
+            print(f"{'workers':>7} {'seconds':>8} {'granules/s':>11} {'MB/s':>7} {'missing':>8} {'errors':>7} "
+                  f"{'final':>6}")
+            for run, workers in enumerate(args.workers):
+                # Use different dates per run so no granule is served from a warm fetcher cache
+                start = datetime(2020, 1, 1) + timedelta(weeks=run * args.dates)
+                dates = [start + timedelta(weeks=i) for i in range(args.dates)]
+                
+                # Generate granules before timing
+                for date in dates:
+                    server.granule_path(TILE, date)
+                
+                concurrency = None
+                if args.adaptive:
+                    concurrency = AIMDConcurrencyController(initial=workers,
+                                                            maximum=max(workers, args.max_concurrency))
+                fetcher = VIIRSDataFetcher(decode_workers=args.decode_workers, base_url=server.base_url,
+                                           rate_limit_delay=args.rate_limit_delay,
+                                           remote_reads=args.remote_reads, concurrency=concurrency)
+                bytes_before = server.stats['bytes_sent']
+                started = time.perf_counter()
+                try:
+                    results = fetcher.process_tile_dates_parallel(
+                        TILE, {date: pixels for date in dates}, max_workers=workers
+                    )
+                finally:
+                    elapsed = time.perf_counter() - started
+                    fetcher.cleanup()
+                
+                first_values = [next(iter(date_results.values()))[0] for date_results in results.values()]
+                missing = sum(value in (ERROR_OLD_MISSING, ERROR_RECENT_MISSING) for value in first_values)
+                errors = sum(value == ERROR_OTHER for value in first_values)
+                megabytes = (server.stats['bytes_sent'] - bytes_before) / 1024 / 1024
+                final = concurrency.limit if concurrency is not None else workers
+                print(f"{workers:>7} {elapsed:>8.2f} {(len(dates) - missing - errors) / elapsed:>11.2f} "
+                      f"{megabytes / elapsed:>7.2f} {missing:>8} {errors:>7} {final:>6}")
+            
+            print(f"\nServer statistics: {server.stats}")
+
+
+if __name__ == "__main__":
+    main()
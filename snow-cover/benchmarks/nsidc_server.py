@@ -0,0 +1,447 @@
+#!/usr/bin/env python3
+"""
+Local stand-in for the NSIDC VNP10A1F HTTP endpoint.
+
+Serves YYYY.MM.DD/ directory listings and synthetic .h5 granules with the same
+URL layout as https://n5eil01u.ecs.nsidc.org/VIIRS/VNP10A1F.002, so the full
+fetch path can be load-tested without network access. Latency, per-connection
+and total bandwidth limits, error rates, missing dates and throttling above a
+number of concurrent granule requests can be injected.
+Granules support single-range HTTP Range requests (206 Partial Content) unless
+range_requests is disabled. A CMR-style granule search at /search/granules.json
+answers temporal and readable_granule_name queries with pages linked by the
+CMR-Search-After header.
+
+Usage:
+    python benchmarks/nsidc_server.py --port 8080 --latency 0.2 --bandwidth 2000000 --error-rate 0.05
+    python src/fetch_snow_data.py data/runs.geojson --base-url http://127.0.0.1:8080/VIIRS/VNP10A1F.002
+    python src/fetch_snow_data.py data/runs.geojson --base-url http://127.0.0.1:8080/VIIRS/VNP10A1F.002 \
+        --discovery cmr --cmr-url http://127.0.0.1:8080/search
+"""
+
+import argparse
+import json
+import random
+import re
+import shutil
+import tempfile
+import threading
+import time
+import zlib
+from datetime import datetime, timedelta
+from fnmatch import fnmatchcase
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional
+from urllib.parse import parse_qs, urlsplit
+
+from synthetic_granules import granule_filename, write_synthetic_granule
+
+URL_PREFIX = "/VIIRS/VNP10A1F.002"
+DATE_DIR_PATTERN = re.compile(rf"^{re.escape(URL_PREFIX)}/(\d{{4}})\.(\d{{2}})\.(\d{{2}})/(.*)$")
+GRANULE_PATTERN = re.compile(r"^VNP10A1F\.A(\d{4})(\d{3})\.(h\d{2}v\d{2})\.[\w.]+\.h5$")
+RANGE_PATTERN = re.compile(r"^bytes=(\d*)-(\d*)$")
+CATALOG_PATH = "/search/granules.json"
+TEMPORAL_PATTERN = re.compile(r"^(\d{4}-\d{2}-\d{2})T[\d:.]+Z?,(\d{4}-\d{2}-\d{2})T[\d:.]+Z?$")
+DEFAULT_CATALOG_PAGE_SIZE = 10
+SEND_CHUNK_SIZE = 64 * 1024
+
+
+class TokenBucket:
+    """Thread-safe token bucket used to limit bytes per second."""
+    
+    def __init__(self, rate: float):
+        self.rate = rate
+        self.tokens = 0.0
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+    
+    def consume(self, amount: int):
+        """Block until amount tokens have been consumed."""
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.rate, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            self.tokens -= amount
+            wait = -self.tokens / self.rate if self.tokens < 0 else 0.0
+        if wait > 0:
+            time.sleep(wait)
+
+
+class NSIDCStandInServer:
+    """Threaded HTTP server imitating the NSIDC VNP10A1F directory layout."""
+    
+    def __init__(self, tiles: Iterable[str] = ("h18v04",), host: str = "127.0.0.1", port: int = 0,
+                 latency: float = 0.0, bandwidth: Optional[float] = None,
+                 total_bandwidth: Optional[float] = None, error_rate: float = 0.0,
+                 missing_rate: float = 0.0, granule_dir: Optional[str] = None, seed: int = 0,
+                 range_requests: bool = True, throttle_concurrency: Optional[int] = None):
+        """
+        Configure the server.
+        
+        Args:
+            tiles: Tiles listed in every date directory
+            host: Interface to bind
+            port: Port to bind (0 picks a free port)
+            latency: Seconds added before every response
+            bandwidth: Per-connection download limit in bytes/s (None = unlimited)
+            total_bandwidth: Limit across all connections in bytes/s (None = unlimited)
+            error_rate: Fraction of requests answered with 429/503
+            missing_rate: Fraction of dates whose directory returns 404
+            granule_dir: Directory for generated granules (default: temporary)
+            seed: Seed for error injection and missing dates
+            range_requests: Answer Range requests with 206 Partial Content (otherwise
+                the Range header is ignored and the whole granule is sent)
+            throttle_concurrency: Answer granule requests with 429 while this many
+                granule requests are already being served (None = never)
+        """
+        self.tiles = set(tiles)
+        self.host = host
+        self.port = port
+        self.latency = latency
+        self.bandwidth = bandwidth
+        self.total_bucket = TokenBucket(total_bandwidth) if total_bandwidth else None
+        self.error_rate = error_rate
+        self.missing_rate = missing_rate
+        self.seed = seed
+        self.range_requests = range_requests
+        self.throttle_concurrency = throttle_concurrency
+        self._granules_in_flight = 0
+        
+        self._owns_granule_dir = granule_dir is None
+        self.granule_dir = Path(granule_dir or tempfile.mkdtemp(prefix="nsidc_standin_"))
+        self.granule_dir.mkdir(parents=True, exist_ok=True)
+        
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._granule_locks: Dict[str, threading.Lock] = {}
+        self._httpd = None
+        self._thread = None
+        self.stats = {'listing_requests': 0, 'granule_requests': 0, 'range_requests': 0,
+                      'catalog_requests': 0, 'bytes_sent': 0, 'errors_injected': 0, 'not_found': 0,
+                      'throttled': 0, 'max_granules_in_flight': 0}
+    
+    @property
+    def base_url(self) -> str:
+        """Base URL to pass to VIIRSDataFetcher."""
+        return f"http://{self.host}:{self.port}{URL_PREFIX}"
+    
+    @property
+    def catalog_url(self) -> str:
+        """Search API root to pass to CMRGranuleDiscovery."""
+        return f"http://{self.host}:{self.port}/search"
+    
+    def is_missing_date(self, date: datetime) -> bool:
+        """Deterministically decide whether a date has no directory."""
+        key = f"{self.seed}:{date:%Y%m%d}".encode()
+        return zlib.crc32(key) / 0xFFFFFFFF < self.missing_rate
+    
+    def should_inject_error(self) -> bool:
+        """Randomly decide whether to fail the current request."""
+        with self._lock:
+            return self._random.random() < self.error_rate
+    
+    def count(self, stat: str, amount: int = 1):
+        """Increment a server statistic."""
+        with self._lock:
+            self.stats[stat] += amount
+    
+    def begin_granule_request(self) -> bool:
+        """Count a granule request in flight, or return False if it must be throttled."""
+        with self._lock:
+            if self.throttle_concurrency is not None and self._granules_in_flight >= self.throttle_concurrency:
+                self.stats['throttled'] += 1
+                return False
+            self._granules_in_flight += 1
+            self.stats['max_granules_in_flight'] = max(self.stats['max_granules_in_flight'],
+                                                       self._granules_in_flight)
+            return True
+    
+    def end_granule_request(self):
+        """Count a granule request as finished."""
+        with self._lock:
+            self._granules_in_flight -= 1
+    
+    def granule_path(self, tile: str, date: datetime) -> Path:
+        """Return the path of a granule, generating it on first use."""
+        filename = granule_filename(tile, date)
+        path = self.granule_dir / filename
+        with self._lock:
+            granule_lock = self._granule_locks.setdefault(filename, threading.Lock())
+        with granule_lock:
+            if not path.exists():
+                partial = path.with_suffix(".partial")
+                write_synthetic_granule(partial, tile, date)
+                partial.rename(path)
+        return path
+    
+    def listing(self, date: datetime) -> str:
+        """Render an NSIDC-style HTML directory listing for a date."""
+        links = []
+        for tile in sorted(self.tiles):
+            filename = granule_filename(tile, date)
+            links.append(f'<a href="{filename}">{filename}</a>')
+            links.append(f'<a href="{filename}.xml">{filename}.xml</a>')
+        return f"<html><body><h1>Index of {date:%Y.%m.%d}</h1>\n" + "\n".join(links) + "\n</body></html>"
+    
+    def catalog_entries(self, start: datetime, end: datetime, patterns: List[str]) -> List[Dict]:
+        """
+        CMR granule entries of all listed granules in a date range.
+        
+        Args:
+            start: First date (inclusive)
+            end: Last date (inclusive)
+            patterns: readable_granule_name patterns with * wildcards (empty matches all)
+        
+        Returns:
+            Entries sorted by date and tile, each with a data link to the granule
+        """
+        entries = []
+        date = start
+        while date <= end:
+            if not self.is_missing_date(date):
+                for tile in sorted(self.tiles):
+                    filename = granule_filename(tile, date)
+                    if patterns and not any(fnmatchcase(filename, pattern) for pattern in patterns):
+                        continue
+                    entries.append({
+                        'producer_granule_id': filename,
+                        'time_start': f"{date:%Y-%m-%d}T00:00:00.000Z",
+                        'links': [{
+                            'rel': "http://esipfed.org/ns/fedsearch/1.1/data#",
+                            'href': f"{self.base_url}/{date:%Y.%m.%d}/{filename}",
+                        }],
+                    })
+            date += timedelta(days=1)
+        return entries
+    
+    def start(self) -> str:
+        """Start serving in a background thread and return the base URL."""
+        handler = type("NSIDCStandInHandler", (_RequestHandler,), {"standin": self})
+        self._httpd = ThreadingHTTPServer((self.host, self.port), handler)
+        self._httpd.daemon_threads = True
+        self.port = self._httpd.server_address[1]
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self.base_url
+    
+    def stop(self):
+        """Stop the server and remove generated granules it owns."""
+        if self._httpd is not None:
+            self._httpd.shutdown()
+            self._httpd.server_close()
+            self._httpd = None
+        if self._owns_granule_dir:
+            shutil.rmtree(self.granule_dir, ignore_errors=True)
+    
+    def __enter__(self):
+        self.start()
+        return self
+    
+    def __exit__(self, *exc_info):
+        self.stop()
+
+
+class _RequestHandler(BaseHTTPRequestHandler):
+    """Request handler bound to an NSIDCStandInServer via the standin attribute."""
+    
+    standin: NSIDCStandInServer
+    protocol_version = "HTTP/1.1"
+    
+    def log_message(self, format, *args):
+        """Silence per-request logging."""
+    
+    def do_GET(self):
+        standin = self.standin
+        if standin.latency > 0:
+            time.sleep(standin.latency)
+        
+        if urlsplit(self.path).path == CATALOG_PATH:
+            return self._send_catalog_page()
+        
+        match = DATE_DIR_PATTERN.match(self.path.split("?", 1)[0])
+        if not match:
+            return self._send_status(404)
+        
+        year, month, day, filename = match.groups()
+        try:
+            date = datetime(int(year), int(month), int(day))
+        except ValueError:
+            return self._send_status(404)
+        
+        if standin.should_inject_error():
+            standin.count('errors_injected')
+            return self._send_status(random.choice([429, 503]))
+        
+        if standin.is_missing_date(date):
+            standin.count('not_found')
+            return self._send_status(404)
+        
+        if filename == "":
+            standin.count('listing_requests')
+            return self._send_body(standin.listing(date).encode(), "text/html")
+        
+        granule = GRANULE_PATTERN.match(filename)
+        if not granule or granule.group(3) not in standin.tiles:
+            standin.count('not_found')
+            return self._send_status(404)
+        
+        if not standin.begin_granule_request():
+            return self._send_status(429)
+        try:
+            standin.count('granule_requests')
+            path = standin.granule_path(granule.group(3), date)
+            range_header = self.headers.get("Range")
+            if range_header and standin.range_requests:
+                standin.count('range_requests')
+                return self._send_file_range(path, range_header)
+            self._send_file(path)
+        finally:
+            standin.end_granule_request()
+    
+    def _send_catalog_page(self):
+        """Answer a CMR granule search with one page of entries."""
+        standin = self.standin
+        if standin.should_inject_error():
+            standin.count('errors_injected')
+            return self._send_status(random.choice([429, 503]))
+        standin.count('catalog_requests')
+        
+        query = parse_qs(urlsplit(self.path).query)
+        temporal = TEMPORAL_PATTERN.match(query.get('temporal[]', [''])[0])
+        if not temporal:
+            return self._send_status(400)
+        start, end = (datetime.strptime(day, "%Y-%m-%d") for day in temporal.groups())
+        page_size = int(query.get('page_size', [DEFAULT_CATALOG_PAGE_SIZE])[0])
+        
+        entries = standin.catalog_entries(start, end, query.get('readable_granule_name[]', []))
+        # Opaque cursor as in CMR; here the offset of the next entry
+        offset = int(json.loads(self.headers.get("CMR-Search-After", "[0]"))[0])
+        page = entries[offset:offset + page_size]
+        
+        body = json.dumps({'feed': {'entry': page}}).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("CMR-Hits", str(len(entries)))
+        if offset + page_size < len(entries):
+            self.send_header("CMR-Search-After", json.dumps([offset + page_size]))
+        self.end_headers()
+        self.wfile.write(body)
+    
+    def _send_status(self, status: int):
+        body = f"{status}\n".encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "text/plain")
+        self.send_header("Content-Length", str(len(body)))
+        if status in (429, 503):
+            self.send_header("Retry-After", "1")
+        self.end_headers()
+        self.wfile.write(body)
+    
+    def _send_body(self, body: bytes, content_type: str):
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+    
+    def _send_file(self, path: Path):
+        size = path.stat().st_size
+        self.send_response(200)
+        self.send_header("Content-Type", "application/x-hdf5")
+        self.send_header("Content-Length", str(size))
+        self.send_header("Accept-Ranges", "bytes" if self.standin.range_requests else "none")
+        self.end_headers()
+        self._send_bytes(path, 0, size)
+    
+    def _send_file_range(self, path: Path, range_header: str):
+        """Send one byte range of a file as 206 Partial Content."""
+        size = path.stat().st_size
+        match = RANGE_PATTERN.match(range_header.strip())
+        if not match or match.groups() == ('', ''):
+            return self._send_range_not_satisfiable(size)
+        
+        first, last = match.groups()
+        if first == '':
+            # Suffix range: the last N bytes
+            start, end = max(0, size - int(last)), size - 1
+        else:
+            start = int(first)
+            end = min(int(last), size - 1) if last else size - 1
+        if start >= size or start > end:
+            return self._send_range_not_satisfiable(size)
+        
+        self.send_response(206)
+        self.send_header("Content-Type", "application/x-hdf5")
+        self.send_header("Content-Length", str(end - start + 1))
+        self.send_header("Content-Range", f"bytes {start}-{end}/{size}")
+        self.send_header("Accept-Ranges", "bytes")
+        self.end_headers()
+        self._send_bytes(path, start, end - start + 1)
+    
+    def _send_range_not_satisfiable(self, size: int):
+        self.send_response(416)
+        self.send_header("Content-Range", f"bytes */{size}")
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+    
+    def _send_bytes(self, path: Path, start: int, length: int):
+        """Send length bytes of a file from start, applying the bandwidth limits."""
+        connection_bucket = TokenBucket(self.standin.bandwidth) if self.standin.bandwidth else None
+        with open(path, 'rb') as f:
+            f.seek(start)
+            remaining = length
+            while remaining > 0:
+                chunk = f.read(min(SEND_CHUNK_SIZE, remaining))
+                if not chunk:
+                    break
+                remaining -= len(chunk)
+                if connection_bucket:
+                    connection_bucket.consume(len(chunk))
+                if self.standin.total_bucket:
+                    self.standin.total_bucket.consume(len(chunk))
+                try:
+                    self.wfile.write(chunk)
+                except (BrokenPipeError, ConnectionResetError):
+                    return
+                self.standin.count('bytes_sent', len(chunk))
+
+
+def main():
+    """Run the stand-in server in the foreground."""
+    parser = argparse.ArgumentParser(description='Local stand-in for the NSIDC VNP10A1F endpoint')
+    parser.add_argument('--host', default='127.0.0.1', help='Interface to bind (default: 127.0.0.1)')
+    parser.add_argument('--port', type=int, default=8080, help='Port to bind (default: 8080)')
+    parser.add_argument('--tiles', nargs='+', default=['h18v04'], help='Tiles listed for every date')
+    parser.add_argument('--latency', type=float, default=0.0, help='Seconds added to every response')
+    parser.add_argument('--bandwidth', type=float, help='Per-connection limit in bytes/s')
+    parser.add_argument('--total-bandwidth', type=float, help='Limit across all connections in bytes/s')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='Fraction of requests failing with 429/503')
+    parser.add_argument('--missing-rate', type=float, default=0.0, help='Fraction of dates returning 404')
+    parser.add_argument('--granule-dir', help='Directory for generated granules (reused across runs)')
+    parser.add_argument('--throttle-concurrency', type=int,
+                        help='Answer granule requests with 429 above this many concurrent ones')
+    parser.add_argument('--no-range-requests', action='store_true',
+                        help='Ignore Range headers and always send whole granules')
+    args = parser.parse_args()
+    
+    server = NSIDCStandInServer(
+        tiles=args.tiles, host=args.host, port=args.port, latency=args.latency,
+        bandwidth=args.bandwidth, total_bandwidth=args.total_bandwidth,
+        error_rate=args.error_rate, missing_rate=args.missing_rate, granule_dir=args.granule_dir,
+        range_requests=not args.no_range_requests, throttle_concurrency=args.throttle_concurrency
+    )
+    print(f"Serving VNP10A1F stand-in at {server.start()}")
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.stop()
+        print(f"Server statistics: {server.stats}")
+
+
+if __name__ == "__main__":
+    main()
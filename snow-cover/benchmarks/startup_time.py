@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+"""
+Benchmark the startup time of fetch_snow_data.py in each CLI mode.
+
+Runs the script in a fresh interpreter per repetition and reports the median
+wall time and which heavy modules each mode loaded:
+- --help
+- --stats-only on an archive
+- --fill-cache on an archive with nothing to fetch (tiles backend)
+- --plan-only with a synthetic runs.geojson
+- a fetch of the synthetic runs with nothing left to fetch
+- a fetch of one year of weekly granules from the local NSIDC stand-in (timed once,
+  mostly spent generating the synthetic granules)
+
+Usage:
+    python benchmarks/startup_time.py --repeat 5
+"""
+
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import List, Tuple
+
+sys.path.insert(0, str(Path(__file__).parent))
+
+from nsidc_server import NSIDCStandInServer
+from synthetic_runs import generate_runs_geojson
+
+SCRIPT = Path(__file__).parent.parent / "src" / "fetch_snow_data.py"
+HEAVY_MODULES = ('geopandas', 'shapely', 'pyproj', 'h5py', 'numpy', 'requests', 'asyncpg', 'pyarrow')
+
+# Runs fetch_snow_data.py as __main__ and reports the heavy modules it loaded on exit
+RUNNER = f"""
+import atexit, json, runpy, sys
+atexit.register(lambda: sys.stderr.write(
+    'LOADED_MODULES ' + json.dumps([m for m in {HEAVY_MODULES!r} if m in sys.modules]) + '\\n'))
+sys.argv = sys.argv[1:]
+sys.path.insert(0, {str(SCRIPT.parent)!r})
+runpy.run_path(sys.argv[0], run_name='__main__')
+"""
+
+# Runs in the Alps, all in tile h18v04
+RUNS_BOUNDS = (6.5, 45.5, 7.5, 46.5)
+
+
+def run_mode(arguments: List[str]) -> Tuple[float, List[str]]:
+    """Run fetch_snow_data.py once and return the elapsed seconds and the heavy modules it loaded."""
+    started = time.perf_counter()
+    result = subprocess.run([sys.executable, "-c", RUNNER, str(SCRIPT), *arguments],
+                            capture_output=True, text=True)
+    elapsed = time.perf_counter() - started
+    if result.returncode != 0:
+        raise RuntimeError(f"fetch_snow_data.py {' '.join(arguments)} failed:\n{result.stdout}{result.stderr}")
+    loaded = []
+    for line in result.stderr.splitlines():
+        if line.startswith("LOADED_MODULES "):
+            loaded = json.loads(line[len("LOADED_MODULES "):])
+    return elapsed, loaded
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark fetch_snow_data.py startup time per CLI mode')
+    parser.add_argument('--repeat', type=int, default=5, help='Runs per mode (default: 5)')
+    parser.add_argument('--runs', type=int, default=200, help='Runs in the synthetic runs.geojson (default: 200)')
+    parser.add_argument('--year', type=int, default=2024, help='Year fetched from the stand-in (default: 2024)')
+    args = parser.parse_args()
+    
+    with tempfile.TemporaryDirectory(prefix="viirs_startup_") as temp_dir, \
+            NSIDCStandInServer(tiles=["h18v04"]) as server:
+        temp_path = Path(temp_dir)
+        runs_file = generate_runs_geojson(temp_path / "runs.geojson", args.runs, bounds=RUNS_BOUNDS)
+        archive = [
+            "--archive-backend", "tiles", "--archive-file", str(temp_path / "archive"),
+            "--from-year", str(args.year), "--to-year", str(args.year),
+        ]
+        
+        # Fills the archive, so the modes below find nothing left to fetch
+        print(f"Fetching {args.year} for {args.runs} synthetic runs from the local stand-in...")
+        fetch_seconds, fetch_loaded = run_mode([str(runs_file), *archive, "--base-url", server.base_url,
+                                                "--decode-workers", "0"])
+        
+        modes = {
+            'help': ["--help"],
+            'stats-only': ["--stats-only", *archive],
+            'fill-cache': ["--fill-cache", *archive],
+            'plan-only': [str(runs_file), "--plan-only", "--plan-file", str(temp_path / "plan.json"), *archive],
+            'cached fetch': [str(runs_file), *archive],
+        }
+        
+        print(f"\n{'mode':<14} {'median s':>9} {'min s':>7}  loaded modules")
+        for name, arguments in modes.items():
+            timings = []
+            for _ in range(args.repeat):
+                elapsed, loaded = run_mode(arguments)
+                timings.append(elapsed)
+            print(f"{name:<14} {statistics.median(timings):>9.2f} {min(timings):>7.2f}  "
+                  f"{', '.join(loaded) or '-'}")
+        print(f"{'fetch':<14} {fetch_seconds:>9.2f} {fetch_seconds:>7.2f}  {', '.join(fetch_loaded) or '-'}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+"""
+Synthetic VIIRS VNP10A1F granules for offline benchmarks and tests.
+
+Writes HDF5 files with the same group layout, dataset names, dtypes and
+chunked/compressed storage as the NSIDC granules, filled with deterministic
+pseudo-random snow cover and cloud persistence values.
+"""
+
+import sys
+from datetime import datetime
+from pathlib import Path
+from typing import List, Tuple
+
+import h5py
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+
+from constants import PIXELS_PER_TILE, SNOW_COVER_DATASET, CLOUD_PERSISTENCE_DATASET, DATA_FIELDS_GROUP
+
+EXTRA_DATASETS = ['Algorithm_Bit_Flags_QA', 'Basic_QA', 'Daily_NDSI_Snow_Cover']
+
+
+def granule_filename(tile: str, date: datetime) -> str:
+    """
+    Build a VNP10A1F granule filename for a tile and date.
+    
+    Args:
+        tile: Tile identifier (e.g., 'h18v04')
+        date: Granule date
+    
+    Returns:
+        Filename matching the NSIDC naming scheme
+    """
+    doy = date.timetuple().tm_yday
+    return f"VNP10A1F.A{date.year}{doy:03d}.{tile}.002.2023100000000.h5"
+
+
+def granule_seed(tile: str, date: datetime) -> int:
+    """Deterministic seed for the contents of a tile/date granule."""
+    h, v = int(tile[1:3]), int(tile[4:6])
+    return (h * 100 + v) * 100000 + date.year * 400 + date.timetuple().tm_yday
+
+
+def write_synthetic_granule(path: Path, tile: str, date: datetime,
+                            size: int = PIXELS_PER_TILE,
+                            chunks: Tuple[int, int] = (300, 300),
+                            compression: str = 'gzip',
+                            extra_datasets: bool = True) -> Path:
+    """
+    Write a synthetic VNP10A1F granule.
+    
+    Args:
+        path: Output file path
+        tile: Tile identifier, used to seed the pixel values
+        date: Granule date, used to seed the pixel values
+        size: Width/height of the grid in pixels
+        chunks: HDF5 chunk shape
+        compression: HDF5 compression filter (None for uncompressed)
+        extra_datasets: Also write the QA and daily snow cover datasets
+    
+    Returns:
+        Path to the written file
+    """
+    rng = np.random.default_rng(granule_seed(tile, date))
+    
+    # Smooth-ish snow cover field so compression behaves like real data
+    coarse = rng.integers(0, 101, size=(size // 100 + 1, size // 100 + 1), dtype=np.uint8)
+    snow_cover = np.kron(coarse, np.ones((100, 100), dtype=np.uint8))[:size, :size]
+    snow_cover[rng.random((size, size)) < 0.02] = 237  # inland water
+    cloud_persistence = rng.integers(0, 8, size=(size, size), dtype=np.uint8)
+    
+    with h5py.File(path, 'w') as f:
+        group = f.require_group(DATA_FIELDS_GROUP)
+        options = {'chunks': chunks, 'compression': compression}
+        f.create_dataset(SNOW_COVER_DATASET, data=snow_cover, **options)
+        f.create_dataset(CLOUD_PERSISTENCE_DATASET, data=cloud_persistence, **options)
+        for name in (SNOW_COVER_DATASET, CLOUD_PERSISTENCE_DATASET):
+            f[name].attrs['_FillValue'] = np.uint8(255)
+        if extra_datasets:
+            for name in EXTRA_DATASETS:
+                group.create_dataset(name, data=rng.integers(0, 4, size=(size, size), dtype=np.uint8), **options)
+    
+    return path
+
+
+def write_synthetic_granules(directory: Path, tile: str, dates: List[datetime], **kwargs) -> List[Path]:
+    """
+    Write one synthetic granule per date for a tile.
+    
+    Args:
+        directory: Output directory
+        tile: Tile identifier
+        dates: Granule dates
+        **kwargs: Passed through to write_synthetic_granule
+    
+    Returns:
+        List of written file paths
+    """
+    directory.mkdir(parents=True, exist_ok=True)
+    return [
+        write_synthetic_granule(directory / granule_filename(tile, date), tile, date, **kwargs)
+        for date in dates
+    ]
+
+
+def random_tile_pixels(count: int, seed: int = 0, cluster_size: int = 0) -> List[Tuple[int, int]]:
+    """
+    Generate unique (pixel_row, pixel_col) tuples inside a tile.
+    
+    Args:
+        count: Number of pixels
+        seed: Random seed
+        cluster_size: If > 0, place pixels in clusters of this radius, like
+            runs of a ski area; otherwise spread them across the whole tile
+    
+    Returns:
+        List of (pixel_row, pixel_col) tuples
+    """
+    rng = np.random.default_rng(seed)
+    pixels = {}  # insertion ordered set
+    while len(pixels) < count:
+        if cluster_size > 0:
+            center_row, center_col = rng.integers(cluster_size, PIXELS_PER_TILE - cluster_size, size=2)
+            offsets = rng.integers(-cluster_size, cluster_size + 1, size=(50, 2))
+            for d_row, d_col in offsets:
+                pixels[(int(center_row + d_row), int(center_col + d_col))] = None
+        else:
+            row, col = rng.integers(0, PIXELS_PER_TILE, size=2)
+            pixels[(int(row), int(col))] = None
+    return list(pixels)[:count]
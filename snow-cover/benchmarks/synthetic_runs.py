@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+"""
+Synthetic runs.geojson files for offline benchmarks.
+
+Generates ski runs clustered into ski areas, with a mix of LineString and
+Polygon geometries, in the same shape as the runs.geojson written by the
+openskidata-processor.
+"""
+
+import json
+from pathlib import Path
+from typing import Tuple
+
+import numpy as np
+
+# Roughly the Alps, where runs are densest
+DEFAULT_BOUNDS = (5.5, 44.0, 16.0, 48.0)
+
+
+def generate_runs_geojson(path: Path, run_count: int, runs_per_ski_area: int = 40,
+                          bounds: Tuple[float, float, float, float] = DEFAULT_BOUNDS,
+                          seed: int = 0) -> Path:
+    """
+    Write a synthetic runs.geojson file.
+    
+    Args:
+        path: Output file path
+        run_count: Number of run features
+        runs_per_ski_area: Runs clustered around each ski area center
+        bounds: (min_lon, min_lat, max_lon, max_lat) for ski area centers
+        seed: Random seed
+    
+    Returns:
+        Path to the written file
+    """
+    rng = np.random.default_rng(seed)
+    min_lon, min_lat, max_lon, max_lat = bounds
+    features = []
+    
+    for index in range(run_count):
+        ski_area = index // runs_per_ski_area
+        if index % runs_per_ski_area == 0:
+            center = (rng.uniform(min_lon, max_lon), rng.uniform(min_lat, max_lat))
+        
+        # Runs are 0.5-3km long and start within ~3km of the ski area center
+        start_lon = center[0] + rng.normal(0, 0.03)
+        start_lat = center[1] + rng.normal(0, 0.02)
+        steps = int(rng.integers(5, 30))
+        heading = rng.uniform(0, 2 * np.pi)
+        deltas = rng.normal(0, 0.3, size=steps).cumsum() + heading
+        lons = start_lon + np.cumsum(np.cos(deltas) * 0.0012)
+        lats = start_lat + np.cumsum(np.sin(deltas) * 0.0008)
+        coordinates = [[float(lon), float(lat)] for lon, lat in zip(lons, lats)]
+        
+        if index % 10 == 9:
+            # Some runs are mapped as areas
+            ring = coordinates + [[lon + 0.0005, lat] for lon, lat in reversed(coordinates)]
+            ring.append(ring[0])
+            geometry = {"type": "Polygon", "coordinates": [ring]}
+        else:
+            geometry = {"type": "LineString", "coordinates": coordinates}
+        
+        features.append({
+            "type": "Feature",
+            "properties": {
+                "id": f"run_{index}",
+                "name": f"Synthetic Run {index}",
+                "type": "run",
+                "uses": ["downhill"],
+                "skiAreas": [{"properties": {"id": f"ski_area_{ski_area}"}}],
+            },
+            "geometry": geometry,
+        })
+    
+    with open(path, 'w') as f:
+        json.dump({"type": "FeatureCollection", "features": features}, f)
+    
+    return path
@@ -0,0 +1,159 @@
+#!/usr/bin/env python3
+"""
+Benchmarks for the snow cover pipeline hot paths.
+
+Uses synthetic VNP10A1F granules and runs.geojson files, so every stage can be
+timed offline without NSIDC access:
+- pixel extraction from runs.geojson
+- HDF pixel extraction from a granule
+- missing-week planning against a partially filled archive
+- archive writes (full histories and weekly updates)
+
+Archive benchmarks run against both archive backends (SQLite rows and
+memory-mapped tile cubes).
+"""
+
+from datetime import datetime, timedelta
+from pathlib import Path
+
+import pytest
+
+from data_fetcher import decode_hdf_pixels, pixels_to_arrays
+from pixel_extractor import VIIRSPixelExtractor
+from archive_backends import ARCHIVE_BACKENDS, SnowCoverArchive, create_archive
+from synthetic_granules import granule_filename, random_tile_pixels, write_synthetic_granule
+from synthetic_runs import generate_runs_geojson
+from utils import calculate_week_index, create_empty_year_data
+
+TILE = "h18v04"
+ARCHIVE_START = datetime(2012, 1, 1)
+ARCHIVE_END = datetime(2024, 12, 31)
+
+
+def scales(**values):
+    """Parametrize over named scales, marking the largest one as slow."""
+    names = list(values)
+    return pytest.mark.parametrize("scale", [
+        pytest.param(values[name], id=name, marks=pytest.mark.slow if name == names[-1] else ())
+        for name in names
+    ])
+
+
+def filled_pixel_data(fraction: float):
+    """Create weekly pixel data for 2012-2024 with the first fraction of weeks filled."""
+    pixel_data = []
+    date = ARCHIVE_START
+    filled_until = ARCHIVE_START + (ARCHIVE_END - ARCHIVE_START) * fraction
+    by_year = {}
+    while date <= ARCHIVE_END:
+        year_data = by_year.get(date.year)
+        if year_data is None:
+            year_data = by_year[date.year] = create_empty_year_data(date.year)
+            pixel_data.append(year_data)
+        if date < filled_until:
+            year_data.data[calculate_week_index(date, date.year)] = [date.month * 7 % 101, 1]
+        date += timedelta(days=7)
+    return pixel_data
+
+
+@pytest.fixture(scope="module")
+def granule(tmp_path_factory):
+    """A full-size synthetic granule."""
+    date = datetime(2024, 1, 8)
+    path = tmp_path_factory.mktemp("granules") / granule_filename(TILE, date)
+    return write_synthetic_granule(path, TILE, date)
+
+
+def new_archive(directory: Path, backend: str = 'sqlite') -> SnowCoverArchive:
+    """Create an initialized archive in a fresh database file or directory."""
+    archive = create_archive(backend, str(directory / f"archive-{datetime.now().timestamp()}.db"))
+    archive.initialize()
+    return archive
+
+
+backends = pytest.mark.parametrize("backend", ARCHIVE_BACKENDS)
+
+
+# Pixel extraction
+@scales(small=50, medium=500, large=5000)
+def test_bench_pixel_extraction(benchmark, tmp_path, scale):
+    """Extract unique pixels from a synthetic runs.geojson."""
+    geojson_path = generate_runs_geojson(tmp_path / "runs.geojson", scale)
+    extractor = VIIRSPixelExtractor()
+    
+    unique_pixels = benchmark.pedantic(
+        extractor.extract_unique_pixels_from_geojson, args=(str(geojson_path),), rounds=3
+    )
+    assert len(unique_pixels) >= scale
+
+
+# HDF extraction
+@scales(small=1000, medium=10000, large=50000)
+@pytest.mark.parametrize("layout", ["clustered", "spread"])
+def test_bench_hdf_extraction(benchmark, granule, scale, layout):
+    """Decode snow cover and cloud persistence for pixels of one granule."""
+    pixels = random_tile_pixels(scale, cluster_size=40 if layout == "clustered" else 0)
+    rows, cols = pixels_to_arrays(pixels)
+    
+    values, cloud_persistence = benchmark(decode_hdf_pixels, str(granule), rows, cols)
+    assert len(values) == len(cloud_persistence) == scale
+
+
+# Missing-week planning
+@scales(small=100, medium=1000, large=5000)
+@backends
+def test_bench_missing_week_planning(benchmark, tmp_path, scale, backend):
+    """Plan missing weeks for every pixel of a partially filled archive."""
+    archive = new_archive(tmp_path, backend)
+    pixels = random_tile_pixels(scale, cluster_size=40)
+    pixel_data = filled_pixel_data(0.8)
+    for pixel_row, pixel_col in pixels:
+        archive.save_pixel_data(TILE, pixel_row, pixel_col, pixel_data)
+    
+    def plan():
+        missing = archive.get_missing_weeks_for_pixels(TILE, pixels, ARCHIVE_START, ARCHIVE_END)
+        return sum(len(weeks) for weeks in missing.values())
+    
+    missing_weeks = benchmark.pedantic(plan, rounds=3)
+    archive.close()
+    assert missing_weeks > 0
+
+
+# Archive writes
+@scales(small=100, medium=1000, large=5000)
+@backends
+def test_bench_archive_writes(benchmark, tmp_path, scale, backend):
+    """Write full 2012-2024 histories for a tile's pixels into an empty archive."""
+    pixels = random_tile_pixels(scale, cluster_size=40)
+    pixel_data = filled_pixel_data(1.0)
+    archives = []
+    
+    def setup():
+        archives.append(new_archive(tmp_path, backend))
+        return (archives[-1],), {}
+    
+    def write(archive):
+        with archive.batch():
+            for pixel_row, pixel_col in pixels:
+                archive.save_pixel_data(TILE, pixel_row, pixel_col, pixel_data)
+    
+    benchmark.pedantic(write, setup=setup, rounds=3)
+    assert archives[-1].get_archive_stats()['total_entries'] == scale
+    for archive in archives:
+        archive.close()
+
+
+@scales(small=100, medium=1000, large=5000)
+@backends
+def test_bench_archive_week_updates(benchmark, tmp_path, scale, backend):
+    """Add one fetched week to every pixel of a partially filled archive."""
+    archive = new_archive(tmp_path, backend)
+    pixels = random_tile_pixels(scale, cluster_size=40)
+    pixel_data = filled_pixel_data(0.8)
+    for pixel_row, pixel_col in pixels:
+        archive.save_pixel_data(TILE, pixel_row, pixel_col, pixel_data)
+    pixel_updates = {pixel: [(ARCHIVE_END, 50, 0)] for pixel in pixels}
+    
+    result = benchmark.pedantic(archive.update_pixel_weeks, args=(TILE, pixel_updates), rounds=3)
+    archive.close()
+    assert result['updated_pixels'] == len(pixel_updates)
@@ -5,16 +5,58 @@ HDF to GeoTIFF Conversion Tool
 This script converts HDF files (specifically VIIRS snow cover data) to GeoTIFF format
 while preserving the original sinusoidal projection.
 
+Batch mode converts files in parallel worker processes and writes tiled,
+compressed Cloud-Optimized GeoTIFFs with overviews. Each HDF file is opened once
+and several subdatasets (e.g. snow cover and cloud persistence) are written from
+that single read.
+
 Requirements:
-- GDAL/OGR Python bindings (install with: pip install gdal)
+- GDAL/OGR Python bindings >= 3.1 for the COG driver (install with: pip install gdal)
+- h5py (batch mode)
 """
 
 import os
 import sys
 import argparse
 import re
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from osgeo import gdal, osr
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+from constants import DATA_FIELDS_GROUP, TILE_SIZE_METERS, PIXEL_SIZE, PIXELS_PER_TILE
+
+# VNP10A1F subdatasets in GDAL's subdataset order
+SUBDATASET_NAMES = [
+    'Algorithm_Bit_Flags_QA',
+    'Basic_QA',
+    'CGF_NDSI_Snow_Cover',
+    'Cloud_Persistence',
+    'Daily_NDSI_Snow_Cover',
+]
+
+# COG creation options: 512px internal tiles, lossless DEFLATE with horizontal
+# differencing, and nearest-neighbour overviews since values are categorical
+# (snow cover percentages mixed with flag values)
+COG_OPTIONS = [
+    'COMPRESS=DEFLATE',
+    'PREDICTOR=2',
+    'BLOCKSIZE=512',
+    'OVERVIEWS=AUTO',
+    'OVERVIEW_RESAMPLING=NEAREST',
+    'BIGTIFF=IF_SAFER',
+]
+
+NUMPY_TO_GDAL_TYPES = {
+    'uint8': gdal.GDT_Byte,
+    'uint16': gdal.GDT_UInt16,
+    'int16': gdal.GDT_Int16,
+    'uint32': gdal.GDT_UInt32,
+    'int32': gdal.GDT_Int32,
+    'float32': gdal.GDT_Float32,
+    'float64': gdal.GDT_Float64,
+}
+
 
 def get_hdf_subdatasets(hdf_file):
     """
@@ -44,6 +86,46 @@ def get_hdf_subdatasets(hdf_file):
     return subdatasets
 
 
+def sinusoidal_srs():
+    """
+    Sinusoidal projection used by the VIIRS/MODIS grids
+    
+    Returns:
+        osr.SpatialReference
+    """
+    srs = osr.SpatialReference()
+    srs.SetProjCS("MODIS Sinusoidal")
+    srs.SetGeogCS("Unknown datum based upon the custom spheroid",
+                  "Not_specified_based_on_custom_spheroid",
+                  "Custom spheroid", 6371007.181, 0.0,
+                  "Greenwich", 0.0)
+    srs.SetSinusoidal(0.0, 0.0, 0.0)
+    return srs
+
+
+def tile_geotransform(hdf_file):
+    """
+    Calculate the geotransform of a tile from the hXXvYY part of its filename
+    
+    Args:
+        hdf_file: Path to HDF file
+        
+    Returns:
+        GDAL geotransform tuple, or None if the filename has no tile
+    """
+    tile_match = re.search(r'h(\d{2})v(\d{2})', os.path.basename(hdf_file))
+    if not tile_match:
+        return None
+    
+    h = int(tile_match.group(1))
+    v = int(tile_match.group(2))
+    
+    # Origin is at (0,0) in the center, with 18 tiles in each direction
+    x_min = (h - 18) * TILE_SIZE_METERS
+    y_max = (9 - v) * TILE_SIZE_METERS
+    return (x_min, PIXEL_SIZE, 0.0, y_max, 0.0, -PIXEL_SIZE)
+
+
 def convert_hdf_to_geotiff(hdf_file, output_file, subdataset_index=2):
     """
     Convert HDF file to GeoTIFF preserving original projection
@@ -77,13 +159,7 @@ def convert_hdf_to_geotiff(hdf_file, output_file, subdataset_index=2):
     print(f"Dimensions: {cols} x {rows}, Bands: {bands}")
     
     # Define the sinusoidal projection used by VIIRS
-    srs = osr.SpatialReference()
-    srs.SetProjCS("MODIS Sinusoidal")
-    srs.SetGeogCS("Unknown datum based upon the custom spheroid",
-                  "Not_specified_based_on_custom_spheroid",
-                  "Custom spheroid", 6371007.181, 0.0,
-                  "Greenwich", 0.0)
-    srs.SetSinusoidal(0.0, 0.0, 0.0)
+    srs = sinusoidal_srs()
     
     # Get or calculate geotransform
     geotransform = src_ds.GetGeoTransform()
@@ -91,26 +167,10 @@ def convert_hdf_to_geotiff(hdf_file, output_file, subdataset_index=2):
     # If geotransform is default (not set), calculate it from tile info
     if geotransform == (0.0, 1.0, 0.0, 0.0, 0.0, 1.0):
         # Extract tile info from filename
-        filename = os.path.basename(hdf_file)
-        tile_match = re.search(r'h(\d{2})v(\d{2})', filename)
+        calculated = tile_geotransform(hdf_file)
         
-        if tile_match:
-            h = int(tile_match.group(1))
-            v = int(tile_match.group(2))
-            print(f"Detected tile: h{h:02d}v{v:02d}")
-            
-            from constants import TILE_SIZE_METERS, PIXEL_SIZE
-            # MODIS/VIIRS sinusoidal grid parameters
-            tile_size = TILE_SIZE_METERS  # meters (10 degrees at equator)
-            pixel_size = PIXEL_SIZE  # meters for VIIRS 375m product
-            
-            # Calculate upper left corner of tile
-            # Origin is at (0,0) in the center, with 18 tiles in each direction
-            x_min = (h - 18) * tile_size
-            y_max = (9 - v) * tile_size
-            
-            # Set geotransform
-            geotransform = (x_min, pixel_size, 0.0, y_max, 0.0, -pixel_size)
+        if calculated:
+            geotransform = calculated
             print(f"Calculated geotransform: {geotransform}")
         else:
             print("Warning: Could not extract tile info from filename")
@@ -179,15 +239,277 @@ def convert_hdf_to_geotiff(hdf_file, output_file, subdataset_index=2):
         verify_ds = None
 
 
-def batch_convert(input_dir, output_dir, file_pattern="*.h5", subdataset_index=2):
+def fill_value_of(dataset, default=None):
     """
-    Batch convert multiple HDF files
+    _FillValue attribute of an h5py dataset
+    
+    Args:
+        dataset: h5py dataset
+        default: Value returned when the attribute is missing
+        
+    Returns:
+        Fill value as a Python number, or default
+    """
+    import numpy as np
+    
+    fill_value = dataset.attrs.get('_FillValue')
+    if fill_value is None:
+        return default
+    # HDF5 attributes are read as one-element arrays
+    return np.ravel(fill_value)[0].item()
+
+
+def write_cog(output_file, data, geotransform, description=None, nodata=None):
+    """
+    Write a 2D array in the sinusoidal projection as a Cloud-Optimized GeoTIFF
+    
+    The array goes through an in-memory GDAL dataset to the COG driver, which adds
+    internal tiling, compression and overviews. The file is written next to the
+    output and renamed, so an interrupted run leaves no partial COGs.
+    
+    Args:
+        output_file: Path to output COG file
+        data: 2D numpy array
+        geotransform: GDAL geotransform tuple
+        description: Band description (e.g. the subdataset name)
+        nodata: NoData value, if any
+    """
+    # Worker processes do not run the __main__ block
+    gdal.UseExceptions()
+    
+    cog_driver = gdal.GetDriverByName('COG')
+    if not cog_driver:
+        raise ValueError("COG driver not available (requires GDAL >= 3.1)")
+    if data.dtype.name not in NUMPY_TO_GDAL_TYPES:
+        raise ValueError(f"Unsupported data type {data.dtype}")
+    
+    rows, cols = data.shape
+    mem_ds = gdal.GetDriverByName('MEM').Create('', cols, rows, 1, NUMPY_TO_GDAL_TYPES[data.dtype.name])
+    mem_ds.SetProjection(sinusoidal_srs().ExportToWkt())
+    mem_ds.SetGeoTransform(geotransform)
+    
+    band = mem_ds.GetRasterBand(1)
+    band.WriteArray(data)
+    if description:
+        band.SetDescription(description)
+    if nodata is not None:
+        band.SetNoDataValue(float(nodata))
+    
+    tmp_file = f"{output_file}.tmp"
+    cog_driver.CreateCopy(tmp_file, mem_ds, options=COG_OPTIONS)
+    os.replace(tmp_file, output_file)
+    mem_ds = None
+
+
+def convert_hdf_to_cogs(hdf_file, output_dir, subdataset_indices=(2,)):
+    """
+    Convert subdatasets of one HDF file to Cloud-Optimized GeoTIFFs
+    
+    The HDF file is opened once with h5py and every requested subdataset is read
+    from that handle.
+    
+    Args:
+        hdf_file: Path to input HDF file
+        output_dir: Directory for output COG files
+        subdataset_indices: Indices of subdatasets to convert (see SUBDATASET_NAMES)
+        
+    Returns:
+        List of written output files
+    """
+    import h5py
+    
+    geotransform = tile_geotransform(hdf_file)
+    if geotransform is None:
+        raise ValueError(f"Could not extract tile info from filename: {hdf_file}")
+    
+    base_name = os.path.splitext(os.path.basename(hdf_file))[0]
+    output_files = []
+    
+    with h5py.File(hdf_file, 'r') as f:
+        for subdataset_index in subdataset_indices:
+            name = SUBDATASET_NAMES[subdataset_index]
+            dataset = f[f"{DATA_FIELDS_GROUP}/{name}"]
+            
+            # Keep the single-subdataset file name of batch_convert()
+            suffix = f"_{name}" if len(subdataset_indices) > 1 else ""
+            output_file = os.path.join(output_dir, f"{base_name}{suffix}.tif")
+            write_cog(output_file, dataset[()], geotransform, name, fill_value_of(dataset))
+            output_files.append(output_file)
+    
+    return output_files
+
+
+def region_bounds(bbox=None, runs_geojson=None):
+    """
+    Sinusoidal bounds of a lon/lat bounding box or of all features of a GeoJSON file
+    
+    Args:
+        bbox: (min_lon, min_lat, max_lon, max_lat)
+        runs_geojson: Path to a GeoJSON file (e.g. runs.geojson)
+        
+    Returns:
+        (min_x, min_y, max_x, max_y) in meters
+    """
+    from shapely.geometry import box
+    from shapely.ops import transform
+    from pixel_extractor import VIIRSPixelExtractor
+    
+    if runs_geojson:
+        import geopandas as gpd
+        bbox = gpd.read_file(runs_geojson).total_bounds
+    
+    # Meridians are curves in the sinusoidal projection, so densify the box edges
+    # before projecting to get the bounds of the curved region
+    region = box(*bbox).segmentize(0.01)
+    transformer = VIIRSPixelExtractor().transformer
+    return transform(transformer.transform, region).bounds
+
+
+def find_tile_files(input_dir, date):
+    """
+    Find the granules of a date in a directory
+    
+    Args:
+        input_dir: Directory containing HDF files
+        date: datetime of the granules
+        
+    Returns:
+        Dictionary mapping (h, v) tile indices to file paths
+    """
+    import glob
+    
+    doy = date.timetuple().tm_yday
+    tile_files = {}
+    for hdf_file in glob.glob(os.path.join(input_dir, f"*.A{date.year}{doy:03d}.h??v??.*")):
+        tile_match = re.search(r'\.h(\d{2})v(\d{2})\.', os.path.basename(hdf_file))
+        if tile_match:
+            tile_files[(int(tile_match.group(1)), int(tile_match.group(2)))] = hdf_file
+    return tile_files
+
+
+def mosaic_region(tile_files, bounds, subdataset_indices=(2,)):
+    """
+    Read the pixels of a region from every intersecting tile into one array per subdataset
+    
+    The mosaic is a PIXEL_SIZE grid covering bounds. Each mosaic pixel takes the value
+    of the tile pixel its center falls in, located the same way as in
+    VIIRSPixelExtractor, so the mosaic shows the pixels the pipeline archives. Only
+    the window of each tile covering the region is read from the HDF file.
+    
+    Args:
+        tile_files: Dictionary mapping (h, v) tile indices to HDF files
+        bounds: (min_x, min_y, max_x, max_y) sinusoidal bounds of the region
+        subdataset_indices: Indices of subdatasets to read (see SUBDATASET_NAMES)
+        
+    Returns:
+        (mosaics, geotransform, tiles_read): arrays and fill values keyed by subdataset
+        name ({name: (array, fill_value)}), the mosaic geotransform and the number of
+        tiles that had a file
+    """
+    import h5py
+    import numpy as np
+    
+    min_x, min_y, max_x, max_y = bounds
+    origin_x = -18 * TILE_SIZE_METERS
+    origin_y = 9 * TILE_SIZE_METERS
+    
+    # Snap the region to the pixel grid of its upper left tile. TILE_SIZE_METERS is not
+    # a multiple of PIXEL_SIZE, so mosaic pixels match tile pixels exactly in that
+    # tile and are nearest-neighbour samples in the others
+    anchor_x = origin_x + np.floor((min_x - origin_x) / TILE_SIZE_METERS) * TILE_SIZE_METERS
+    anchor_y = origin_y - np.floor((origin_y - max_y) / TILE_SIZE_METERS) * TILE_SIZE_METERS
+    first_col = int(np.floor((min_x - anchor_x) / PIXEL_SIZE))
+    last_col = int(np.ceil((max_x - anchor_x) / PIXEL_SIZE))
+    first_row = int(np.floor((anchor_y - max_y) / PIXEL_SIZE))
+    last_row = int(np.ceil((anchor_y - min_y) / PIXEL_SIZE))
+    geotransform = (float(anchor_x + first_col * PIXEL_SIZE), PIXEL_SIZE, 0.0,
+                    float(anchor_y - first_row * PIXEL_SIZE), 0.0, -PIXEL_SIZE)
+    
+    # Tile and tile pixel of each mosaic column and row center
+    x = anchor_x + (np.arange(first_col, last_col) + 0.5) * PIXEL_SIZE
+    y = anchor_y - (np.arange(first_row, last_row) + 0.5) * PIXEL_SIZE
+    h_tiles = np.floor((x - origin_x) / TILE_SIZE_METERS).astype(int)
+    v_tiles = np.floor((origin_y - y) / TILE_SIZE_METERS).astype(int)
+    tile_cols = np.minimum(((x - (origin_x + h_tiles * TILE_SIZE_METERS)) / PIXEL_SIZE).astype(int),
+                           PIXELS_PER_TILE - 1)
+    tile_rows = np.minimum((((origin_y - v_tiles * TILE_SIZE_METERS) - y) / PIXEL_SIZE).astype(int),
+                           PIXELS_PER_TILE - 1)
+    
+    mosaics = {}
+    tiles_read = 0
+    for h in np.unique(h_tiles):
+        for v in np.unique(v_tiles):
+            hdf_file = tile_files.get((int(h), int(v)))
+            if hdf_file is None:
+                continue
+            tiles_read += 1
+            
+            mosaic_cols = np.flatnonzero(h_tiles == h)
+            mosaic_rows = np.flatnonzero(v_tiles == v)
+            cols, rows = tile_cols[mosaic_cols], tile_rows[mosaic_rows]
+            col_start, col_end = cols.min(), cols.max() + 1
+            row_start, row_end = rows.min(), rows.max() + 1
+            
+            with h5py.File(hdf_file, 'r') as f:
+                for subdataset_index in subdataset_indices:
+                    name = SUBDATASET_NAMES[subdataset_index]
+                    dataset = f[f"{DATA_FIELDS_GROUP}/{name}"]
+                    if name not in mosaics:
+                        # VIIRS fill value for pixels not covered by any file
+                        fill_value = fill_value_of(dataset, default=255)
+                        mosaics[name] = (np.full((len(y), len(x)), fill_value, dtype=dataset.dtype), fill_value)
+                    
+                    window = dataset[row_start:row_end, col_start:col_end]
+                    mosaics[name][0][np.ix_(mosaic_rows, mosaic_cols)] = \
+                        window[np.ix_(rows - row_start, cols - col_start)]
+    
+    return mosaics, geotransform, tiles_read
+
+
+def mosaic_convert(input_dir, output_file, date, bbox=None, runs_geojson=None, subdataset_indices=(2,)):
+    """
+    Write a mosaicked Cloud-Optimized GeoTIFF of a region for one date
+    
+    Args:
+        input_dir: Directory containing the HDF files of the date
+        output_file: Path to output COG file; with several subdatasets the subdataset
+            name is appended to the file name
+        date: datetime of the granules
+        bbox: (min_lon, min_lat, max_lon, max_lat) of the region
+        runs_geojson: GeoJSON file whose features define the region (instead of bbox)
+        subdataset_indices: Indices of subdatasets to write
+        
+    Returns:
+        List of written output files
+    """
+    bounds = region_bounds(bbox, runs_geojson)
+    tile_files = find_tile_files(input_dir, date)
+    mosaics, geotransform, tiles_read = mosaic_region(tile_files, bounds, subdataset_indices)
+    
+    if not mosaics:
+        raise ValueError(f"No granules for {date:%Y-%m-%d} intersect the region in {input_dir}")
+    
+    output_base, extension = os.path.splitext(output_file)
+    output_files = []
+    for name, (data, fill_value) in mosaics.items():
+        path = f"{output_base}_{name}{extension}" if len(mosaics) > 1 else output_file
+        write_cog(path, data, geotransform, name, fill_value)
+        output_files.append(path)
+        print(f"Wrote {data.shape[1]} x {data.shape[0]} mosaic of {tiles_read} tiles: {path}")
+    
+    return output_files
+
+
+def batch_convert(input_dir, output_dir, file_pattern="*.h5", subdataset_indices=(2,), workers=None):
+    """
+    Batch convert multiple HDF files to Cloud-Optimized GeoTIFFs in parallel
     
     Args:
         input_dir: Directory containing HDF files
         output_dir: Directory for output GeoTIFF files
         file_pattern: File pattern to match (default: *.h5)
-        subdataset_index: Index of subdataset to convert
+        subdataset_indices: Indices of subdatasets to convert, one COG per subdataset
+        workers: Number of worker processes (default: CPU count)
     """
     import glob
     
@@ -196,28 +518,34 @@ def batch_convert(input_dir, output_dir, file_pattern="*.h5", subdataset_index=2
     
     # Find all matching files
     search_pattern = os.path.join(input_dir, file_pattern)
-    hdf_files = glob.glob(search_pattern)
+    hdf_files = sorted(glob.glob(search_pattern))
     
     if not hdf_files:
         print(f"No files found matching pattern: {search_pattern}")
         return
     
-    print(f"Found {len(hdf_files)} files to process")
-    
-    # Process each file
-    for i, hdf_file in enumerate(hdf_files):
-        print(f"\n[{i+1}/{len(hdf_files)}] Processing: {os.path.basename(hdf_file)}")
-        
-        # Generate output filename
-        base_name = os.path.basename(hdf_file)
-        output_name = os.path.splitext(base_name)[0] + ".tif"
-        output_file = os.path.join(output_dir, output_name)
-        
-        try:
-            convert_hdf_to_geotiff(hdf_file, output_file, subdataset_index)
-        except Exception as e:
-            print(f"Error processing {hdf_file}: {str(e)}")
-            continue
+    workers = workers or os.cpu_count() or 1
+    names = ", ".join(SUBDATASET_NAMES[i] for i in subdataset_indices)
+    print(f"Found {len(hdf_files)} files to process ({names}) with {workers} workers")
+    
+    # Each worker converts whole files, so GDAL runs single-threaded per process
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = {
+            executor.submit(convert_hdf_to_cogs, hdf_file, output_dir, tuple(subdataset_indices)): hdf_file
+            for hdf_file in hdf_files
+        }
+        failed = 0
+        for i, future in enumerate(as_completed(futures)):
+            hdf_file = futures[future]
+            try:
+                output_files = future.result()
+                print(f"[{i+1}/{len(hdf_files)}] {os.path.basename(hdf_file)} -> "
+                      f"{', '.join(os.path.basename(output_file) for output_file in output_files)}")
+            except Exception as e:
+                failed += 1
+                print(f"[{i+1}/{len(hdf_files)}] Error processing {hdf_file}: {str(e)}")
+    
+    print(f"\nConverted {len(hdf_files) - failed}/{len(hdf_files)} files")
 
 
 def main():
@@ -235,8 +563,17 @@ Examples:
   # List available subdatasets
   python hdf_to_geotiff.py input.h5 --list-subdatasets
   
-  # Batch process directory
-  python hdf_to_geotiff.py --batch input_dir/ output_dir/ --subdataset 2
+  # Batch process directory into Cloud-Optimized GeoTIFFs, 4 files at a time
+  python hdf_to_geotiff.py --batch input_dir/ output_dir/ --subdataset 2 --workers 4
+  
+  # Batch process snow cover and cloud persistence in one pass
+  python hdf_to_geotiff.py --batch input_dir/ output_dir/ --subdataset 2 3
+  
+  # Mosaic the tiles of one date cropped to a bounding box (lon/lat)
+  python hdf_to_geotiff.py --mosaic input_dir/ alps.tif --date 2024-01-08 --bbox 5.9 45.8 10.5 47.8
+  
+  # Mosaic cropped to the extent of a runs.geojson
+  python hdf_to_geotiff.py --mosaic input_dir/ region.tif --date 2024-01-08 --runs data/runs.geojson
   
 Subdataset indices for VIIRS snow cover:
   0: Algorithm_Bit_Flags_QA
@@ -255,20 +592,47 @@ Subdataset indices for VIIRS snow cover:
     parser.add_argument('--batch', nargs=2, metavar=('INPUT_DIR', 'OUTPUT_DIR'),
                        help='Batch process directory')
     
+    # Mosaic mode
+    parser.add_argument('--mosaic', nargs=2, metavar=('INPUT_DIR', 'OUTPUT_FILE'),
+                       help='Mosaic the tiles of --date cropped to --bbox or --runs into one COG')
+    parser.add_argument('--date', help='Granule date for mosaic mode (YYYY-MM-DD)')
+    region = parser.add_mutually_exclusive_group()
+    region.add_argument('--bbox', type=float, nargs=4, metavar=('MIN_LON', 'MIN_LAT', 'MAX_LON', 'MAX_LAT'),
+                       help='Region for mosaic mode')
+    region.add_argument('--runs', metavar='GEOJSON',
+                       help='GeoJSON file whose extent is the region for mosaic mode (e.g. runs.geojson)')
+    
     # Options
-    parser.add_argument('--subdataset', type=int, default=2,
-                       help='Subdataset index to process (default: 2 - CGF_NDSI_Snow_Cover)')
+    parser.add_argument('--subdataset', type=int, nargs='+', default=[2],
+                       help='Subdataset index to process (default: 2 - CGF_NDSI_Snow_Cover); '
+                            'batch mode accepts several')
+    parser.add_argument('--workers', type=int,
+                       help='Worker processes for batch mode (default: CPU count)')
     parser.add_argument('--list-subdatasets', action='store_true',
                        help='List available subdatasets and exit')
     
     args = parser.parse_args()
     
+    if args.mosaic:
+        from datetime import datetime
+        
+        if not args.date or not (args.bbox or args.runs):
+            parser.error("--mosaic requires --date and --bbox or --runs")
+        mosaic_convert(
+            args.mosaic[0],
+            args.mosaic[1],
+            datetime.strptime(args.date, '%Y-%m-%d'),
+            bbox=args.bbox,
+            runs_geojson=args.runs,
+            subdataset_indices=args.subdataset
+        )
     # Check for batch mode
-    if args.batch:
+    elif args.batch:
         batch_convert(
             args.batch[0], 
             args.batch[1],
-            subdataset_index=args.subdataset
+            subdataset_indices=args.subdataset,
+            workers=args.workers
         )
     elif args.input:
         # Single file mode
@@ -277,11 +641,13 @@ Subdataset indices for VIIRS snow cover:
         else:
             if not args.output:
                 parser.error("Output file required when not using --list-subdatasets")
+            if len(args.subdataset) > 1:
+                parser.error("Several subdatasets are only supported in --batch mode")
             
             convert_hdf_to_geotiff(
                 args.input,
                 args.output,
-                subdataset_index=args.subdataset
+                subdataset_index=args.subdataset[0]
             )
     else:
         parser.print_help()
@@ -0,0 +1,46 @@
+#!/usr/bin/env python3
+"""
+Selection of the snow cover archive storage backend.
+
+Both backends implement the same interface, so the processor, the aggregator and
+the exporter work with either:
+
+    sqlite  One JSON row per pixel in a SQLite database file (default)
+    tiles   Memory-mapped per-tile, per-year cubes in a directory, see
+            snow_cover_tile_archive.py
+
+Backends are imported when an archive is created, so the tile backend's numpy
+import is not paid by SQLite runs.
+"""
+
+from typing import TYPE_CHECKING, Union
+
+if TYPE_CHECKING:
+    from snow_cover_sqlite_archive import SnowCoverSQLiteArchive
+    from snow_cover_tile_archive import SnowCoverTileArchive
+
+ARCHIVE_BACKENDS = ('sqlite', 'tiles')
+
+SnowCoverArchive = Union['SnowCoverSQLiteArchive', 'SnowCoverTileArchive']
+
+
+def create_archive(backend: str, archive_path: str, read_only: bool = False) -> SnowCoverArchive:
+    """
+    Create an (uninitialized) archive of the given backend.
+    
+    Args:
+        backend: 'sqlite' or 'tiles'
+        archive_path: SQLite database file for 'sqlite', archive directory for 'tiles'
+        read_only: Open the SQLite archive as a concurrent reader; tile cubes need no
+            locking and ignore it
+    
+    Returns:
+        Archive instance; call initialize() before use
+    """
+    if backend == 'sqlite':
+        from snow_cover_sqlite_archive import SnowCoverSQLiteArchive
+        return SnowCoverSQLiteArchive(archive_path, read_only=read_only)
+    if backend == 'tiles':
+        from snow_cover_tile_archive import SnowCoverTileArchive
+        return SnowCoverTileArchive(archive_path)
+    raise ValueError(f"Unknown archive backend {backend!r}, expected one of {ARCHIVE_BACKENDS}")
@@ -0,0 +1,181 @@
+#!/usr/bin/env python3
+"""
+Adaptive download concurrency (AIMD).
+
+Too many parallel downloads get us throttled by NSIDC (429/503), too few leave the
+link idle. AIMDConcurrencyController picks the number of granules fetched in
+parallel while the run progresses:
+
+- Additive increase: after each window of completed granules, concurrency grows
+  by one while throughput keeps up with the previous window and granule latency
+  stays within latency_tolerance of the best latency seen.
+- Multiplicative decrease: a throttling response (429, 5xx) or a timeout halves
+  concurrency at once, at most once per window.
+- A window whose throughput fell, or whose latency inflated, steps back by one.
+
+Throttling and timeouts are observed by ConcurrencySignalAdapter, mounted on the
+fetcher's requests session; granule latencies are reported by the download
+engine. Each window is recorded in the metrics summary as a concurrency and
+throughput timeline.
+"""
+
+import logging
+import threading
+import time
+from typing import List, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from constants import DEFAULT_MAX_CONCURRENCY
+from metrics import PipelineMetrics
+
+# Completed granules per window at least, so one slow granule does not decide
+MIN_WINDOW_TASKS = 4
+
+# HTTP statuses that mean the server is overloaded or throttling us
+THROTTLE_STATUSES = frozenset({429, 500, 502, 503, 504})
+
+
+class AIMDConcurrencyController:
+    """Thread-safe AIMD controller for the number of parallel granule fetches."""
+    
+    def __init__(self, initial: int = 6, minimum: int = 1, maximum: int = DEFAULT_MAX_CONCURRENCY,
+                 adaptive: bool = True, decrease_factor: float = 0.5, latency_tolerance: float = 2.0,
+                 throughput_tolerance: float = 0.05, metrics: Optional[PipelineMetrics] = None):
+        """
+        Initialize the controller.
+        
+        Args:
+            initial: Concurrency to start with
+            minimum: Lowest concurrency
+            maximum: Highest concurrency (size of the download thread pool)
+            adaptive: Adjust concurrency; if False it stays at initial and only the
+                throughput timeline is recorded
+            decrease_factor: Factor applied on throttling or timeouts
+            latency_tolerance: Window median latency above this multiple of the best
+                median seen counts as congestion
+            throughput_tolerance: Relative throughput drop between windows that still
+                counts as keeping up
+            metrics: Metrics registry the timeline is recorded in
+        """
+        if not 1 <= minimum <= maximum:
+            raise ValueError(f"Invalid concurrency bounds {minimum}..{maximum}")
+        
+        self.minimum = minimum
+        self.maximum = maximum if adaptive else max(initial, minimum)
+        self.adaptive = adaptive
+        self.decrease_factor = decrease_factor
+        self.latency_tolerance = latency_tolerance
+        self.throughput_tolerance = throughput_tolerance
+        self.metrics = metrics if metrics is not None else PipelineMetrics()
+        self.logger = logging.getLogger(__name__)
+        
+        self._limit = min(max(initial, minimum), self.maximum)
+        self._lock = threading.Lock()
+        self._started = time.monotonic()
+        self._best_latency: Optional[float] = None
+        self._previous_throughput: Optional[float] = None
+        self._reset_window(time.monotonic())
+    
+    @property
+    def limit(self) -> int:
+        """Number of granules to fetch in parallel right now."""
+        return self._limit
+    
+    def _reset_window(self, now: float):
+        self._window_start = now
+        self._window_latencies: List[float] = []
+        self._window_throttled = 0
+    
+    def observe_response(self, status_code: int):
+        """Record an HTTP response; throttling statuses cut concurrency."""
+        if status_code in THROTTLE_STATUSES:
+            self.observe_throttle(f"HTTP {status_code}")
+    
+    def observe_throttle(self, reason: str):
+        """
+        Record a throttling response or a timeout.
+        
+        Concurrency is multiplied by decrease_factor, at most once per window, since
+        requests in flight when the server pushed back report the same event.
+        """
+        self.metrics.increment('throttle_signals')
+        with self._lock:
+            self._window_throttled += 1
+            if self.adaptive and self._window_throttled == 1:
+                self._previous_throughput = None
+                self._adjust(max(self.minimum, int(self._limit * self.decrease_factor)),
+                             f"throttled ({reason})", time.monotonic())
+    
+    def task_done(self, seconds: float):
+        """
+        Record a completed granule fetch and close the window when it is full.
+        
+        Args:
+            seconds: Time the granule took from start to finish
+        """
+        with self._lock:
+            now = time.monotonic()
+            self._window_latencies.append(seconds)
+            if len(self._window_latencies) < max(self._limit, MIN_WINDOW_TASKS):
+                return
+            
+            elapsed = now - self._window_start
+            throughput = len(self._window_latencies) / elapsed if elapsed > 0 else 0.0
+            latencies = sorted(self._window_latencies)
+            median = latencies[len(latencies) // 2]
+            
+            # Windows that saw throttling were already cut and are not compared
+            if self._window_throttled:
+                self._record(now, throughput, median, "throttled window")
+                self._reset_window(now)
+                return
+            
+            self._best_latency = median if self._best_latency is None else min(self._best_latency, median)
+            previous = self._previous_throughput
+            self._previous_throughput = throughput
+            
+            if not self.adaptive:
+                self._record(now, throughput, median, "fixed")
+            elif median > self._best_latency * self.latency_tolerance:
+                self._adjust(max(self.minimum, self._limit - 1), "latency inflated", now, throughput, median)
+            elif previous is not None and throughput < previous * (1 - self.throughput_tolerance):
+                self._adjust(max(self.minimum, self._limit - 1), "throughput fell", now, throughput, median)
+            else:
+                self._adjust(min(self.maximum, self._limit + 1), "increase", now, throughput, median)
+            self._reset_window(now)
+    
+    def _adjust(self, limit: int, reason: str, now: float, throughput: Optional[float] = None,
+                median: Optional[float] = None):
+        """Set the concurrency limit and record the window (caller holds the lock)."""
+        if limit != self._limit:
+            self.logger.debug(f"Download concurrency {self._limit} -> {limit}: {reason}")
+        self._limit = limit
+        self._record(now, throughput, median, reason)
+    
+    def _record(self, now: float, throughput: Optional[float], median: Optional[float], reason: str):
+        self.metrics.record_concurrency({
+            'seconds': round(now - self._started, 3),
+            'concurrency': self._limit,
+            'granules_per_second': round(throughput, 3) if throughput is not None else None,
+            'p50_seconds': round(median, 3) if median is not None else None,
+            'reason': reason,
+        })
+
+
+class ConcurrencySignalAdapter(HTTPAdapter):
+    """HTTP adapter reporting throttling responses and timeouts to a controller."""
+    
+    def __init__(self, controller: AIMDConcurrencyController, **kwargs):
+        self.controller = controller
+        super().__init__(**kwargs)
+    
+    def send(self, request, **kwargs):
+        try:
+            response = super().send(request, **kwargs)
+        except (requests.Timeout, requests.ConnectionError) as e:
+            self.controller.observe_throttle(type(e).__name__)
+            raise
+        self.controller.observe_response(response.status_code)
+        return response
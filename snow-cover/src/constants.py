@@ -5,6 +5,15 @@ Shared constants for VIIRS snow cover data processing.
 Contains error codes, VIIRS/MODIS grid parameters, and other shared constants.
 """
 
+# NSIDC DAAC endpoint for VIIRS VNP10A1F data
+NSIDC_BASE_URL = "https://n5eil01u.ecs.nsidc.org/VIIRS/VNP10A1F.002"
+
+# NASA CMR search API used for bulk granule discovery
+CMR_SEARCH_URL = "https://cmr.earthdata.nasa.gov/search"
+
+# Upper bound of the adaptive download concurrency
+DEFAULT_MAX_CONCURRENCY = 24
+
 # Error codes for missing/failed data
 ERROR_OLD_MISSING = 301  # No data available for old dates (>1 month)
 ERROR_RECENT_MISSING = 400  # No data available for recent dates (retryable)
@@ -16,4 +25,9 @@ TILE_SIZE_METERS = 1111950.519667  # 10 degrees at equator in sinusoidal project
 PIXELS_PER_TILE = 3000
 SPHERE_RADIUS = 6371007.181  # Official VIIRS sphere radius in meters
 GLOBAL_WIDTH = 20015109.354 * 2  # Full global extent horizontally
-GLOBAL_HEIGHT = 10007554.677 * 2  # Full global extent vertically
\ No newline at end of file
+GLOBAL_HEIGHT = 10007554.677 * 2  # Full global extent vertically
+
+# VNP10A1F HDF5 dataset paths
+DATA_FIELDS_GROUP = '/HDFEOS/GRIDS/VIIRS_Grid_IMG_2D/Data Fields'
+SNOW_COVER_DATASET = '/HDFEOS/GRIDS/VIIRS_Grid_IMG_2D/Data Fields/CGF_NDSI_Snow_Cover'
+CLOUD_PERSISTENCE_DATASET = '/HDFEOS/GRIDS/VIIRS_Grid_IMG_2D/Data Fields/Cloud_Persistence'
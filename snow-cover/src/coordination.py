@@ -0,0 +1,377 @@
+#!/usr/bin/env python3
+"""
+Coordination of fetches split across several machines.
+
+Each node fetches into its own archive; merge_archives.py folds the node archives
+into one afterwards. Two modes decide which node fetches what:
+
+- Static shards (--shard i/N): a node only processes the tiles whose CRC32 modulo N
+  is i. Tiles are disjoint, so no granule is fetched twice, but a crashed node's
+  tiles wait for it to be restarted.
+- Leases (--lease-job NAME): (tile, year) units of a job are registered in the
+  fetch_leases table of the Postgres cache database and claimed by workers with
+  expiring leases, recent years first. A worker renews its lease every
+  lease_seconds / RENEWALS_PER_LEASE seconds while it works on the unit and records
+  the dates it fetched after each batch. A crashed worker's lease expires and
+  another worker reclaims the unit, skipping the recorded dates.
+
+A worker only starts granules while more than half of its lease is left, so
+granules in flight finish long before the lease can expire and be reclaimed, and
+two workers never download the same granule. Each node should start from a copy
+of the merged archive, since missing weeks are planned from the local archive.
+"""
+
+import asyncio
+import logging
+import os
+import socket
+import threading
+import time
+import zlib
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, Dict, Iterable, Optional, Set, Tuple
+
+# asyncpg and postgres_cache are imported when a lease table is used, so shard-only
+# and single-node runs do not load them
+
+# Seconds a claimed unit stays leased without renewal
+DEFAULT_LEASE_SECONDS = 600
+
+RENEWALS_PER_LEASE = 3
+
+# Seconds to wait for units leased by other workers to finish or expire
+DEFAULT_POLL_SECONDS = 30
+
+LEASE_PENDING = 'pending'
+LEASE_LEASED = 'leased'
+LEASE_DONE = 'done'
+
+CREATE_LEASES_SQL = """
+    CREATE TABLE IF NOT EXISTS fetch_leases (
+        job TEXT NOT NULL,
+        tile TEXT NOT NULL,
+        year INTEGER NOT NULL,
+        status TEXT NOT NULL DEFAULT 'pending',
+        owner TEXT,
+        expires_at TIMESTAMPTZ,
+        attempts INTEGER NOT NULL DEFAULT 0,
+        done_dates DATE[] NOT NULL DEFAULT '{}',
+        PRIMARY KEY (job, tile, year)
+    )
+"""
+REGISTER_SQL = """INSERT INTO fetch_leases (job, tile, year)
+                  SELECT $1, tile, year FROM unnest($2::text[], $3::int[]) AS unit(tile, year)
+                  ON CONFLICT DO NOTHING"""
+# Pending units and units whose lease expired, most recent year first
+CLAIM_SQL = """UPDATE fetch_leases
+               SET status = 'leased', owner = $2, attempts = attempts + 1,
+                   expires_at = now() + $3::float8 * interval '1 second'
+               WHERE (job, tile, year) = (
+                   SELECT job, tile, year FROM fetch_leases
+                   WHERE job = $1 AND (status = 'pending' OR (status = 'leased' AND expires_at < now()))
+                   ORDER BY year DESC, tile
+                   LIMIT 1
+                   FOR UPDATE SKIP LOCKED
+               )
+               RETURNING tile, year, done_dates, attempts"""
+# A lease that expired but was not reclaimed yet can still be renewed by its owner
+RENEW_SQL = """UPDATE fetch_leases SET expires_at = now() + $5::float8 * interval '1 second'
+               WHERE job = $1 AND tile = $2 AND year = $3 AND owner = $4 AND status = 'leased'"""
+RECORD_DATES_SQL = """UPDATE fetch_leases SET done_dates = done_dates || $4::date[]
+                      WHERE job = $1 AND tile = $2 AND year = $3"""
+FINISH_SQL = """UPDATE fetch_leases SET status = $5, expires_at = NULL
+                WHERE job = $1 AND tile = $2 AND year = $3 AND owner = $4 AND status = 'leased'"""
+
+
+def parse_shard(spec: str) -> Tuple[int, int]:
+    """
+    Parse a shard specification.
+    
+    Args:
+        spec: 'i/N' with 0 <= i < N
+    
+    Returns:
+        Tuple of the shard index and the number of shards
+    """
+    try:
+        index, count = (int(part) for part in spec.split('/'))
+    except ValueError:
+        raise ValueError(f"Invalid shard {spec!r}, expected i/N") from None
+    if not 0 <= index < count:
+        raise ValueError(f"Invalid shard {spec!r}, expected 0 <= i < N")
+    return index, count
+
+
+def tile_in_shard(tile: str, index: int, count: int) -> bool:
+    """Whether a tile belongs to shard index of count (stable across processes and machines)."""
+    return zlib.crc32(tile.encode()) % count == index
+
+
+def lease_db_config_from_environment() -> Dict[str, Any]:
+    """Connection settings of the Postgres cache database from POSTGRES_HOST/PORT/USER/PASSWORD."""
+    from postgres_cache import DEFAULT_DB_CONFIG
+    
+    db_config = dict(DEFAULT_DB_CONFIG)
+    for key in ('host', 'port', 'user', 'password'):
+        value = os.environ.get(f'POSTGRES_{key.upper()}')
+        if value:
+            db_config[key] = int(value) if key == 'port' else value
+    return db_config
+
+
+@dataclass
+class Lease:
+    """A claimed (tile, year) unit."""
+    tile: str
+    year: int
+    done_dates: Set[datetime]
+    attempts: int
+    lease_seconds: float
+    # time.monotonic() by which the lease expires unless renewed
+    valid_until: float
+    lost: bool = False
+    
+    def should_stop(self) -> bool:
+        """Whether to stop starting granules: the lease was lost or may lapse before they finish."""
+        return self.lost or time.monotonic() >= self.valid_until - self.lease_seconds / 2
+
+
+class FetchLeaseTable:
+    """Lease table of (tile, year) fetch units in the Postgres cache database."""
+    
+    def __init__(self, job: str, db_config: Optional[Dict[str, Any]] = None,
+                 lease_seconds: float = DEFAULT_LEASE_SECONDS, worker_id: Optional[str] = None):
+        """
+        Initialize the lease table.
+        
+        Args:
+            job: Name of the fetch job the units belong to; workers of the same job
+                share its units
+            db_config: Overrides for the asyncpg connection settings
+            lease_seconds: Seconds a claimed unit stays leased without renewal
+            worker_id: Owner recorded for claimed units (default: host name and PID)
+        """
+        from postgres_cache import DEFAULT_DB_CONFIG
+        
+        self.job = job
+        self.lease_seconds = lease_seconds
+        self.worker_id = worker_id or f"{socket.gethostname()}-{os.getpid()}"
+        self.db_config = dict(DEFAULT_DB_CONFIG)
+        if db_config:
+            self.db_config.update(db_config)
+        self.logger = logging.getLogger(__name__)
+        self._pool = None
+    
+    async def initialize(self):
+        """Create the lease table if needed and connect."""
+        import asyncpg
+        from postgres_cache import ensure_database
+        
+        await ensure_database(self.db_config)
+        self._pool = await asyncpg.create_pool(min_size=1, max_size=2, **self.db_config)
+        async with self._pool.acquire() as conn:
+            await conn.execute(CREATE_LEASES_SQL)
+    
+    async def register_units(self, units: Iterable[Tuple[str, int]]) -> int:
+        """
+        Add (tile, year) units to the job; units that already exist keep their state.
+        
+        Returns:
+            Number of units added
+        """
+        units = list(units)
+        async with self._pool.acquire() as conn:
+            result = await conn.execute(REGISTER_SQL, self.job, [tile for tile, _ in units],
+                                        [year for _, year in units])
+        return int(result.split()[-1])
+    
+    async def claim(self) -> Optional[Lease]:
+        """Claim the next pending or expired unit, or return None if there is none."""
+        started = time.monotonic()
+        async with self._pool.acquire() as conn:
+            row = await conn.fetchrow(CLAIM_SQL, self.job, self.worker_id, float(self.lease_seconds))
+        if row is None:
+            return None
+        
+        done_dates = {datetime(date.year, date.month, date.day) for date in row['done_dates']}
+        return Lease(row['tile'], row['year'], done_dates, row['attempts'], self.lease_seconds,
+                     started + self.lease_seconds)
+    
+    async def renew(self, lease: Lease) -> bool:
+        """Extend a lease; returns False when another worker took the unit over."""
+        started = time.monotonic()
+        async with self._pool.acquire() as conn:
+            result = await conn.execute(RENEW_SQL, self.job, lease.tile, lease.year, self.worker_id,
+                                        float(self.lease_seconds))
+        if result.split()[-1] == '0':
+            return False
+        lease.valid_until = started + self.lease_seconds
+        return True
+    
+    async def record_dates(self, lease: Lease, dates: Iterable[datetime]):
+        """Record dates of a unit whose results are in the archive, so they are not fetched again."""
+        dates = [date.date() for date in dates]
+        if not dates:
+            return
+        async with self._pool.acquire() as conn:
+            await conn.execute(RECORD_DATES_SQL, self.job, lease.tile, lease.year, dates)
+    
+    async def finish(self, lease: Lease, status: str) -> bool:
+        """
+        Mark a leased unit as done, or hand it back as pending.
+        
+        Returns:
+            False when the lease had already been taken over by another worker
+        """
+        async with self._pool.acquire() as conn:
+            result = await conn.execute(FINISH_SQL, self.job, lease.tile, lease.year, self.worker_id, status)
+        return result.split()[-1] != '0'
+    
+    async def unfinished_count(self) -> int:
+        """Number of units of the job that are not done."""
+        async with self._pool.acquire() as conn:
+            return await conn.fetchval(
+                "SELECT count(*) FROM fetch_leases WHERE job = $1 AND status <> 'done'", self.job
+            )
+    
+    async def get_stats(self) -> Dict[str, int]:
+        """Number of units of the job per status."""
+        async with self._pool.acquire() as conn:
+            rows = await conn.fetch(
+                "SELECT status, count(*) AS units FROM fetch_leases WHERE job = $1 GROUP BY status", self.job
+            )
+        return {row['status']: row['units'] for row in rows}
+    
+    async def close(self):
+        """Close the connection pool."""
+        if self._pool is not None:
+            await self._pool.close()
+            self._pool = None
+
+
+class FetchLeaseTableSync:
+    """
+    Synchronous wrapper around FetchLeaseTable that keeps claimed leases alive.
+    
+    Like PostgresCacheSync, it runs one event loop in a dedicated thread. Each
+    claimed lease is renewed by a task on that loop until it is completed or
+    released, independently of the thread that fetches the unit.
+    """
+    
+    def __init__(self, job: str, db_config: Optional[Dict[str, Any]] = None,
+                 lease_seconds: float = DEFAULT_LEASE_SECONDS, worker_id: Optional[str] = None,
+                 renew_interval: Optional[float] = None):
+        """
+        Initialize the wrapper and start its event loop thread.
+        
+        Args:
+            job: Name of the fetch job
+            db_config: Overrides for the asyncpg connection settings
+            lease_seconds: Seconds a claimed unit stays leased without renewal
+            worker_id: Owner recorded for claimed units (default: host name and PID)
+            renew_interval: Seconds between renewals (default: lease_seconds / RENEWALS_PER_LEASE)
+        """
+        self._table = FetchLeaseTable(job, db_config, lease_seconds, worker_id)
+        self.renew_interval = renew_interval if renew_interval is not None else lease_seconds / RENEWALS_PER_LEASE
+        self.logger = logging.getLogger(__name__)
+        self._heartbeats: Dict[Tuple[str, int], Tuple[Lease, asyncio.Task]] = {}
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._run_loop, name=f"fetch-leases-{job}", daemon=True)
+        self._thread.start()
+    
+    @property
+    def job(self) -> str:
+        return self._table.job
+    
+    @property
+    def worker_id(self) -> str:
+        return self._table.worker_id
+    
+    def _run_loop(self):
+        """Run the event loop until close() stops it."""
+        asyncio.set_event_loop(self._loop)
+        self._loop.run_forever()
+    
+    def _run(self, coroutine):
+        """Run a coroutine on the event loop and wait for its result."""
+        if self._loop.is_closed():
+            coroutine.close()
+            raise RuntimeError("Lease table closed")
+        return asyncio.run_coroutine_threadsafe(coroutine, self._loop).result()
+    
+    async def _heartbeat(self, lease: Lease):
+        """Renew a lease until it is cancelled or lost."""
+        while True:
+            await asyncio.sleep(self.renew_interval)
+            try:
+                if not await self._table.renew(lease):
+                    self.logger.warning(f"Lease on {lease.tile} {lease.year} was taken over by another worker")
+                    lease.lost = True
+                    return
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                # Keep trying; should_stop() ends the unit before the lease can lapse
+                self.logger.warning(f"Could not renew lease on {lease.tile} {lease.year}: {e}")
+    
+    def initialize(self):
+        """Create the lease table if needed and connect (sync version)."""
+        return self._run(self._table.initialize())
+    
+    def register_units(self, units: Iterable[Tuple[str, int]]) -> int:
+        """Add (tile, year) units to the job (sync version)."""
+        return self._run(self._table.register_units(units))
+    
+    def claim(self) -> Optional[Lease]:
+        """Claim the next unit and keep its lease renewed until complete() or release()."""
+        async def claim():
+            lease = await self._table.claim()
+            if lease is not None:
+                task = asyncio.get_running_loop().create_task(self._heartbeat(lease))
+                self._heartbeats[(lease.tile, lease.year)] = (lease, task)
+            return lease
+        
+        return self._run(claim())
+    
+    def record_dates(self, lease: Lease, dates: Iterable[datetime]):
+        """Record fetched dates of a unit (sync version)."""
+        return self._run(self._table.record_dates(lease, list(dates)))
+    
+    def _finish(self, lease: Lease, status: str) -> bool:
+        async def finish():
+            _, task = self._heartbeats.pop((lease.tile, lease.year), (None, None))
+            if task is not None:
+                task.cancel()
+            return await self._table.finish(lease, status)
+        
+        return self._run(finish())
+    
+    def complete(self, lease: Lease) -> bool:
+        """Mark a unit as done; returns False if its lease had been taken over."""
+        return self._finish(lease, LEASE_DONE)
+    
+    def release(self, lease: Lease) -> bool:
+        """Hand an unfinished unit back so other workers can claim it right away."""
+        return self._finish(lease, LEASE_PENDING)
+    
+    def unfinished_count(self) -> int:
+        """Number of units of the job that are not done (sync version)."""
+        return self._run(self._table.unfinished_count())
+    
+    def get_stats(self) -> Dict[str, int]:
+        """Number of units of the job per status (sync version)."""
+        return self._run(self._table.get_stats())
+    
+    def close(self):
+        """Release leases still held, close the pool and stop the event loop thread."""
+        if self._loop.is_closed():
+            return
+        try:
+            for lease, _ in list(self._heartbeats.values()):
+                self.release(lease)
+            self._run(self._table.close())
+        finally:
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._thread.join()
+            self._loop.close()
@@ -2,8 +2,9 @@
 """
 VIIRS data fetcher for downloading and processing snow cover tiles.
 
-Downloads VIIRS VNP10A1F tiles and extracts snow cover values for specified pixels.
-Handles error codes: 301 (old missing), 400 (recent missing), 401 (other errors).
+Downloads VIIRS VNP10A1F tiles and extracts snow cover values for specified pixels,
+or with remote_reads reads only the HDF5 chunks holding those pixels over HTTP
+Range requests. Handles error codes: 301 (old missing), 400 (recent missing), 401 (other errors).
 """
 
 import requests
@@ -11,32 +12,78 @@ import h5py
 import numpy as np
 from datetime import datetime, timedelta
 from pathlib import Path
+import os
 import time
 import logging
 import tempfile
-from typing import List, Tuple, Dict, Optional, Set
+import multiprocessing
+import re
+import threading
+from collections import OrderedDict, deque
+from typing import Callable, List, Tuple, Dict, Optional, Set
 import json
-from concurrent.futures import ThreadPoolExecutor, as_completed
+from concurrent.futures import (
+    ThreadPoolExecutor, ProcessPoolExecutor, wait, FIRST_COMPLETED
+)
 
 
-from constants import ERROR_OLD_MISSING, ERROR_RECENT_MISSING, ERROR_OTHER
+from constants import (
+    ERROR_OLD_MISSING, ERROR_RECENT_MISSING, ERROR_OTHER,
+    SNOW_COVER_DATASET, CLOUD_PERSISTENCE_DATASET, NSIDC_BASE_URL
+)
+from concurrency import THROTTLE_STATUSES, AIMDConcurrencyController, ConcurrencySignalAdapter
+from granule_discovery import GranuleIndex
+from http_range_file import DEFAULT_BLOCK_SIZE, HTTPRangeFile, RangeRequestsNotSupported
+from metrics import PipelineMetrics
 from utils import generate_weekly_dates
 
+# Sentinel for pixels that could not be read (outside the tile bounds)
+MISSING_PIXEL_VALUE = -1
+
+# Directory listings kept in memory; a listing maps each tile of a date to its granule
+LISTING_CACHE_DATES = 1024
+
+# Seconds a listing of a recent date is reused; granules of recent dates may still appear
+RECENT_LISTING_TTL_SECONDS = 3600
+
+# Granule links of a directory listing, grouped into the filename prefix and the tile
+LISTING_GRANULE_PATTERN = re.compile(r'href="(VNP10A1F\.A\d{7}\.(h\d{2}v\d{2})[^"]+\.h5)"')
+
 
 class VIIRSDataFetcher:
     """Fetches and processes VIIRS snow cover data."""
     
-    def __init__(self):
+    def __init__(self, decode_workers: Optional[int] = None, base_url: str = NSIDC_BASE_URL,
+                 rate_limit_delay: float = 0.5, metrics: Optional[PipelineMetrics] = None,
+                 remote_reads: bool = False, range_block_size: int = DEFAULT_BLOCK_SIZE,
+                 granule_index: Optional[GranuleIndex] = None,
+                 concurrency: Optional[AIMDConcurrencyController] = None):
         """
         Initialize the VIIRS data fetcher.
         
         Uses a temporary directory for HDF file caching during processing.
+        
+        Args:
+            decode_workers: Number of processes used to decode HDF files
+                (default: CPU count, 0 decodes in the download threads)
+            base_url: Root URL of the VNP10A1F date directories (default: NSIDC DAAC)
+            rate_limit_delay: Seconds each download worker waits after a download
+            metrics: Metrics registry for listing, download and decode timings
+            remote_reads: Read only the chunks holding the requested pixels with HTTP
+                Range requests instead of downloading whole granules; falls back to
+                downloads if the server does not support Range requests
+            range_block_size: Bytes fetched per block in remote reads
+            granule_index: Index of discovered granules consulted before the
+                directory listings
+            concurrency: Controller choosing the number of parallel fetches; it sees
+                every response of the session (default: max_workers of each call)
         """
         self.temp_dir = tempfile.mkdtemp(prefix="viirs_")
         self.cache_dir = Path(self.temp_dir)
         
-        # NSIDC DAAC endpoint for VIIRS data
-        self.base_url = "https://n5eil01u.ecs.nsidc.org/VIIRS/VNP10A1F.002"
+        # Endpoint serving YYYY.MM.DD/ directory listings and granules
+        self.base_url = base_url.rstrip('/')
+        self.rate_limit_delay = rate_limit_delay
         self.session = requests.Session()
         
         # Setup logging
@@ -44,6 +91,27 @@ class VIIRSDataFetcher:
         
         # Cutoff for old missing files (1 month)
         self.old_missing_cutoff_days = 30
+        
+        # HDF decoding is CPU bound and holds the GIL, so it runs in a process pool
+        self.decode_workers = decode_workers if decode_workers is not None else (os.cpu_count() or 1)
+        self._decode_pool = None
+        
+        self.metrics = metrics if metrics is not None else PipelineMetrics()
+        
+        self.remote_reads = remote_reads
+        self.range_block_size = range_block_size
+        self.granule_index = granule_index
+        
+        self.concurrency = concurrency
+        if concurrency is not None:
+            adapter = ConcurrencySignalAdapter(concurrency, pool_maxsize=concurrency.maximum)
+            self.session.mount("http://", adapter)
+            self.session.mount("https://", adapter)
+        
+        # Date string -> (fetched at, tile -> granule filename); a listing covers all
+        # tiles of a date, so the other tiles of the date are answered without a request
+        self._listings: "OrderedDict[str, Tuple[float, Dict[str, str]]]" = OrderedDict()
+        self._listings_lock = threading.Lock()
     
     def _is_old_date(self, date: datetime) -> bool:
         """Check if a date is older than the cutoff for old missing files."""
@@ -72,46 +140,98 @@ class VIIRSDataFetcher:
         """
         Find the exact filename and URL for a VIIRS file.
         
+        Dates covered by the granule index are answered without a request; other
+        dates are looked up in the date's directory listing, which is kept in memory
+        for the other tiles of the date.
+        
         Args:
             tile: Tile identifier (e.g., 'h18v04')
             date: Date for the file
         
         Returns:
             Tuple of (filename, download_url) or (None, None) if not found
+        
+        Raises:
+            requests.HTTPError: If the server throttles the listing request (429, 5xx),
+                so the date is not mistaken for a missing granule
         """
+        if self.granule_index is not None:
+            located = self.granule_index.lookup(tile, date)
+            if located is not None:
+                self.metrics.increment('granule_index_hits')
+                return located
+        
+        # NSIDC directory structure: /VIIRS/VNP10A1F.002/YYYY.MM.DD/
+        date_str = date.strftime("%Y.%m.%d")
+        dir_url = f"{self.base_url}/{date_str}/"
+        
+        granules = self._cached_listing(date_str, date)
+        if granules is not None:
+            self.metrics.increment('listing_cache_hits')
+            filename = granules.get(tile)
+            return (filename, f"{dir_url}{filename}") if filename else (None, None)
+        
         try:
-            # NSIDC directory structure: /VIIRS/VNP10A1F.002/YYYY.MM.DD/
-            date_str = date.strftime("%Y.%m.%d")
-            dir_url = f"{self.base_url}/{date_str}/"
-            
             # Get base filename pattern
             base_filename = self.get_tile_filename_pattern(tile, date)
             
-            response = self.session.get(dir_url, timeout=30)
+            with self.metrics.timed('listing') as measurement:
+                response = self.session.get(dir_url, timeout=30)
+                measurement['bytes'] = len(response.content)
+                measurement['error'] = response.status_code not in (200, 404)
+            
             if response.status_code == 200:
                 # Parse directory listing to find exact filename
-                content = response.text
-                import re
-                pattern = rf'href="({base_filename}[^"]+\.h5)"'
-                matches = re.findall(pattern, content)
+                granules = {}
+                for filename, listed_tile in LISTING_GRANULE_PATTERN.findall(response.text):
+                    granules.setdefault(listed_tile, filename)
+                self._cache_listing(date_str, granules)
                 
-                if matches:
-                    filename = matches[0]
+                filename = granules.get(tile)
+                if filename and filename.startswith(base_filename):
                     return filename, f"{dir_url}{filename}"
                 else:
                     return None, None
             
             elif response.status_code == 404:
+                self._cache_listing(date_str, {})
                 return None, None
             
+            elif response.status_code in THROTTLE_STATUSES:
+                response.raise_for_status()
+            
             else:
                 self.logger.warning(f"HTTP {response.status_code} for {dir_url}")
                 return None, None
-                
+        
+        except requests.HTTPError:
+            raise
+        
         except Exception as e:
             self.logger.error(f"Error finding filename for {tile} {date}: {e}")
             return None, None
     
+    def _cached_listing(self, date_str: str, date: datetime) -> Optional[Dict[str, str]]:
+        """Granules of a date from a cached listing, or None if it is not cached or stale."""
+        with self._listings_lock:
+            cached = self._listings.get(date_str)
+            if cached is None:
+                return None
+            fetched_at, granules = cached
+            if not self._is_old_date(date) and time.monotonic() - fetched_at > RECENT_LISTING_TTL_SECONDS:
+                del self._listings[date_str]
+                return None
+            self._listings.move_to_end(date_str)
+            return granules
+    
+    def _cache_listing(self, date_str: str, granules: Dict[str, str]):
+        """Keep the granules of a date's listing, evicting the least recently used listings."""
+        with self._listings_lock:
+            self._listings[date_str] = (time.monotonic(), granules)
+            self._listings.move_to_end(date_str)
+            while len(self._listings) > LISTING_CACHE_DATES:
+                self._listings.popitem(last=False)
+    
     def download_hdf_file(self, tile: str, date: datetime) -> Optional[Path]:
         """
         Download HDF file for a specific tile and date.
@@ -122,6 +242,10 @@ class VIIRSDataFetcher:
         
         Returns:
             Path to downloaded file or None if failed
+        
+        Raises:
+            requests.RequestException: If the server throttles the request or it times
+                out, which is retryable rather than a missing granule
         """
         # Check if file already exists in cache
         base_filename = self.get_tile_filename_pattern(tile, date)
@@ -138,29 +262,79 @@ class VIIRSDataFetcher:
         if cache_path.exists():
             return cache_path
         
+        # Written under another suffix and renamed once complete, so an interrupted
+        # download is never found by the cache lookup above
+        part_path = cache_path.with_suffix('.part')
         try:
             # Download file with authentication (uses .netrc)
             self.logger.info(f"Downloading {filename}")
-            response = self.session.get(download_url, stream=True, timeout=120)
-            response.raise_for_status()
-            
-            # Write file to cache
-            with open(cache_path, 'wb') as f:
-                for chunk in response.iter_content(chunk_size=8192):
-                    if chunk:
-                        f.write(chunk)
+            with self.metrics.timed('download') as measurement:
+                response = self.session.get(download_url, stream=True, timeout=120)
+                response.raise_for_status()
+                
+                # Write file to cache
+                with open(part_path, 'wb') as f:
+                    for chunk in response.iter_content(chunk_size=8192):
+                        if chunk:
+                            f.write(chunk)
+                            measurement['bytes'] += len(chunk)
+                os.replace(part_path, cache_path)
             
             # Rate limiting
-            time.sleep(0.5)
+            if self.rate_limit_delay > 0:
+                time.sleep(self.rate_limit_delay)
             return cache_path
-            
+        
         except Exception as e:
             self.logger.error(f"Error downloading {filename}: {e}")
+            part_path.unlink(missing_ok=True)
+            if is_throttling_error(e):
+                raise
             if hasattr(e, 'response') and e.response is not None:
                 if e.response.status_code == 401:
                     self.logger.error("Authentication failed. Check .netrc configuration for urs.earthdata.nasa.gov")
             return None
     
+    def read_remote_pixels(self, tile: str, date: datetime,
+                           pixels: List[Tuple[int, int]]) -> Optional[Tuple[np.ndarray, np.ndarray]]:
+        """
+        Read snow cover and cloud persistence for pixels of a remote granule.
+        
+        Opens the granule through HTTP Range requests, so only the HDF5 metadata and
+        the chunks holding the pixels are transferred. Recorded as a 'download' with
+        the transferred bytes; decompressing the touched chunks is included.
+        
+        Args:
+            tile: Tile identifier (e.g., 'h18v04')
+            date: Date of the granule
+            pixels: List of (pixel_row, pixel_col) tuples
+        
+        Returns:
+            Tuple of (values, cloud_persistence) arrays as from decode_hdf_pixels(),
+            or None if the granule does not exist
+        
+        Raises:
+            RangeRequestsNotSupported: If the server sends whole files
+            requests.RequestException: If a request fails
+        """
+        filename, url = self.find_exact_filename(tile, date)
+        if not filename:
+            return None
+        
+        rows, cols = pixels_to_arrays(pixels)
+        with self.metrics.timed('download') as measurement:
+            remote = HTTPRangeFile(url, self.session, self.range_block_size)
+            try:
+                values, cloud_persistence = decode_hdf_pixels(remote, rows, cols)
+            finally:
+                measurement['bytes'] = remote.bytes_fetched
+                self.metrics.increment('range_requests', remote.requests)
+                remote.close()
+        
+        if self.rate_limit_delay > 0:
+            time.sleep(self.rate_limit_delay)
+        return values, cloud_persistence
+    
     def extract_pixel_values(self, hdf_path: Path, pixels: List[Tuple[int, int]]) -> List[Optional[int]]:
         """
         Extract snow cover values for specific pixels from HDF file.
@@ -173,24 +347,12 @@ class VIIRSDataFetcher:
             List of snow cover values (raw, not normalized) or None for missing/invalid
         """
         try:
+            rows, cols = pixels_to_arrays(pixels)
             with h5py.File(hdf_path, 'r') as f:
-                # VIIRS snow cover dataset path
-                dataset_path = '/HDFEOS/GRIDS/VIIRS_Grid_IMG_2D/Data Fields/CGF_NDSI_Snow_Cover'
-                dataset = f[dataset_path]
-                shape = dataset.shape
-                
-                values = []
-                for row, col in pixels:
-                    if 0 <= row < shape[0] and 0 <= col < shape[1]:
-                        # Extract raw pixel value (not normalized)
-                        value = int(dataset[row, col])
-                        # Store raw value (including special values like fill values)
-                        values.append(value)
-                    else:
-                        values.append(None)
-                
-                return values
-                
+                values = read_dataset_pixels(f[SNOW_COVER_DATASET], rows, cols, MISSING_PIXEL_VALUE)
+            # Store raw values (including special values like fill values)
+            return [None if value == MISSING_PIXEL_VALUE else int(value) for value in values]
+        
         except Exception as e:
             self.logger.error(f"Error extracting pixels from {hdf_path}: {e}")
             return [None] * len(pixels)
@@ -208,30 +370,47 @@ class VIIRSDataFetcher:
         """
         try:
             with h5py.File(hdf_path, 'r') as f:
-                # Cloud persistence dataset path
-                dataset_path = '/HDFEOS/GRIDS/VIIRS_Grid_IMG_2D/Data Fields/Cloud_Persistence'
-                if dataset_path in f:
-                    dataset = f[dataset_path]
-                    shape = dataset.shape
-                    
-                    values = []
-                    for row, col in pixels:
-                        if 0 <= row < shape[0] and 0 <= col < shape[1]:
-                            # Extract cloud persistence value directly
-                            cloud_persistence = int(dataset[row, col])
-                            values.append(cloud_persistence)
-                        else:
-                            values.append(0)
-                    
-                    return values
-                else:
+                if CLOUD_PERSISTENCE_DATASET not in f:
                     # If QA dataset not available, return 0 for all pixels
                     return [0] * len(pixels)
-                    
+                rows, cols = pixels_to_arrays(pixels)
+                values = read_dataset_pixels(f[CLOUD_PERSISTENCE_DATASET], rows, cols, 0)
+                return [int(value) for value in values]
+        
         except Exception as e:
             self.logger.error(f"Error extracting cloud persistence from {hdf_path}: {e}")
             return [0] * len(pixels)
     
+    def _missing_file_results(self, date: datetime, pixels: List[Tuple[int, int]]) -> Dict[Tuple[int, int], Tuple[int, int]]:
+        """Build error results for a tile/date whose HDF file could not be obtained."""
+        # Determine appropriate error code based on date
+        if self._is_old_date(date):
+            error_code = ERROR_OLD_MISSING
+        else:
+            error_code = ERROR_RECENT_MISSING
+        
+        return {pixel: (error_code, 0) for pixel in pixels}
+    
+    def _decoded_results(self, pixels: List[Tuple[int, int]], values: np.ndarray,
+                         cloud_persistence: np.ndarray) -> Dict[Tuple[int, int], Tuple[int, int]]:
+        """Combine decoded value and cloud persistence arrays into per-pixel results."""
+        results = {}
+        for pixel, value, persistence in zip(pixels, values.tolist(), cloud_persistence.tolist()):
+            if value == MISSING_PIXEL_VALUE:
+                results[pixel] = (ERROR_OTHER, 0)
+            else:
+                results[pixel] = (value, persistence)
+        return results
+    
+    def _delete_hdf_file(self, hdf_path: Optional[Path]):
+        """Clean up a downloaded HDF file to save space."""
+        if hdf_path and hdf_path.exists():
+            try:
+                hdf_path.unlink()
+                self.logger.debug(f"Deleted HDF file: {hdf_path}")
+            except Exception as e:
+                self.logger.warning(f"Could not delete HDF file {hdf_path}: {e}")
+    
     def process_tile_date(self, tile: str, date: datetime, pixels: List[Tuple[int, int]]) -> Dict[Tuple[int, int], Tuple[int, int]]:
         """
         Process a single tile for a specific date.
@@ -245,96 +424,217 @@ class VIIRSDataFetcher:
             Dictionary mapping pixel coordinates to (value, cloud_persistence) tuples
             Uses error codes: 301 (old missing), 400 (recent missing), 401 (other errors)
         """
-        results = {}
+        if self.remote_reads:
+            try:
+                decoded = self.read_remote_pixels(tile, date, pixels)
+                if decoded is None:
+                    self.metrics.increment('granules_missing')
+                    return self._missing_file_results(date, pixels)
+                return self._decoded_results(pixels, *decoded)
+            
+            except RangeRequestsNotSupported as e:
+                self.logger.warning(f"{e}; downloading whole granules instead")
+                self.remote_reads = False
+            
+            except requests.RequestException as e:
+                self.logger.error(f"Error reading {tile} for {date} remotely: {e}")
+                if is_throttling_error(e):
+                    return {pixel: (ERROR_OTHER, 0) for pixel in pixels}
+                return self._missing_file_results(date, pixels)
+            
+            except Exception as e:
+                self.logger.error(f"Error processing {tile} for {date}: {e}")
+                self.metrics.increment('decode_errors')
+                return {pixel: (ERROR_OTHER, 0) for pixel in pixels}
         
         # Download HDF file
-        hdf_path = self.download_hdf_file(tile, date)
+        try:
+            hdf_path = self.download_hdf_file(tile, date)
+        except requests.RequestException as e:
+            self.logger.error(f"Error downloading {tile} for {date}: {e}")
+            return {pixel: (ERROR_OTHER, 0) for pixel in pixels}
         
         if hdf_path is None:
-            # Determine appropriate error code based on date
-            if self._is_old_date(date):
-                error_code = ERROR_OLD_MISSING
-            else:
-                error_code = ERROR_RECENT_MISSING
-            
-            # Set error code for all pixels
-            for pixel in pixels:
-                results[pixel] = (error_code, 0)
-            
-            return results
+            self.metrics.increment('granules_missing')
+            return self._missing_file_results(date, pixels)
         
         try:
             # Extract pixel values and cloud persistence
-            pixel_values = self.extract_pixel_values(hdf_path, pixels)
-            cloud_persistence_values = self.get_cloud_persistence_value(hdf_path, pixels)
-            
-            # Combine results
-            for i, pixel in enumerate(pixels):
-                value = pixel_values[i] if i < len(pixel_values) else None
-                cloud_persistence = cloud_persistence_values[i] if i < len(cloud_persistence_values) else 0
-                
-                if value is not None:
-                    results[pixel] = (value, cloud_persistence)
-                else:
-                    results[pixel] = (ERROR_OTHER, 0)
-            
+            rows, cols = pixels_to_arrays(pixels)
+            start, seconds, values, cloud_persistence = timed_decode_hdf_pixels(str(hdf_path), rows, cols)
+            self.metrics.record('decode', seconds, start=start)
+            return self._decoded_results(pixels, values, cloud_persistence)
+        
         except Exception as e:
             self.logger.error(f"Error processing {tile} for {date}: {e}")
+            self.metrics.increment('decode_errors')
             # Set error code for all pixels
-            for pixel in pixels:
-                results[pixel] = (ERROR_OTHER, 0)
+            return {pixel: (ERROR_OTHER, 0) for pixel in pixels}
         
         finally:
-            # Clean up HDF file to save space
-            if hdf_path and hdf_path.exists():
-                try:
-                    hdf_path.unlink()
-                    self.logger.debug(f"Deleted HDF file: {hdf_path}")
-                except Exception as e:
-                    self.logger.warning(f"Could not delete HDF file {hdf_path}: {e}")
-        
-        return results
+            self._delete_hdf_file(hdf_path)
+    
+    def _get_decode_pool(self) -> ProcessPoolExecutor:
+        """Lazily start the process pool used for HDF decoding."""
+        if self._decode_pool is None:
+            # Spawn rather than fork: the download threads may hold locks at fork time
+            self._decode_pool = ProcessPoolExecutor(
+                max_workers=self.decode_workers,
+                mp_context=multiprocessing.get_context("spawn")
+            )
+            self.logger.debug(f"Started HDF decode pool with {self.decode_workers} processes")
+        return self._decode_pool
     
     def process_tile_dates_parallel(self, tile: str, date_to_pixels: Dict[datetime, List[Tuple[int, int]]], 
-                                   max_workers: int = 4) -> Dict[datetime, Dict[Tuple[int, int], Tuple[int, int]]]:
+                                   max_workers: int = 4, should_stop: Optional[Callable[[], bool]] = None
+                                   ) -> Dict[datetime, Dict[Tuple[int, int], Tuple[int, int]]]:
         """
         Process multiple dates for a tile in parallel.
         
+        Downloads run in a thread pool and only do I/O. Each downloaded granule is
+        handed to a process pool for HDF decoding as soon as it arrives, so
+        decompression is not serialized behind the GIL. New downloads are only
+        started while the number of granules waiting to be decoded is bounded,
+        which keeps the number of HDF files on disk small.
+        
+        With a concurrency controller, the number of downloads in flight follows
+        the controller's limit instead of max_workers.
+        
         Args:
             tile: Tile identifier (e.g., 'h18v04')
             date_to_pixels: Dictionary mapping dates to lists of pixel coordinates
-            max_workers: Maximum number of parallel workers
+            max_workers: Maximum number of parallel download workers (without a
+                concurrency controller)
+            should_stop: Called before each new download; once it returns True no
+                more dates are started and the dates in flight are finished
         
         Returns:
-            Dictionary mapping dates to pixel results
+            Dictionary mapping dates to pixel results, without the dates that were
+            not started
         """
+        # Remote reads transfer and decompress only a few chunks per granule, which
+        # is cheap enough to do in the download threads
+        if self.decode_workers == 0 or self.remote_reads:
+            return self._process_tile_dates_threaded(tile, date_to_pixels, max_workers, should_stop)
+        
         all_results = {}
+        decode_pool = self._get_decode_pool()
+        pool_size = self._download_pool_size(max_workers)
+        max_pending_decodes = max(pool_size, 2 * self.decode_workers)
         
-        # Use ThreadPoolExecutor for I/O bound operations (downloading)
-        with ThreadPoolExecutor(max_workers=max_workers) as executor:
-            # Submit all jobs
-            future_to_date = {}
-            for date, pixels in date_to_pixels.items():
-                future = executor.submit(self.process_tile_date, tile, date, pixels)
-                future_to_date[future] = date
+        pending_dates = deque(date_to_pixels.keys())
+        downloads = {}  # download future -> (date, start time)
+        decodes = {}  # decode future -> (date, hdf_path)
+        
+        with ThreadPoolExecutor(max_workers=pool_size) as download_executor:
+            def submit_downloads():
+                while (pending_dates and len(downloads) < self._download_limit(max_workers) and
+                       len(decodes) < max_pending_decodes):
+                    if should_stop is not None and should_stop():
+                        pending_dates.clear()
+                        break
+                    date = pending_dates.popleft()
+                    future = download_executor.submit(self.download_hdf_file, tile, date)
+                    downloads[future] = (date, time.perf_counter())
+                
+                self.metrics.observe_queue('dates_pending', len(pending_dates))
+                self.metrics.observe_queue('downloads_in_flight', len(downloads))
+                self.metrics.observe_queue('decodes_pending', len(decodes))
             
-            # Collect results as they complete
-            for future in as_completed(future_to_date):
-                date = future_to_date[future]
-                try:
-                    result = future.result()
-                    all_results[date] = result
-                except Exception as e:
-                    self.logger.error(f"Error processing {tile} for {date}: {e}")
-                    # Store error results for all pixels on this date
-                    pixels = date_to_pixels[date]
-                    all_results[date] = {pixel: (ERROR_OTHER, 0) for pixel in pixels}
+            submit_downloads()
+            
+            while downloads or decodes:
+                done, _ = wait(list(downloads) + list(decodes), return_when=FIRST_COMPLETED)
+                
+                for future in done:
+                    if future in downloads:
+                        date, started = downloads.pop(future)
+                        if self.concurrency is not None:
+                            self.concurrency.task_done(time.perf_counter() - started)
+                        pixels = date_to_pixels[date]
+                        try:
+                            hdf_path = future.result()
+                        except Exception as e:
+                            self.logger.error(f"Error downloading {tile} for {date}: {e}")
+                            all_results[date] = {pixel: (ERROR_OTHER, 0) for pixel in pixels}
+                            continue
+                        
+                        if hdf_path is None:
+                            self.metrics.increment('granules_missing')
+                            all_results[date] = self._missing_file_results(date, pixels)
+                            continue
+                        
+                        rows, cols = pixels_to_arrays(pixels)
+                        decode_future = decode_pool.submit(timed_decode_hdf_pixels, str(hdf_path), rows, cols)
+                        decodes[decode_future] = (date, hdf_path)
+                    else:
+                        date, hdf_path = decodes.pop(future)
+                        pixels = date_to_pixels[date]
+                        try:
+                            # Decode time is measured in the worker, excluding time spent queued
+                            start, seconds, values, cloud_persistence = future.result()
+                            self.metrics.record('decode', seconds, start=start)
+                            all_results[date] = self._decoded_results(pixels, values, cloud_persistence)
+                        except Exception as e:
+                            self.logger.error(f"Error processing {tile} for {date}: {e}")
+                            self.metrics.increment('decode_errors')
+                            all_results[date] = {pixel: (ERROR_OTHER, 0) for pixel in pixels}
+                        finally:
+                            self._delete_hdf_file(hdf_path)
+                
+                submit_downloads()
+        
+        return all_results
+    
+    def _process_tile_dates_threaded(self, tile: str, date_to_pixels: Dict[datetime, List[Tuple[int, int]]],
+                                     max_workers: int, should_stop: Optional[Callable[[], bool]] = None
+                                     ) -> Dict[datetime, Dict[Tuple[int, int], Tuple[int, int]]]:
+        """Process multiple dates with download and decode both running in the thread pool."""
+        all_results = {}
+        pending_dates = deque(date_to_pixels.keys())
+        future_to_date = {}  # future -> (date, start time)
+        
+        with ThreadPoolExecutor(max_workers=self._download_pool_size(max_workers)) as executor:
+            while pending_dates or future_to_date:
+                while pending_dates and len(future_to_date) < self._download_limit(max_workers):
+                    if should_stop is not None and should_stop():
+                        pending_dates.clear()
+                        break
+                    date = pending_dates.popleft()
+                    future = executor.submit(self.process_tile_date, tile, date, date_to_pixels[date])
+                    future_to_date[future] = (date, time.perf_counter())
+                
+                # Collect results as they complete
+                done, _ = wait(list(future_to_date), return_when=FIRST_COMPLETED)
+                for future in done:
+                    date, started = future_to_date.pop(future)
+                    if self.concurrency is not None:
+                        self.concurrency.task_done(time.perf_counter() - started)
+                    try:
+                        all_results[date] = future.result()
+                    except Exception as e:
+                        self.logger.error(f"Error processing {tile} for {date}: {e}")
+                        # Store error results for all pixels on this date
+                        pixels = date_to_pixels[date]
+                        all_results[date] = {pixel: (ERROR_OTHER, 0) for pixel in pixels}
         
         return all_results
     
+    def _download_pool_size(self, max_workers: int) -> int:
+        """Threads needed for the highest number of parallel fetches."""
+        return self.concurrency.maximum if self.concurrency is not None else max_workers
+    
+    def _download_limit(self, max_workers: int) -> int:
+        """Number of fetches to keep in flight right now."""
+        return self.concurrency.limit if self.concurrency is not None else max_workers
+    
     def cleanup(self):
         """Cleanup resources and temporary directory."""
         import shutil
+        if self._decode_pool is not None:
+            self._decode_pool.shutdown(wait=True, cancel_futures=True)
+            self._decode_pool = None
+        
         try:
             if self.cache_dir.exists():
                 shutil.rmtree(self.cache_dir)
@@ -345,6 +645,159 @@ class VIIRSDataFetcher:
         self.logger.info("VIIRS data fetcher cleanup completed")
 
 
+def is_throttling_error(error: Exception) -> bool:
+    """Whether a request failed because the server throttled it or it timed out."""
+    if isinstance(error, (requests.Timeout, requests.ConnectionError)):
+        return True
+    response = getattr(error, 'response', None)
+    return response is not None and response.status_code in THROTTLE_STATUSES
+
+
+def pixels_to_arrays(pixels: List[Tuple[int, int]]) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Convert a list of (pixel_row, pixel_col) tuples to compact row and column arrays.
+    
+    Args:
+        pixels: List of (pixel_row, pixel_col) tuples
+    
+    Returns:
+        Tuple of (rows, cols) int32 arrays
+    """
+    if not pixels:
+        return np.empty(0, dtype=np.int32), np.empty(0, dtype=np.int32)
+    coords = np.asarray(pixels, dtype=np.int32)
+    return coords[:, 0].copy(), coords[:, 1].copy()
+
+
+def read_dataset_pixels(dataset, rows: np.ndarray, cols: np.ndarray, fill_value: int) -> np.ndarray:
+    """
+    Read the values of a 2D HDF5 dataset at the given pixel positions.
+    
+    Chunked datasets are read one touched chunk at a time, so only chunks that
+    contain requested pixels are decompressed. Contiguous datasets are read
+    through the bounding window of the requested pixels.
+    
+    Args:
+        dataset: h5py dataset (or any object supporting 2D slicing with .shape/.chunks)
+        rows: Pixel row indices
+        cols: Pixel column indices
+        fill_value: Value used for pixels outside the dataset bounds
+    
+    Returns:
+        int16 array of pixel values, aligned with rows/cols
+    """
+    values = np.full(len(rows), fill_value, dtype=np.int16)
+    height, width = dataset.shape
+    in_bounds = np.nonzero((rows >= 0) & (rows < height) & (cols >= 0) & (cols < width))[0]
+    if len(in_bounds) == 0:
+        return values
+    
+    rows_in = rows[in_bounds]
+    cols_in = cols[in_bounds]
+    
+    if dataset.chunks is None:
+        row_start, row_end = int(rows_in.min()), int(rows_in.max()) + 1
+        col_start, col_end = int(cols_in.min()), int(cols_in.max()) + 1
+        window = dataset[row_start:row_end, col_start:col_end]
+        values[in_bounds] = window[rows_in - row_start, cols_in - col_start]
+        return values
+    
+    chunk_rows, chunk_cols = dataset.chunks
+    chunks_per_row = -(-width // chunk_cols)
+    chunk_ids = (rows_in // chunk_rows) * chunks_per_row + cols_in // chunk_cols
+    order = np.argsort(chunk_ids, kind='stable')
+    sorted_ids = chunk_ids[order]
+    boundaries = np.flatnonzero(np.diff(sorted_ids)) + 1
+    
+    for group in np.split(order, boundaries):
+        chunk_row = int(rows_in[group[0]] // chunk_rows)
+        chunk_col = int(cols_in[group[0]] // chunk_cols)
+        row_start, col_start = chunk_row * chunk_rows, chunk_col * chunk_cols
+        block = dataset[row_start:min(row_start + chunk_rows, height),
+                        col_start:min(col_start + chunk_cols, width)]
+        values[in_bounds[group]] = block[rows_in[group] - row_start, cols_in[group] - col_start]
+    
+    return values
+
+
+def chunk_byte_ranges(dataset, rows: np.ndarray, cols: np.ndarray) -> List[Tuple[int, int]]:
+    """
+    Locate the stored chunks of a dataset that hold the given pixels.
+    
+    Args:
+        dataset: h5py dataset
+        rows: Pixel row indices
+        cols: Pixel column indices
+    
+    Returns:
+        (file offset, stored size) of each touched chunk that is allocated; empty for
+        contiguous datasets or HDF5 libraries without chunk queries
+    """
+    if dataset.chunks is None or not hasattr(dataset.id, 'get_chunk_info_by_coord'):
+        return []
+    
+    height, width = dataset.shape
+    chunk_rows, chunk_cols = dataset.chunks
+    in_bounds = (rows >= 0) & (rows < height) & (cols >= 0) & (cols < width)
+    chunks = np.unique(np.stack([rows[in_bounds] // chunk_rows, cols[in_bounds] // chunk_cols], axis=1), axis=0)
+    
+    byte_ranges = []
+    for chunk_row, chunk_col in chunks:
+        info = dataset.id.get_chunk_info_by_coord((int(chunk_row) * chunk_rows, int(chunk_col) * chunk_cols))
+        if info.byte_offset is not None:
+            byte_ranges.append((info.byte_offset, info.size))
+    return byte_ranges
+
+
+def decode_hdf_pixels(hdf_path, rows: np.ndarray, cols: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Decode snow cover and cloud persistence values for pixels of one granule.
+    
+    This is a module-level function so it can run in a worker process.
+    
+    Args:
+        hdf_path: Path to the VNP10A1F HDF5 file, or a seekable binary file object
+            (e.g. an HTTPRangeFile)
+        rows: Pixel row indices
+        cols: Pixel column indices
+    
+    Returns:
+        Tuple of (values, cloud_persistence) arrays. values is int16 with
+        MISSING_PIXEL_VALUE for pixels outside the tile, cloud_persistence is
+        uint8 and 0 when the dataset is not present.
+    """
+    with h5py.File(hdf_path, 'r') as f:
+        if isinstance(hdf_path, HTTPRangeFile):
+            # Fetch all touched chunks up front instead of one round trip per chunk
+            hdf_path.prefetch([
+                byte_range
+                for name in (SNOW_COVER_DATASET, CLOUD_PERSISTENCE_DATASET) if name in f
+                for byte_range in chunk_byte_ranges(f[name], rows, cols)
+            ])
+        
+        values = read_dataset_pixels(f[SNOW_COVER_DATASET], rows, cols, MISSING_PIXEL_VALUE)
+        if CLOUD_PERSISTENCE_DATASET in f:
+            cloud_persistence = read_dataset_pixels(f[CLOUD_PERSISTENCE_DATASET], rows, cols, 0)
+        else:
+            cloud_persistence = np.zeros(len(rows), dtype=np.int16)
+    
+    return values, cloud_persistence.astype(np.uint8)
+
+
+def timed_decode_hdf_pixels(hdf_path: str, rows: np.ndarray,
+                            cols: np.ndarray) -> Tuple[float, float, np.ndarray, np.ndarray]:
+    """
+    Run decode_hdf_pixels and measure it where it runs.
+    
+    Returns:
+        Tuple of (start wall-clock time, duration in seconds, values, cloud_persistence)
+    """
+    start = time.time()
+    started = time.perf_counter()
+    values, cloud_persistence = decode_hdf_pixels(hdf_path, rows, cols)
+    return start, time.perf_counter() - started, values, cloud_persistence
+
+
 def main():
     """Main function for standalone testing."""
     import sys
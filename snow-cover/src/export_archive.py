@@ -0,0 +1,245 @@
+#!/usr/bin/env python3
+"""
+Export the snow cover archive to a columnar Parquet or Arrow dataset.
+
+Streams every archived pixel history into one file per tile, laid out as a
+hive-partitioned dataset:
+
+    <output_dir>/tile=h18v04/part-0.parquet
+    <output_dir>/tile=h19v04/part-0.parquet
+
+with one row per observed week and the columns (row, col, year, week, value,
+persistence); the tile column comes from the partition directory. Pixels are read
+from the archive in pages and written in row groups of a fixed size, so memory use
+is bounded regardless of the archive size.
+
+Example:
+    python export_archive.py --archive-file cache/snow-cover-archive.db --output-dir export/
+    
+    import pyarrow.dataset as ds
+    dataset = ds.dataset("export/", format="parquet", partitioning="hive")
+"""
+
+import argparse
+import logging
+import shutil
+import sys
+import time
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from archive_backends import ARCHIVE_BACKENDS, SnowCoverArchive, create_archive
+
+EXPORT_FORMATS = ('parquet', 'arrow')
+
+# Rows buffered before a row group (Parquet) or record batch (Arrow) is written
+DEFAULT_ROW_GROUP_SIZE = 1_000_000
+
+EXPORT_SCHEMA = pa.schema([
+    ('row', pa.int16()),
+    ('col', pa.int16()),
+    ('year', pa.int16()),
+    ('week', pa.int8()),
+    # Snow cover (0-100), other VNP10A1F flag values or pipeline error codes (301, 400, 401)
+    ('value', pa.int16()),
+    ('persistence', pa.int16()),
+])
+
+
+class _TileWriter:
+    """Buffer rows of one tile and write them as row groups to a single file."""
+    
+    def __init__(self, path: Path, export_format: str, row_group_size: int):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self.path = path
+        self.row_group_size = row_group_size
+        self.rows_written = 0
+        self.columns: Dict[str, List[int]] = {name: [] for name in EXPORT_SCHEMA.names}
+        
+        if export_format == 'parquet':
+            self._writer = pq.ParquetWriter(str(path), EXPORT_SCHEMA, compression='zstd')
+        else:
+            self._writer = pa.ipc.new_file(str(path), EXPORT_SCHEMA)
+    
+    def add_pixel(self, pixel_row: int, pixel_col: int, pixel_data):
+        """Add the observed weeks of one pixel's history."""
+        columns = self.columns
+        for year_data in pixel_data:
+            for week, entry in enumerate(year_data.data):
+                # Weeks that were never fetched are stored as [None, 0]
+                if entry is None or entry[0] is None:
+                    continue
+                columns['row'].append(pixel_row)
+                columns['col'].append(pixel_col)
+                columns['year'].append(year_data.year)
+                columns['week'].append(week)
+                columns['value'].append(entry[0])
+                columns['persistence'].append(entry[1])
+        
+        if len(columns['row']) >= self.row_group_size:
+            self.flush()
+    
+    def flush(self):
+        """Write buffered rows as one row group."""
+        row_count = len(self.columns['row'])
+        if row_count == 0:
+            return
+        
+        batch = pa.record_batch(
+            [pa.array(self.columns[field.name], type=field.type) for field in EXPORT_SCHEMA],
+            schema=EXPORT_SCHEMA
+        )
+        self._writer.write_batch(batch)
+        self.rows_written += row_count
+        for values in self.columns.values():
+            values.clear()
+    
+    def close(self):
+        """Flush remaining rows and close the file."""
+        self.flush()
+        self._writer.close()
+
+
+def export_archive(archive: SnowCoverArchive, output_dir: str,
+                   export_format: str = 'parquet', tile: Optional[str] = None,
+                   row_group_size: int = DEFAULT_ROW_GROUP_SIZE) -> Dict[str, int]:
+    """
+    Export an archive to a dataset partitioned by tile.
+    
+    Existing partitions of exported tiles are replaced; other tiles in output_dir
+    are left untouched.
+    
+    Args:
+        archive: Initialized archive to export
+        output_dir: Dataset directory (created if needed)
+        export_format: 'parquet' or 'arrow' (Arrow IPC file)
+        tile: Only export this tile (default: all tiles)
+        row_group_size: Rows buffered in memory before they are written
+    
+    Returns:
+        Dictionary mapping each exported tile to its number of rows
+    """
+    if export_format not in EXPORT_FORMATS:
+        raise ValueError(f"Unknown export format {export_format!r}, expected one of {EXPORT_FORMATS}")
+    
+    logger = logging.getLogger(__name__)
+    output_path = Path(output_dir)
+    extension = 'parquet' if export_format == 'parquet' else 'arrow'
+    rows_by_tile = {}
+    writer = None
+    current_tile = None
+    
+    try:
+        # Pixels arrive grouped by tile, so only one tile's file is open at a time
+        for pixel_tile, pixel_row, pixel_col, pixel_data in archive.iter_pixel_data(tile):
+            if pixel_tile != current_tile:
+                if writer is not None:
+                    writer.close()
+                    rows_by_tile[current_tile] = writer.rows_written
+                    logger.info(f"Exported {writer.rows_written:,} rows for tile {current_tile}")
+                
+                current_tile = pixel_tile
+                partition_dir = output_path / f"tile={pixel_tile}"
+                if partition_dir.exists():
+                    shutil.rmtree(partition_dir)
+                writer = _TileWriter(partition_dir / f"part-0.{extension}", export_format, row_group_size)
+            
+            writer.add_pixel(pixel_row, pixel_col, pixel_data)
+    finally:
+        if writer is not None:
+            writer.close()
+            rows_by_tile[current_tile] = writer.rows_written
+            logger.info(f"Exported {writer.rows_written:,} rows for tile {current_tile}")
+    
+    return rows_by_tile
+
+
+def setup_logging(verbose: bool = False):
+    """Setup logging configuration."""
+    level = logging.DEBUG if verbose else logging.INFO
+    
+    logging.basicConfig(
+        level=level,
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+        handlers=[logging.StreamHandler(sys.stdout)]
+    )
+
+
+def main():
+    """Main function with argument parsing."""
+    parser = argparse.ArgumentParser(
+        description='Export the snow cover archive to a Parquet/Arrow dataset partitioned by tile'
+    )
+    
+    parser.add_argument(
+        '--archive-file',
+        default='./cache/snow-cover-archive.db',
+        help='SQLite archive file, or archive directory with --archive-backend tiles '
+             '(default: ./cache/snow-cover-archive.db)'
+    )
+    
+    parser.add_argument(
+        '--archive-backend',
+        choices=ARCHIVE_BACKENDS,
+        default='sqlite',
+        help='Archive storage backend (default: sqlite)'
+    )
+    
+    parser.add_argument(
+        '--output-dir',
+        required=True,
+        help='Directory of the exported dataset'
+    )
+    
+    parser.add_argument(
+        '--format',
+        choices=EXPORT_FORMATS,
+        default='parquet',
+        help='Output file format (default: parquet)'
+    )
+    
+    parser.add_argument(
+        '--tile',
+        help='Only export this tile (e.g. h18v04)'
+    )
+    
+    parser.add_argument(
+        '--row-group-size',
+        type=int,
+        default=DEFAULT_ROW_GROUP_SIZE,
+        help=f'Rows per row group, bounds memory use (default: {DEFAULT_ROW_GROUP_SIZE:,})'
+    )
+    
+    parser.add_argument(
+        '--verbose', '-v',
+        action='store_true',
+        help='Enable verbose logging'
+    )
+    
+    args = parser.parse_args()
+    
+    setup_logging(args.verbose)
+    logger = logging.getLogger(__name__)
+    
+    if not Path(args.archive_file).exists():
+        logger.error(f"Archive file not found: {args.archive_file}")
+        sys.exit(1)
+    
+    # Read-only, so an export can run while a fetch writes to the archive
+    archive = create_archive(args.archive_backend, args.archive_file, read_only=True)
+    archive.initialize()
+    started = time.perf_counter()
+    try:
+        rows_by_tile = export_archive(archive, args.output_dir, args.format, args.tile, args.row_group_size)
+    finally:
+        archive.close()
+    
+    logger.info(f"Exported {sum(rows_by_tile.values()):,} rows in {len(rows_by_tile)} tiles "
+                f"to {args.output_dir} in {time.perf_counter() - started:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
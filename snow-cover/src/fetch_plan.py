@@ -0,0 +1,282 @@
+#!/usr/bin/env python3
+"""
+Value-ordered fetch plans for time-budgeted and planned runs.
+
+A run normally works through the tiles one after another and writes a tile's
+results once all of its granules are fetched, so a run killed at the end of a
+nightly window loses the tile it was working on. With a time budget the run
+instead:
+
+1. Plans the missing (tile, date) granules of all tiles up front as work units.
+2. Orders them by value: the pixels a granule fills, weighted by recency with a
+   half-life of RECENCY_HALF_LIFE_DAYS, since a download costs about the same
+   whatever the number of pixels read from it and recent seasons matter most.
+3. Fetches them in batches and writes each batch to the archive as it finishes.
+4. Stops taking new granules once the budget is used up; granules in flight still
+   complete and are written.
+
+The archive records what was fetched, so the next run plans the remaining units
+again and continues with the most valuable of them.
+
+A plan can also be written to a plan file without fetching (--plan-only), together
+with an estimate of its bytes and duration from the download throughput of earlier
+runs, which each run appends to a throughput history file. A later run executes the
+plan file without planning again, skipping the pixels archived since it was written,
+so budgeted runs of the same plan file work through it window by window.
+"""
+
+import json
+import logging
+import time
+from dataclasses import dataclass
+from datetime import datetime
+from pathlib import Path
+from statistics import median
+from typing import Any, Dict, List, Optional, Tuple
+
+# Age at which a granule is worth half as much as one of the same size from today
+RECENCY_HALF_LIFE_DAYS = 2 * 365
+
+# Granules fetched between archive writes
+DEFAULT_BATCH_UNITS = 32
+
+PLAN_FILE_VERSION = 1
+
+# Most recent runs of the same read mode the estimate is based on
+HISTORY_RUNS = 5
+
+
+@dataclass
+class WorkUnit:
+    """One granule to fetch: the missing pixels of a tile on a date."""
+    tile: str
+    date: datetime
+    pixels: List[Tuple[int, int]]
+    value: float = 0.0
+
+
+def unit_value(pixel_count: int, date: datetime, reference_date: datetime) -> float:
+    """
+    Value of fetching a granule.
+    
+    Args:
+        pixel_count: Missing pixels the granule fills
+        date: Date of the granule
+        reference_date: Date considered current, usually the end of the date range
+    
+    Returns:
+        Pixel count weighted by recency
+    """
+    age_days = max(0, (reference_date - date).days)
+    return pixel_count * 0.5 ** (age_days / RECENCY_HALF_LIFE_DAYS)
+
+
+def build_work_plan(date_to_pixels_by_tile: Dict[str, Dict[datetime, List[Tuple[int, int]]]],
+                    reference_date: datetime) -> List[WorkUnit]:
+    """
+    Build the work units of all tiles, most valuable first.
+    
+    Args:
+        date_to_pixels_by_tile: Missing pixels per date of each tile
+        reference_date: Date considered current for the recency weighting
+    
+    Returns:
+        Work units ordered by decreasing value, ties broken by recency
+    """
+    units = [
+        WorkUnit(tile, date, pixels, unit_value(len(pixels), date, reference_date))
+        for tile, date_to_pixels in date_to_pixels_by_tile.items()
+        for date, pixels in date_to_pixels.items()
+    ]
+    units.sort(key=lambda unit: (-unit.value, -unit.date.timestamp(), unit.tile))
+    return units
+
+
+def group_by_tile(units: List[WorkUnit]) -> Dict[str, Dict[datetime, List[Tuple[int, int]]]]:
+    """Group work units into the date -> pixels mapping of each tile, keeping their order."""
+    grouped: Dict[str, Dict[datetime, List[Tuple[int, int]]]] = {}
+    for unit in units:
+        grouped.setdefault(unit.tile, {})[unit.date] = unit.pixels
+    return grouped
+
+
+class TimeBudget:
+    """Wall-clock budget of a run, started when it is created."""
+    
+    def __init__(self, seconds: float):
+        """
+        Start the budget.
+        
+        Args:
+            seconds: Time after which no new work is started
+        """
+        self.seconds = seconds
+        self.deadline = time.monotonic() + seconds
+    
+    def remaining(self) -> float:
+        """Seconds left, zero when the budget is used up."""
+        return max(0.0, self.deadline - time.monotonic())
+    
+    def exhausted(self) -> bool:
+        """Whether the budget is used up."""
+        return time.monotonic() >= self.deadline
+
+
+def summarize_plan(plan: List[WorkUnit], throughput: Optional[Dict[str, float]] = None) -> Dict[str, Any]:
+    """
+    Summarize a plan per tile, with estimated bytes and duration.
+    
+    Args:
+        plan: Work units of the plan
+        throughput: Estimate from ThroughputHistory.estimate(), if any
+    
+    Returns:
+        Dictionary with 'tiles' (granules and pixels per tile), 'granules', 'pixels'
+        and, with a throughput estimate, 'bytes' and 'seconds'
+    """
+    tiles: Dict[str, Dict[str, int]] = {}
+    for unit in plan:
+        tile = tiles.setdefault(unit.tile, {'granules': 0, 'pixels': 0})
+        tile['granules'] += 1
+        tile['pixels'] += len(unit.pixels)
+    
+    summary = {
+        'tiles': dict(sorted(tiles.items())),
+        'granules': len(plan),
+        'pixels': sum(tile['pixels'] for tile in tiles.values()),
+    }
+    if throughput is not None:
+        for tile in tiles.values():
+            tile['bytes'] = round(tile['granules'] * throughput['bytes_per_granule'])
+        summary['bytes'] = round(len(plan) * throughput['bytes_per_granule'])
+        summary['seconds'] = round(len(plan) / throughput['granules_per_second'], 1)
+        summary['throughput'] = throughput
+    return summary
+
+
+def write_plan_file(path: str, plan: List[WorkUnit], pixels_by_tile: Dict[str, List[Tuple[int, int]]],
+                    metadata: Dict[str, Any]):
+    """
+    Write a plan to a JSON plan file.
+    
+    Each tile's pixels are stored once; a work unit stores the indices of its pixels
+    in that list, or null when it covers all of them, which keeps backfill plans small.
+    
+    Args:
+        path: Plan file to write
+        plan: Work units in the order they are to be fetched
+        pixels_by_tile: Pixels of each planned tile
+        metadata: Date range, estimate and other information stored with the plan
+    """
+    tiles = {tile: list(pixels_by_tile[tile]) for tile in sorted({unit.tile for unit in plan})}
+    indices = {tile: {pixel: i for i, pixel in enumerate(pixels)} for tile, pixels in tiles.items()}
+    
+    units = []
+    for unit in plan:
+        tile_pixels = tiles[unit.tile]
+        pixel_indices = None
+        if len(unit.pixels) != len(tile_pixels):
+            pixel_indices = [indices[unit.tile][pixel] for pixel in unit.pixels]
+        units.append([unit.tile, unit.date.strftime('%Y-%m-%d'), round(unit.value, 6), pixel_indices])
+    
+    Path(path).parent.mkdir(parents=True, exist_ok=True)
+    with open(path, 'w') as f:
+        json.dump({'version': PLAN_FILE_VERSION, **metadata, 'tiles': tiles, 'units': units}, f)
+
+
+def read_plan_file(path: str) -> Tuple[List[WorkUnit], Dict[str, Any]]:
+    """
+    Read a plan written by write_plan_file().
+    
+    Args:
+        path: Plan file to read
+    
+    Returns:
+        Tuple of the work units in plan order and the plan's metadata
+    """
+    with open(path) as f:
+        data = json.load(f)
+    if data.get('version') != PLAN_FILE_VERSION:
+        raise ValueError(f"Unsupported plan file version {data.get('version')!r} in {path}")
+    
+    tiles = {tile: [tuple(pixel) for pixel in pixels] for tile, pixels in data.pop('tiles').items()}
+    plan = []
+    for tile, date, value, pixel_indices in data.pop('units'):
+        pixels = tiles[tile] if pixel_indices is None else [tiles[tile][i] for i in pixel_indices]
+        plan.append(WorkUnit(tile, datetime.strptime(date, '%Y-%m-%d'), pixels, value))
+    return plan, data
+
+
+class ThroughputHistory:
+    """Download throughput of past runs, one JSON line per run."""
+    
+    def __init__(self, history_file: str):
+        """
+        Initialize the history.
+        
+        Args:
+            history_file: JSON lines file the runs are appended to
+        """
+        self.history_file = Path(history_file)
+        self.logger = logging.getLogger(__name__)
+    
+    def record(self, summary: Dict[str, Any], remote_reads: bool = False):
+        """
+        Append the download throughput of a run.
+        
+        Args:
+            summary: Metrics summary of the run
+            remote_reads: Whether the run read granules with HTTP Range requests
+        """
+        download = summary['stages'].get('download')
+        if not download or download['items'] == 0 or download['wall_seconds'] <= 0:
+            return
+        
+        entry = {
+            'finished_at': datetime.now().isoformat(timespec='seconds'),
+            'remote_reads': remote_reads,
+            'granules': download['items'],
+            'bytes': download.get('bytes', 0),
+            'seconds': download['wall_seconds'],
+        }
+        try:
+            self.history_file.parent.mkdir(parents=True, exist_ok=True)
+            with open(self.history_file, 'a') as f:
+                f.write(json.dumps(entry) + '\n')
+        except OSError as e:
+            self.logger.warning(f"Could not record throughput history in {self.history_file}: {e}")
+    
+    def estimate(self, remote_reads: bool = False) -> Optional[Dict[str, float]]:
+        """
+        Estimate the throughput of the next run from the most recent runs.
+        
+        Args:
+            remote_reads: Read mode of the next run; whole-granule downloads and
+                Range reads transfer very different amounts per granule
+        
+        Returns:
+            Dictionary with the median 'granules_per_second' and 'bytes_per_granule'
+            of the last HISTORY_RUNS runs and the number of 'runs' used, or None
+            without history
+        """
+        if not self.history_file.exists():
+            return None
+        
+        runs = []
+        with open(self.history_file) as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+                if entry.get('remote_reads', False) == remote_reads:
+                    runs.append(entry)
+        runs = runs[-HISTORY_RUNS:]
+        if not runs:
+            return None
+        
+        return {
+            'granules_per_second': round(median(run['granules'] / run['seconds'] for run in runs), 4),
+            'bytes_per_granule': round(median(run['bytes'] / run['granules'] for run in runs)),
+            'runs': len(runs),
+        }
@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+"""
+Season-aware fetch planning.
+
+By default every week from 2012 to now is fetched for every pixel, including
+mid-summer weeks in which ski areas are snow-free year after year. The seasonal
+policy skips such weeks per tile:
+
+1. The tile's hemisphere (from its vertical index) gives the off-season weeks that
+   are candidates for skipping: June to September in the northern hemisphere,
+   December to March in the southern hemisphere. Other weeks are always fetched.
+2. The archived history of a sample of the tile's pixels decides each candidate week:
+   - snow: snow was observed in that week in some year, so it is fetched for all years
+   - clear: valid observations from at least min_clear_years years and never any
+     snow, so it is skipped
+   - unknown: too little history, so only the latest min_clear_years missing years
+     are fetched as probes; once they are archived, later runs can decide the week
+
+Skipped weeks stay unfetched in the archive, so switching back to the 'all'
+policy fills them in.
+"""
+
+import logging
+from datetime import datetime
+from typing import Dict, FrozenSet, Iterable, List, Set, Tuple
+
+from archive_backends import SnowCoverArchive
+from utils import calculate_week_index
+
+FETCH_POLICIES = ('all', 'seasonal')
+
+# Week indices (0-52) of the off-season that may be skipped
+NORTHERN_OFF_SEASON_WEEKS = frozenset(range(22, 40))  # June to September
+SOUTHERN_OFF_SEASON_WEEKS = frozenset([*range(48, 53), *range(0, 13)])  # December to March
+
+# Sinusoidal tiles v00-v08 lie north of the equator, v09-v17 south of it
+SOUTHERN_HEMISPHERE_FIRST_V = 9
+
+# Pixels of a tile whose history is read to decide the candidate weeks
+DEFAULT_SAMPLE_PIXELS = 500
+
+WEEK_SNOW = 'snow'
+WEEK_CLEAR = 'clear'
+WEEK_UNKNOWN = 'unknown'
+
+
+def off_season_weeks(tile: str) -> FrozenSet[int]:
+    """
+    Off-season week indices of a tile's hemisphere.
+    
+    Args:
+        tile: Tile identifier (e.g., 'h18v04')
+    
+    Returns:
+        Week indices that are candidates for skipping
+    """
+    v = int(tile[4:6])
+    return SOUTHERN_OFF_SEASON_WEEKS if v >= SOUTHERN_HEMISPHERE_FIRST_V else NORTHERN_OFF_SEASON_WEEKS
+
+
+class SeasonalFetchPolicy:
+    """Skip off-season weeks in which a tile's archived history never had snow."""
+    
+    def __init__(self, archive: SnowCoverArchive, min_clear_years: int = 2,
+                 sample_pixels: int = DEFAULT_SAMPLE_PIXELS):
+        """
+        Initialize the policy.
+        
+        Args:
+            archive: Initialized archive to read pixel histories from
+            min_clear_years: Years with valid, snow-free observations needed to skip a week
+            sample_pixels: Maximum number of pixels per tile whose history is read
+        """
+        self.archive = archive
+        self.min_clear_years = min_clear_years
+        self.sample_pixels = sample_pixels
+        self.logger = logging.getLogger(__name__)
+    
+    def week_status(self, tile: str, pixels: List[Tuple[int, int]]) -> Dict[int, str]:
+        """
+        Classify the off-season weeks of a tile from the archived history.
+        
+        Args:
+            tile: Tile identifier
+            pixels: (pixel_row, pixel_col) tuples of the tile
+        
+        Returns:
+            Dictionary mapping each off-season week index to 'snow', 'clear' or 'unknown'
+        """
+        candidates = off_season_weeks(tile)
+        sorted_pixels = sorted(pixels)
+        # Evenly spaced sample so all parts of the tile are represented
+        step = max(1, len(sorted_pixels) // self.sample_pixels)
+        sample = sorted_pixels[::step][:self.sample_pixels]
+        
+        snow_weeks: Set[int] = set()
+        clear_years: Dict[int, Set[int]] = {week: set() for week in candidates}
+        for pixel_row, pixel_col in sample:
+            for year_data in self.archive.load_pixel_data(tile, pixel_row, pixel_col):
+                for week in candidates:
+                    if week >= len(year_data.data) or year_data.data[week] is None:
+                        continue
+                    value = year_data.data[week][0]
+                    # Error codes and flag values (>100) are not observations
+                    if value is None or not 0 <= value <= 100:
+                        continue
+                    if value > 0:
+                        snow_weeks.add(week)
+                    else:
+                        clear_years[week].add(year_data.year)
+        
+        status = {}
+        for week in candidates:
+            if week in snow_weeks:
+                status[week] = WEEK_SNOW
+            elif len(clear_years[week]) >= self.min_clear_years:
+                status[week] = WEEK_CLEAR
+            else:
+                status[week] = WEEK_UNKNOWN
+        return status
+    
+    def select_dates(self, tile: str, pixels: List[Tuple[int, int]],
+                     dates: Iterable[datetime]) -> List[datetime]:
+        """
+        Select the missing dates of a tile that are worth fetching.
+        
+        Args:
+            tile: Tile identifier
+            pixels: (pixel_row, pixel_col) tuples of the tile
+            dates: Missing dates from the planner
+        
+        Returns:
+            Sorted dates to fetch
+        """
+        status = self.week_status(tile, pixels)
+        selected = []
+        unknown_dates: Dict[int, List[datetime]] = {}
+        for date in sorted(dates):
+            week_status = status.get(calculate_week_index(date, date.year))
+            if week_status is None or week_status == WEEK_SNOW:
+                selected.append(date)
+            elif week_status == WEEK_UNKNOWN:
+                unknown_dates.setdefault(calculate_week_index(date, date.year), []).append(date)
+        
+        # Probe the most recent years of undecided weeks
+        for week_dates in unknown_dates.values():
+            selected.extend(week_dates[-self.min_clear_years:])
+        
+        counts = {name: sum(1 for value in status.values() if value == name)
+                  for name in (WEEK_SNOW, WEEK_CLEAR, WEEK_UNKNOWN)}
+        self.logger.info(f"Seasonal policy for {tile}: off-season weeks {counts}")
+        return sorted(selected)
@@ -4,44 +4,164 @@ Main script to fetch VIIRS snow cover data for ski run pixels.
 
 Processes runs.geojson to extract unique pixels, then fetches and caches
 weekly snow cover data with error handling and progress tracking.
+
+Heavy dependencies load with the stage that needs them: geopandas, shapely and
+pyproj with pixel extraction, requests, h5py and numpy with the first fetch, and
+numpy with the aggregates. Archive statistics and runs with nothing to fetch start
+without them.
 """
 
 import argparse
 import logging
 import sys
+import time
+from contextlib import nullcontext
 from datetime import datetime, timedelta
 from pathlib import Path
-from typing import Dict, List, Tuple, Set, Optional
+from typing import TYPE_CHECKING, Any, Callable, Dict, List, Tuple, Set, Optional
+
+from coordination import (
+    DEFAULT_LEASE_SECONDS, DEFAULT_POLL_SECONDS, FetchLeaseTableSync, lease_db_config_from_environment,
+    parse_shard, tile_in_shard
+)
+from fetch_plan import (
+    DEFAULT_BATCH_UNITS, ThroughputHistory, TimeBudget, WorkUnit, build_work_plan, group_by_tile,
+    read_plan_file, summarize_plan, write_plan_file
+)
+from fetch_policy import FETCH_POLICIES, SeasonalFetchPolicy
+from granule_discovery import DISCOVERY_BACKENDS, CMRGranuleDiscovery, GranuleIndex
+from metrics import PipelineMetrics
+from profiling import StageProfiler, PROFILER_MODES
+from archive_backends import ARCHIVE_BACKENDS, create_archive
+from constants import (
+    ERROR_OLD_MISSING, ERROR_RECENT_MISSING, ERROR_OTHER, NSIDC_BASE_URL, CMR_SEARCH_URL, DEFAULT_MAX_CONCURRENCY
+)
+from utils import format_cache_stats
 
-from pixel_extractor import VIIRSPixelExtractor
-from data_fetcher import VIIRSDataFetcher
-from snow_cover_sqlite_archive import SnowCoverSQLiteArchive
-from constants import ERROR_OLD_MISSING, ERROR_RECENT_MISSING, ERROR_OTHER
-from utils import calculate_week_index, format_cache_stats, create_empty_year_data
+if TYPE_CHECKING:
+    from data_fetcher import VIIRSDataFetcher
+    from pixel_extractor import VIIRSPixelExtractor
 
 
 class VIIRSSnowDataProcessor:
     """Main processor for VIIRS snow data integration."""
     
     def __init__(self, archive_file: str = "./cache/snow-cover-archive.db", 
-                 max_workers: int = 6, from_year: Optional[int] = None, to_year: Optional[int] = None):
+                 max_workers: int = 6, from_year: Optional[int] = None, to_year: Optional[int] = None,
+                 decode_workers: Optional[int] = None, base_url: str = NSIDC_BASE_URL,
+                 profiler: Optional[StageProfiler] = None, aggregates_file: Optional[str] = None,
+                 archive_backend: str = 'sqlite', remote_reads: bool = False,
+                 discovery: str = 'listing', cmr_url: str = CMR_SEARCH_URL,
+                 granule_index_file: Optional[str] = None, adaptive_concurrency: bool = True,
+                 max_concurrency: int = DEFAULT_MAX_CONCURRENCY, fetch_policy: str = 'all',
+                 time_budget: Optional[float] = None, batch_units: int = DEFAULT_BATCH_UNITS,
+                 shard: Optional[Tuple[int, int]] = None, lease_job: Optional[str] = None,
+                 lease_db_config: Optional[Dict] = None, lease_seconds: float = DEFAULT_LEASE_SECONDS,
+                 pixel_map_file: Optional[str] = None, persistent: bool = False):
         """
         Initialize the processor.
         
         Args:
             archive_file: Path to SQLite archive database file
-            max_workers: Maximum number of parallel workers for downloads
+            max_workers: Number of parallel downloads (the starting point with adaptive_concurrency)
             from_year: Start year (inclusive), defaults to 2012
             to_year: End year (inclusive), defaults to current year
+            decode_workers: Number of processes for HDF decoding (default: CPU count)
+            base_url: Root URL of the VNP10A1F date directories (default: NSIDC DAAC)
+            profiler: Profiler wrapping the extraction, planning, fetching and archive write stages
+            aggregates_file: SQLite file to write per-run and per-ski-area snow cover
+                histories to after fetching (requires a runs GeoJSON)
+            archive_backend: 'sqlite' (archive_file is a database file) or 'tiles'
+                (archive_file is a directory of memory-mapped tile cubes)
+            remote_reads: Read only the HDF5 chunks holding the needed pixels with HTTP
+                Range requests instead of downloading whole granules
+            discovery: 'listing' looks up each granule in its date's directory listing;
+                'cmr' resolves all granules of the processed tiles with paged catalog
+                searches first and falls back to listings for dates it could not cover
+            cmr_url: Root of the CMR-compatible search API used with discovery='cmr'
+            granule_index_file: SQLite file of the granule index (default:
+                granule-index.db next to the archive)
+            adaptive_concurrency: Adjust the number of parallel downloads with AIMD,
+                backing off on throttling and timeouts
+            max_concurrency: Upper bound of the adaptive download concurrency
+            fetch_policy: 'all' fetches every missing week; 'seasonal' skips off-season
+                weeks in which a tile's archived history never had snow
+            time_budget: Seconds after which no new granules are fetched. Granules of
+                all tiles are then fetched in order of value and written to the archive
+                in batches, so the next run continues with the rest
+            batch_units: Granules fetched between archive writes with a time budget,
+                a plan file or leases
+            shard: (index, count) to only process the tiles of one of count shards
+            lease_job: Name of a fetch job whose (tile, year) units are claimed with
+                expiring leases in the Postgres cache database, shared by all workers
+                of the job
+            lease_db_config: Connection settings of the lease database (default:
+                POSTGRES_* environment variables)
+            lease_seconds: Seconds a claimed unit stays leased without renewal
+            pixel_map_file: SQLite file to write the pixels of each run to after
+                extraction, loaded by the Node pipeline instead of extracting them again
+            persistent: Keep the archive, the fetcher and their caches open after
+                run() for further runs, as the worker service does; close() releases them
         """
-        self.pixel_extractor = VIIRSPixelExtractor()
-        self.data_fetcher = VIIRSDataFetcher()
-        self.archive_manager = SnowCoverSQLiteArchive(archive_file)
+        if discovery not in DISCOVERY_BACKENDS:
+            raise ValueError(f"Unknown discovery backend {discovery!r}, expected one of {DISCOVERY_BACKENDS}")
+        if fetch_policy not in FETCH_POLICIES:
+            raise ValueError(f"Unknown fetch policy {fetch_policy!r}, expected one of {FETCH_POLICIES}")
+        
+        # Shared by all stages, written out by write_metrics() at the end of a run
+        self.metrics = PipelineMetrics()
+        # Created on first use, see the pixel_extractor and data_fetcher properties
+        self._pixel_extractor = None
+        self._data_fetcher = None
+        self.concurrency = None
+        
+        self.granule_index = None
+        self.granule_discovery = None
+        if discovery == 'cmr':
+            index_file = granule_index_file or str(Path(archive_file).parent / "granule-index.db")
+            self.granule_index = GranuleIndex(index_file)
+            self.granule_index.initialize()
+            self.granule_discovery = CMRGranuleDiscovery(cmr_url, metrics=self.metrics)
+        
+        self.archive_manager = create_archive(archive_backend, archive_file)
         self.archive_manager.initialize()
+        self.fetch_policy = SeasonalFetchPolicy(self.archive_manager) if fetch_policy == 'seasonal' else None
         self.max_workers = max_workers
+        self.max_concurrency = max_concurrency
+        self.adaptive_concurrency = adaptive_concurrency
+        self.decode_workers = decode_workers
+        self.base_url = base_url
+        self.remote_reads = remote_reads
+        # Download throughput of each run, used to estimate plans
+        self.throughput_history = ThroughputHistory(str(Path(archive_file).parent / "throughput-history.jsonl"))
+        self.time_budget = time_budget
+        self.batch_units = batch_units
+        self.shard = shard
+        self.lease_table = None
+        if lease_job is not None:
+            self.lease_table = FetchLeaseTableSync(
+                lease_job, lease_db_config if lease_db_config is not None else lease_db_config_from_environment(),
+                lease_seconds=lease_seconds
+            )
+            self.lease_table.initialize()
+        self.profiler = profiler
+        self.aggregates_file = aggregates_file
+        self.pixel_map_file = pixel_map_file
+        self.persistent = persistent
+        # Pixels of each run, set by process_runs_geojson()
+        self.feature_pixels = {}
         
         self.logger = logging.getLogger(__name__)
+        self.set_date_range(from_year, to_year)
+    
+    def set_date_range(self, from_year: Optional[int] = None, to_year: Optional[int] = None):
+        """
+        Set the date range of the next run.
         
+        Args:
+            from_year: Start year (inclusive), defaults to 2012
+            to_year: End year (inclusive), defaults to current year
+        """
         # Set date range for processing
         start_year = from_year if from_year is not None else 2012
         end_year = to_year if to_year is not None else datetime.now().year
@@ -57,6 +177,54 @@ class VIIRSSnowDataProcessor:
         
         self.logger.info(f"Processing date range: {self.start_date.strftime('%Y-%m-%d')} to {self.end_date.strftime('%Y-%m-%d')}")
     
+    def configure_run(self, from_year: Optional[int] = None, to_year: Optional[int] = None,
+                      time_budget: Optional[float] = None, aggregates_file: Optional[str] = None,
+                      profiler: Optional[StageProfiler] = None, shard: Optional[Tuple[int, int]] = None,
+                      pixel_map_file: Optional[str] = None):
+        """
+        Prepare a persistent processor for its next run.
+        
+        Metrics start over; caches, connections and the download concurrency carry
+        over. Arguments are the per-run options (RUN_OPTIONS) of the constructor.
+        """
+        self.set_date_range(from_year, to_year)
+        self.time_budget = time_budget
+        self.aggregates_file = aggregates_file
+        self.pixel_map_file = pixel_map_file
+        self.profiler = profiler
+        self.shard = shard
+        self.feature_pixels = {}
+        self.metrics.reset()
+    
+    @property
+    def pixel_extractor(self) -> "VIIRSPixelExtractor":
+        """Pixel extractor, created on first use since it loads geopandas, shapely and pyproj."""
+        if self._pixel_extractor is None:
+            from pixel_extractor import VIIRSPixelExtractor
+            self._pixel_extractor = VIIRSPixelExtractor(metrics=self.metrics)
+        return self._pixel_extractor
+    
+    @property
+    def data_fetcher(self) -> "VIIRSDataFetcher":
+        """Data fetcher, created on first use since it loads requests, h5py and numpy."""
+        if self._data_fetcher is None:
+            from concurrency import AIMDConcurrencyController
+            from data_fetcher import VIIRSDataFetcher
+            
+            self.concurrency = AIMDConcurrencyController(
+                initial=self.max_workers, maximum=max(self.max_concurrency, self.max_workers),
+                adaptive=self.adaptive_concurrency, metrics=self.metrics
+            )
+            self._data_fetcher = VIIRSDataFetcher(decode_workers=self.decode_workers, base_url=self.base_url,
+                                                  metrics=self.metrics, remote_reads=self.remote_reads,
+                                                  granule_index=self.granule_index,
+                                                  concurrency=self.concurrency)
+        return self._data_fetcher
+    
+    def _stage(self, name: str):
+        """Profile a stage when profiling is enabled."""
+        return self.profiler.stage(name) if self.profiler is not None else nullcontext()
+    
     def process_runs_geojson(self, geojson_path: str) -> Dict[str, List[Tuple[int, int]]]:
         """
         Extract unique pixels from runs.geojson and group by tile.
@@ -67,13 +235,21 @@ class VIIRSSnowDataProcessor:
         Returns:
             Dictionary mapping tile names to lists of (pixel_row, pixel_col) tuples
         """
-        self.logger.info(f"Extracting pixels from {geojson_path}")
+        from pixel_extractor import get_unique_pixels
         
-        # Extract unique pixels
-        unique_pixels = self.pixel_extractor.extract_unique_pixels_from_geojson(geojson_path)
+        self.logger.info(f"Extracting pixels from {geojson_path}")
         
-        # Group by tile
-        pixels_by_tile = self.pixel_extractor.get_pixels_by_tile(unique_pixels)
+        with self._stage('extraction'):
+            # Extract pixels per run, kept for computing per-run aggregates
+            self.feature_pixels = self.pixel_extractor.extract_feature_pixels_from_geojson(geojson_path)
+            unique_pixels = get_unique_pixels(self.feature_pixels)
+            
+            # Group by tile
+            pixels_by_tile = self.pixel_extractor.get_pixels_by_tile(unique_pixels)
+            
+            if self.pixel_map_file:
+                from pixel_map import write_pixel_map
+                write_pixel_map(self.pixel_map_file, self.feature_pixels)
         
         self.logger.info(f"Found {len(unique_pixels)} unique pixels across {len(pixels_by_tile)} tiles")
         
@@ -92,12 +268,12 @@ class VIIRSSnowDataProcessor:
         total_pixels = sum(len(pixels) for pixels in pixels_by_tile.values())
         missing_weeks_count = 0
         
-        for tile, pixels in pixels_by_tile.items():
-            for pixel_row, pixel_col in pixels:
-                missing_weeks = self.archive_manager.get_missing_weeks_for_pixel(
-                    tile, pixel_row, pixel_col, self.start_date, self.end_date
+        with self._stage('planning'):
+            for tile, pixels in pixels_by_tile.items():
+                missing_weeks = self.archive_manager.get_missing_weeks_for_pixels(
+                    tile, pixels, self.start_date, self.end_date
                 )
-                missing_weeks_count += len(missing_weeks)
+                missing_weeks_count += sum(len(weeks) for weeks in missing_weeks.values())
         
         return {
             'total_pixels': total_pixels,
@@ -105,54 +281,123 @@ class VIIRSSnowDataProcessor:
             'tiles_count': len(pixels_by_tile)
         }
     
-    def process_tile(self, tile: str, pixels: List[Tuple[int, int]]) -> Dict[str, int]:
+    def discover_granules(self, tiles: List[str]):
         """
-        Process all missing data for a single tile using batched approach.
+        Resolve the granules of the processed tiles over the date range in bulk.
+        
+        Failed searches are logged and leave the affected dates to the directory
+        listings.
+        
+        Args:
+            tiles: Tiles that will be processed
+        """
+        if self.granule_discovery is None:
+            return
+        
+        with self._stage('discovery'):
+            try:
+                found = self.granule_discovery.discover(self.granule_index, tiles, self.start_date, self.end_date)
+            except Exception as e:
+                self.logger.warning(f"Granule discovery failed, falling back to directory listings: {e}")
+                return
+        self.logger.info(f"Granule discovery found {found} new granules, index: {self.granule_index.get_stats()}")
+    
+    def plan_tile(self, tile: str, pixels: List[Tuple[int, int]],
+                  year: Optional[int] = None) -> Dict[datetime, List[Tuple[int, int]]]:
+        """
+        Determine the granules to fetch for a tile and the pixels each of them fills.
         
         Args:
             tile: Tile identifier (e.g., 'h18v04')
             pixels: List of (pixel_row, pixel_col) tuples
+            year: Only plan the weekly dates of this year
         
         Returns:
-            Dictionary with processing statistics
+            Dictionary mapping dates to the pixels missing on them, in date order
         """
-        self.logger.info(f"Processing tile {tile} with {len(pixels)} pixels")
+        start_date, end_date = self.start_date, self.end_date
+        if year is not None:
+            # Keep the weekly sampling dates of the whole range
+            weeks_to_year = max(0, -(-(datetime(year, 1, 1) - self.start_date).days // 7))
+            start_date = self.start_date + timedelta(weeks=weeks_to_year)
+            end_date = min(self.end_date, datetime(year, 12, 31))
         
         # Step 1: Determine all missing weeks for all pixels in this tile
         self.logger.info(f"  Step 1: Analyzing missing data for {len(pixels)} pixels")
         all_missing_weeks = set()
-        pixel_missing_weeks = {}
         
-        for pixel_row, pixel_col in pixels:
-            missing_weeks = self.archive_manager.get_missing_weeks_for_pixel(
-                tile, pixel_row, pixel_col, self.start_date, self.end_date
+        with self._stage('planning'), self.metrics.timed('planning', items=len(pixels)):
+            pixel_missing_weeks = self.archive_manager.get_missing_weeks_for_pixels(
+                tile, pixels, start_date, end_date
             )
-            pixel_missing_weeks[(pixel_row, pixel_col)] = missing_weeks
-            all_missing_weeks.update(date for date, _ in missing_weeks)
+            for missing_weeks in pixel_missing_weeks.values():
+                all_missing_weeks.update(date for date, _ in missing_weeks)
         
         if not all_missing_weeks:
             self.logger.info(f"No missing data for tile {tile}")
-            return {'processed_weeks': 0, 'updated_pixels': 0, 'errors': 0}
+            return {}
         
         sorted_dates = sorted(all_missing_weeks)
         self.logger.info(f"  Found {len(sorted_dates)} dates needing data")
         
+        if self.fetch_policy is not None:
+            with self._stage('planning'):
+                selected_dates = self.fetch_policy.select_dates(tile, pixels, sorted_dates)
+            skipped = len(sorted_dates) - len(selected_dates)
+            self.metrics.increment('dates_skipped_by_policy', skipped)
+            self.logger.info(f"  Fetch policy skips {skipped} of {len(sorted_dates)} dates")
+            sorted_dates = selected_dates
+        
         # Step 2: Build date->pixels mapping for efficient processing
         date_to_pixels = {}
-        for date in sorted_dates:
-            pixels_for_date = []
-            for pixel_row, pixel_col in pixels:
-                missing_weeks = pixel_missing_weeks.get((pixel_row, pixel_col), [])
-                if any(missing_date == date for missing_date, _ in missing_weeks):
-                    pixels_for_date.append((pixel_row, pixel_col))
-            
-            if pixels_for_date:
-                date_to_pixels[date] = pixels_for_date
+        with self._stage('planning'):
+            for date in sorted_dates:
+                pixels_for_date = []
+                for pixel_row, pixel_col in pixels:
+                    missing_weeks = pixel_missing_weeks.get((pixel_row, pixel_col), [])
+                    if any(missing_date == date for missing_date, _ in missing_weeks):
+                        pixels_for_date.append((pixel_row, pixel_col))
+                
+                if pixels_for_date:
+                    date_to_pixels[date] = pixels_for_date
+        
+        return date_to_pixels
+    
+    def fetch_tile_dates(self, tile: str, date_to_pixels: Dict[datetime, List[Tuple[int, int]]],
+                         should_stop: Optional[Callable[[], bool]] = None) -> Dict[str, int]:
+        """
+        Fetch granules of a tile and write the results to the archive.
         
+        Args:
+            tile: Tile identifier (e.g., 'h18v04')
+            date_to_pixels: Dictionary mapping dates to the pixels to fill from them
+            should_stop: Called before each new download; once it returns True the
+                remaining dates are left for a later run
+        
+        Returns:
+            Dictionary with processing statistics
+        """
         # Step 3: Fetch all data in parallel
         self.logger.info(f"  Step 2: Fetching data for {len(date_to_pixels)} dates in parallel (workers: {self.max_workers})")
-        all_results = self.data_fetcher.process_tile_dates_parallel(tile, date_to_pixels, max_workers=self.max_workers)
+        with self._stage('fetching'):
+            all_results = self.data_fetcher.process_tile_dates_parallel(
+                tile, date_to_pixels, max_workers=self.max_workers, should_stop=should_stop
+            )
         
+        return self.write_tile_results(tile, all_results)
+    
+    def write_tile_results(self, tile: str,
+                           all_results: Dict[datetime, Dict[Tuple[int, int], Tuple[int, int]]]) -> Dict[str, int]:
+        """
+        Write fetched results of a tile to the archive.
+        
+        Args:
+            tile: Tile identifier (e.g., 'h18v04')
+            all_results: Dictionary mapping dates to pixel results
+        
+        Returns:
+            Dictionary with processing statistics
+        """
         stats = {'processed_weeks': len(all_results), 'updated_pixels': 0, 'errors': 0}
         
         # Count errors
@@ -162,58 +407,274 @@ class VIIRSSnowDataProcessor:
                     stats['errors'] += 1
         
         # Step 4: Group results by pixel and batch update all JSON files
-        self.logger.info(f"  Step 3: Updating cache files for {len(pixels)} pixels")
         pixel_updates = {}  # {(pixel_row, pixel_col): [(date, value, cloud_persistence), ...]}
         
-        for date, date_results in all_results.items():
-            for (pixel_row, pixel_col), (value, cloud_persistence) in date_results.items():
-                if (pixel_row, pixel_col) not in pixel_updates:
-                    pixel_updates[(pixel_row, pixel_col)] = []
-                pixel_updates[(pixel_row, pixel_col)].append((date, value, cloud_persistence))
+        with self._stage('archive_writes'):
+            for date, date_results in all_results.items():
+                for (pixel_row, pixel_col), (value, cloud_persistence) in date_results.items():
+                    if (pixel_row, pixel_col) not in pixel_updates:
+                        pixel_updates[(pixel_row, pixel_col)] = []
+                    pixel_updates[(pixel_row, pixel_col)].append((date, value, cloud_persistence))
+            
+            self.logger.info(f"  Step 3: Updating archive for {len(pixel_updates)} pixels")
+            # Batch update all pixel cache files
+            with self.metrics.timed('archive_write', items=len(pixel_updates)):
+                update_stats = self.archive_manager.update_pixel_weeks(tile, pixel_updates)
+            stats['updated_pixels'] += update_stats['updated_pixels']
+            stats['errors'] += update_stats['errors']
         
-        # Batch update all pixel cache files
-        for (pixel_row, pixel_col), updates in pixel_updates.items():
-            try:
-                # Load existing data once
-                pixel_data = self.archive_manager.load_pixel_data(tile, pixel_row, pixel_col)
-                
-                # Apply all updates for this pixel
-                for date, value, cloud_persistence in updates:
-                    # Find or create year data
-                    year = date.year
-                    year_data = None
-                    for data in pixel_data:
-                        if data.year == year:
-                            year_data = data
-                            break
-                    
-                    if year_data is None:
-                        # Create new year data with 53 weeks
-                        year_data = create_empty_year_data(year)
-                        pixel_data.append(year_data)
-                    
-                    # Calculate week index and update
-                    week_index = calculate_week_index(date, year)
-                    
-                    # Ensure we have enough weeks in the data array
-                    while len(year_data.data) <= week_index:
-                        year_data.data.append([None, 0])
-                    
-                    year_data.data[week_index] = [value, cloud_persistence]
-                    stats['updated_pixels'] += 1
-                
-                # Save updated data once per pixel
-                self.archive_manager.save_pixel_data(tile, pixel_row, pixel_col, pixel_data)
-                
-            except Exception as e:
-                self.logger.error(f"Error updating cache for pixel {tile}:{pixel_row},{pixel_col}: {e}")
-                stats['errors'] += 1
+        return stats
+    
+    def process_tile(self, tile: str, pixels: List[Tuple[int, int]]) -> Dict[str, int]:
+        """
+        Process all missing data for a single tile using batched approach.
         
+        Args:
+            tile: Tile identifier (e.g., 'h18v04')
+            pixels: List of (pixel_row, pixel_col) tuples
+        
+        Returns:
+            Dictionary with processing statistics
+        """
+        self.logger.info(f"Processing tile {tile} with {len(pixels)} pixels")
+        
+        date_to_pixels = self.plan_tile(tile, pixels)
+        if not date_to_pixels:
+            return {'processed_weeks': 0, 'updated_pixels': 0, 'errors': 0}
+        
+        stats = self.fetch_tile_dates(tile, date_to_pixels)
         self.logger.info(f"  Completed tile {tile}: {stats}")
         return stats
     
+    def plan_work(self, pixels_by_tile: Dict[str, List[Tuple[int, int]]], tiles: List[str]) -> List[WorkUnit]:
+        """
+        Plan the missing granules of all tiles, most valuable first.
+        
+        Args:
+            pixels_by_tile: Dictionary mapping tiles to pixel lists
+            tiles: Tiles to plan
+        
+        Returns:
+            Work units ordered by decreasing value
+        """
+        date_to_pixels_by_tile = {}
+        for tile in tiles:
+            self.logger.info(f"Planning tile {tile} with {len(pixels_by_tile[tile])} pixels")
+            date_to_pixels = self.plan_tile(tile, pixels_by_tile[tile])
+            if date_to_pixels:
+                date_to_pixels_by_tile[tile] = date_to_pixels
+        
+        with self._stage('planning'):
+            plan = build_work_plan(date_to_pixels_by_tile, self.end_date)
+        self.logger.info(f"Fetch plan: {len(plan)} granules in {len(date_to_pixels_by_tile)} tiles")
+        return plan
+    
+    def execute_plan(self, plan: List[WorkUnit], budget: Optional[TimeBudget] = None) -> Dict[str, int]:
+        """
+        Fetch the granules of a plan in order until the time budget, if any, is used up.
+        
+        Results are written to the archive after each batch of batch_units granules,
+        so work finished before the budget ran out is kept. Granules that were not
+        started stay missing in the archive and are planned again by the next run.
+        
+        Args:
+            plan: Work units in the order they are to be fetched
+            budget: Time budget of the run
+        
+        Returns:
+            Dictionary with processing statistics
+        """
+        if budget is not None:
+            self.logger.info(f"{budget.remaining():.0f}s of the time budget left for {len(plan)} granules")
+        should_stop = budget.exhausted if budget is not None else None
+        
+        total_stats = {'processed_weeks': 0, 'updated_pixels': 0, 'errors': 0}
+        for position in range(0, len(plan), self.batch_units):
+            if should_stop is not None and should_stop():
+                break
+            batch = plan[position:position + self.batch_units]
+            for tile, date_to_pixels in group_by_tile(batch).items():
+                if should_stop is not None and should_stop():
+                    break
+                tile_stats = self.fetch_tile_dates(tile, date_to_pixels, should_stop=should_stop)
+                for key in total_stats:
+                    total_stats[key] += tile_stats[key]
+        
+        deferred = len(plan) - total_stats['processed_weeks']
+        self.metrics.increment('granules_deferred', deferred)
+        if deferred and budget is not None:
+            self.logger.info(f"Time budget of {budget.seconds:.0f}s used up: deferred {deferred} of "
+                             f"{len(plan)} granules to the next run")
+        return total_stats
+    
+    def write_plan(self, plan: List[WorkUnit], pixels_by_tile: Dict[str, List[Tuple[int, int]]],
+                   plan_file: str) -> Dict:
+        """
+        Estimate a plan from the throughput history and write it to a plan file.
+        
+        Args:
+            plan: Work units of the plan
+            pixels_by_tile: Pixels of each planned tile
+            plan_file: Plan file to write
+        
+        Returns:
+            Plan summary from summarize_plan()
+        """
+        summary = summarize_plan(plan, self.throughput_history.estimate(self.remote_reads))
+        estimate = {key: summary[key] for key in ('granules', 'pixels', 'bytes', 'seconds') if key in summary}
+        write_plan_file(plan_file, plan, pixels_by_tile, {
+            'created_at': datetime.now().isoformat(timespec='seconds'),
+            'start_date': self.start_date.strftime('%Y-%m-%d'),
+            'end_date': self.end_date.strftime('%Y-%m-%d'),
+            'estimate': estimate,
+        })
+        self.logger.info(f"Fetch plan for {self.start_date.strftime('%Y-%m-%d')} to "
+                         f"{self.end_date.strftime('%Y-%m-%d')}:\n{format_plan(summary)}")
+        self.logger.info(f"Wrote fetch plan to {plan_file}, run it with --plan-file {plan_file}")
+        return summary
+    
+    def run_plan_file(self, plan_file: str, geojson_path: Optional[str] = None,
+                      budget: Optional[TimeBudget] = None) -> Dict[str, int]:
+        """
+        Execute a plan file written with --plan-only, without planning again.
+        
+        Pixels archived since the plan was written, e.g. by an earlier run of the same
+        plan that ran out of its time budget, are dropped from the plan, so repeated
+        budgeted runs continue with the deferred granules.
+        
+        Args:
+            plan_file: Plan file to execute
+            geojson_path: runs.geojson to compute aggregates for (optional)
+            budget: Time budget of the run
+        
+        Returns:
+            Dictionary with processing statistics
+        """
+        plan, metadata = read_plan_file(plan_file)
+        self.logger.info(f"Executing fetch plan {plan_file} from {metadata.get('created_at')}: "
+                         f"{len(plan)} granules, estimate {metadata.get('estimate')}")
+        self.start_date = datetime.strptime(metadata['start_date'], '%Y-%m-%d')
+        self.end_date = datetime.strptime(metadata['end_date'], '%Y-%m-%d')
+        
+        # Runs are only extracted for their aggregates
+        if geojson_path is not None:
+            self.process_runs_geojson(geojson_path)
+        
+        plan = self.remaining_plan(plan)
+        self.discover_granules(sorted({unit.tile for unit in plan}))
+        return self.execute_plan(plan, budget)
+    
+    def remaining_plan(self, plan: List[WorkUnit]) -> List[WorkUnit]:
+        """
+        Drop the pixels of a plan that are no longer missing in the archive.
+        
+        Args:
+            plan: Work units in the order they are to be fetched
+        
+        Returns:
+            Work units with at least one missing pixel, in plan order
+        """
+        missing_dates = {}
+        with self._stage('planning'):
+            for tile, date_to_pixels in group_by_tile(plan).items():
+                pixels = sorted({pixel for pixels in date_to_pixels.values() for pixel in pixels})
+                with self.metrics.timed('planning', items=len(pixels)):
+                    pixel_missing_weeks = self.archive_manager.get_missing_weeks_for_pixels(
+                        tile, pixels, self.start_date, self.end_date
+                    )
+                missing_dates[tile] = {pixel: {date.date() for date, _ in missing_weeks}
+                                       for pixel, missing_weeks in pixel_missing_weeks.items()}
+            
+            remaining = []
+            for unit in plan:
+                pixels = [pixel for pixel in unit.pixels if unit.date.date() in missing_dates[unit.tile][pixel]]
+                if pixels:
+                    remaining.append(WorkUnit(unit.tile, unit.date, pixels, unit.value))
+        
+        if len(remaining) < len(plan):
+            self.logger.info(f"Skipping {len(plan) - len(remaining)} planned granules already in the archive, "
+                             f"{len(remaining)} left")
+        return remaining
+    
+    def process_leased_units(self, pixels_by_tile: Dict[str, List[Tuple[int, int]]], tiles: List[str],
+                             budget: Optional[TimeBudget] = None,
+                             poll_seconds: float = DEFAULT_POLL_SECONDS) -> Dict[str, int]:
+        """
+        Fetch (tile, year) units claimed from the lease table until the job is done.
+        
+        The units of the processed tiles are registered first; workers of the same
+        job register the same units. Dates fetched by an earlier owner of a unit are
+        skipped. While other workers hold the remaining units, the worker waits so it
+        can reclaim the units of workers that crash.
+        
+        Args:
+            pixels_by_tile: Dictionary mapping tiles to pixel lists
+            tiles: Tiles to process
+            budget: Time budget of the run
+            poll_seconds: Seconds between claim attempts while other workers hold units
+        
+        Returns:
+            Dictionary with processing statistics
+        """
+        years = range(self.start_date.year, self.end_date.year + 1)
+        added = self.lease_table.register_units((tile, year) for tile in tiles for year in years)
+        self.logger.info(f"Lease job {self.lease_table.job}: registered {added} new units, "
+                         f"units by status: {self.lease_table.get_stats()}")
+        
+        total_stats = {'processed_weeks': 0, 'updated_pixels': 0, 'errors': 0}
+        while budget is None or not budget.exhausted():
+            lease = self.lease_table.claim()
+            if lease is None:
+                if self.lease_table.unfinished_count() == 0:
+                    break
+                time.sleep(poll_seconds)
+                continue
+            
+            self.logger.info(f"Leased {lease.tile} {lease.year} (attempt {lease.attempts}, "
+                             f"{len(lease.done_dates)} dates fetched by earlier owners)")
+            self.metrics.increment('units_leased')
+            if lease.tile not in pixels_by_tile:
+                # Registered by a worker with other pixels, e.g. another runs.geojson
+                self.logger.warning(f"No pixels of tile {lease.tile} to fetch, handing the unit back")
+                self.lease_table.release(lease)
+                continue
+            
+            date_to_pixels = self.plan_tile(lease.tile, pixels_by_tile[lease.tile], year=lease.year)
+            dates = [date for date in date_to_pixels if date not in lease.done_dates]
+            
+            def should_stop():
+                return lease.should_stop() or (budget is not None and budget.exhausted())
+            
+            for position in range(0, len(dates), self.batch_units):
+                if should_stop():
+                    break
+                batch = {date: date_to_pixels[date] for date in dates[position:position + self.batch_units]}
+                with self._stage('fetching'):
+                    all_results = self.data_fetcher.process_tile_dates_parallel(
+                        lease.tile, batch, max_workers=self.max_workers, should_stop=should_stop
+                    )
+                tile_stats = self.write_tile_results(lease.tile, all_results)
+                for key in total_stats:
+                    total_stats[key] += tile_stats[key]
+                # Recorded once the results are in the archive
+                self.lease_table.record_dates(lease, all_results.keys())
+                lease.done_dates.update(all_results.keys())
+            
+            if all(date in lease.done_dates for date in dates):
+                if self.lease_table.complete(lease):
+                    self.metrics.increment('units_completed')
+                else:
+                    self.logger.warning(f"Lease on {lease.tile} {lease.year} expired before it was completed")
+            elif lease.lost:
+                self.metrics.increment('units_lost')
+            else:
+                self.lease_table.release(lease)
+        
+        self.logger.info(f"Lease job {self.lease_table.job}: units by status: {self.lease_table.get_stats()}")
+        return total_stats
+    
     def run(self, geojson_path: Optional[str] = None, max_tiles: Optional[int] = None, 
-           fill_cache_mode: bool = False) -> bool:
+           fill_cache_mode: bool = False, plan_only: bool = False, plan_file: Optional[str] = None) -> bool:
         """
         Run the complete VIIRS snow data fetching process.
         
@@ -221,11 +682,23 @@ class VIIRSSnowDataProcessor:
             geojson_path: Path to runs.geojson file (optional if fill_cache_mode=True)
             max_tiles: Maximum number of tiles to process (for testing)
             fill_cache_mode: If True, discover existing pixels instead of processing geojson
+            plan_only: Only plan the missing granules, estimate them and write them to
+                plan_file, without fetching
+            plan_file: Plan file to write with plan_only, or to execute instead of
+                planning otherwise
         
         Returns:
             True if successful, False otherwise
         """
+        # Started before planning, which is part of the budgeted work
+        budget = TimeBudget(self.time_budget) if self.time_budget is not None else None
         try:
+            if plan_file is not None and not plan_only:
+                total_stats = self.run_plan_file(plan_file, geojson_path, budget)
+                self.write_aggregates()
+                self.log_run_summary(total_stats)
+                return total_stats['errors'] == 0
+            
             # Step 1: Get pixels either from runs.geojson or existing cache
             if fill_cache_mode:
                 self.logger.info("Discovering existing cached pixels")
@@ -243,48 +716,104 @@ class VIIRSSnowDataProcessor:
             missing_summary = self.get_missing_data_summary(pixels_by_tile)
             self.logger.info(f"Missing data summary: {missing_summary}")
             
-            if missing_summary['total_missing_weeks'] == 0:
-                self.logger.info("All data is already cached - nothing to fetch")
-                return True
-            
             # Step 3: Process each tile
             tiles_to_process = list(pixels_by_tile.keys())
             if max_tiles:
                 tiles_to_process = tiles_to_process[:max_tiles]
                 self.logger.info(f"Limiting processing to {max_tiles} tiles for testing")
+            if self.shard is not None:
+                index, count = self.shard
+                tiles_to_process = [tile for tile in tiles_to_process if tile_in_shard(tile, index, count)]
+                self.logger.info(f"Shard {index}/{count}: processing {len(tiles_to_process)} tiles")
+            
+            if plan_only:
+                plan = self.plan_work(pixels_by_tile, tiles_to_process) if missing_summary['total_missing_weeks'] else []
+                self.write_plan(plan, pixels_by_tile, plan_file)
+                return True
             
-            total_stats = {'processed_weeks': 0, 'updated_pixels': 0, 'errors': 0}
+            if missing_summary['total_missing_weeks'] == 0:
+                self.logger.info("All data is already cached - nothing to fetch")
+                self.write_aggregates()
+                return True
             
-            for i, tile in enumerate(tiles_to_process):
-                self.logger.info(f"\n=== Processing tile {i+1}/{len(tiles_to_process)}: {tile} ===")
-                
-                pixels = pixels_by_tile[tile]
-                tile_stats = self.process_tile(tile, pixels)
-                
-                # Accumulate statistics
-                for key in total_stats:
-                    total_stats[key] += tile_stats[key]
+            self.discover_granules(tiles_to_process)
+            
+            if self.lease_table is not None:
+                total_stats = self.process_leased_units(pixels_by_tile, tiles_to_process, budget)
+            elif budget is not None:
+                total_stats = self.execute_plan(self.plan_work(pixels_by_tile, tiles_to_process), budget)
+            else:
+                total_stats = {'processed_weeks': 0, 'updated_pixels': 0, 'errors': 0}
                 
-                self.logger.info(f"Tile {tile} completed: {tile_stats}")
+                for i, tile in enumerate(tiles_to_process):
+                    self.logger.info(f"\n=== Processing tile {i+1}/{len(tiles_to_process)}: {tile} ===")
+                    
+                    pixels = pixels_by_tile[tile]
+                    tile_stats = self.process_tile(tile, pixels)
+                    
+                    # Accumulate statistics
+                    for key in total_stats:
+                        total_stats[key] += tile_stats[key]
+                    self.metrics.increment('tiles_processed')
+                    
+                    self.logger.info(f"Tile {tile} completed: {tile_stats}")
             
-            # Step 4: Final summary
-            self.logger.info(f"\n=== Processing Complete ===")
-            self.logger.info(f"Total statistics: {total_stats}")
+            # Step 4: Per-run and per-ski-area aggregates
+            self.write_aggregates()
             
-            # Show cache statistics
-            archive_stats = self.archive_manager.get_archive_stats()
-            self.logger.info(f"Archive statistics: {archive_stats}")
+            # Step 5: Final summary
+            self.log_run_summary(total_stats)
             
             return total_stats['errors'] == 0
-            
+        
         except Exception as e:
             self.logger.error(f"Error in main processing: {e}")
             return False
         
         finally:
-            # Cleanup
-            self.data_fetcher.cleanup()
-            self.archive_manager.close()
+            if not self.persistent:
+                self.close()
+    
+    def close(self):
+        """Release the fetcher, the archive and the other resources of the processor."""
+        if self._data_fetcher is not None:
+            self._data_fetcher.cleanup()
+        self.archive_manager.close()
+        if self.granule_index is not None:
+            self.granule_index.close()
+        if self.lease_table is not None:
+            self.lease_table.close()
+    
+    def log_run_summary(self, total_stats: Dict[str, int]):
+        """Log the statistics of a finished run and record its download throughput."""
+        summary = self.metrics.summary()
+        self.logger.info(f"\n=== Processing Complete ===")
+        self.logger.info(f"Total statistics: {total_stats}")
+        self.logger.info(f"Stage metrics: {format_stage_metrics(summary)}")
+        concurrency_report = format_concurrency(summary)
+        if concurrency_report:
+            self.logger.info(f"Download concurrency: {concurrency_report}")
+        
+        # Show cache statistics
+        archive_stats = self.archive_manager.get_archive_stats()
+        self.logger.info(f"Archive statistics: {archive_stats}")
+        
+        self.throughput_history.record(summary, self.remote_reads)
+    
+    def write_aggregates(self):
+        """Compute snow cover histories of all runs and their ski areas and write them to the aggregates file."""
+        if not self.aggregates_file:
+            return
+        if not self.feature_pixels:
+            self.logger.warning("No runs to aggregate, aggregates require a runs GeoJSON")
+            return
+        
+        from snow_cover_aggregates import SnowCoverAggregator, write_aggregates
+        
+        self.logger.info(f"Computing snow cover aggregates for {len(self.feature_pixels)} runs")
+        with self._stage('aggregation'), self.metrics.timed('aggregation', len(self.feature_pixels)):
+            aggregator = SnowCoverAggregator(self.archive_manager)
+            write_aggregates(self.aggregates_file, aggregator.aggregate_features(self.feature_pixels))
     
     def cleanup_old_errors(self, days: int = 7):
         """
@@ -296,6 +825,76 @@ class VIIRSSnowDataProcessor:
         cutoff_date = datetime.now() - timedelta(days=days)
         self.logger.info(f"Cleaning up error codes older than {cutoff_date}")
         self.archive_manager.cleanup_old_error_codes(cutoff_date)
+    
+    def write_metrics(self, metrics_file: Optional[str] = None, prometheus_file: Optional[str] = None):
+        """
+        Write the per-stage metrics collected during the run.
+        
+        Args:
+            metrics_file: Path of the JSON summary file
+            prometheus_file: Path of the Prometheus text format file
+        """
+        try:
+            if metrics_file:
+                self.metrics.write_json(metrics_file)
+                self.logger.info(f"Wrote metrics summary to {metrics_file}")
+            if prometheus_file:
+                self.metrics.write_prometheus(prometheus_file)
+                self.logger.info(f"Wrote Prometheus metrics to {prometheus_file}")
+        except OSError as e:
+            self.logger.error(f"Error writing metrics: {e}")
+
+
+def format_stage_metrics(summary: Dict) -> str:
+    """Format the stage metrics of a run summary as a single log line."""
+    parts = []
+    for name, stage in summary['stages'].items():
+        part = f"{name}={stage['items_per_second']} {stage['unit']}/s (p95 {stage['p95_ms']}ms)"
+        if 'bytes_per_second' in stage:
+            part += f" {stage['bytes_per_second'] / 1e6:.1f} MB/s"
+        parts.append(part)
+    return ", ".join(parts) or "none"
+
+
+def format_concurrency(summary: Dict) -> str:
+    """Format the download concurrency timeline of a metrics summary for logging."""
+    concurrency = summary.get('concurrency')
+    if not concurrency:
+        return ""
+    
+    steps = [
+        f"{sample['seconds']:.0f}s: {sample['concurrency']} ({sample['granules_per_second']} granules/s)"
+        for sample in concurrency['timeline'] if sample['granules_per_second'] is not None
+    ]
+    # The last ten windows are enough to see where the controller settled
+    return (f"final {concurrency['final']} (range {concurrency['min']}-{concurrency['max']}); "
+            + ", ".join(steps[-10:]))
+
+
+def format_duration(seconds: float) -> str:
+    """Format a duration as hours and minutes."""
+    minutes = round(seconds / 60)
+    return f"{minutes // 60}h {minutes % 60:02d}m" if minutes >= 60 else f"{max(minutes, 1)}m"
+
+
+def format_plan(summary: Dict) -> str:
+    """Format a plan summary as one line per tile and a total line."""
+    lines = []
+    for tile, tile_summary in summary['tiles'].items():
+        line = f"  {tile}: {tile_summary['granules']:,} granules, {tile_summary['pixels']:,} pixel-weeks"
+        if 'bytes' in tile_summary:
+            line += f", {tile_summary['bytes'] / 1e9:.2f} GB"
+        lines.append(line)
+    
+    total = f"  Total: {summary['granules']:,} granules, {summary['pixels']:,} pixel-weeks"
+    throughput = summary.get('throughput')
+    if throughput is not None:
+        total += (f", {summary['bytes'] / 1e9:.2f} GB, ETA {format_duration(summary['seconds'])} at "
+                  f"{throughput['granules_per_second']} granules/s (median of the last {throughput['runs']} runs)")
+    else:
+        total += ", no throughput history for an ETA yet (recorded at the end of each fetching run)"
+    lines.append(total)
+    return "\n".join(lines)
 
 
 def setup_logging(verbose: bool = False):
@@ -309,9 +908,17 @@ def setup_logging(verbose: bool = False):
     )
 
 
-def main():
-    """Main function with argument parsing."""
-    parser = argparse.ArgumentParser(
+def create_parser(parser_class=argparse.ArgumentParser) -> argparse.ArgumentParser:
+    """
+    Build the command line parser, shared by the script and the worker service.
+    
+    Args:
+        parser_class: ArgumentParser subclass to build
+    
+    Returns:
+        Parser of the fetch arguments
+    """
+    parser = parser_class(
         description='Fetch VIIRS snow cover data for ski run pixels'
     )
     
@@ -330,7 +937,15 @@ def main():
     parser.add_argument(
         '--archive-file',
         default='./cache/snow-cover-archive.db',
-        help='Path to SQLite archive database file (default: ./cache/snow-cover-archive.db)'
+        help='Path to SQLite archive database file (default: ./cache/snow-cover-archive.db), '
+             'or archive directory with --archive-backend tiles'
+    )
+    
+    parser.add_argument(
+        '--archive-backend',
+        choices=ARCHIVE_BACKENDS,
+        default='sqlite',
+        help='Archive storage: one SQLite row per pixel, or memory-mapped per-tile cubes (default: sqlite)'
     )
     
     
@@ -369,7 +984,145 @@ def main():
         '--max-workers',
         type=int,
         default=6,
-        help='Maximum number of parallel workers for downloads (default: 6)'
+        help='Number of parallel downloads, the starting point of the adaptive concurrency (default: 6)'
+    )
+    
+    parser.add_argument(
+        '--max-concurrency',
+        type=int,
+        default=DEFAULT_MAX_CONCURRENCY,
+        help=f'Upper bound of the adaptive download concurrency (default: {DEFAULT_MAX_CONCURRENCY})'
+    )
+    
+    parser.add_argument(
+        '--fixed-concurrency',
+        action='store_true',
+        help='Keep --max-workers parallel downloads instead of adapting to throughput and throttling'
+    )
+    
+    parser.add_argument(
+        '--decode-workers',
+        type=int,
+        help='Number of processes for HDF decoding (default: CPU count, 0 to decode in download threads)'
+    )
+    
+    parser.add_argument(
+        '--base-url',
+        default=NSIDC_BASE_URL,
+        help=f'Root URL of the VNP10A1F date directories (default: {NSIDC_BASE_URL})'
+    )
+    
+    parser.add_argument(
+        '--remote-reads',
+        action='store_true',
+        help='Fetch only the HDF5 chunks holding the needed pixels with HTTP Range requests '
+             'instead of whole granules'
+    )
+    
+    parser.add_argument(
+        '--discovery',
+        choices=DISCOVERY_BACKENDS,
+        default='listing',
+        help='Granule discovery: one directory listing per tile and date, or paged CMR catalog '
+             'searches stored in a local granule index (default: listing)'
+    )
+    
+    parser.add_argument(
+        '--cmr-url',
+        default=CMR_SEARCH_URL,
+        help=f'Root of the CMR-compatible search API for --discovery cmr (default: {CMR_SEARCH_URL})'
+    )
+    
+    parser.add_argument(
+        '--granule-index',
+        help='SQLite granule index file for --discovery cmr (default: granule-index.db next to the archive)'
+    )
+    
+    parser.add_argument(
+        '--fetch-policy',
+        choices=FETCH_POLICIES,
+        default='all',
+        help='all: fetch every missing week; seasonal: skip off-season weeks (June-September '
+             'north, December-March south) in which the archived history never had snow (default: all)'
+    )
+    
+    parser.add_argument(
+        '--shard',
+        help='Only process the tiles of shard i of N (i/N, e.g. 0/4), for fetching on N machines '
+             'that are merged with merge_archives.py afterwards'
+    )
+    
+    parser.add_argument(
+        '--lease-job',
+        help='Claim (tile, year) units of this fetch job with expiring leases in the Postgres cache '
+             'database (POSTGRES_HOST/PORT/USER/PASSWORD), shared by all workers of the job'
+    )
+    
+    parser.add_argument(
+        '--lease-seconds',
+        type=float,
+        default=DEFAULT_LEASE_SECONDS,
+        help=f'Seconds a claimed unit stays leased without renewal (default: {DEFAULT_LEASE_SECONDS})'
+    )
+    
+    parser.add_argument(
+        '--plan-only',
+        action='store_true',
+        help='Plan the missing granules and print them per tile with estimated bytes and ETA from '
+             'the throughput of earlier runs, then write the plan to --plan-file without fetching'
+    )
+    
+    parser.add_argument(
+        '--plan-file',
+        help='Plan file to write with --plan-only (default: fetch-plan.json next to the archive), '
+             'or to execute without planning again'
+    )
+    
+    parser.add_argument(
+        '--time-budget',
+        type=float,
+        help='Stop starting new downloads after this many seconds. Granules of all tiles are '
+             'fetched in order of value (pixels filled, weighted by recency) and written to the '
+             'archive in batches; the next run continues with the rest. Leave headroom for the '
+             'granules in flight and the aggregates'
+    )
+    
+    parser.add_argument(
+        '--metrics-file',
+        help='Write per-stage timing and throughput metrics as JSON to this file'
+    )
+    
+    parser.add_argument(
+        '--prometheus-file',
+        help='Write per-stage metrics in Prometheus text format to this file (e.g. for the node_exporter textfile collector)'
+    )
+    
+    parser.add_argument(
+        '--aggregates-file',
+        help='Write per-run and per-ski-area snow cover histories to this SQLite file after fetching'
+    )
+    
+    parser.add_argument(
+        '--pixel-map-file',
+        help='Write the VIIRS pixels of each run to this SQLite file after extraction'
+    )
+    
+    parser.add_argument(
+        '--profile',
+        action='store_true',
+        help='Profile the extraction, planning, fetching and archive write stages'
+    )
+    
+    parser.add_argument(
+        '--profiler',
+        choices=PROFILER_MODES,
+        default='cprofile',
+        help='cprofile: cProfile per stage plus stack sampling; sampling: stack sampling only, lower overhead (default: cprofile)'
+    )
+    
+    parser.add_argument(
+        '--profile-dir',
+        help='Directory for profile output (default: profiles/<timestamp> next to the archive file)'
     )
     
     parser.add_argument(
@@ -384,65 +1137,175 @@ def main():
         help='End year (inclusive) for processing (default: current year)'
     )
     
-    args = parser.parse_args()
+    return parser
+
+
+def validate_args(args: argparse.Namespace):
+    """
+    Check the parsed arguments beyond what the parser checks.
     
-    # Setup logging
-    setup_logging(args.verbose)
+    Args:
+        args: Parsed command line arguments
+    
+    Raises:
+        ValueError: If the arguments are invalid, with the message to report
+    """
     logger = logging.getLogger(__name__)
     
-    # Validate input file (only required if not in fill-cache mode)
-    if args.fill_cache:
+    # Validate input file (only required if not in fill-cache or stats-only mode or executing a plan)
+    executing_plan = args.plan_file is not None and not args.plan_only
+    if args.stats_only:
+        # Only reads the archive statistics
+        pass
+    elif executing_plan:
+        if not Path(args.plan_file).exists():
+            raise ValueError(f"Plan file not found: {args.plan_file}")
+        if args.geojson_path and not Path(args.geojson_path).exists():
+            raise ValueError(f"Input file not found: {args.geojson_path}")
+    elif args.fill_cache:
         if args.geojson_path:
             logger.warning("geojson_path ignored when using --fill-cache mode")
     else:
         if not args.geojson_path:
-            logger.error("geojson_path is required unless using --fill-cache mode")
-            sys.exit(1)
+            raise ValueError("geojson_path is required unless using --fill-cache or --stats-only mode")
         if not Path(args.geojson_path).exists():
-            logger.error(f"Input file not found: {args.geojson_path}")
-            sys.exit(1)
+            raise ValueError(f"Input file not found: {args.geojson_path}")
     
     # Validate year arguments
     current_year = datetime.now().year
     if args.from_year is not None and args.from_year < 2012:
-        logger.error("VIIRS data is only available from 2012 onwards")
-        sys.exit(1)
+        raise ValueError("VIIRS data is only available from 2012 onwards")
     
     if args.to_year is not None and args.to_year > current_year:
-        logger.error(f"Cannot process future years beyond {current_year}")
-        sys.exit(1)
+        raise ValueError(f"Cannot process future years beyond {current_year}")
     
     if (args.from_year is not None and args.to_year is not None and 
         args.from_year > args.to_year):
-        logger.error("from-year cannot be greater than to-year")
-        sys.exit(1)
+        raise ValueError("from-year cannot be greater than to-year")
     
-    # Initialize processor
-    processor = VIIRSSnowDataProcessor(
-        archive_file=args.archive_file,
-        max_workers=args.max_workers,
-        from_year=args.from_year,
-        to_year=args.to_year
-    )
+    if args.time_budget is not None and args.time_budget <= 0:
+        raise ValueError("--time-budget must be positive")
+    
+    if args.shard is not None:
+        parse_shard(args.shard)
+    
+    if args.lease_job is not None and (args.plan_only or args.plan_file is not None):
+        raise ValueError("--lease-job cannot be combined with --plan-only or --plan-file")
+
+
+# Processor options that a persistent processor takes per run; a change of any other
+# option needs a new processor
+RUN_OPTIONS = ('from_year', 'to_year', 'time_budget', 'aggregates_file', 'profiler', 'shard', 'pixel_map_file')
+
+
+def processor_options(args: argparse.Namespace) -> Dict[str, Any]:
+    """
+    Processor constructor arguments of validated command line arguments.
+    
+    Args:
+        args: Arguments checked by validate_args()
+    
+    Returns:
+        Keyword arguments of VIIRSSnowDataProcessor
+    """
+    return {
+        'archive_file': args.archive_file,
+        'max_workers': args.max_workers,
+        'from_year': args.from_year,
+        'to_year': args.to_year,
+        'decode_workers': args.decode_workers,
+        'base_url': args.base_url,
+        'profiler': StageProfiler(mode=args.profiler) if args.profile else None,
+        'aggregates_file': args.aggregates_file,
+        'archive_backend': args.archive_backend,
+        'remote_reads': args.remote_reads,
+        'discovery': args.discovery,
+        'cmr_url': args.cmr_url,
+        'granule_index_file': args.granule_index,
+        'adaptive_concurrency': not args.fixed_concurrency,
+        'max_concurrency': args.max_concurrency,
+        'fetch_policy': args.fetch_policy,
+        'time_budget': args.time_budget,
+        'shard': parse_shard(args.shard) if args.shard is not None else None,
+        'lease_job': args.lease_job,
+        'lease_seconds': args.lease_seconds,
+        'pixel_map_file': args.pixel_map_file,
+    }
+
+
+def run_job(processor: VIIRSSnowDataProcessor, args: argparse.Namespace) -> bool:
+    """
+    Run the work the command line arguments ask for with a processor.
+    
+    Args:
+        processor: Processor created from processor_options(args), or a persistent
+            processor configured with the run options of args
+        args: Arguments checked by validate_args()
+    
+    Returns:
+        True if successful, False otherwise
+    """
+    logger = logging.getLogger(__name__)
     
     if args.stats_only:
         # Show statistics only
         archive_stats = processor.archive_manager.get_archive_stats()
         print("Archive Statistics:")
         print(format_cache_stats(archive_stats))
-        sys.exit(0)
+        return True
     
     # Clean up old errors if requested
     if args.cleanup_errors:
         processor.cleanup_old_errors(args.cleanup_days)
     
+    executing_plan = args.plan_file is not None and not args.plan_only
+    plan_file = args.plan_file
+    if args.plan_only and plan_file is None:
+        plan_file = str(Path(args.archive_file).parent / "fetch-plan.json")
+    
     # Run the main processing
-    if args.fill_cache:
-        logger.info("Starting VIIRS snow data fill-cache process")
-        success = processor.run(geojson_path=None, max_tiles=args.max_tiles, fill_cache_mode=True)
-    else:
-        logger.info("Starting VIIRS snow data fetch process")
-        success = processor.run(args.geojson_path, args.max_tiles, fill_cache_mode=False)
+    profiler = processor.profiler
+    with profiler if profiler is not None else nullcontext():
+        if args.plan_only or executing_plan:
+            success = processor.run(args.geojson_path, args.max_tiles, fill_cache_mode=args.fill_cache,
+                                    plan_only=args.plan_only, plan_file=plan_file)
+        elif args.fill_cache:
+            logger.info("Starting VIIRS snow data fill-cache process")
+            success = processor.run(geojson_path=None, max_tiles=args.max_tiles, fill_cache_mode=True)
+        else:
+            logger.info("Starting VIIRS snow data fetch process")
+            success = processor.run(args.geojson_path, args.max_tiles, fill_cache_mode=False)
+    
+    processor.write_metrics(args.metrics_file, args.prometheus_file)
+    
+    if profiler is not None:
+        profile_dir = args.profile_dir or (
+            Path(args.archive_file).parent / "profiles" / datetime.now().strftime("%Y%m%d-%H%M%S")
+        )
+        profiler.write(str(profile_dir))
+    
+    return success
+
+
+def main():
+    """Main function with argument parsing."""
+    args = create_parser().parse_args()
+    
+    # Setup logging
+    setup_logging(args.verbose)
+    logger = logging.getLogger(__name__)
+    
+    try:
+        validate_args(args)
+    except ValueError as e:
+        logger.error(str(e))
+        sys.exit(1)
+    
+    # Initialize processor
+    processor = VIIRSSnowDataProcessor(**processor_options(args))
+    success = run_job(processor, args)
+    if args.stats_only:
+        sys.exit(0)
     
     if success:
         logger.info("Processing completed successfully")
@@ -453,4 +1316,4 @@ def main():
 
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,350 @@
+#!/usr/bin/env python3
+"""
+Bulk granule discovery through a CMR-compatible catalog search.
+
+Looking up a granule in the NSIDC directory listings costs one request per
+(tile, date); a backfill over several years makes thousands of them. Discovery
+instead resolves all granules of several tiles over a date range with a few
+paged queries to a NASA CMR-compatible granule search:
+
+    GET {search_url}/granules.json?short_name=VNP10A1F&version=2
+        &temporal[]=2024-01-01T00:00:00Z,2024-12-31T23:59:59Z
+        &readable_granule_name[]=VNP10A1F.A*.h18v04.*
+        &options[readable_granule_name][pattern]=true&page_size=2000
+
+and stores the results in a GranuleIndex, a small SQLite file that
+VIIRSDataFetcher consults before falling back to directory listings. The index
+also records which date ranges were searched, so a date inside a searched range
+without a granule is known to be missing without any request.
+
+Catalogs publish recent granules with a delay, so a searched date only counts as
+settled once the search ran at least MISSING_SETTLE_DAYS after it; unsettled dates
+are searched again on the next run.
+"""
+
+import logging
+import re
+import sqlite3
+import threading
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import TYPE_CHECKING, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from constants import CMR_SEARCH_URL
+from metrics import PipelineMetrics
+
+if TYPE_CHECKING:
+    import requests
+
+DISCOVERY_BACKENDS = ('listing', 'cmr')
+
+VIIRS_SHORT_NAME = 'VNP10A1F'
+VIIRS_VERSION = '2'
+
+# CMR allows up to 2000 granules per page
+DEFAULT_PAGE_SIZE = 2000
+
+# Days after which a granule missing from the catalog is not expected to appear
+MISSING_SETTLE_DAYS = 30
+
+GRANULE_FILENAME_PATTERN = re.compile(r'^VNP10A1F\.A(\d{4})(\d{3})\.(h\d{2}v\d{2})\.[\w.]+\.h5$')
+
+
+def parse_granule_filename(filename: str) -> Optional[Tuple[str, datetime]]:
+    """
+    Parse the tile and date of a VNP10A1F granule filename.
+    
+    Args:
+        filename: Granule filename (e.g. 'VNP10A1F.A2024001.h18v04.002.2024003120000.h5')
+    
+    Returns:
+        (tile, date) tuple, or None if the filename is not a VNP10A1F granule
+    """
+    match = GRANULE_FILENAME_PATTERN.match(filename)
+    if not match:
+        return None
+    year, day_of_year, tile = match.groups()
+    return tile, datetime(int(year), 1, 1) + timedelta(days=int(day_of_year) - 1)
+
+
+class GranuleIndex:
+    """Local index of granule URLs and of the date ranges searched for each tile."""
+    
+    def __init__(self, index_file: str):
+        """
+        Initialize the index.
+        
+        Args:
+            index_file: Path of the SQLite index file
+        """
+        self.index_file = Path(index_file)
+        self.conn = None
+        # Loaded into memory so download threads can look up granules without a connection
+        self._granules: Dict[Tuple[str, str], Tuple[str, str]] = {}
+        self._searches: Dict[str, Tuple[str, str, str]] = {}
+        self._lock = threading.Lock()
+    
+    def initialize(self):
+        """Create the tables if needed and load the index into memory."""
+        self.index_file.parent.mkdir(parents=True, exist_ok=True)
+        # The connection is shared between threads, e.g. the jobs of a persistent
+        # worker processor; writes and close() are serialized by self._lock
+        self.conn = sqlite3.connect(str(self.index_file), check_same_thread=False)
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS granules (
+                tile TEXT NOT NULL,
+                date TEXT NOT NULL,
+                filename TEXT NOT NULL,
+                url TEXT NOT NULL,
+                PRIMARY KEY (tile, date)
+            ) WITHOUT ROWID
+        """)
+        # One contiguous searched range per tile; dates up to settled_until were
+        # searched long enough after the fact that a missing granule stays missing
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS granule_searches (
+                tile TEXT PRIMARY KEY,
+                start_date TEXT NOT NULL,
+                end_date TEXT NOT NULL,
+                settled_until TEXT NOT NULL
+            )
+        """)
+        self.conn.commit()
+        
+        with self._lock:
+            self._granules = {
+                (tile, date): (filename, url)
+                for tile, date, filename, url in self.conn.execute("SELECT tile, date, filename, url FROM granules")
+            }
+            self._searches = {
+                tile: (start, end, settled)
+                for tile, start, end, settled in self.conn.execute(
+                    "SELECT tile, start_date, end_date, settled_until FROM granule_searches"
+                )
+            }
+    
+    def close(self):
+        """Close the database connection."""
+        if self.conn is not None:
+            with self._lock:
+                self.conn.close()
+            self.conn = None
+    
+    def lookup(self, tile: str, date: datetime) -> Optional[Tuple[Optional[str], Optional[str]]]:
+        """
+        Look up the granule of a tile and date.
+        
+        Args:
+            tile: Tile identifier (e.g., 'h18v04')
+            date: Date of the granule
+        
+        Returns:
+            (filename, url) if the granule is indexed, (None, None) if the date was
+            searched and has no granule, or None if the date was never searched
+        """
+        day = date.strftime('%Y-%m-%d')
+        with self._lock:
+            granule = self._granules.get((tile, day))
+            if granule is not None:
+                return granule
+            search = self._searches.get(tile)
+        if search is not None and search[0] <= day <= search[1]:
+            return None, None
+        return None
+    
+    def unsettled_range(self, tile: str, start_date: datetime,
+                        end_date: datetime) -> Optional[Tuple[datetime, datetime]]:
+        """
+        Part of a date range that still has to be searched for a tile.
+        
+        Args:
+            tile: Tile identifier
+            start_date: First date of the range
+            end_date: Last date of the range
+        
+        Returns:
+            (start, end) of the dates to search, or None if the whole range is settled
+        """
+        with self._lock:
+            search = self._searches.get(tile)
+        if search is None or start_date.strftime('%Y-%m-%d') < search[0]:
+            return start_date, end_date
+        
+        first_unsettled = datetime.strptime(search[2], '%Y-%m-%d') + timedelta(days=1)
+        if first_unsettled > end_date:
+            return None
+        return max(start_date, first_unsettled), end_date
+    
+    def add_search(self, tile: str, start_date: datetime, end_date: datetime,
+                   granules: Iterable[Tuple[datetime, str, str]], searched_at: Optional[datetime] = None):
+        """
+        Record the results of a search over a date range of a tile.
+        
+        Args:
+            tile: Tile identifier
+            start_date: First searched date
+            end_date: Last searched date
+            granules: (date, filename, url) tuples found in the range
+            searched_at: Time of the search (default: now)
+        """
+        searched_at = searched_at or datetime.now()
+        start, end = start_date.strftime('%Y-%m-%d'), end_date.strftime('%Y-%m-%d')
+        settled = min(end_date, searched_at - timedelta(days=MISSING_SETTLE_DAYS)).strftime('%Y-%m-%d')
+        rows = [(tile, date.strftime('%Y-%m-%d'), filename, url) for date, filename, url in granules]
+        
+        with self._lock:
+            previous = self._searches.get(tile)
+            day_before = (start_date - timedelta(days=1)).strftime('%Y-%m-%d')
+            # Extend the searched range if the new search overlaps or adjoins it
+            if previous is not None and previous[0] <= start and day_before <= previous[1]:
+                start = previous[0]
+                end = max(end, previous[1])
+                if day_before <= previous[2]:
+                    settled = max(settled, previous[2])
+                else:
+                    settled = previous[2]
+            if settled < start:
+                # Nothing settled yet: make settled_until the day before the range
+                settled = (datetime.strptime(start, '%Y-%m-%d') - timedelta(days=1)).strftime('%Y-%m-%d')
+            
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO granules (tile, date, filename, url) VALUES (?, ?, ?, ?)", rows
+            )
+            self.conn.execute(
+                "INSERT OR REPLACE INTO granule_searches (tile, start_date, end_date, settled_until) "
+                "VALUES (?, ?, ?, ?)", (tile, start, end, settled)
+            )
+            self.conn.commit()
+            
+            for row in rows:
+                self._granules[(row[0], row[1])] = (row[2], row[3])
+            self._searches[tile] = (start, end, settled)
+    
+    def get_stats(self) -> Dict[str, int]:
+        """Number of indexed granules and searched tiles."""
+        with self._lock:
+            return {'granules': len(self._granules), 'searched_tiles': len(self._searches)}
+
+
+class CMRGranuleDiscovery:
+    """Discover VNP10A1F granules through a CMR-compatible granule search API."""
+    
+    def __init__(self, search_url: str = CMR_SEARCH_URL, session: Optional["requests.Session"] = None,
+                 page_size: int = DEFAULT_PAGE_SIZE, metrics: Optional[PipelineMetrics] = None,
+                 timeout: float = 60):
+        """
+        Initialize the discovery client.
+        
+        Args:
+            search_url: Root of the search API (e.g. https://cmr.earthdata.nasa.gov/search)
+            session: Session to send requests with
+            page_size: Granules requested per page
+            metrics: Metrics registry for discovery request timings
+            timeout: Seconds to wait for each response
+        """
+        import requests
+        
+        self.search_url = search_url.rstrip('/')
+        self.session = session or requests.Session()
+        self.page_size = page_size
+        self.metrics = metrics if metrics is not None else PipelineMetrics()
+        self.timeout = timeout
+        self.logger = logging.getLogger(__name__)
+    
+    def search(self, tiles: List[str], start_date: datetime,
+               end_date: datetime) -> Iterator[Tuple[str, datetime, str, str]]:
+        """
+        Search granules of several tiles over a date range.
+        
+        Pages are followed with the CMR-Search-After header.
+        
+        Args:
+            tiles: Tile identifiers
+            start_date: First date (inclusive)
+            end_date: Last date (inclusive)
+        
+        Yields:
+            (tile, date, filename, url) of each granule found
+        
+        Raises:
+            requests.RequestException: If a request fails
+        """
+        params = [
+            ('short_name', VIIRS_SHORT_NAME),
+            ('version', VIIRS_VERSION),
+            ('temporal[]', f"{start_date:%Y-%m-%d}T00:00:00Z,{end_date:%Y-%m-%d}T23:59:59Z"),
+            ('options[readable_granule_name][pattern]', 'true'),
+            ('page_size', str(self.page_size)),
+            ('sort_key[]', 'start_date'),
+        ]
+        params.extend(('readable_granule_name[]', f"{VIIRS_SHORT_NAME}.A*.{tile}.*") for tile in sorted(tiles))
+        
+        headers = {}
+        while True:
+            with self.metrics.timed('discovery') as measurement:
+                response = self.session.get(f"{self.search_url}/granules.json", params=params,
+                                            headers=headers, timeout=self.timeout)
+                measurement['bytes'] = len(response.content)
+                measurement['error'] = response.status_code != 200
+                response.raise_for_status()
+                entries = response.json().get('feed', {}).get('entry', [])
+                measurement['items'] = len(entries)
+            
+            for entry in entries:
+                granule = self._parse_entry(entry)
+                if granule is not None and granule[0] in tiles:
+                    yield granule
+            
+            search_after = response.headers.get('CMR-Search-After')
+            if not search_after or len(entries) < self.page_size:
+                return
+            headers = {'CMR-Search-After': search_after}
+    
+    @staticmethod
+    def _parse_entry(entry: Dict) -> Optional[Tuple[str, datetime, str, str]]:
+        """Extract (tile, date, filename, url) from the data link of a CMR granule entry."""
+        for link in entry.get('links', []):
+            href = link.get('href', '')
+            if not link.get('rel', '').endswith('/data#') or link.get('inherited'):
+                continue
+            filename = href.rsplit('/', 1)[-1]
+            parsed = parse_granule_filename(filename)
+            if parsed is not None:
+                return parsed[0], parsed[1], filename, href
+        return None
+    
+    def discover(self, index: GranuleIndex, tiles: List[str], start_date: datetime,
+                 end_date: datetime) -> int:
+        """
+        Search the parts of a (tiles x dates) plan that are not settled in the index.
+        
+        Tiles whose unsettled ranges start on the same date are searched together.
+        
+        Args:
+            index: Initialized granule index to store results in
+            tiles: Tile identifiers
+            start_date: First date of the plan
+            end_date: Last date of the plan
+        
+        Returns:
+            Number of granules found
+        """
+        tiles_by_start: Dict[datetime, List[str]] = {}
+        for tile in tiles:
+            unsettled = index.unsettled_range(tile, start_date, end_date)
+            if unsettled is not None:
+                tiles_by_start.setdefault(unsettled[0], []).append(tile)
+        
+        found = 0
+        for search_start, search_tiles in sorted(tiles_by_start.items()):
+            searched_at = datetime.now()
+            granules_by_tile: Dict[str, List[Tuple[datetime, str, str]]] = {tile: [] for tile in search_tiles}
+            for tile, date, filename, url in self.search(search_tiles, search_start, end_date):
+                granules_by_tile[tile].append((date, filename, url))
+            
+            for tile, granules in granules_by_tile.items():
+                index.add_search(tile, search_start, end_date, granules, searched_at)
+                found += len(granules)
+            self.logger.info(f"Discovered {sum(len(g) for g in granules_by_tile.values())} granules for "
+                             f"{len(search_tiles)} tiles from {search_start:%Y-%m-%d} to {end_date:%Y-%m-%d}")
+        return found
@@ -0,0 +1,187 @@
+#!/usr/bin/env python3
+"""
+Read-only file object over HTTP Range requests.
+
+Lets h5py open a remote granule without downloading it: h5py reads the HDF5
+superblock, object headers and chunk B-trees through small reads, then only the
+chunks that hold the requested pixels. Reads are served from fixed-size blocks,
+and runs of adjacent missing blocks are fetched with a single Range request, so
+the bytes transferred scale with the number of touched chunks rather than the
+file size.
+
+Example:
+    with HTTPRangeFile(url, session) as remote, h5py.File(remote, 'r') as f:
+        block = f[SNOW_COVER_DATASET][0:300, 0:300]
+"""
+
+import io
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import requests
+
+# Bytes fetched per block. HDF5 metadata reads are a few hundred bytes; compressed
+# chunks of a VNP10A1F granule are tens of kilobytes
+DEFAULT_BLOCK_SIZE = 64 * 1024
+
+# Concurrent Range requests of one prefetch()
+DEFAULT_PREFETCH_WORKERS = 8
+
+CONTENT_RANGE_PATTERN = re.compile(r'bytes (\d+)-(\d+)/(\d+|\*)')
+
+
+class RangeRequestsNotSupported(IOError):
+    """The server answered a Range request with the whole file."""
+
+
+class HTTPRangeFile(io.RawIOBase):
+    """Seekable, read-only file object backed by HTTP Range requests."""
+    
+    def __init__(self, url: str, session: Optional[requests.Session] = None,
+                 block_size: int = DEFAULT_BLOCK_SIZE, timeout: float = 60):
+        """
+        Open a remote file. Fetches the first block to learn the file size.
+        
+        Args:
+            url: URL of the file
+            session: Session to send requests with (authentication, connection reuse)
+            block_size: Bytes per cached block
+            timeout: Seconds to wait for each response
+        
+        Raises:
+            RangeRequestsNotSupported: If the server does not answer with 206 Partial Content
+            requests.HTTPError: If the server answers with an error status
+        """
+        super().__init__()
+        self.url = url
+        self.session = session or requests.Session()
+        self.block_size = block_size
+        self.timeout = timeout
+        self.size: Optional[int] = None
+        self.position = 0
+        self.bytes_fetched = 0
+        self.requests = 0
+        self._blocks: Dict[int, bytes] = {}
+        self._lock = threading.Lock()
+        
+        self._fetch_blocks(0, 0)
+    
+    def readable(self) -> bool:
+        return True
+    
+    def seekable(self) -> bool:
+        return True
+    
+    def tell(self) -> int:
+        return self.position
+    
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        if whence == io.SEEK_SET:
+            position = offset
+        elif whence == io.SEEK_CUR:
+            position = self.position + offset
+        elif whence == io.SEEK_END:
+            position = self.size + offset
+        else:
+            raise ValueError(f"Invalid whence: {whence}")
+        if position < 0:
+            raise ValueError(f"Negative seek position {position}")
+        self.position = position
+        return position
+    
+    def readinto(self, buffer) -> int:
+        length = max(0, min(len(buffer), self.size - self.position))
+        if length == 0:
+            return 0
+        
+        data = self._read(self.position, length)
+        buffer[:length] = data
+        self.position += length
+        return length
+    
+    def prefetch(self, byte_ranges: Iterable[Tuple[int, int]], max_workers: int = DEFAULT_PREFETCH_WORKERS):
+        """
+        Fetch the blocks of several byte ranges concurrently.
+        
+        h5py reads chunks one after another, so each chunk would cost a round trip;
+        prefetching the chunks a read will touch overlaps those round trips.
+        
+        Args:
+            byte_ranges: (offset, length) tuples
+            max_workers: Maximum number of concurrent requests
+        """
+        blocks = set()
+        for start, length in byte_ranges:
+            if length > 0:
+                blocks.update(range(start // self.block_size, (start + length - 1) // self.block_size + 1))
+        
+        runs = self._missing_runs(sorted(blocks))
+        if len(runs) == 1:
+            self._fetch_blocks(*runs[0])
+        elif runs:
+            with ThreadPoolExecutor(max_workers=min(max_workers, len(runs))) as executor:
+                for future in [executor.submit(self._fetch_blocks, *run) for run in runs]:
+                    future.result()
+    
+    def _missing_runs(self, blocks: List[int]) -> List[Tuple[int, int]]:
+        """Group sorted block numbers that are not cached into runs of consecutive blocks."""
+        runs = []
+        for block in blocks:
+            if block in self._blocks:
+                continue
+            if runs and runs[-1][1] == block - 1:
+                runs[-1] = (runs[-1][0], block)
+            else:
+                runs.append((block, block))
+        return runs
+    
+    def _read(self, start: int, length: int) -> bytes:
+        """Read length bytes at start from cached blocks, fetching missing ones."""
+        first_block = start // self.block_size
+        last_block = (start + length - 1) // self.block_size
+        
+        # Fetch runs of consecutive missing blocks with one request each
+        for run in self._missing_runs(list(range(first_block, last_block + 1))):
+            self._fetch_blocks(*run)
+        
+        data = b"".join(self._blocks[block] for block in range(first_block, last_block + 1))
+        offset = start - first_block * self.block_size
+        return data[offset:offset + length]
+    
+    def _fetch_blocks(self, first_block: int, last_block: int):
+        """Fetch blocks first_block..last_block (inclusive) with one Range request."""
+        range_start = first_block * self.block_size
+        range_end = (last_block + 1) * self.block_size - 1
+        if self.size is not None:
+            range_end = min(range_end, self.size - 1)
+        
+        response = self.session.get(self.url, headers={'Range': f'bytes={range_start}-{range_end}'},
+                                    timeout=self.timeout)
+        with self._lock:
+            self.requests += 1
+        if response.status_code == 200:
+            response.close()
+            raise RangeRequestsNotSupported(f"Server ignored the Range header for {self.url}")
+        response.raise_for_status()
+        
+        content_range = CONTENT_RANGE_PATTERN.match(response.headers.get('Content-Range', ''))
+        if response.status_code != 206 or content_range is None:
+            raise RangeRequestsNotSupported(
+                f"Unexpected response to a Range request for {self.url}: HTTP {response.status_code}"
+            )
+        if self.size is None:
+            if content_range.group(3) == '*':
+                raise RangeRequestsNotSupported(f"Server did not report the size of {self.url}")
+            self.size = int(content_range.group(3))
+        
+        data = response.content
+        if int(content_range.group(1)) != range_start:
+            raise IOError(f"Server returned bytes {content_range.group(0)} for a request starting at {range_start}")
+        
+        with self._lock:
+            self.bytes_fetched += len(data)
+            for block in range(first_block, last_block + 1):
+                offset = (block - first_block) * self.block_size
+                self._blocks[block] = data[offset:offset + self.block_size]
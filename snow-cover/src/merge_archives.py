@@ -0,0 +1,181 @@
+#!/usr/bin/env python3
+"""
+Merge snow cover archives fetched on several nodes into one.
+
+With --shard or --lease-job, every node fetches into its own archive. This script
+folds those archives into a target archive, pixel by pixel and week by week:
+
+- a week missing in the target is taken from the source
+- a week holding a pipeline error code (301, 400, 401) in the target is replaced by
+  a snow cover or flag value of the source
+- otherwise the target keeps its value
+
+Merging is idempotent, so node archives can be merged again after later runs.
+
+Example:
+    python merge_archives.py --archive-file cache/snow-cover-archive.db node-1.db node-2.db
+"""
+
+import argparse
+import logging
+import sys
+import time
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from archive_backends import ARCHIVE_BACKENDS, SnowCoverArchive, create_archive
+from constants import ERROR_OLD_MISSING, ERROR_RECENT_MISSING, ERROR_OTHER
+from snow_cover_sqlite_archive import PixelWeeklyData
+from utils import create_empty_year_data
+
+ERROR_CODES = frozenset({ERROR_OLD_MISSING, ERROR_RECENT_MISSING, ERROR_OTHER})
+
+
+def _is_missing(entry) -> bool:
+    return entry is None or entry[0] is None
+
+
+def merge_pixel_history(target: List[PixelWeeklyData], source: List[PixelWeeklyData]) -> int:
+    """
+    Merge the weeks of a source pixel history into a target history in place.
+    
+    Args:
+        target: History of the pixel in the target archive
+        source: History of the same pixel in a source archive
+    
+    Returns:
+        Number of weeks taken from the source
+    """
+    target_by_year = {year_data.year: year_data for year_data in target}
+    taken = 0
+    for source_year in source:
+        target_year = target_by_year.get(source_year.year)
+        for week, entry in enumerate(source_year.data):
+            if _is_missing(entry):
+                continue
+            if target_year is None:
+                target_year = target_by_year[source_year.year] = create_empty_year_data(source_year.year)
+                target.append(target_year)
+            while len(target_year.data) <= week:
+                target_year.data.append([None, 0])
+            
+            current = target_year.data[week]
+            if (_is_missing(current) or
+                    (current[0] in ERROR_CODES and entry[0] not in ERROR_CODES)):
+                target_year.data[week] = list(entry)
+                taken += 1
+    
+    target.sort(key=lambda year_data: year_data.year)
+    return taken
+
+
+def merge_archive(target: SnowCoverArchive, source: SnowCoverArchive,
+                  tile: Optional[str] = None) -> Dict[str, int]:
+    """
+    Merge a source archive into a target archive.
+    
+    Args:
+        target: Initialized archive to merge into
+        source: Initialized archive to merge from
+        tile: Only merge this tile (default: all tiles)
+    
+    Returns:
+        Dictionary with the number of source 'pixels', of 'updated_pixels' and of
+        weeks taken from the source ('weeks')
+    """
+    stats = {'pixels': 0, 'updated_pixels': 0, 'weeks': 0}
+    with target.batch():
+        for pixel_tile, pixel_row, pixel_col, source_data in source.iter_pixel_data(tile):
+            stats['pixels'] += 1
+            target_data = target.load_pixel_data(pixel_tile, pixel_row, pixel_col)
+            taken = merge_pixel_history(target_data, source_data)
+            if taken:
+                target.save_pixel_data(pixel_tile, pixel_row, pixel_col, target_data)
+                stats['updated_pixels'] += 1
+                stats['weeks'] += taken
+    return stats
+
+
+def setup_logging(verbose: bool = False):
+    """Setup logging configuration."""
+    level = logging.DEBUG if verbose else logging.INFO
+    
+    logging.basicConfig(
+        level=level,
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+        handlers=[logging.StreamHandler(sys.stdout)]
+    )
+
+
+def main():
+    """Main function with argument parsing."""
+    parser = argparse.ArgumentParser(
+        description='Merge snow cover archives fetched on several nodes into one archive'
+    )
+    
+    parser.add_argument(
+        'sources',
+        nargs='+',
+        help='Archives to merge from (SQLite files, or directories with --source-backend tiles)'
+    )
+    
+    parser.add_argument(
+        '--archive-file',
+        default='./cache/snow-cover-archive.db',
+        help='Archive to merge into, created if needed (default: ./cache/snow-cover-archive.db)'
+    )
+    
+    parser.add_argument(
+        '--archive-backend',
+        choices=ARCHIVE_BACKENDS,
+        default='sqlite',
+        help='Storage backend of the target archive (default: sqlite)'
+    )
+    
+    parser.add_argument(
+        '--source-backend',
+        choices=ARCHIVE_BACKENDS,
+        default='sqlite',
+        help='Storage backend of the source archives (default: sqlite)'
+    )
+    
+    parser.add_argument(
+        '--tile',
+        help='Only merge this tile (e.g. h18v04)'
+    )
+    
+    parser.add_argument(
+        '--verbose', '-v',
+        action='store_true',
+        help='Enable verbose logging'
+    )
+    
+    args = parser.parse_args()
+    
+    setup_logging(args.verbose)
+    logger = logging.getLogger(__name__)
+    
+    for source_path in args.sources:
+        if not Path(source_path).exists():
+            logger.error(f"Source archive not found: {source_path}")
+            sys.exit(1)
+    
+    target = create_archive(args.archive_backend, args.archive_file)
+    target.initialize()
+    try:
+        for source_path in args.sources:
+            started = time.perf_counter()
+            source = create_archive(args.source_backend, source_path, read_only=True)
+            source.initialize()
+            try:
+                stats = merge_archive(target, source, args.tile)
+            finally:
+                source.close()
+            logger.info(f"Merged {source_path}: {stats['weeks']:,} weeks into {stats['updated_pixels']:,} "
+                        f"of {stats['pixels']:,} pixels in {time.perf_counter() - started:.1f}s")
+    finally:
+        target.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,312 @@
+#!/usr/bin/env python3
+"""
+Per-stage timing and throughput metrics for the snow cover pipeline.
+
+Collects durations, item and byte counts per stage (extraction, listing,
+download, decode, archive writes) and queue depth samples, and writes them
+as a JSON summary or in the Prometheus text exposition format.
+"""
+
+import json
+import random
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Any, List
+
+# Maximum number of duration samples kept per stage for percentiles
+MAX_DURATION_SAMPLES = 10000
+
+# Maximum number of download concurrency adjustments kept in the timeline
+MAX_CONCURRENCY_SAMPLES = 1000
+
+
+class StageMetrics:
+    """Accumulated measurements for one pipeline stage."""
+    
+    def __init__(self, unit: str):
+        """
+        Initialize empty stage metrics.
+        
+        Args:
+            unit: Name of the items counted by this stage (e.g. 'features', 'granules')
+        """
+        self.unit = unit
+        self.count = 0
+        self.items = 0
+        self.bytes = 0
+        self.errors = 0
+        self.busy_seconds = 0.0
+        self.first_start = None
+        self.last_end = None
+        self.samples: List[float] = []
+        self._random = random.Random(0)
+    
+    def add(self, start: float, seconds: float, items: int, nbytes: int, error: bool):
+        """Add one measurement."""
+        self.count += 1
+        self.items += items
+        self.bytes += nbytes
+        self.errors += int(error)
+        self.busy_seconds += seconds
+        end = start + seconds
+        self.first_start = start if self.first_start is None else min(self.first_start, start)
+        self.last_end = end if self.last_end is None else max(self.last_end, end)
+        
+        # Reservoir sampling keeps percentiles representative for long runs
+        if len(self.samples) < MAX_DURATION_SAMPLES:
+            self.samples.append(seconds)
+        else:
+            index = self._random.randrange(self.count)
+            if index < MAX_DURATION_SAMPLES:
+                self.samples[index] = seconds
+    
+    def _percentile(self, sorted_samples: List[float], fraction: float) -> float:
+        if not sorted_samples:
+            return 0.0
+        return sorted_samples[min(len(sorted_samples) - 1, int(fraction * len(sorted_samples)))]
+    
+    def summary(self) -> Dict[str, Any]:
+        """
+        Summarize the stage.
+        
+        Rates are reported against wall-clock time (first start to last end),
+        which is the throughput seen by the run when the stage runs in parallel.
+        """
+        wall_seconds = (self.last_end - self.first_start) if self.count else 0.0
+        sorted_samples = sorted(self.samples)
+        summary = {
+            'unit': self.unit,
+            'count': self.count,
+            'items': self.items,
+            'errors': self.errors,
+            'busy_seconds': round(self.busy_seconds, 3),
+            'wall_seconds': round(wall_seconds, 3),
+            'items_per_second': round(self.items / wall_seconds, 3) if wall_seconds > 0 else 0.0,
+            'mean_ms': round(1000 * self.busy_seconds / self.count, 3) if self.count else 0.0,
+            'p50_ms': round(1000 * self._percentile(sorted_samples, 0.5), 3),
+            'p95_ms': round(1000 * self._percentile(sorted_samples, 0.95), 3),
+            'max_ms': round(1000 * sorted_samples[-1], 3) if sorted_samples else 0.0,
+        }
+        if self.count:
+            summary['started_at'] = round(self.first_start, 3)
+            summary['ended_at'] = round(self.last_end, 3)
+        if self.bytes:
+            summary['bytes'] = self.bytes
+            summary['bytes_per_second'] = round(self.bytes / wall_seconds, 1) if wall_seconds > 0 else 0.0
+        return summary
+
+
+class QueueMetrics:
+    """Depth samples for one queue."""
+    
+    def __init__(self):
+        self.samples = 0
+        self.total = 0
+        self.max = 0
+        self.last = 0
+    
+    def observe(self, depth: int):
+        """Record the current depth."""
+        self.samples += 1
+        self.total += depth
+        self.max = max(self.max, depth)
+        self.last = depth
+    
+    def summary(self) -> Dict[str, Any]:
+        """Summarize the queue depth samples."""
+        return {
+            'samples': self.samples,
+            'mean': round(self.total / self.samples, 3) if self.samples else 0.0,
+            'max': self.max,
+            'last': self.last,
+        }
+
+
+class PipelineMetrics:
+    """Thread-safe registry of stage and queue metrics for one run."""
+    
+    # Stage name -> unit of the counted items
+    STAGE_UNITS = {
+        'extraction': 'features',
+        'planning': 'pixels',
+        'discovery': 'granules',
+        'listing': 'requests',
+        'download': 'granules',
+        'decode': 'granules',
+        'archive_write': 'pixels',
+        'aggregation': 'features',
+    }
+    
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stages: Dict[str, StageMetrics] = {}
+        self._queues: Dict[str, QueueMetrics] = {}
+        self._counters: Dict[str, int] = {}
+        self._concurrency: List[Dict[str, Any]] = []
+        self.started_at = time.time()
+    
+    def reset(self):
+        """Start a new run, dropping all measurements; components keep their reference to the registry."""
+        with self._lock:
+            self._stages.clear()
+            self._queues.clear()
+            self._counters.clear()
+            self._concurrency.clear()
+            self.started_at = time.time()
+    
+    def record(self, stage: str, seconds: float, items: int = 1, nbytes: int = 0,
+               error: bool = False, start: float = None):
+        """
+        Record one measurement for a stage.
+        
+        Args:
+            stage: Stage name (e.g. 'download')
+            seconds: Duration of the measured work
+            items: Number of items processed
+            nbytes: Number of bytes transferred
+            error: Whether the work failed
+            start: Wall-clock start time (default: now - seconds)
+        """
+        if start is None:
+            start = time.time() - seconds
+        with self._lock:
+            metrics = self._stages.get(stage)
+            if metrics is None:
+                metrics = self._stages[stage] = StageMetrics(self.STAGE_UNITS.get(stage, 'items'))
+            metrics.add(start, seconds, items, nbytes, error)
+    
+    @contextmanager
+    def timed(self, stage: str, items: int = 1):
+        """
+        Time a block of work as one measurement of a stage.
+        
+        Yields a dict whose 'items', 'bytes' and 'error' entries can be updated
+        inside the block when they are only known at the end.
+        """
+        measurement = {'items': items, 'bytes': 0, 'error': False}
+        start = time.time()
+        started = time.perf_counter()
+        try:
+            yield measurement
+        except Exception:
+            measurement['error'] = True
+            raise
+        finally:
+            self.record(stage, time.perf_counter() - started, measurement['items'],
+                        measurement['bytes'], measurement['error'], start)
+    
+    def observe_queue(self, queue: str, depth: int):
+        """Record a queue depth sample."""
+        with self._lock:
+            metrics = self._queues.get(queue)
+            if metrics is None:
+                metrics = self._queues[queue] = QueueMetrics()
+            metrics.observe(depth)
+    
+    def increment(self, counter: str, amount: int = 1):
+        """Increment a plain counter."""
+        with self._lock:
+            self._counters[counter] = self._counters.get(counter, 0) + amount
+    
+    def record_concurrency(self, sample: Dict[str, Any]):
+        """Record one window of the download concurrency controller."""
+        with self._lock:
+            if len(self._concurrency) >= MAX_CONCURRENCY_SAMPLES:
+                # Keep the start of the run and every other later sample
+                del self._concurrency[MAX_CONCURRENCY_SAMPLES // 2::2]
+            self._concurrency.append(sample)
+    
+    def summary(self) -> Dict[str, Any]:
+        """
+        Build the run summary.
+        
+        Returns:
+            Dictionary with run timing, per-stage, per-queue and counter metrics, and
+            the download concurrency timeline when downloads ran
+        """
+        with self._lock:
+            summary = {
+                'started_at': self.started_at,
+                'duration_seconds': round(time.time() - self.started_at, 3),
+                'stages': {name: stage.summary() for name, stage in self._stages.items()},
+                'queues': {name: queue.summary() for name, queue in self._queues.items()},
+                'counters': dict(self._counters),
+            }
+            if self._concurrency:
+                levels = [sample['concurrency'] for sample in self._concurrency]
+                summary['concurrency'] = {
+                    'final': levels[-1],
+                    'min': min(levels),
+                    'max': max(levels),
+                    'timeline': list(self._concurrency),
+                }
+            return summary
+    
+    def write_json(self, path: str):
+        """Write the run summary as JSON."""
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        with open(path, 'w') as f:
+            json.dump(self.summary(), f, indent=2)
+    
+    def to_prometheus(self, prefix: str = "snow_cover") -> str:
+        """
+        Render the run summary in the Prometheus text exposition format.
+        
+        Suitable for the node_exporter textfile collector.
+        """
+        summary = self.summary()
+        lines = []
+        
+        def metric(name: str, metric_type: str, help_text: str, samples: List[tuple]):
+            if not samples:
+                return
+            lines.append(f"# HELP {prefix}_{name} {help_text}")
+            lines.append(f"# TYPE {prefix}_{name} {metric_type}")
+            for labels, value in samples:
+                label_text = ",".join(f'{key}="{val}"' for key, val in labels.items())
+                lines.append(f"{prefix}_{name}{{{label_text}}} {value}" if label_text else f"{prefix}_{name} {value}")
+        
+        stages = summary['stages']
+        metric("run_duration_seconds", "gauge", "Duration of the snow cover run.",
+               [({}, summary['duration_seconds'])])
+        metric("stage_operations_total", "counter", "Number of measured operations per stage.",
+               [({'stage': name}, stage['count']) for name, stage in stages.items()])
+        metric("stage_items_total", "counter", "Number of items processed per stage.",
+               [({'stage': name, 'unit': stage['unit']}, stage['items']) for name, stage in stages.items()])
+        metric("stage_errors_total", "counter", "Number of failed operations per stage.",
+               [({'stage': name}, stage['errors']) for name, stage in stages.items()])
+        metric("stage_busy_seconds_total", "counter", "Summed duration of operations per stage.",
+               [({'stage': name}, stage['busy_seconds']) for name, stage in stages.items()])
+        metric("stage_items_per_second", "gauge", "Wall-clock throughput per stage.",
+               [({'stage': name}, stage['items_per_second']) for name, stage in stages.items()])
+        metric("stage_duration_milliseconds", "gauge", "Operation duration percentiles per stage.",
+               [({'stage': name, 'quantile': quantile}, stage[key])
+                for name, stage in stages.items()
+                for quantile, key in (('0.5', 'p50_ms'), ('0.95', 'p95_ms'))])
+        metric("stage_bytes_total", "counter", "Bytes transferred per stage.",
+               [({'stage': name}, stage['bytes']) for name, stage in stages.items() if 'bytes' in stage])
+        metric("stage_bytes_per_second", "gauge", "Wall-clock transfer rate per stage.",
+               [({'stage': name}, stage['bytes_per_second']) for name, stage in stages.items() if 'bytes' in stage])
+        metric("queue_depth_mean", "gauge", "Mean sampled queue depth.",
+               [({'queue': name}, queue['mean']) for name, queue in summary['queues'].items()])
+        metric("queue_depth_max", "gauge", "Maximum sampled queue depth.",
+               [({'queue': name}, queue['max']) for name, queue in summary['queues'].items()])
+        if 'concurrency' in summary:
+            metric("download_concurrency", "gauge", "Download concurrency chosen at the end of the run.",
+                   [({}, summary['concurrency']['final'])])
+            metric("download_concurrency_max", "gauge", "Highest download concurrency during the run.",
+                   [({}, summary['concurrency']['max'])])
+        metric("events_total", "counter", "Pipeline event counters.",
+               [({'event': name}, value) for name, value in summary['counters'].items()])
+        
+        return "\n".join(lines) + "\n"
+    
+    def write_prometheus(self, path: str):
+        """Write the run summary in the Prometheus text exposition format."""
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        # Write atomically so a textfile collector never reads a partial file
+        temp_path = Path(f"{path}.tmp")
+        temp_path.write_text(self.to_prometheus())
+        temp_path.replace(path)
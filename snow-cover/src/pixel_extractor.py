@@ -5,27 +5,62 @@ VIIRS pixel coordinate extractor for geometric data.
 Extracts unique VIIRS pixel coordinates from GeoJSON geometries for snow cover analysis.
 """
 
+import hashlib
 import json
 import geopandas as gpd
 from shapely.geometry import Polygon, LineString
 from shapely.ops import transform
 import pyproj
-from typing import List, Dict, Set, Tuple, Any
+from typing import List, Dict, Set, Tuple, Any, Optional
 from pathlib import Path
+from dataclasses import dataclass, field
 
 from constants import (
     PIXEL_SIZE, TILE_SIZE_METERS, PIXELS_PER_TILE, SPHERE_RADIUS,
     GLOBAL_WIDTH, GLOBAL_HEIGHT
 )
+from metrics import PipelineMetrics
 from utils import validate_file_exists
 
 
+@dataclass
+class FeaturePixels:
+    """VIIRS pixels covered by a feature and the ski areas it belongs to."""
+    pixels: Set[Tuple[str, int, int]]  # (tile, pixel_row, pixel_col)
+    ski_areas: List[str] = field(default_factory=list)
+
+
+def get_unique_pixels(feature_pixels: Dict[str, FeaturePixels]) -> Set[Tuple[str, int, int]]:
+    """
+    Get the union of the pixels of all features.
+    
+    Args:
+        feature_pixels: Dictionary mapping feature IDs to their pixels
+    
+    Returns:
+        Set of unique pixel coordinates as (tile, pixel_row, pixel_col) tuples
+    """
+    unique_pixels = set()
+    for feature in feature_pixels.values():
+        unique_pixels.update(feature.pixels)
+    return unique_pixels
+
+
 class VIIRSPixelExtractor:
     """Extract VIIRS pixel coordinates from geometric features."""
     
-    def __init__(self):
-        """Initialize the pixel extractor with coordinate transformations."""
+    def __init__(self, metrics: Optional[PipelineMetrics] = None):
+        """
+        Initialize the pixel extractor with coordinate transformations.
+        
+        Args:
+            metrics: Metrics registry for extraction timings
+        """
         self.transformer = self._setup_coordinate_transforms()
+        self.metrics = metrics if metrics is not None else PipelineMetrics()
+        # Geometry digest -> pixels of the features of the last extracted file, so an
+        # extractor that is kept around only computes pixels of new or changed features
+        self._pixel_memo: Dict[bytes, Set[Tuple[str, int, int]]] = {}
     
     def _setup_coordinate_transforms(self):
         """Set up coordinate transformation from WGS84 to Sinusoidal projection."""
@@ -167,47 +202,103 @@ class VIIRSPixelExtractor:
         
         return pixel_coords
     
-    def extract_unique_pixels_from_geojson(self, geojson_path: str) -> Set[Tuple[str, int, int]]:
+    def extract_feature_pixels_from_geojson(self, geojson_path: str) -> Dict[str, FeaturePixels]:
         """
-        Extract unique VIIRS pixel coordinates from a GeoJSON file.
+        Extract the VIIRS pixels of each feature in a GeoJSON file.
+        
+        Pixels of geometries that were already in the previously extracted file are
+        reused.
         
         Args:
             geojson_path: Path to the GeoJSON file
         
         Returns:
-            Set of unique pixel coordinates as (tile, pixel_row, pixel_col) tuples
+            Dictionary mapping feature IDs to their pixels and ski area IDs
         """
-        # Read the GeoJSON file
-        gdf = gpd.read_file(geojson_path)
-        
-        unique_pixels = set()
-        
-        for idx, row in gdf.iterrows():
-            feature_id = row.get('id', f'feature_{idx}')
-            feature_name = row.get('name', f'Unnamed Feature {idx}')
-            geometry = row.geometry
-            
-            print(f"Processing feature: {feature_name} (ID: {feature_id})")
+        with self.metrics.timed('extraction') as measurement:
+            # Read the GeoJSON file
+            gdf = gpd.read_file(geojson_path)
+            measurement['items'] = len(gdf)
             
-            # Handle different geometry types
-            all_pixel_coords = []
+            feature_pixels = {}
+            pixel_memo = {}
+            memo_hits = 0
             
-            if geometry.geom_type in ['Polygon', 'LineString']:
-                pixel_coords = self.get_geometry_pixel_coordinates(geometry)
-                all_pixel_coords.extend(pixel_coords)
-            elif geometry.geom_type in ['MultiPolygon', 'MultiLineString']:
-                for sub_geometry in geometry.geoms:
-                    pixel_coords = self.get_geometry_pixel_coordinates(sub_geometry)
+            for idx, row in gdf.iterrows():
+                feature_id = row.get('id', f'feature_{idx}')
+                feature_name = row.get('name', f'Unnamed Feature {idx}')
+                geometry = row.geometry
+                ski_areas = self._ski_area_ids(row.get('skiAreas'))
+                
+                geometry_key = hashlib.blake2b(geometry.wkb, digest_size=16).digest()
+                pixels = self._pixel_memo.get(geometry_key)
+                if pixels is not None:
+                    memo_hits += 1
+                    pixel_memo[geometry_key] = pixels
+                    feature_pixels[feature_id] = FeaturePixels(pixels=set(pixels), ski_areas=ski_areas)
+                    continue
+                
+                print(f"Processing feature: {feature_name} (ID: {feature_id})")
+                
+                # Handle different geometry types
+                all_pixel_coords = []
+                
+                if geometry.geom_type in ['Polygon', 'LineString']:
+                    pixel_coords = self.get_geometry_pixel_coordinates(geometry)
                     all_pixel_coords.extend(pixel_coords)
-            else:
-                print(f"  Warning: Skipping unsupported geometry type: {geometry.geom_type}")
-                continue
-            
-            # Add pixels to unique set
-            for pixel in all_pixel_coords:
-                unique_pixels.add((pixel['tile'], pixel['pixel_row'], pixel['pixel_col']))
+                elif geometry.geom_type in ['MultiPolygon', 'MultiLineString']:
+                    for sub_geometry in geometry.geoms:
+                        pixel_coords = self.get_geometry_pixel_coordinates(sub_geometry)
+                        all_pixel_coords.extend(pixel_coords)
+                else:
+                    print(f"  Warning: Skipping unsupported geometry type: {geometry.geom_type}")
+                    continue
+                
+                pixels = {(pixel['tile'], pixel['pixel_row'], pixel['pixel_col']) for pixel in all_pixel_coords}
+                pixel_memo[geometry_key] = pixels
+                feature_pixels[feature_id] = FeaturePixels(pixels=set(pixels), ski_areas=ski_areas)
+                
+                print(f"  Found {len(all_pixel_coords)} VIIRS pixels")
             
-            print(f"  Found {len(all_pixel_coords)} VIIRS pixels")
+            self._pixel_memo = pixel_memo
+            if memo_hits:
+                self.metrics.increment('pixel_memo_hits', memo_hits)
+        
+        return feature_pixels
+    
+    @staticmethod
+    def _ski_area_ids(ski_areas) -> List[str]:
+        """Get the IDs of the ski areas a run belongs to from its skiAreas property."""
+        if isinstance(ski_areas, str):
+            # Nested properties may be read as JSON text depending on the GDAL driver
+            try:
+                ski_areas = json.loads(ski_areas)
+            except ValueError:
+                return []
+        if not isinstance(ski_areas, list):
+            return []
+        
+        ski_area_ids = []
+        for ski_area in ski_areas:
+            # Ski areas are either embedded features or plain IDs
+            if isinstance(ski_area, dict):
+                ski_area = (ski_area.get('properties') or {}).get('id')
+            if isinstance(ski_area, str):
+                ski_area_ids.append(ski_area)
+        return ski_area_ids
+    
+    def extract_unique_pixels_from_geojson(self, geojson_path: str) -> Set[Tuple[str, int, int]]:
+        """
+        Extract unique VIIRS pixel coordinates from a GeoJSON file.
+        
+        Args:
+            geojson_path: Path to the GeoJSON file
+        
+        Returns:
+            Set of unique pixel coordinates as (tile, pixel_row, pixel_col) tuples
+        """
+        feature_pixels = self.extract_feature_pixels_from_geojson(geojson_path)
+        unique_pixels = get_unique_pixels(feature_pixels)
         
         print(f"\nTotal unique pixels across all features: {len(unique_pixels)}")
         
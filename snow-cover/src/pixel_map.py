@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+"""
+Feature ID to VIIRS pixel mapping shared with the Node pipeline.
+
+The pixels of every run are extracted here before fetching, and the Node
+pipeline needs the same pixels again when it clusters runs into ski areas and
+computes their snow cover. Instead of rasterizing the geometries a second time
+in src/utils/VIIRSPixelExtractor.ts, it loads them from the SQLite file written
+by write_pixel_map():
+
+    feature_pixels(feature_id TEXT PRIMARY KEY, pixel_count INTEGER, pixels BLOB)
+
+pixels holds pixel_count sorted little-endian uint16 quadruples
+[h_tile, v_tile, pixel_col, pixel_row], the VIIRSPixel layout of the Node side
+(8 bytes per pixel).
+"""
+
+import logging
+import re
+import sqlite3
+import struct
+from pathlib import Path
+from typing import TYPE_CHECKING, Dict, Iterable, Set, Tuple
+
+if TYPE_CHECKING:
+    from pixel_extractor import FeaturePixels
+
+TILE_PATTERN = re.compile(r'^h(\d{2})v(\d{2})$')
+
+
+def encode_pixels(pixels: Iterable[Tuple[str, int, int]]) -> bytes:
+    """
+    Encode (tile, pixel_row, pixel_col) tuples as sorted uint16 quadruples.
+    
+    Args:
+        pixels: Pixels with tiles named like 'h18v04'
+    
+    Returns:
+        Little-endian [h_tile, v_tile, pixel_col, pixel_row] values, 8 bytes per pixel
+    """
+    values = []
+    for tile, pixel_row, pixel_col in pixels:
+        match = TILE_PATTERN.match(tile)
+        if match is None:
+            raise ValueError(f"Invalid tile name: {tile}")
+        values.append((int(match.group(1)), int(match.group(2)), pixel_col, pixel_row))
+    values.sort()
+    return struct.pack(f'<{4 * len(values)}H', *(value for pixel in values for value in pixel))
+
+
+def decode_pixels(data: bytes) -> Set[Tuple[str, int, int]]:
+    """
+    Decode pixels encoded by encode_pixels().
+    
+    Args:
+        data: Encoded pixels
+    
+    Returns:
+        Set of (tile, pixel_row, pixel_col) tuples
+    """
+    values = struct.unpack(f'<{len(data) // 2}H', data)
+    return {
+        (f"h{values[i]:02d}v{values[i + 1]:02d}", values[i + 3], values[i + 2])
+        for i in range(0, len(values), 4)
+    }
+
+
+def write_pixel_map(pixel_map_file: str, feature_pixels: Dict[str, "FeaturePixels"]) -> int:
+    """
+    Write the pixels of each feature to a SQLite table, replacing any previous contents.
+    
+    Args:
+        pixel_map_file: Path of the SQLite database file
+        feature_pixels: Pixels of each feature by feature ID
+    
+    Returns:
+        Number of features written
+    """
+    Path(pixel_map_file).parent.mkdir(parents=True, exist_ok=True)
+    
+    conn = sqlite3.connect(pixel_map_file)
+    try:
+        conn.execute("DROP TABLE IF EXISTS feature_pixels")
+        conn.execute("""
+            CREATE TABLE feature_pixels (
+                feature_id TEXT PRIMARY KEY,
+                pixel_count INTEGER NOT NULL,
+                pixels BLOB NOT NULL
+            ) WITHOUT ROWID
+        """)
+        cursor = conn.executemany(
+            "INSERT OR REPLACE INTO feature_pixels (feature_id, pixel_count, pixels) VALUES (?, ?, ?)",
+            ((str(feature_id), len(feature.pixels), encode_pixels(feature.pixels))
+             for feature_id, feature in feature_pixels.items())
+        )
+        conn.commit()
+        row_count = cursor.rowcount
+    finally:
+        conn.close()
+    
+    logging.getLogger(__name__).info(f"Wrote the pixels of {row_count} features to {pixel_map_file}")
+    return row_count
+
+
+def read_pixel_map(pixel_map_file: str) -> Dict[str, Set[Tuple[str, int, int]]]:
+    """
+    Read the pixels of all features from a file written by write_pixel_map().
+    
+    Args:
+        pixel_map_file: Path of the SQLite database file
+    
+    Returns:
+        Dictionary mapping feature IDs to sets of (tile, pixel_row, pixel_col) tuples
+    """
+    conn = sqlite3.connect(f"file:{pixel_map_file}?mode=ro", uri=True)
+    try:
+        return {feature_id: decode_pixels(pixels)
+                for feature_id, pixels in conn.execute("SELECT feature_id, pixels FROM feature_pixels")}
+    finally:
+        conn.close()
@@ -10,35 +10,111 @@ import json
 import time
 import logging
 import asyncio
-from typing import Optional, Any, Dict
+import threading
+from typing import Optional, Any, Dict, Iterable, Tuple, Union
 import asyncpg
 
+try:
+    import orjson
+except ImportError:  # Optional, the json module is used instead
+    orjson = None
+
+# Batches of at least this many entries are written with COPY instead of executemany
+COPY_THRESHOLD = 1000
+
+# Maximum number of expired entries removed per DELETE statement during cleanup
+CLEANUP_CHUNK_SIZE = 5000
+
+# Statements run with the connection methods, which prepare them once per pooled
+# connection through asyncpg's statement cache
+GET_SQL = "SELECT value FROM cache WHERE cache_type = $1 AND key = $2 AND timestamp >= $3"
+GET_MANY_SQL = """SELECT key, value FROM cache
+                  WHERE cache_type = $1 AND key = ANY($2::text[]) AND timestamp >= $3"""
+SET_SQL = """INSERT INTO cache (key, cache_type, value, timestamp) 
+             VALUES ($1, $2, $3, $4) 
+             ON CONFLICT (cache_type, key) 
+             DO UPDATE SET value = EXCLUDED.value, timestamp = EXCLUDED.timestamp"""
+DELETE_SQL = "DELETE FROM cache WHERE cache_type = $1 AND key = $2"
+
+DEFAULT_DB_CONFIG = {
+    'host': 'localhost',
+    'port': 5432,
+    'database': 'openskidata_cache',
+    'user': 'postgres',
+    # No password required for local trust authentication
+}
+
+# Version byte prefixing the binary jsonb wire format
+JSONB_FORMAT_VERSION = b'\x01'
+
+
+def encode_jsonb(value: Any) -> bytes:
+    """Encode a value in the binary jsonb wire format (orjson when available)."""
+    if orjson is not None:
+        try:
+            return JSONB_FORMAT_VERSION + orjson.dumps(value)
+        except TypeError:
+            # Types orjson does not serialize, fall through to the json module
+            pass
+    return JSONB_FORMAT_VERSION + json.dumps(value, separators=(',', ':')).encode()
+
+
+def decode_jsonb(data: bytes) -> Any:
+    """Decode a value from the binary jsonb wire format."""
+    if data[:1] != JSONB_FORMAT_VERSION:
+        raise ValueError(f"Unsupported jsonb format version {data[:1]!r}")
+    payload = memoryview(data)[1:]
+    return orjson.loads(payload) if orjson is not None else json.loads(bytes(payload))
+
+
+async def ensure_database(db_config: Dict[str, Any]):
+    """Create the database of db_config if it does not exist yet."""
+    # Connect to postgres database to create cache database if needed
+    admin_config = {**db_config, 'database': 'postgres'}
+    
+    conn = await asyncpg.connect(**admin_config)
+    try:
+        # Check if cache database exists
+        database = db_config['database']
+        result = await conn.fetchval(
+            "SELECT 1 FROM pg_database WHERE datname = $1",
+            database
+        )
+        
+        if not result:
+            # Create cache database
+            await conn.execute(f'CREATE DATABASE "{database}"')
+            logging.getLogger(__name__).info(f"Created persistent cache database: {database}")
+    finally:
+        await conn.close()
+
 
 class PostgresCache:
     """PostgreSQL-based cache with TTL support for snow cover data."""
     
-    def __init__(self, cache_type: str, ttl_ms: int = 0):
+    def __init__(self, cache_type: str, ttl_ms: int = 0, db_config: Optional[Dict[str, Any]] = None,
+                 pool_size: int = 5):
         """
         Initialize the PostgreSQL cache.
         
         Args:
             cache_type: Cache type for namespacing (e.g., 'snow_cover')
             ttl_ms: Time-to-live in milliseconds (0 means no expiration)
+            db_config: Overrides for the asyncpg connection settings (host, port, database, user, ...)
+            pool_size: Maximum number of pooled connections
         """
         self.cache_type = cache_type
         self.ttl_ms = ttl_ms
+        self.pool_size = pool_size
         self.logger = logging.getLogger(__name__)
         self._pool = None
         self._initialized = False
+        self._cleanup_task = None
         
         # Database configuration
-        self.db_config = {
-            'host': 'localhost',
-            'port': 5432,
-            'database': 'openskidata_cache',
-            'user': 'postgres',
-            # No password required for local trust authentication
-        }
+        self.db_config = dict(DEFAULT_DB_CONFIG)
+        if db_config:
+            self.db_config.update(db_config)
     
     async def initialize(self):
         """Initialize the cache database and create tables."""
@@ -48,7 +124,8 @@ class PostgresCache:
         # Create connection pool to cache database
         self._pool = await asyncpg.create_pool(
             min_size=1,
-            max_size=5,
+            max_size=self.pool_size,
+            init=self._init_connection,
             **self.db_config
         )
         
@@ -58,25 +135,15 @@ class PostgresCache:
         self._initialized = True
         self.logger.debug(f"PostgreSQL cache initialized for type: {self.cache_type}")
     
+    async def _init_connection(self, conn: asyncpg.Connection):
+        """Send and receive JSONB values in binary format as Python objects."""
+        await conn.set_type_codec(
+            'jsonb', schema='pg_catalog', encoder=encode_jsonb, decoder=decode_jsonb, format='binary'
+        )
+    
     async def _ensure_cache_database(self):
         """Ensure the cache database exists."""
-        # Connect to postgres database to create cache database if needed
-        admin_config = {**self.db_config, 'database': 'postgres'}
-        
-        conn = await asyncpg.connect(**admin_config)
-        try:
-            # Check if cache database exists
-            result = await conn.fetchval(
-                "SELECT 1 FROM pg_database WHERE datname = $1",
-                'openskidata_cache'
-            )
-            
-            if not result:
-                # Create cache database
-                await conn.execute(f'CREATE DATABASE "openskidata_cache"')
-                self.logger.info("Created persistent cache database: openskidata_cache")
-        finally:
-            await conn.close()
+        await ensure_database(self.db_config)
     
     async def _create_cache_table(self):
         """Create cache table and indexes."""
@@ -103,49 +170,50 @@ class PostgresCache:
         if not self._initialized or not self._pool:
             raise RuntimeError("Cache not initialized")
     
+    def _expiry_cutoff(self) -> int:
+        """Oldest timestamp (ms) that is still valid, or 0 when entries never expire."""
+        if self.ttl_ms <= 0:
+            return 0
+        return int(time.time() * 1000) - self.ttl_ms
+    
     async def get(self, key: str) -> Optional[Any]:
         """
         Get a value from the cache.
         
+        Expired entries are filtered out in SQL and left for cleanup(), so reads
+        never write or wait on row locks.
+        
         Args:
             key: Cache key
-            
+        
         Returns:
             Cached value or None if not found/expired
         """
         self._ensure_initialized()
         
         async with self._pool.acquire() as conn:
-            result = await conn.fetchrow(
-                "SELECT value, timestamp FROM cache WHERE cache_type = $1 AND key = $2",
-                self.cache_type, key
-            )
-            
-            if not result:
-                return None
-            
-            value, timestamp = result
-            
-            # Check if entry has expired
-            current_time_ms = int(time.time() * 1000)
-            if self.ttl_ms > 0 and current_time_ms - timestamp > self.ttl_ms:
-                # Delete expired entry
-                await conn.execute(
-                    "DELETE FROM cache WHERE cache_type = $1 AND key = $2",
-                    self.cache_type, key
-                )
-                return None
-            
-            try:
-                return value  # asyncpg automatically handles JSONB conversion
-            except Exception as e:
-                self.logger.warning(f"Failed to parse cached value for key {key}: {e}")
-                # Delete corrupted entry
-                await conn.execute(
-                    "DELETE FROM cache WHERE cache_type = $1 AND key = $2",
-                    self.cache_type, key
-                )
-                return None
+            return await conn.fetchval(GET_SQL, self.cache_type, key, self._expiry_cutoff())
+    
+    async def get_many(self, keys: Iterable[str]) -> Dict[str, Any]:
+        """
+        Get several values from the cache in a single query.
+        
+        Args:
+            keys: Cache keys
+        
+        Returns:
+            Dictionary mapping found keys to cached values (missing/expired keys are omitted)
+        """
+        self._ensure_initialized()
+        
+        keys = list(keys)
+        if not keys:
+            return {}
+        
+        async with self._pool.acquire() as conn:
+            rows = await conn.fetch(GET_MANY_SQL, self.cache_type, keys, self._expiry_cutoff())
+        
+        return {row['key']: row['value'] for row in rows}
     
     async def set(self, key: str, value: Any) -> None:
         """
@@ -160,13 +228,54 @@ class PostgresCache:
         timestamp = int(time.time() * 1000)
         
         async with self._pool.acquire() as conn:
-            await conn.execute(
-                """INSERT INTO cache (key, cache_type, value, timestamp) 
-                   VALUES ($1, $2, $3, $4) 
-                   ON CONFLICT (cache_type, key) 
-                   DO UPDATE SET value = EXCLUDED.value, timestamp = EXCLUDED.timestamp""",
-                key, self.cache_type, json.dumps(value), timestamp
-            )
+            await conn.execute(SET_SQL, key, self.cache_type, value, timestamp)
+    
+    async def set_many(self, items: Union[Dict[str, Any], Iterable[Tuple[str, Any]]]) -> None:
+        """
+        Set several values in the cache in one transaction.
+        
+        Small batches are sent as one pipelined executemany. Batches of COPY_THRESHOLD
+        entries or more are copied into a temporary table with binary COPY and
+        upserted from there with a single statement.
+        
+        Args:
+            items: Dictionary or (key, value) pairs; later duplicates of a key win
+        """
+        self._ensure_initialized()
+        
+        # Deduplicate keys, an upsert cannot touch the same row twice
+        items = dict(items)
+        if not items:
+            return
+        
+        timestamp = int(time.time() * 1000)
+        
+        async with self._pool.acquire() as conn:
+            async with conn.transaction():
+                if len(items) < COPY_THRESHOLD:
+                    await conn.executemany(
+                        SET_SQL, [(key, self.cache_type, value, timestamp) for key, value in items.items()]
+                    )
+                    return
+                
+                await conn.execute("""
+                    CREATE TEMP TABLE IF NOT EXISTS cache_upload (
+                        key TEXT NOT NULL,
+                        value JSONB NOT NULL,
+                        timestamp BIGINT NOT NULL
+                    ) ON COMMIT DELETE ROWS
+                """)
+                await conn.copy_records_to_table(
+                    'cache_upload', columns=['key', 'value', 'timestamp'],
+                    records=((key, value, timestamp) for key, value in items.items())
+                )
+                await conn.execute(
+                    """INSERT INTO cache (key, cache_type, value, timestamp)
+                       SELECT key, $1, value, timestamp FROM cache_upload
+                       ON CONFLICT (cache_type, key)
+                       DO UPDATE SET value = EXCLUDED.value, timestamp = EXCLUDED.timestamp""",
+                    self.cache_type
+                )
     
     async def delete(self, key: str) -> None:
         """
@@ -178,31 +287,48 @@ class PostgresCache:
         self._ensure_initialized()
         
         async with self._pool.acquire() as conn:
-            await conn.execute(
-                "DELETE FROM cache WHERE cache_type = $1 AND key = $2",
-                self.cache_type, key
-            )
+            await conn.execute(DELETE_SQL, self.cache_type, key)
     
-    async def cleanup(self) -> int:
+    async def cleanup(self, chunk_size: int = CLEANUP_CHUNK_SIZE) -> int:
         """
         Remove expired entries from the cache.
         
+        Deletes in chunks of at most chunk_size rows, each found through the
+        (cache_type, timestamp) index and committed on its own, so row locks are
+        held briefly and concurrent writers are never blocked for long.
+        
+        Args:
+            chunk_size: Maximum number of rows deleted per statement
+        
         Returns:
             Number of entries removed
         """
         if not self._initialized or self.ttl_ms <= 0:
             return 0
         
-        cutoff_time = int(time.time() * 1000) - self.ttl_ms
+        cutoff_time = self._expiry_cutoff()
+        deleted_count = 0
         
-        async with self._pool.acquire() as conn:
-            result = await conn.execute(
-                "DELETE FROM cache WHERE cache_type = $1 AND timestamp < $2",
-                self.cache_type, cutoff_time
-            )
+        while True:
+            async with self._pool.acquire() as conn:
+                # The outer timestamp predicate is rechecked on rows refreshed concurrently
+                result = await conn.execute(
+                    """DELETE FROM cache
+                       WHERE cache_type = $1 AND timestamp < $2 AND key IN (
+                           SELECT key FROM cache
+                           WHERE cache_type = $1 AND timestamp < $2
+                           LIMIT $3
+                       )""",
+                    self.cache_type, cutoff_time, chunk_size
+                )
             # Extract number of deleted rows from result
-            deleted_count = int(result.split()[-1]) if result.startswith('DELETE') else 0
-            return deleted_count
+            deleted = int(result.split()[-1]) if result.startswith('DELETE') else 0
+            deleted_count += deleted
+            if deleted < chunk_size:
+                return deleted_count
+            
+            # Let other tasks use the pool between chunks
+            await asyncio.sleep(0)
     
     async def clear(self) -> None:
         """Clear all entries from the cache for this cache type."""
@@ -232,6 +358,7 @@ class PostgresCache:
     
     async def close(self) -> None:
         """Close the cache connection pool."""
+        await self.stop_background_cleanup()
         if self._pool:
             await self._pool.close()
             self._pool = None
@@ -244,67 +371,140 @@ class PostgresCache:
             deleted = await self.cleanup()
             if deleted > 0:
                 self.logger.info(f"Cleaned up {deleted} expired cache entries from {self.cache_type} cache")
+    
+    def start_background_cleanup(self, interval_s: float = 3600) -> None:
+        """
+        Run periodic_cleanup() every interval_s seconds in a background task.
+        
+        Must be called from the event loop that uses the cache.
+        
+        Args:
+            interval_s: Seconds between cleanups
+        """
+        if self._cleanup_task is not None or self.ttl_ms <= 0:
+            return
+        
+        async def cleanup_loop():
+            while True:
+                try:
+                    await self.periodic_cleanup()
+                except asyncio.CancelledError:
+                    raise
+                except Exception as e:
+                    self.logger.warning(f"Background cleanup of {self.cache_type} cache failed: {e}")
+                await asyncio.sleep(interval_s)
+        
+        self._cleanup_task = asyncio.get_running_loop().create_task(cleanup_loop())
+    
+    async def stop_background_cleanup(self) -> None:
+        """Stop the background cleanup task, if running."""
+        if self._cleanup_task is None:
+            return
+        
+        self._cleanup_task.cancel()
+        try:
+            await self._cleanup_task
+        except asyncio.CancelledError:
+            pass
+        self._cleanup_task = None
 
 
 # Synchronous wrapper for use in non-async contexts
 class PostgresCacheSync:
-    """Synchronous wrapper around PostgresCache for compatibility with existing sync code."""
-    
-    def __init__(self, cache_type: str, ttl_ms: int = 0):
-        self._cache = PostgresCache(cache_type, ttl_ms)
-        self._loop = None
-    
-    def _get_loop(self):
-        """Get or create event loop for sync operations."""
-        if self._loop is None or self._loop.is_closed():
-            try:
-                self._loop = asyncio.get_event_loop()
-            except RuntimeError:
-                self._loop = asyncio.new_event_loop()
-                asyncio.set_event_loop(self._loop)
-        return self._loop
+    """
+    Synchronous wrapper around PostgresCache for compatibility with existing sync code.
+    
+    Runs one event loop in a dedicated thread for the lifetime of the wrapper and
+    submits every call to it with run_coroutine_threadsafe. Calls are thread-safe:
+    concurrent calls from worker threads run concurrently on the loop, each on its
+    own pooled connection (which keeps asyncpg's prepared statement cache), instead
+    of being serialized behind run_until_complete.
+    """
+    
+    def __init__(self, cache_type: str, ttl_ms: int = 0, db_config: Optional[Dict[str, Any]] = None,
+                 pool_size: int = 5):
+        """
+        Initialize the wrapper and start its event loop thread.
+        
+        Args:
+            cache_type: Cache type for namespacing (e.g., 'snow_cover')
+            ttl_ms: Time-to-live in milliseconds (0 means no expiration)
+            db_config: Overrides for the asyncpg connection settings
+            pool_size: Maximum number of pooled connections, i.e. concurrent calls
+        """
+        self._cache = PostgresCache(cache_type, ttl_ms, db_config, pool_size)
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(
+            target=self._run_loop, name=f"postgres-cache-{cache_type}", daemon=True
+        )
+        self._thread.start()
+    
+    def _run_loop(self):
+        """Run the event loop until close() stops it."""
+        asyncio.set_event_loop(self._loop)
+        self._loop.run_forever()
+    
+    def _run(self, coroutine):
+        """Run a coroutine on the cache's event loop and wait for its result."""
+        if self._loop.is_closed():
+            coroutine.close()
+            raise RuntimeError("Cache closed")
+        return asyncio.run_coroutine_threadsafe(coroutine, self._loop).result()
     
     def initialize(self):
         """Initialize the cache (sync version)."""
-        loop = self._get_loop()
-        return loop.run_until_complete(self._cache.initialize())
+        return self._run(self._cache.initialize())
     
     def get(self, key: str) -> Optional[Any]:
         """Get a value from the cache (sync version)."""
-        loop = self._get_loop()
-        return loop.run_until_complete(self._cache.get(key))
+        return self._run(self._cache.get(key))
+    
+    def get_many(self, keys: Iterable[str]) -> Dict[str, Any]:
+        """Get several values in one query (sync version)."""
+        return self._run(self._cache.get_many(keys))
     
     def set(self, key: str, value: Any) -> None:
         """Set a value in the cache (sync version)."""
-        loop = self._get_loop()
-        return loop.run_until_complete(self._cache.set(key, value))
+        return self._run(self._cache.set(key, value))
+    
+    def set_many(self, items: Union[Dict[str, Any], Iterable[Tuple[str, Any]]]) -> None:
+        """Set several values in one transaction (sync version)."""
+        return self._run(self._cache.set_many(items))
     
     def delete(self, key: str) -> None:
         """Delete a value from the cache (sync version)."""
-        loop = self._get_loop()
-        return loop.run_until_complete(self._cache.delete(key))
+        return self._run(self._cache.delete(key))
     
-    def cleanup(self) -> int:
+    def cleanup(self, chunk_size: int = CLEANUP_CHUNK_SIZE) -> int:
         """Remove expired entries (sync version)."""
-        loop = self._get_loop()
-        return loop.run_until_complete(self._cache.cleanup())
+        return self._run(self._cache.cleanup(chunk_size))
     
     def clear(self) -> None:
         """Clear all entries (sync version)."""
-        loop = self._get_loop()
-        return loop.run_until_complete(self._cache.clear())
+        return self._run(self._cache.clear())
     
     def size(self) -> int:
         """Get cache size (sync version)."""
-        loop = self._get_loop()
-        return loop.run_until_complete(self._cache.size())
-    
-    def close(self) -> None:
-        """Close the cache (sync version)."""
-        loop = self._get_loop()
-        return loop.run_until_complete(self._cache.close())
+        return self._run(self._cache.size())
     
     def periodic_cleanup(self) -> None:
         """Run periodic cleanup (sync version)."""
-        loop = self._get_loop()
-        return loop.run_until_complete(self._cache.periodic_cleanup())
\ No newline at end of file
+        return self._run(self._cache.periodic_cleanup())
+    
+    def start_background_cleanup(self, interval_s: float = 3600) -> None:
+        """Run periodic cleanup every interval_s seconds on the cache's event loop."""
+        async def start():
+            self._cache.start_background_cleanup(interval_s)
+        
+        return self._run(start())
+    
+    def close(self) -> None:
+        """Close the cache and stop the event loop thread."""
+        if self._loop.is_closed():
+            return
+        try:
+            self._run(self._cache.close())
+        finally:
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._thread.join()
+            self._loop.close()
@@ -0,0 +1,244 @@
+#!/usr/bin/env python3
+"""
+Per-stage profiling for the snow cover processor.
+
+Wraps pipeline stages (extraction, planning, fetching, archive writes) in cProfile
+and/or a sampling profiler, records peak memory per stage, and dumps per-stage
+profiles plus a flame-graph compatible collapsed-stack file.
+
+Output files:
+    <stage>.prof            cProfile statistics (snakeviz, pstats)
+    <stage>.txt             Top functions by cumulative time
+    stacks.collapsed        Sampled stacks of all threads ("frame;frame;frame count"),
+                            for flamegraph.pl, speedscope or inferno
+    profile_summary.json    Wall time, sample count and memory peaks per stage
+"""
+
+import cProfile
+import io
+import json
+import logging
+import os
+import pstats
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Any, Optional
+
+try:
+    import resource
+except ImportError:  # Not available on Windows
+    resource = None
+
+PROFILER_MODES = ('cprofile', 'sampling')
+
+# Default interval between stack samples in seconds
+DEFAULT_SAMPLE_INTERVAL = 0.005
+
+
+def max_rss_bytes() -> Optional[int]:
+    """Peak resident set size of this process so far, in bytes."""
+    if resource is None:
+        return None
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and kilobytes elsewhere
+    return max_rss if sys.platform == 'darwin' else max_rss * 1024
+
+
+class StackSampler:
+    """Background thread sampling the stacks of all other threads."""
+    
+    def __init__(self, interval: float = DEFAULT_SAMPLE_INTERVAL):
+        """
+        Initialize the sampler.
+        
+        Args:
+            interval: Seconds between samples
+        """
+        self.interval = interval
+        self.stacks: Counter = Counter()
+        self.stage: Optional[str] = None
+        self._stop = threading.Event()
+        self._thread = None
+    
+    def start(self):
+        """Start sampling in a daemon thread."""
+        self._thread = threading.Thread(target=self._run, name="stack-sampler", daemon=True)
+        self._thread.start()
+    
+    def stop(self):
+        """Stop sampling and wait for the sampling thread to exit."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+    
+    def _run(self):
+        own_ident = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            stage = self.stage
+            if stage is None:
+                continue
+            
+            thread_names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                if ident == own_ident:
+                    continue
+                self.stacks[self._collapse(stage, thread_names.get(ident, str(ident)), frame)] += 1
+    
+    @staticmethod
+    def _collapse(stage: str, thread_name: str, frame) -> str:
+        """Render a frame and its callers as a root-first collapsed stack."""
+        frames = []
+        while frame is not None:
+            code = frame.f_code
+            frames.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+            frame = frame.f_back
+        frames.append(thread_name)
+        frames.append(stage)
+        # Semicolons separate frames in the collapsed format
+        return ";".join(name.replace(";", ":") for name in reversed(frames))
+    
+    def samples_for_stage(self, stage: str) -> int:
+        """Number of thread samples taken during a stage."""
+        prefix = f"{stage};"
+        return sum(count for stack, count in self.stacks.items() if stack.startswith(prefix))
+
+
+class StageProfiler:
+    """Profile named pipeline stages and dump the results to a directory."""
+    
+    def __init__(self, mode: str = 'cprofile', sample_interval: float = DEFAULT_SAMPLE_INTERVAL):
+        """
+        Initialize the profiler.
+        
+        Args:
+            mode: 'cprofile' profiles every call on the stage's thread with cProfile in
+                addition to sampling all threads; 'sampling' only samples stacks, which has
+                much lower overhead
+            sample_interval: Seconds between stack samples
+        """
+        if mode not in PROFILER_MODES:
+            raise ValueError(f"Unknown profiler mode {mode!r}, expected one of {PROFILER_MODES}")
+        
+        self.mode = mode
+        self.logger = logging.getLogger(__name__)
+        self.sampler = StackSampler(sample_interval)
+        self.profiles: Dict[str, cProfile.Profile] = {}
+        self.stages: Dict[str, Dict[str, Any]] = {}
+        self._active_stage = None
+        self._started_tracemalloc = False
+    
+    def start(self):
+        """Start memory tracing and stack sampling."""
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._started_tracemalloc = True
+        self.sampler.start()
+    
+    def stop(self):
+        """Stop stack sampling and memory tracing."""
+        self.sampler.stop()
+        if self._started_tracemalloc:
+            tracemalloc.stop()
+            self._started_tracemalloc = False
+    
+    def __enter__(self):
+        self.start()
+        return self
+    
+    def __exit__(self, *exc_info):
+        self.stop()
+    
+    @contextmanager
+    def stage(self, name: str):
+        """
+        Profile a block of work as part of a stage.
+        
+        A stage can be entered several times (e.g. once per tile); its measurements
+        accumulate. Stages cannot be nested.
+        
+        Args:
+            name: Stage name (e.g. 'planning')
+        """
+        if self._active_stage is not None:
+            raise RuntimeError(f"Cannot start stage {name!r} inside stage {self._active_stage!r}")
+        
+        stats = self.stages.setdefault(name, {
+            'calls': 0, 'wall_seconds': 0.0, 'python_peak_bytes': 0, 'max_rss_bytes': None,
+        })
+        profile = None
+        if self.mode == 'cprofile':
+            profile = self.profiles.setdefault(name, cProfile.Profile())
+        
+        self._active_stage = name
+        self.sampler.stage = name
+        if tracemalloc.is_tracing():
+            tracemalloc.reset_peak()
+        started = time.perf_counter()
+        if profile is not None:
+            profile.enable()
+        
+        try:
+            yield
+        finally:
+            if profile is not None:
+                profile.disable()
+            stats['calls'] += 1
+            stats['wall_seconds'] += time.perf_counter() - started
+            if tracemalloc.is_tracing():
+                stats['python_peak_bytes'] = max(stats['python_peak_bytes'], tracemalloc.get_traced_memory()[1])
+            stats['max_rss_bytes'] = max_rss_bytes()
+            self.sampler.stage = None
+            self._active_stage = None
+    
+    def summary(self) -> Dict[str, Any]:
+        """
+        Summarize all stages.
+        
+        Returns:
+            Dictionary with the profiler mode and per-stage wall time, sample count,
+            peak Python allocation (tracemalloc) and process peak RSS after the stage
+        """
+        stages = {}
+        for name, stats in self.stages.items():
+            stages[name] = {
+                **stats,
+                'wall_seconds': round(stats['wall_seconds'], 3),
+                'samples': self.sampler.samples_for_stage(name),
+            }
+        return {'mode': self.mode, 'sample_interval': self.sampler.interval, 'stages': stages}
+    
+    def write(self, output_dir: str) -> Path:
+        """
+        Write per-stage profiles, collapsed stacks and the summary.
+        
+        Args:
+            output_dir: Directory to write to (created if needed)
+        
+        Returns:
+            Path of the output directory
+        """
+        output_path = Path(output_dir)
+        output_path.mkdir(parents=True, exist_ok=True)
+        
+        for name, profile in self.profiles.items():
+            profile.dump_stats(str(output_path / f"{name}.prof"))
+            
+            report = io.StringIO()
+            pstats.Stats(profile, stream=report).sort_stats('cumulative').print_stats(40)
+            (output_path / f"{name}.txt").write_text(report.getvalue())
+        
+        with open(output_path / "stacks.collapsed", 'w') as f:
+            for stack, count in sorted(self.sampler.stacks.items()):
+                f.write(f"{stack} {count}\n")
+        
+        with open(output_path / "profile_summary.json", 'w') as f:
+            json.dump(self.summary(), f, indent=2)
+        
+        self.logger.info(f"Wrote profiles for {len(self.stages)} stages to {output_path}")
+        return output_path
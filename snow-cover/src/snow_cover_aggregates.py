@@ -0,0 +1,291 @@
+#!/usr/bin/env python3
+"""
+Per-run and per-ski-area snow cover histories computed from the archive.
+
+Mirrors getSnowCoverHistory() in src/utils/snowCoverHistory.ts: years with an
+unfetched or malformed week are dropped as a whole, as readPixelCacheData() does,
+and pixels left without years do not count as valid. Weekly values are shifted
+back by their cloud persistence to the day they were observed, deduplicated per
+pixel (keeping the observation with the least cloud persistence) and averaged
+across pixels per day. Histories have the openskidata-format SnowCoverHistory
+shape:
+
+    [{"year": 2024, "days": [[day_of_year, snow_cover, valid_pixel_percentage], ...]}, ...]
+
+and are written to a SQLite table keyed by feature ID that the Node side loads in
+one query when exporting runs.
+"""
+
+import json
+import logging
+import numbers
+import sqlite3
+from collections import OrderedDict
+from pathlib import Path
+from typing import TYPE_CHECKING, Dict, Iterator, List, Optional, Set, Tuple
+
+import numpy as np
+
+from archive_backends import SnowCoverArchive
+from snow_cover_sqlite_archive import PixelWeeklyData
+
+if TYPE_CHECKING:
+    from pixel_extractor import FeaturePixels
+
+AGGREGATE_KIND_RUN = 'run'
+AGGREGATE_KIND_SKI_AREA = 'ski_area'
+
+# Pixel observations kept in memory while aggregating; runs of the same ski area
+# share most of their pixels
+DEFAULT_PIXEL_CACHE_SIZE = 50_000
+
+# Same validity limits as weekToDayAndYear() and isValidSnowCover()
+MAX_WEEKS = 53
+MAX_CLOUD_PERSISTENCE = 365
+MIN_YEAR, MAX_YEAR = 1900, 2100
+
+_EPOCH_YEAR = 1970
+
+
+def _is_number(value) -> bool:
+    """Whether a week entry field is a number, like typeof value === "number"."""
+    return isinstance(value, numbers.Real) and not isinstance(value, bool)
+
+
+def complete_years(pixel_data: List[PixelWeeklyData]) -> List[PixelWeeklyData]:
+    """
+    Keep the years of a pixel whose weeks all hold a value and a cloud persistence.
+    
+    Same filter as readPixelCacheData(): a year with any unfetched week ([None, 0])
+    or malformed entry is dropped as a whole, so partial years, including the
+    current one, contribute no observations.
+    
+    Args:
+        pixel_data: Archived history of one pixel
+    
+    Returns:
+        Years within MIN_YEAR..MAX_YEAR whose weeks are all numeric pairs
+    """
+    return [
+        year_data for year_data in pixel_data
+        if MIN_YEAR <= year_data.year <= MAX_YEAR and all(
+            isinstance(week, (list, tuple)) and len(week) >= 2 and _is_number(week[0]) and _is_number(week[1])
+            for week in year_data.data
+        )
+    ]
+
+
+def pixel_daily_observations(pixel_data: List[PixelWeeklyData]) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Convert a pixel's weekly values to daily observations.
+    
+    Week w of a year (0-indexed) was observed on January 1st + 7 * w days minus the
+    cloud persistence in days. Invalid values (error codes, flags, missing weeks)
+    are dropped, and when several weeks map to the same day the one with the least
+    cloud persistence is kept (the first one on ties).
+    
+    Args:
+        pixel_data: Archived history of one pixel
+    
+    Returns:
+        (days, values) arrays: days since 1970-01-01 (sorted, unique) and snow cover (0-100)
+    """
+    entries, day_offsets = [], []
+    for year_data in pixel_data:
+        weeks = year_data.data[:MAX_WEEKS]
+        year_start = np.datetime64(f"{year_data.year:04d}-01-01", 'D').astype(np.int64)
+        entries.extend(weeks)
+        day_offsets.append(year_start + 7 * np.arange(len(weeks)))
+    
+    if not entries:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=float)
+    
+    # None (never fetched) becomes NaN and fails the validity check below
+    try:
+        week_values = np.array(entries, dtype=float)
+    except (ValueError, TypeError):
+        week_values = None
+    if week_values is None or week_values.shape != (len(entries), 2):
+        week_values = np.array(
+            [entry[:2] if isinstance(entry, (list, tuple)) and len(entry) >= 2 else (None, None)
+             for entry in entries],
+            dtype=float
+        )
+    
+    value, persistence = week_values[:, 0], week_values[:, 1]
+    valid = ((value >= 0) & (value <= 100) &
+             (persistence >= 0) & (persistence <= MAX_CLOUD_PERSISTENCE))
+    days = np.concatenate(day_offsets)[valid] - persistence[valid].astype(np.int64)
+    values, persistence = value[valid], persistence[valid]
+    
+    # Sort by day, then persistence, then original order and keep the first of each day
+    order = np.lexsort((np.arange(len(days)), persistence, days))
+    days, values = days[order], values[order]
+    first = np.ones(len(days), dtype=bool)
+    first[1:] = days[1:] != days[:-1]
+    return days[first], values[first]
+
+
+def aggregate_observations(observations: List[Tuple[np.ndarray, np.ndarray]],
+                           valid_pixel_count: int) -> List[Dict]:
+    """
+    Average daily observations of several pixels into a snow cover history.
+    
+    Args:
+        observations: (days, values) arrays per pixel from pixel_daily_observations()
+        valid_pixel_count: Number of pixels with a complete archived year, the denominator of the
+            valid pixel percentage
+    
+    Returns:
+        SnowCoverHistory: list of {'year', 'days': [[day_of_year, snow_cover, valid_percentage]]}
+    """
+    observations = [(days, values) for days, values in observations if len(days) > 0]
+    if not observations or valid_pixel_count == 0:
+        return []
+    
+    days = np.concatenate([days for days, _ in observations])
+    values = np.concatenate([values for _, values in observations])
+    
+    # Histories span a few thousand days, so counting per day offset is cheaper than sorting
+    first_day = days.min()
+    counts = np.bincount(days - first_day)
+    sums = np.bincount(days - first_day, weights=values)
+    observed = np.flatnonzero(counts)
+    unique_days, counts, sums = observed + first_day, counts[observed], sums[observed]
+    
+    # Math.round() semantics: round half up
+    average = np.floor(sums / counts + 0.5).astype(np.int64)
+    valid_percentage = np.floor(counts / valid_pixel_count * 100 + 0.5).astype(np.int64)
+    
+    dates = unique_days.astype('datetime64[D]')
+    year_starts = dates.astype('datetime64[Y]')
+    years = year_starts.astype(np.int64) + _EPOCH_YEAR
+    day_of_year = (dates - year_starts.astype('datetime64[D]')).astype(np.int64) + 1
+    
+    history = []
+    # unique_days is sorted, so years are sorted and days within a year are sorted
+    year_values, year_first = np.unique(years, return_index=True)
+    year_bounds = list(year_first) + [len(years)]
+    for i, year in enumerate(year_values):
+        if not MIN_YEAR <= year <= MAX_YEAR:
+            continue
+        start, end = year_bounds[i], year_bounds[i + 1]
+        history.append({
+            'year': int(year),
+            'days': np.stack(
+                [day_of_year[start:end], average[start:end], valid_percentage[start:end]], axis=1
+            ).tolist(),
+        })
+    return history
+
+
+class SnowCoverAggregator:
+    """Compute snow cover histories of pixel groups from the archive."""
+    
+    def __init__(self, archive: SnowCoverArchive, pixel_cache_size: int = DEFAULT_PIXEL_CACHE_SIZE):
+        """
+        Initialize the aggregator.
+        
+        Args:
+            archive: Initialized archive to read pixel histories from
+            pixel_cache_size: Number of pixels whose daily observations are kept in memory
+        """
+        self.archive = archive
+        self.pixel_cache_size = pixel_cache_size
+        self._observations: "OrderedDict[Tuple[str, int, int], Optional[Tuple[np.ndarray, np.ndarray]]]" = OrderedDict()
+    
+    def _pixel_observations(self, pixel: Tuple[str, int, int]) -> Optional[Tuple[np.ndarray, np.ndarray]]:
+        """Daily observations of a pixel, or None if it has no complete archived year."""
+        if pixel in self._observations:
+            self._observations.move_to_end(pixel)
+            return self._observations[pixel]
+        
+        pixel_data = complete_years(self.archive.load_pixel_data(*pixel) or [])
+        observations = pixel_daily_observations(pixel_data) if pixel_data else None
+        
+        self._observations[pixel] = observations
+        if len(self._observations) > self.pixel_cache_size:
+            self._observations.popitem(last=False)
+        return observations
+    
+    def history_for_pixels(self, pixels: Set[Tuple[str, int, int]]) -> List[Dict]:
+        """
+        Compute the snow cover history of a group of pixels.
+        
+        Args:
+            pixels: (tile, pixel_row, pixel_col) tuples
+        
+        Returns:
+            SnowCoverHistory averaged over the pixels of the group with a complete
+            archived year, which are also the denominator of the valid pixel percentage
+        """
+        observations = [self._pixel_observations(pixel) for pixel in sorted(pixels)]
+        observations = [pixel_observations for pixel_observations in observations if pixel_observations is not None]
+        return aggregate_observations(observations, len(observations))
+    
+    def aggregate_features(self, feature_pixels: Dict[str, "FeaturePixels"]) -> Iterator[Tuple[str, str, int, List[Dict]]]:
+        """
+        Compute histories for each run and each ski area its runs belong to.
+        
+        A ski area's history is computed over the union of the pixels of its runs.
+        
+        Args:
+            feature_pixels: Dictionary mapping run IDs to their pixels and ski areas
+        
+        Yields:
+            (kind, feature_id, pixel_count, history) tuples
+        """
+        ski_area_pixels: Dict[str, Set[Tuple[str, int, int]]] = {}
+        
+        # Visit runs in pixel order so that neighbouring runs reuse cached pixels
+        for feature_id, feature in sorted(feature_pixels.items(), key=lambda item: min(item[1].pixels, default=())):
+            for ski_area_id in feature.ski_areas:
+                ski_area_pixels.setdefault(ski_area_id, set()).update(feature.pixels)
+            if feature.pixels:
+                yield AGGREGATE_KIND_RUN, feature_id, len(feature.pixels), self.history_for_pixels(feature.pixels)
+        
+        for ski_area_id, pixels in ski_area_pixels.items():
+            yield AGGREGATE_KIND_SKI_AREA, ski_area_id, len(pixels), self.history_for_pixels(pixels)
+
+
+def write_aggregates(aggregates_file: str, aggregates: Iterator[Tuple[str, str, int, List[Dict]]]) -> int:
+    """
+    Write snow cover histories to a SQLite table, replacing any previous contents.
+    
+    Table snow_cover_aggregates(kind, feature_id, pixel_count, history), where kind is
+    'run' or 'ski_area' and history is the SnowCoverHistory as compact JSON. Rows
+    with an empty history are skipped.
+    
+    Args:
+        aggregates_file: Path of the SQLite database file
+        aggregates: (kind, feature_id, pixel_count, history) tuples
+    
+    Returns:
+        Number of rows written
+    """
+    Path(aggregates_file).parent.mkdir(parents=True, exist_ok=True)
+    
+    conn = sqlite3.connect(aggregates_file)
+    try:
+        conn.execute("DROP TABLE IF EXISTS snow_cover_aggregates")
+        conn.execute("""
+            CREATE TABLE snow_cover_aggregates (
+                kind TEXT NOT NULL,
+                feature_id TEXT NOT NULL,
+                pixel_count INTEGER NOT NULL,
+                history TEXT NOT NULL,
+                PRIMARY KEY (kind, feature_id)
+            ) WITHOUT ROWID
+        """)
+        cursor = conn.executemany(
+            "INSERT OR REPLACE INTO snow_cover_aggregates (kind, feature_id, pixel_count, history) VALUES (?, ?, ?, ?)",
+            ((kind, feature_id, pixel_count, json.dumps(history, separators=(',', ':')))
+             for kind, feature_id, pixel_count, history in aggregates if history)
+        )
+        conn.commit()
+        row_count = cursor.rowcount
+    finally:
+        conn.close()
+    
+    logging.getLogger(__name__).info(f"Wrote {row_count} snow cover aggregates to {aggregates_file}")
+    return row_count
@@ -4,16 +4,23 @@ SQLite-based archive for VIIRS snow cover data.
 
 Provides cross-language compatibility with the Node.js processing pipeline.
 Historical satellite data is stored permanently (no TTL).
+
+The database is in WAL mode, so other processes can read the archive with
+read_only=True while the fetcher writes to it.
 """
 
 import logging
+from contextlib import contextmanager
 from datetime import datetime, timedelta
-from typing import List, Dict, Tuple, Optional
+from typing import List, Dict, Tuple, Optional, Iterator
 from dataclasses import dataclass, asdict
 
-from sqlite_cache import SQLiteCacheSync
+from sqlite_cache import DEFAULT_WRITE_BATCH_SIZE, SQLiteCacheSync
 from utils import calculate_week_index, create_empty_year_data
 
+# (pixel_row, pixel_col) -> [(date, value, cloud_persistence), ...]
+PixelUpdates = Dict[Tuple[int, int], List[Tuple[datetime, int, int]]]
+
 
 @dataclass
 class PixelWeeklyData:
@@ -28,14 +35,19 @@ class SnowCoverSQLiteArchive:
     # No TTL: Historical satellite data never changes
     ARCHIVE_TTL_MS = 0  # Infinite - this is an archive, not a cache
     
-    def __init__(self, archive_file: str = "./cache/snow-cover-archive.db"):
+    def __init__(self, archive_file: str = "./cache/snow-cover-archive.db", read_only: bool = False,
+                 write_batch_size: int = DEFAULT_WRITE_BATCH_SIZE):
         """
         Initialize the snow cover SQLite archive.
         
         Args:
             archive_file: Path to the SQLite database file
+            read_only: Open an existing archive for reading only, e.g. while a fetch
+                is writing to it
+            write_batch_size: Pixels written per transaction inside batch()
         """
-        self.archive = SQLiteCacheSync(archive_file, self.ARCHIVE_TTL_MS)
+        self.archive = SQLiteCacheSync(archive_file, self.ARCHIVE_TTL_MS, read_only=read_only,
+                                       write_batch_size=write_batch_size)
         self.logger = logging.getLogger(__name__)
         self._initialized = False
     
@@ -45,6 +57,20 @@ class SnowCoverSQLiteArchive:
         self._initialized = True
         self.logger.debug("Snow cover SQLite archive initialized")
     
+    @contextmanager
+    def batch(self):
+        """
+        Commit pixel writes inside the block in transactions of write_batch_size pixels.
+        
+        Use around loops of save_pixel_data() calls; writes become visible to other
+        connections when a transaction commits.
+        """
+        if not self._initialized:
+            raise RuntimeError("Archive not initialized")
+        
+        with self.archive.batch():
+            yield self
+    
     def _create_pixel_key(self, tile: str, pixel_row: int, pixel_col: int) -> str:
         """
         Create an archive key for a specific pixel.
@@ -96,7 +122,8 @@ class SnowCoverSQLiteArchive:
         except Exception as e:
             self.logger.error(f"Error parsing archived pixel data for {tile}:{pixel_row},{pixel_col}: {e}")
             # Delete corrupted entry
-            self.archive.delete(archive_key)
+            if not self.archive.read_only:
+                self.archive.delete(archive_key)
             return []
     
     def save_pixel_data(self, tile: str, pixel_row: int, pixel_col: int, 
@@ -122,6 +149,88 @@ class SnowCoverSQLiteArchive:
         
         self.archive.set(archive_key, serializable_data)
     
+    def update_pixel_weeks(self, tile: str, pixel_updates: PixelUpdates) -> Dict[str, int]:
+        """
+        Write fetched weekly values for many pixels of a tile.
+        
+        Args:
+            tile: Tile identifier
+            pixel_updates: New (date, value, cloud_persistence) entries per pixel
+        
+        Returns:
+            Dictionary with the number of updated weeks ('updated_pixels') and of pixels
+            that could not be updated ('errors')
+        """
+        stats = {'updated_pixels': 0, 'errors': 0}
+        
+        with self.batch():
+            self._apply_pixel_updates(tile, pixel_updates, stats)
+        
+        return stats
+    
+    def _apply_pixel_updates(self, tile: str, pixel_updates: PixelUpdates, stats: Dict[str, int]):
+        """Load, update and save each pixel of pixel_updates, counting into stats."""
+        for (pixel_row, pixel_col), updates in pixel_updates.items():
+            try:
+                # Load existing data once
+                pixel_data = self.load_pixel_data(tile, pixel_row, pixel_col)
+                data_by_year = {year_data.year: year_data for year_data in pixel_data}
+                
+                # Apply all updates for this pixel
+                for date, value, cloud_persistence in updates:
+                    year_data = data_by_year.get(date.year)
+                    if year_data is None:
+                        # Create new year data with 53 weeks
+                        year_data = data_by_year[date.year] = create_empty_year_data(date.year)
+                        pixel_data.append(year_data)
+                    
+                    week_index = calculate_week_index(date, date.year)
+                    
+                    # Ensure we have enough weeks in the data array
+                    while len(year_data.data) <= week_index:
+                        year_data.data.append([None, 0])
+                    
+                    year_data.data[week_index] = [value, cloud_persistence]
+                    stats['updated_pixels'] += 1
+                
+                # Save updated data once per pixel
+                self.save_pixel_data(tile, pixel_row, pixel_col, pixel_data)
+            
+            except Exception as e:
+                self.logger.error(f"Error updating cache for pixel {tile}:{pixel_row},{pixel_col}: {e}")
+                stats['errors'] += 1
+    
+    def iter_pixel_data(self, tile: Optional[str] = None,
+                        batch_size: int = 1000) -> Iterator[Tuple[str, int, int, List[PixelWeeklyData]]]:
+        """
+        Stream all archived pixels, grouped by tile.
+        
+        Pixels are read from the archive in pages, so the whole archive is never held
+        in memory. All pixels of a tile are yielded consecutively.
+        
+        Args:
+            tile: Only yield pixels of this tile (default: all tiles)
+            batch_size: Number of pixels read from the archive per query
+        
+        Yields:
+            (tile, pixel_row, pixel_col, pixel_data) tuples, pixel_data sorted by year
+        """
+        if not self._initialized:
+            raise RuntimeError("Archive not initialized")
+        
+        prefix = f"snow_cover:{tile}:" if tile else "snow_cover:"
+        for key, archived_data in self.archive.iter_items(prefix, batch_size):
+            try:
+                _, pixel_tile, pixel_row, pixel_col = key.split(':')
+                pixel_data = [PixelWeeklyData(year=year_data['year'], data=year_data['data'])
+                              for year_data in archived_data]
+            except (ValueError, TypeError, KeyError) as e:
+                self.logger.warning(f"Skipping malformed archive entry {key}: {e}")
+                continue
+            
+            pixel_data.sort(key=lambda x: x.year)
+            yield pixel_tile, int(pixel_row), int(pixel_col), pixel_data
+    
     def get_missing_weeks_for_pixel(self, tile: str, pixel_row: int, pixel_col: int,
                                    start_date: datetime, end_date: datetime) -> List[Tuple[datetime, int]]:
         """
@@ -173,6 +282,26 @@ class SnowCoverSQLiteArchive:
         
         return missing_weeks
     
+    def get_missing_weeks_for_pixels(self, tile: str, pixels: List[Tuple[int, int]],
+                                     start_date: datetime,
+                                     end_date: datetime) -> Dict[Tuple[int, int], List[Tuple[datetime, int]]]:
+        """
+        Get the missing weeks of many pixels of a tile within the specified date range.
+        
+        Args:
+            tile: Tile identifier
+            pixels: List of (pixel_row, pixel_col) tuples
+            start_date: Start date for analysis
+            end_date: End date for analysis
+        
+        Returns:
+            Dictionary mapping each pixel to its list of (date, week_index) tuples for missing weeks
+        """
+        return {
+            (pixel_row, pixel_col): self.get_missing_weeks_for_pixel(tile, pixel_row, pixel_col, start_date, end_date)
+            for pixel_row, pixel_col in pixels
+        }
+    
     def discover_existing_pixels(self) -> Dict[str, List[Tuple[int, int]]]:
         """
         Discover all existing cached pixels by scanning cache keys.
@@ -0,0 +1,393 @@
+#!/usr/bin/env python3
+"""
+Memory-mapped tile cube archive for VIIRS snow cover data.
+
+Alternative to SnowCoverSQLiteArchive with the same interface. Instead of one
+key-value row per pixel, each tile is a directory of NumPy arrays:
+
+    <archive_dir>/<tile>/pixels.npy    (pixel_count, 2) int16 pixel rows and columns;
+                                       a pixel's position is its index in the cubes
+    <archive_dir>/<tile>/<year>.npy    (capacity, 53) cube of (value int16, persistence uint8)
+
+Year cubes are opened as memory maps, so missing-week planning and bulk updates are
+array slicing over the pixels of a tile, and reads do not copy the whole cube. Weeks
+that were never fetched have the value MISSING_VALUE.
+"""
+
+import logging
+import os
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+from snow_cover_sqlite_archive import PixelUpdates, PixelWeeklyData
+from utils import calculate_week_index, generate_weekly_dates
+
+WEEKS_PER_YEAR = 53
+MISSING_VALUE = -1
+
+WEEK_DTYPE = np.dtype([('value', '<i2'), ('persistence', 'u1')])
+
+# Pixel slots allocated in a new year cube; cubes grow by doubling
+INITIAL_CAPACITY = 1024
+
+
+class _TileCubes:
+    """Pixel index and memory-mapped year cubes of one tile."""
+    
+    def __init__(self, tile_dir: Path, initial_capacity: int):
+        self.tile_dir = tile_dir
+        self.pixels_path = tile_dir / "pixels.npy"
+        
+        pixels = np.load(self.pixels_path) if self.pixels_path.exists() else np.empty((0, 2), dtype=np.int16)
+        self.pixel_list: List[Tuple[int, int]] = [tuple(pixel) for pixel in pixels.tolist()]
+        self.index: Dict[Tuple[int, int], int] = {pixel: i for i, pixel in enumerate(self.pixel_list)}
+        self._index_dirty = False
+        
+        self.cubes: Dict[int, np.memmap] = {}
+        for cube_path in tile_dir.glob("*.npy"):
+            if cube_path.stem.isdigit():
+                self.cubes[int(cube_path.stem)] = np.lib.format.open_memmap(cube_path, mode='r+')
+        
+        # Pixel slots of the year cubes
+        self.capacity = max([len(cube) for cube in self.cubes.values()] + [initial_capacity])
+    
+    def lookup(self, pixels: List[Tuple[int, int]]) -> np.ndarray:
+        """Cube indices of pixels, -1 for pixels that are not archived."""
+        return np.array([self.index.get(pixel, -1) for pixel in pixels], dtype=np.int64)
+    
+    def add(self, pixels: List[Tuple[int, int]]) -> np.ndarray:
+        """Cube indices of pixels, allocating slots for pixels that are not archived yet."""
+        first_new = len(self.pixel_list)
+        for pixel in pixels:
+            if pixel not in self.index:
+                self.index[pixel] = len(self.pixel_list)
+                self.pixel_list.append(pixel)
+                self._index_dirty = True
+        
+        if len(self.pixel_list) > self.capacity:
+            while self.capacity < len(self.pixel_list):
+                self.capacity *= 2
+            for year in list(self.cubes):
+                self.cubes[year] = self._create_cube(year, self.capacity, self.cubes[year])
+        
+        # Slots past the last written index may hold writes of a run that did not flush
+        for cube in self.cubes.values():
+            cube[first_new:len(self.pixel_list)] = (MISSING_VALUE, 0)
+        
+        return self.lookup(pixels)
+    
+    def cube(self, year: int) -> np.memmap:
+        """Year cube, created (all weeks missing) if it does not exist."""
+        if year not in self.cubes:
+            self.cubes[year] = self._create_cube(year, self.capacity)
+        return self.cubes[year]
+    
+    def _create_cube(self, year: int, capacity: int, old_cube: Optional[np.memmap] = None) -> np.memmap:
+        """Write a year cube with the given capacity, copying an existing cube into it."""
+        self.tile_dir.mkdir(parents=True, exist_ok=True)
+        path = self.tile_dir / f"{year}.npy"
+        tmp_path = self.tile_dir / f"{year}.npy.tmp"
+        
+        cube = np.lib.format.open_memmap(tmp_path, mode='w+', dtype=WEEK_DTYPE, shape=(capacity, WEEKS_PER_YEAR))
+        cube['value'] = MISSING_VALUE
+        cube['persistence'] = 0
+        if old_cube is not None:
+            cube[:len(old_cube)] = old_cube
+            old_cube.flush()
+            del old_cube
+        cube.flush()
+        del cube
+        
+        os.replace(tmp_path, path)
+        return np.lib.format.open_memmap(path, mode='r+')
+    
+    def flush(self):
+        """Flush the cubes and write the pixel index if it changed."""
+        for cube in self.cubes.values():
+            cube.flush()
+        
+        if self._index_dirty:
+            self.tile_dir.mkdir(parents=True, exist_ok=True)
+            tmp_path = self.tile_dir / "pixels.tmp.npy"
+            np.save(tmp_path, np.array(self.pixel_list, dtype=np.int16).reshape(-1, 2))
+            os.replace(tmp_path, self.pixels_path)
+            self._index_dirty = False
+
+
+class SnowCoverTileArchive:
+    """Memory-mapped tile cube archive for VIIRS snow cover data."""
+    
+    def __init__(self, archive_dir: str = "./cache/snow-cover-tiles", initial_capacity: int = INITIAL_CAPACITY):
+        """
+        Initialize the tile archive.
+        
+        Args:
+            archive_dir: Directory holding one subdirectory per tile
+            initial_capacity: Pixel slots allocated in a new year cube
+        """
+        self.archive_dir = Path(archive_dir)
+        self.initial_capacity = initial_capacity
+        self.logger = logging.getLogger(__name__)
+        self._tiles: Dict[str, _TileCubes] = {}
+        self._initialized = False
+    
+    def initialize(self):
+        """Initialize the archive directory."""
+        self.archive_dir.mkdir(parents=True, exist_ok=True)
+        self._initialized = True
+        self.logger.debug(f"Snow cover tile archive initialized: {self.archive_dir}")
+    
+    @contextmanager
+    def batch(self):
+        """
+        Flush the pixel indices of all open tiles once when the block exits.
+        
+        Cube writes go straight to the memory maps; only new pixels need the index
+        written, which save_pixel_data() otherwise defers until close().
+        """
+        if not self._initialized:
+            raise RuntimeError("Archive not initialized")
+        
+        try:
+            yield self
+        finally:
+            for cubes in self._tiles.values():
+                cubes.flush()
+    
+    def _tile(self, tile: str) -> _TileCubes:
+        """Open (and cache) the cubes of a tile."""
+        if not self._initialized:
+            raise RuntimeError("Archive not initialized")
+        
+        if tile not in self._tiles:
+            self._tiles[tile] = _TileCubes(self.archive_dir / tile, self.initial_capacity)
+        return self._tiles[tile]
+    
+    def _tile_names(self) -> List[str]:
+        """Tiles with an archive directory, sorted."""
+        on_disk = {path.name for path in self.archive_dir.iterdir() if path.is_dir()}
+        return sorted(on_disk | set(self._tiles))
+    
+    @staticmethod
+    def _weeks_to_data(weeks: np.ndarray) -> List[List[Optional[int]]]:
+        """Convert a (53,) cube row to [[value, persistence], ...] with None for missing weeks."""
+        return [[value if value != MISSING_VALUE else None, persistence]
+                for value, persistence in zip(weeks['value'].tolist(), weeks['persistence'].tolist())]
+    
+    def load_pixel_data(self, tile: str, pixel_row: int, pixel_col: int) -> List[PixelWeeklyData]:
+        """
+        Load existing data for a pixel from archive.
+        
+        Args:
+            tile: Tile identifier
+            pixel_row: Pixel row coordinate
+            pixel_col: Pixel column coordinate
+        
+        Returns:
+            List of PixelWeeklyData objects for years with at least one archived week, sorted by year
+        """
+        cubes = self._tile(tile)
+        index = cubes.index.get((pixel_row, pixel_col))
+        if index is None:
+            return []
+        
+        pixel_data = []
+        for year in sorted(cubes.cubes):
+            weeks = cubes.cubes[year][index]
+            if (weeks['value'] != MISSING_VALUE).any():
+                pixel_data.append(PixelWeeklyData(year=year, data=self._weeks_to_data(weeks)))
+        return pixel_data
+    
+    def save_pixel_data(self, tile: str, pixel_row: int, pixel_col: int,
+                        pixel_data: List[PixelWeeklyData]):
+        """
+        Save pixel data to archive, replacing all archived years of the pixel.
+        
+        Args:
+            tile: Tile identifier
+            pixel_row: Pixel row coordinate
+            pixel_col: Pixel column coordinate
+            pixel_data: List of PixelWeeklyData objects to save
+        """
+        cubes = self._tile(tile)
+        index = cubes.add([(pixel_row, pixel_col)])[0]
+        
+        for cube in cubes.cubes.values():
+            cube[index] = (MISSING_VALUE, 0)
+        
+        for year_data in pixel_data:
+            weeks = np.zeros(WEEKS_PER_YEAR, dtype=WEEK_DTYPE)
+            weeks['value'] = MISSING_VALUE
+            for week_index, entry in enumerate(year_data.data[:WEEKS_PER_YEAR]):
+                if entry is not None and entry[0] is not None:
+                    weeks[week_index] = (entry[0], entry[1])
+            cubes.cube(year_data.year)[index] = weeks
+    
+    def update_pixel_weeks(self, tile: str, pixel_updates: PixelUpdates) -> Dict[str, int]:
+        """
+        Write fetched weekly values for many pixels of a tile.
+        
+        Args:
+            tile: Tile identifier
+            pixel_updates: New (date, value, cloud_persistence) entries per pixel
+        
+        Returns:
+            Dictionary with the number of updated weeks ('updated_pixels') and of pixels
+            that could not be updated ('errors')
+        """
+        cubes = self._tile(tile)
+        pixels = list(pixel_updates)
+        indices = cubes.add(pixels)
+        
+        # Group the updates by year: (pixel index, week, value, persistence) columns
+        by_year: Dict[int, List[Tuple[int, int, int, int]]] = {}
+        for index, pixel in zip(indices.tolist(), pixels):
+            for date, value, cloud_persistence in pixel_updates[pixel]:
+                by_year.setdefault(date.year, []).append(
+                    (index, calculate_week_index(date, date.year), value, cloud_persistence)
+                )
+        
+        updated = 0
+        for year, updates in by_year.items():
+            index, week, value, persistence = np.array(updates, dtype=np.int64).T
+            cube = cubes.cube(year)
+            cube['value'][index, week] = value
+            cube['persistence'][index, week] = persistence
+            updated += len(updates)
+        
+        cubes.flush()
+        return {'updated_pixels': updated, 'errors': 0}
+    
+    def get_missing_weeks_for_pixel(self, tile: str, pixel_row: int, pixel_col: int,
+                                    start_date: datetime, end_date: datetime) -> List[Tuple[datetime, int]]:
+        """
+        Get list of missing weeks for a pixel within the specified date range.
+        
+        Args:
+            tile: Tile identifier
+            pixel_row: Pixel row coordinate
+            pixel_col: Pixel column coordinate
+            start_date: Start date for analysis
+            end_date: End date for analysis
+        
+        Returns:
+            List of (date, week_index) tuples for missing weeks
+        """
+        return self.get_missing_weeks_for_pixels(
+            tile, [(pixel_row, pixel_col)], start_date, end_date
+        )[(pixel_row, pixel_col)]
+    
+    def get_missing_weeks_for_pixels(self, tile: str, pixels: List[Tuple[int, int]],
+                                     start_date: datetime,
+                                     end_date: datetime) -> Dict[Tuple[int, int], List[Tuple[datetime, int]]]:
+        """
+        Get the missing weeks of many pixels of a tile within the specified date range.
+        
+        Args:
+            tile: Tile identifier
+            pixels: List of (pixel_row, pixel_col) tuples
+            start_date: Start date for analysis
+            end_date: End date for analysis
+        
+        Returns:
+            Dictionary mapping each pixel to its list of (date, week_index) tuples for missing weeks
+        """
+        cubes = self._tile(tile)
+        dates = generate_weekly_dates(start_date, end_date)
+        weeks = [(date, calculate_week_index(date, date.year)) for date in dates]
+        indices = cubes.lookup(pixels)
+        archived = indices >= 0
+        
+        # missing[i, j]: week j of the date range is missing for pixel i
+        missing = np.ones((len(pixels), len(weeks)), dtype=bool)
+        years = np.array([date.year for date in dates], dtype=np.int64)
+        week_indices = np.array([week_index for _, week_index in weeks], dtype=np.int64)
+        for year in np.unique(years).tolist():
+            cube = cubes.cubes.get(year)
+            if cube is None or not archived.any():
+                continue
+            columns = np.flatnonzero(years == year)
+            values = cube['value'][indices[archived]][:, week_indices[columns]]
+            missing[np.ix_(archived, columns)] = values == MISSING_VALUE
+        
+        return {
+            pixel: [weeks[j] for j in np.flatnonzero(pixel_missing).tolist()]
+            for pixel, pixel_missing in zip(pixels, missing)
+        }
+    
+    def iter_pixel_data(self, tile: Optional[str] = None,
+                        batch_size: int = 1000) -> Iterator[Tuple[str, int, int, List[PixelWeeklyData]]]:
+        """
+        Stream all archived pixels, grouped by tile.
+        
+        Args:
+            tile: Only yield pixels of this tile (default: all tiles)
+            batch_size: Number of pixels read from the cubes at once
+        
+        Yields:
+            (tile, pixel_row, pixel_col, pixel_data) tuples, pixel_data sorted by year
+        """
+        for tile_name in ([tile] if tile else self._tile_names()):
+            cubes = self._tile(tile_name)
+            order = sorted(range(len(cubes.pixel_list)), key=cubes.pixel_list.__getitem__)
+            years = sorted(cubes.cubes)
+            
+            for start in range(0, len(order), batch_size):
+                batch = np.array(order[start:start + batch_size], dtype=np.int64)
+                blocks = {year: cubes.cubes[year][batch] for year in years}
+                
+                for position, index in enumerate(batch.tolist()):
+                    pixel_data = [
+                        PixelWeeklyData(year=year, data=self._weeks_to_data(blocks[year][position]))
+                        for year in years if (blocks[year][position]['value'] != MISSING_VALUE).any()
+                    ]
+                    if pixel_data:
+                        pixel_row, pixel_col = cubes.pixel_list[index]
+                        yield tile_name, pixel_row, pixel_col, pixel_data
+    
+    def discover_existing_pixels(self) -> Dict[str, List[Tuple[int, int]]]:
+        """
+        Discover all archived pixels from the tile indexes.
+        
+        Returns:
+            Dictionary mapping tile names to lists of (pixel_row, pixel_col) tuples
+        """
+        return {tile: list(self._tile(tile).pixel_list) for tile in self._tile_names()
+                if self._tile(tile).pixel_list}
+    
+    def get_archive_stats(self) -> Dict[str, int]:
+        """
+        Get archive statistics.
+        
+        Returns:
+            Dictionary with archive statistics
+        """
+        tiles = self._tile_names()
+        total_size = sum(path.stat().st_size for path in self.archive_dir.glob("*/*.npy"))
+        return {
+            'total_entries': sum(len(self._tile(tile).pixel_list) for tile in tiles),
+            'tiles': len(tiles),
+            'total_size_bytes': total_size,
+            'archive_type': 'tiles'
+        }
+    
+    def cleanup_old_error_codes(self, cutoff_date: datetime):
+        """
+        Clean up old error codes from archive.
+        
+        Args:
+            cutoff_date: Remove error codes older than this date
+        """
+        self.logger.info("cleanup_old_error_codes: not applicable for infinite archive")
+    
+    def close(self):
+        """Flush all tiles and close the archive."""
+        if self._initialized:
+            for cubes in self._tiles.values():
+                cubes.flush()
+            self._tiles.clear()
+            self._initialized = False
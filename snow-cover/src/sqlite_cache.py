@@ -0,0 +1,302 @@
+#!/usr/bin/env python3
+"""
+SQLite-based key-value cache for snow cover data.
+
+Mirrors the PostgresCache interface (get/set/delete/cleanup/clear/size) on top of a
+single SQLite database file. Values are stored as JSON text with a millisecond
+timestamp, and entries expire after the configured TTL (0 means no expiration).
+
+The database is opened in WAL mode, so readers in other processes (e.g. an export
+or the Node pipeline) are not blocked while the fetcher writes. Writes commit one
+by one, or in transactions of write_batch_size writes inside batch().
+"""
+
+import json
+import time
+import logging
+import sqlite3
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Optional, Any, Iterator, Tuple
+
+# Writes per transaction inside batch()
+DEFAULT_WRITE_BATCH_SIZE = 1000
+
+# Same memory settings as the Node GeoPackage writer
+MMAP_SIZE = 256 * 1024 * 1024
+CACHE_SIZE_KB = 64 * 1024
+
+# Seconds to wait for another connection's write lock before failing
+BUSY_TIMEOUT = 30.0
+
+
+class SQLiteCacheSync:
+    """Synchronous SQLite cache with TTL support."""
+    
+    def __init__(self, db_file: str, ttl_ms: int = 0, read_only: bool = False,
+                 write_batch_size: int = DEFAULT_WRITE_BATCH_SIZE):
+        """
+        Initialize the SQLite cache.
+        
+        Args:
+            db_file: Path to the SQLite database file
+            ttl_ms: Time-to-live in milliseconds (0 means no expiration)
+            read_only: Open an existing database for reading only, alongside a writer
+                in another process
+            write_batch_size: Writes grouped into one transaction inside batch()
+        """
+        self.db_file = db_file
+        self.ttl_ms = ttl_ms
+        self.read_only = read_only
+        self.write_batch_size = write_batch_size
+        self.logger = logging.getLogger(__name__)
+        self._conn = None
+        self._lock = threading.Lock()
+        self._batch_depth = 0
+        self._pending_writes = 0
+    
+    def initialize(self):
+        """Open the database and create the cache table."""
+        if self.read_only:
+            self._initialize_read_only()
+            return
+        
+        Path(self.db_file).parent.mkdir(parents=True, exist_ok=True)
+        
+        # The connection is shared between threads, access is serialized by self._lock
+        self._conn = sqlite3.connect(self.db_file, timeout=BUSY_TIMEOUT, check_same_thread=False)
+        
+        with self._lock:
+            # WAL lets readers continue during writes; with synchronous=NORMAL commits
+            # are not fsynced, only WAL checkpoints are (a crash loses at most the last
+            # transactions, never corrupts the database)
+            self._conn.execute("PRAGMA journal_mode = WAL")
+            self._conn.execute("PRAGMA synchronous = NORMAL")
+            self._apply_read_pragmas()
+            
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS cache (
+                    key TEXT PRIMARY KEY,
+                    value TEXT NOT NULL,
+                    timestamp INTEGER NOT NULL
+                )
+            """)
+            
+            # Create index on timestamp for efficient cleanup
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_cache_timestamp ON cache(timestamp)")
+            self._conn.commit()
+        
+        self.logger.debug(f"SQLite cache initialized: {self.db_file}")
+    
+    def _initialize_read_only(self):
+        """Open an existing database without write access."""
+        if not Path(self.db_file).exists():
+            raise FileNotFoundError(f"SQLite cache not found: {self.db_file}")
+        
+        self._conn = sqlite3.connect(f"{Path(self.db_file).resolve().as_uri()}?mode=ro", uri=True,
+                                     timeout=BUSY_TIMEOUT, check_same_thread=False)
+        with self._lock:
+            self._apply_read_pragmas()
+        
+        self.logger.debug(f"SQLite cache opened read-only: {self.db_file}")
+    
+    def _apply_read_pragmas(self):
+        """Memory settings for reads, applied per connection."""
+        self._conn.execute(f"PRAGMA mmap_size = {MMAP_SIZE}")
+        self._conn.execute(f"PRAGMA cache_size = -{CACHE_SIZE_KB}")
+        self._conn.execute("PRAGMA temp_store = MEMORY")
+    
+    def _ensure_initialized(self):
+        """Ensure the cache is initialized."""
+        if self._conn is None:
+            raise RuntimeError("Cache not initialized")
+    
+    def _ensure_writable(self):
+        """Ensure the cache is initialized and not read-only."""
+        self._ensure_initialized()
+        if self.read_only:
+            raise RuntimeError(f"SQLite cache is read-only: {self.db_file}")
+    
+    def _commit_write(self):
+        """Commit after a write, or once write_batch_size writes are pending inside batch()."""
+        self._pending_writes += 1
+        if self._batch_depth == 0 or self._pending_writes >= self.write_batch_size:
+            self._conn.commit()
+            self._pending_writes = 0
+    
+    @contextmanager
+    def batch(self):
+        """
+        Group writes into transactions of write_batch_size writes.
+        
+        Writes inside the block are committed every write_batch_size writes and once
+        when the block exits, instead of one commit per write. Blocks can be nested;
+        the outermost one commits. Writes of other threads during the block are
+        grouped as well.
+        """
+        self._ensure_writable()
+        
+        with self._lock:
+            self._batch_depth += 1
+        try:
+            yield self
+        finally:
+            with self._lock:
+                self._batch_depth -= 1
+                if self._batch_depth == 0 and self._pending_writes:
+                    self._conn.commit()
+                    self._pending_writes = 0
+    
+    def _is_expired(self, timestamp: int) -> bool:
+        """Check whether an entry written at timestamp has expired."""
+        return self.ttl_ms > 0 and int(time.time() * 1000) - timestamp > self.ttl_ms
+    
+    def get(self, key: str) -> Optional[Any]:
+        """
+        Get a value from the cache.
+        
+        Args:
+            key: Cache key
+        
+        Returns:
+            Cached value or None if not found/expired
+        """
+        self._ensure_initialized()
+        
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value, timestamp FROM cache WHERE key = ?", (key,)
+            ).fetchone()
+        
+        if row is None:
+            return None
+        
+        value, timestamp = row
+        if self._is_expired(timestamp):
+            return None
+        
+        return json.loads(value)
+    
+    def set(self, key: str, value: Any) -> None:
+        """
+        Set a value in the cache.
+        
+        Args:
+            key: Cache key
+            value: JSON-serializable value to cache
+        """
+        self._ensure_writable()
+        
+        timestamp = int(time.time() * 1000)
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO cache (key, value, timestamp) VALUES (?, ?, ?)",
+                (key, json.dumps(value), timestamp)
+            )
+            self._commit_write()
+    
+    def iter_items(self, prefix: str = "", batch_size: int = 1000) -> Iterator[Tuple[str, Any]]:
+        """
+        Iterate over all unexpired entries whose key starts with prefix, in key order.
+        
+        Entries are read in pages of batch_size keys, so memory use does not grow with
+        the size of the cache and the lock is not held between pages.
+        
+        Args:
+            prefix: Key prefix to match (empty matches all keys)
+            batch_size: Number of entries read per query
+        
+        Yields:
+            (key, value) tuples
+        """
+        self._ensure_initialized()
+        
+        # Keys with the prefix sort between the prefix and the prefix with its last
+        # character incremented
+        upper = prefix[:-1] + chr(ord(prefix[-1]) + 1) if prefix else None
+        last_key = None
+        while True:
+            conditions, params = ["key >= ?"], [prefix]
+            if upper is not None:
+                conditions.append("key < ?")
+                params.append(upper)
+            if last_key is not None:
+                conditions.append("key > ?")
+                params.append(last_key)
+            params.append(batch_size)
+            
+            with self._lock:
+                rows = self._conn.execute(
+                    f"SELECT key, value, timestamp FROM cache WHERE {' AND '.join(conditions)} "
+                    "ORDER BY key LIMIT ?",
+                    params
+                ).fetchall()
+            
+            for key, value, timestamp in rows:
+                if not self._is_expired(timestamp):
+                    yield key, json.loads(value)
+            
+            if len(rows) < batch_size:
+                return
+            last_key = rows[-1][0]
+    
+    def delete(self, key: str) -> None:
+        """
+        Delete a value from the cache.
+        
+        Args:
+            key: Cache key to delete
+        """
+        self._ensure_writable()
+        
+        with self._lock:
+            self._conn.execute("DELETE FROM cache WHERE key = ?", (key,))
+            self._commit_write()
+    
+    def cleanup(self) -> int:
+        """
+        Remove expired entries from the cache.
+        
+        Returns:
+            Number of entries removed
+        """
+        if self._conn is None or self.ttl_ms <= 0 or self.read_only:
+            return 0
+        
+        cutoff_time = int(time.time() * 1000) - self.ttl_ms
+        with self._lock:
+            cursor = self._conn.execute("DELETE FROM cache WHERE timestamp < ?", (cutoff_time,))
+            self._conn.commit()
+            return cursor.rowcount
+    
+    def clear(self) -> None:
+        """Clear all entries from the cache."""
+        self._ensure_writable()
+        
+        with self._lock:
+            self._conn.execute("DELETE FROM cache")
+            self._conn.commit()
+    
+    def size(self) -> int:
+        """
+        Get the number of entries in the cache.
+        
+        Returns:
+            Number of cache entries
+        """
+        self._ensure_initialized()
+        
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM cache").fetchone()[0]
+    
+    def close(self) -> None:
+        """Close the database connection."""
+        if self._conn is not None:
+            with self._lock:
+                if self._pending_writes:
+                    self._conn.commit()
+                    self._pending_writes = 0
+                self._conn.close()
+            self._conn = None
+        self.logger.debug(f"SQLite cache closed: {self.db_file}")
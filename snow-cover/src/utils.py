@@ -8,10 +8,10 @@ Contains common date handling, cache formatting, and other utility functions.
 import sys
 from datetime import datetime, timedelta
 from pathlib import Path
-from typing import List, Dict, TYPE_CHECKING
+from typing import List, Dict, TYPE_CHECKING, Union
 
 if TYPE_CHECKING:
-    from cache_manager import PixelWeeklyData
+    from snow_cover_sqlite_archive import PixelWeeklyData
 
 
 def calculate_week_index(date: datetime, year: int) -> int:
@@ -50,7 +50,7 @@ def generate_weekly_dates(start_date: datetime, end_date: datetime) -> List[date
     return dates
 
 
-def format_cache_stats(stats: Dict[str, int]) -> str:
+def format_cache_stats(stats: Dict[str, Union[int, str]]) -> str:
     """
     Format cache statistics for display.
     
@@ -64,6 +64,8 @@ def format_cache_stats(stats: Dict[str, int]) -> str:
     for key, value in stats.items():
         if key == 'total_size_bytes':
             lines.append(f"  {key}: {value:,} bytes ({value/1024/1024:.2f} MB)")
+        elif isinstance(value, str):
+            lines.append(f"  {key}: {value}")
         else:
             lines.append(f"  {key}: {value:,}")
     
@@ -80,7 +82,7 @@ def create_empty_year_data(year: int) -> "PixelWeeklyData":
     Returns:
         PixelWeeklyData with 53 weeks of empty data
     """
-    from cache_manager import PixelWeeklyData
+    from snow_cover_sqlite_archive import PixelWeeklyData
     return PixelWeeklyData(year=year, data=[[None, 0] for _ in range(53)])
 
 
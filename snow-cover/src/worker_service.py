@@ -0,0 +1,349 @@
+#!/usr/bin/env python3
+"""
+Long-running snow cover worker service.
+
+Running fetch_snow_data.py once per pipeline run pays for the heavy imports
+(geopandas, pyproj, h5py) and starts with cold caches every time. The worker
+service keeps one process around instead and runs the fetch jobs submitted to it
+on a processor that stays open between jobs, keeping warm:
+
+- the coordinate transformer and the pixel memo of the pixel extractor
+- the directory listing cache, the HTTP session and the decode process pool
+- the archive connection, the granule index and the learned download concurrency
+
+A job takes the command line arguments of fetch_snow_data.py. Jobs run one at a
+time; a job whose processor options (archive, backend, base URL, ...) differ from
+the previous job's gets a new processor. Relative paths are resolved against the
+working directory of the service, so start it from the directory the pipeline
+would run fetch_snow_data.py from.
+
+HTTP API (on a TCP port or a Unix socket):
+
+- GET /health: {"status": "ok", "pid", "uptime_seconds", "jobs", "busy"}
+- POST /jobs with {"args": [...]}: streams newline-delimited JSON events while the
+  job runs: "accepted", "log" (one per log record), "progress" (counters and
+  stage items every few seconds) and a final "result" with "success" and the
+  metrics summary. Invalid arguments are answered with 400 and {"error": ...}.
+- POST /shutdown: stop the service after the running job
+
+Usage:
+    python snow-cover/src/worker_service.py --port 8766
+    python snow-cover/src/worker_service.py --socket /tmp/snow-cover.sock
+"""
+
+import argparse
+import json
+import logging
+import os
+import signal
+import socketserver
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from fetch_snow_data import (
+    RUN_OPTIONS, VIIRSSnowDataProcessor, create_parser, processor_options, run_job, setup_logging,
+    validate_args
+)
+
+DEFAULT_PORT = 8766
+
+# Seconds between progress events of a running job
+PROGRESS_INTERVAL_SECONDS = 5.0
+
+
+class JobArgumentParser(argparse.ArgumentParser):
+    """Argument parser that raises ValueError instead of exiting the service."""
+    
+    def error(self, message: str):
+        raise ValueError(message)
+    
+    def exit(self, status: int = 0, message: Optional[str] = None):
+        raise ValueError(message or f"Argument parsing stopped with status {status}")
+
+
+class SnowCoverWorker:
+    """Runs fetch jobs one at a time on a processor kept open between jobs."""
+    
+    def __init__(self):
+        self.processor: Optional[VIIRSSnowDataProcessor] = None
+        self.processor_options: Optional[Dict[str, Any]] = None
+        self.jobs = 0
+        self.started = time.monotonic()
+        self.logger = logging.getLogger(__name__)
+        self._lock = threading.Lock()
+    
+    @property
+    def busy(self) -> bool:
+        """Whether a job is running."""
+        return self._lock.locked()
+    
+    def parse_job(self, argv: List[str]) -> argparse.Namespace:
+        """
+        Parse and validate the arguments of a job.
+        
+        Args:
+            argv: Command line arguments of fetch_snow_data.py
+        
+        Returns:
+            Parsed arguments
+        
+        Raises:
+            ValueError: If the arguments are invalid
+        """
+        if not isinstance(argv, list) or not all(isinstance(arg, str) for arg in argv):
+            raise ValueError("args must be a list of strings")
+        args = create_parser(JobArgumentParser).parse_args(argv)
+        validate_args(args)
+        return args
+    
+    def run(self, args: argparse.Namespace,
+            on_start: Optional[Callable[[VIIRSSnowDataProcessor], None]] = None) -> Tuple[bool, Dict[str, Any]]:
+        """
+        Run a job, waiting for the running job to finish first.
+        
+        Args:
+            args: Arguments returned by parse_job()
+            on_start: Called with the processor once the job starts
+        
+        Returns:
+            Tuple of whether the job succeeded and its metrics summary
+        """
+        with self._lock:
+            options = processor_options(args)
+            run_options = {name: options.pop(name) for name in RUN_OPTIONS}
+            
+            if self.processor is not None and options == self.processor_options:
+                self.processor.configure_run(**run_options)
+            else:
+                self.close_processor()
+                self.logger.info("Starting a new processor for the job's options")
+                self.processor = VIIRSSnowDataProcessor(**options, **run_options, persistent=True)
+                self.processor_options = options
+            
+            self.jobs += 1
+            if on_start is not None:
+                on_start(self.processor)
+            success = run_job(self.processor, args)
+            return success, self.processor.metrics.summary()
+    
+    def close_processor(self):
+        """Close the processor of the previous jobs, if any."""
+        if self.processor is not None:
+            self.processor.close()
+            self.processor = None
+            self.processor_options = None
+    
+    def close(self):
+        """Wait for the running job and close the processor."""
+        with self._lock:
+            self.close_processor()
+    
+    def health(self) -> Dict[str, Any]:
+        """Status of the service."""
+        return {
+            'status': 'ok',
+            'pid': os.getpid(),
+            'uptime_seconds': round(time.monotonic() - self.started, 1),
+            'jobs': self.jobs,
+            'busy': self.busy,
+        }
+
+
+class JobEventStream(logging.Handler):
+    """Writes the events of a job as JSON lines to an HTTP response."""
+    
+    def __init__(self, wfile):
+        super().__init__()
+        self.wfile = wfile
+        self.connected = True
+        self._write_lock = threading.Lock()
+        self.setFormatter(logging.Formatter('%(message)s'))
+    
+    def send(self, event: str, **fields):
+        """Write one event; a client that went away only stops the stream, not the job."""
+        line = (json.dumps({'event': event, **fields}, default=str) + '\n').encode()
+        with self._write_lock:
+            if not self.connected:
+                return
+            try:
+                self.wfile.write(line)
+                self.wfile.flush()
+            except OSError:
+                self.connected = False
+    
+    def emit(self, record: logging.LogRecord):
+        try:
+            message = self.format(record)
+        except Exception:
+            self.handleError(record)
+            return
+        self.send('log', level=record.levelname, logger=record.name, message=message, time=record.created)
+
+
+def send_progress(stream: JobEventStream, processor: VIIRSSnowDataProcessor, done: threading.Event):
+    """Send the counters and stage items of a running job until it is done."""
+    while not done.wait(PROGRESS_INTERVAL_SECONDS):
+        summary = processor.metrics.summary()
+        stream.send('progress', seconds=summary['duration_seconds'], counters=summary['counters'],
+                    stages={name: stage['items'] for name, stage in summary['stages'].items()})
+
+
+class _RequestHandler(BaseHTTPRequestHandler):
+    """Request handler bound to a SnowCoverWorker via the server's worker attribute."""
+    
+    # Responses end when the connection closes, which suits the streamed job events
+    protocol_version = "HTTP/1.0"
+    
+    def log_message(self, format, *args):
+        """Log requests at debug level; Unix socket clients have no address."""
+        logging.getLogger(__name__).debug(format % args)
+    
+    def do_GET(self):
+        if self.path == "/health":
+            return self._send_json(200, self.server.worker.health())
+        self._send_json(404, {'error': f"Unknown path {self.path}"})
+    
+    def do_POST(self):
+        if self.path == "/jobs":
+            return self._run_job()
+        if self.path == "/shutdown":
+            self._send_json(200, {'status': 'stopping'})
+            threading.Thread(target=self.server.shutdown, daemon=True).start()
+            return
+        self._send_json(404, {'error': f"Unknown path {self.path}"})
+    
+    def _run_job(self):
+        worker: SnowCoverWorker = self.server.worker
+        try:
+            length = int(self.headers.get("Content-Length", 0))
+            request = json.loads(self.rfile.read(length) or b'{}')
+            args = worker.parse_job(request.get('args', []))
+        except (ValueError, AttributeError) as e:
+            return self._send_json(400, {'error': str(e)})
+        
+        self.send_response(200)
+        self.send_header("Content-Type", "application/x-ndjson")
+        self.end_headers()
+        
+        stream = JobEventStream(self.wfile)
+        stream.send('accepted', queued=worker.busy)
+        done = threading.Event()
+        
+        def on_start(processor: VIIRSSnowDataProcessor):
+            # Jobs run one at a time, so all log records until the job ends are its own
+            logging.getLogger().addHandler(stream)
+            threading.Thread(target=send_progress, args=(stream, processor, done), daemon=True).start()
+        
+        started = time.perf_counter()
+        result: Dict[str, Any] = {'success': False, 'metrics': None}
+        try:
+            result['success'], result['metrics'] = worker.run(args, on_start)
+        except Exception as e:
+            logging.getLogger(__name__).exception(f"Job failed: {e}")
+            result['error'] = str(e)
+        finally:
+            done.set()
+            logging.getLogger().removeHandler(stream)
+        
+        stream.send('result', seconds=round(time.perf_counter() - started, 3), **result)
+    
+    def _send_json(self, status: int, body: Dict[str, Any]):
+        data = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+
+class _TCPServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+
+class _UnixServer(socketserver.ThreadingUnixStreamServer):
+    daemon_threads = True
+
+
+def create_server(worker: SnowCoverWorker, host: str = "127.0.0.1", port: int = DEFAULT_PORT,
+                  socket_path: Optional[str] = None) -> socketserver.BaseServer:
+    """
+    Create the HTTP server of a worker.
+    
+    Args:
+        worker: Worker running the submitted jobs
+        host: Interface to listen on
+        port: TCP port to listen on (0 picks a free port)
+        socket_path: Listen on this Unix socket instead of a TCP port
+    
+    Returns:
+        Server with the worker as its worker attribute, not yet serving
+    """
+    if socket_path is not None:
+        if os.path.exists(socket_path):
+            os.unlink(socket_path)
+        server = _UnixServer(socket_path, _RequestHandler)
+    else:
+        server = _TCPServer((host, port), _RequestHandler)
+    server.worker = worker
+    return server
+
+
+def main():
+    """Main function with argument parsing."""
+    parser = argparse.ArgumentParser(
+        description='Serve snow cover fetch jobs from a long-running process with warm caches'
+    )
+    
+    parser.add_argument(
+        '--host',
+        default='127.0.0.1',
+        help='Interface to listen on (default: 127.0.0.1)'
+    )
+    
+    parser.add_argument(
+        '--port',
+        type=int,
+        default=DEFAULT_PORT,
+        help=f'TCP port to listen on (default: {DEFAULT_PORT})'
+    )
+    
+    parser.add_argument(
+        '--socket',
+        help='Listen on this Unix socket instead of a TCP port'
+    )
+    
+    parser.add_argument(
+        '--verbose', '-v',
+        action='store_true',
+        help='Enable verbose logging'
+    )
+    
+    args = parser.parse_args()
+    
+    setup_logging(args.verbose)
+    logger = logging.getLogger(__name__)
+    
+    worker = SnowCoverWorker()
+    server = create_server(worker, args.host, args.port, args.socket)
+    
+    def stop(signum, frame):
+        threading.Thread(target=server.shutdown, daemon=True).start()
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+    
+    address = args.socket if args.socket else f"http://{args.host}:{server.server_address[1]}"
+    logger.info(f"Snow cover worker listening on {address}")
+    try:
+        server.serve_forever()
+    finally:
+        server.server_close()
+        worker.close()
+        if args.socket and os.path.exists(args.socket):
+            os.unlink(args.socket)
+        logger.info(f"Snow cover worker stopped after {worker.jobs} jobs")
+
+
+if __name__ == "__main__":
+    main()
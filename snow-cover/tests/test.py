@@ -7,11 +7,11 @@ import sys
 sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
 
 from test_fixtures import (
-    temp_dir, pixel_extractor, data_fetcher, cache_manager, sample_geojson_file,
-    sample_tile_pixels, sample_dates, test_data_helper,
-    assert_pixel_coords_valid, assert_cache_file_valid
+    temp_dir, pixel_extractor, data_fetcher, archive, tile_archive, sample_geojson_file,
+    sample_tile_pixels, sample_dates, test_data_helper, synthetic_granule, hdf_to_geotiff, nsidc_server,
+    postgres_db_config, postgres_cache, lease_job, assert_pixel_coords_valid, assert_archive_entry_valid
 )
-from constants import ERROR_OLD_MISSING, ERROR_RECENT_MISSING
+from constants import ERROR_OLD_MISSING, ERROR_RECENT_MISSING, ERROR_OTHER
 
 
 # Pixel Extractor Tests
@@ -97,45 +97,732 @@ def test_pixel_extractor_empty_geojson(pixel_extractor, temp_dir):
     assert len(unique_pixels) == 0
 
 
-# Cache Manager Tests
-def test_cache_manager_save_and_load(cache_manager, sample_tile_pixels, test_data_helper):
-    """Test cache save and load operations."""
+def test_pixel_extractor_memo(pixel_extractor, sample_geojson_file):
+    """Test that pixels of unchanged geometries are reused by a later extraction."""
+    first = pixel_extractor.extract_feature_pixels_from_geojson(sample_geojson_file)
+    second = pixel_extractor.extract_feature_pixels_from_geojson(sample_geojson_file)
+    
+    assert second == first
+    assert pixel_extractor.metrics.summary()['counters']['pixel_memo_hits'] == 1
+
+
+# Archive Tests
+def test_archive_save_and_load(archive, sample_tile_pixels, test_data_helper):
+    """Test archive save and load operations."""
     tile, pixel_row, pixel_col = sample_tile_pixels[0]
     
     # Create and save test data
     pixel_data = test_data_helper.create_pixel_data(2024, [0, 1, 2])
-    cache_manager.save_pixel_data(tile, pixel_row, pixel_col, pixel_data)
+    archive.save_pixel_data(tile, pixel_row, pixel_col, pixel_data)
     
-    # Verify cache file exists
-    cache_path = cache_manager.get_pixel_cache_path(tile, pixel_row, pixel_col)
-    assert_cache_file_valid(cache_path)
+    # Verify archive entry exists
+    assert_archive_entry_valid(archive, tile, pixel_row, pixel_col)
     
     # Load and verify data
-    loaded_data = cache_manager.load_pixel_data(tile, pixel_row, pixel_col)
+    loaded_data = archive.load_pixel_data(tile, pixel_row, pixel_col)
     assert len(loaded_data) == 1
     assert loaded_data[0].year == 2024
 
 
-def test_cache_manager_missing_weeks(cache_manager, sample_tile_pixels, sample_dates):
-    """Test cache manager missing weeks detection."""
+def test_archive_missing_weeks(archive, sample_tile_pixels, sample_dates, test_data_helper):
+    """Test archive missing weeks detection."""
     tile, pixel_row, pixel_col = sample_tile_pixels[0]
     start_date, end_date = sample_dates[0], sample_dates[-1]
     
     # Initially all weeks should be missing
-    missing_weeks = cache_manager.get_missing_weeks_for_pixel(
+    missing_weeks = archive.get_missing_weeks_for_pixel(
         tile, pixel_row, pixel_col, start_date, end_date
     )
     assert len(missing_weeks) > 0
     
     # Add data and verify reduction in missing weeks
-    cache_manager.update_pixel_week(tile, pixel_row, pixel_col, start_date, 85, 0)
-    missing_weeks_after = cache_manager.get_missing_weeks_for_pixel(
+    archive.save_pixel_data(tile, pixel_row, pixel_col, test_data_helper.create_pixel_data(2024, [0]))
+    missing_weeks_after = archive.get_missing_weeks_for_pixel(
         tile, pixel_row, pixel_col, start_date, end_date
     )
     assert len(missing_weeks_after) < len(missing_weeks)
 
 
-# Data Fetcher Tests
+
+def test_archive_iter_pixel_data(archive, sample_tile_pixels, test_data_helper):
+    """Test streaming all archived pixels in pages, grouped by tile."""
+    for tile, pixel_row, pixel_col in sample_tile_pixels:
+        archive.save_pixel_data(tile, pixel_row, pixel_col, test_data_helper.create_pixel_data(2024, [0]))
+    
+    pixels = list(archive.iter_pixel_data(batch_size=2))
+    assert [(tile, row, col) for tile, row, col, _ in pixels] == sorted(sample_tile_pixels)
+    assert pixels[0][3][0].year == 2024
+    
+    assert [(row, col) for _, row, col, _ in archive.iter_pixel_data("h19v04")] == [(500, 500)]
+
+
+def test_archive_batched_writes_and_concurrent_reader(archive, test_data_helper):
+    """Test WAL mode, batched commits and a read-only reader alongside the writer."""
+    from snow_cover_sqlite_archive import SnowCoverSQLiteArchive
+    
+    assert archive.archive._conn.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+    archive.archive.write_batch_size = 2
+    
+    reader = SnowCoverSQLiteArchive(archive.archive.db_file, read_only=True)
+    reader.initialize()
+    pixel_data = test_data_helper.create_pixel_data(2024, [0])
+    
+    with archive.batch():
+        archive.save_pixel_data("h18v04", 1, 1, pixel_data)
+        # Uncommitted writes are visible to the writer only, and do not block the reader
+        assert archive.load_pixel_data("h18v04", 1, 1)[0].year == 2024
+        assert reader.load_pixel_data("h18v04", 1, 1) == []
+        
+        archive.save_pixel_data("h18v04", 2, 2, pixel_data)
+        # The second write completed a batch of write_batch_size
+        assert reader.get_archive_stats()['total_entries'] == 2
+        
+        archive.save_pixel_data("h18v04", 3, 3, pixel_data)
+        assert reader.get_archive_stats()['total_entries'] == 2
+    assert reader.get_archive_stats()['total_entries'] == 3
+    
+    with pytest.raises(RuntimeError, match="read-only"):
+        reader.save_pixel_data("h18v04", 4, 4, pixel_data)
+    reader.close()
+    
+    with pytest.raises(FileNotFoundError):
+        SnowCoverSQLiteArchive(str(Path(archive.archive.db_file).with_name("missing.db")), read_only=True).initialize()
+
+
+def test_tile_archive_matches_sqlite_archive(archive, tile_archive, sample_tile_pixels, test_data_helper):
+    """Test that the tile cube backend plans and stores the same weeks as the SQLite archive."""
+    from datetime import datetime
+    
+    start_date, end_date = datetime(2023, 1, 1), datetime(2024, 12, 31)
+    pixel_data = test_data_helper.create_pixel_data(2024, [0, 1, 2])
+    pixel_data[0].data[3] = [ERROR_RECENT_MISSING, 0]
+    pixel_data[0].data[4] = [40, 2]
+    
+    for backend in (archive, tile_archive):
+        backend.save_pixel_data(*sample_tile_pixels[0], pixel_data)
+        result = backend.update_pixel_weeks("h18v04", {
+            (1501, 1001): [(datetime(2023, 1, 9), 60, 1)],
+            (1500, 1000): [(datetime(2024, 1, 15), 20, 0)],
+        })
+        assert result == {'updated_pixels': 2, 'errors': 0}
+    
+    pixels = [(1500, 1000), (1501, 1001), (10, 10)]
+    assert (tile_archive.get_missing_weeks_for_pixels("h18v04", pixels, start_date, end_date) ==
+            archive.get_missing_weeks_for_pixels("h18v04", pixels, start_date, end_date))
+    
+    for pixel in pixels:
+        expected = [(year_data.year, year_data.data) for year_data in archive.load_pixel_data("h18v04", *pixel)]
+        assert [(year_data.year, year_data.data)
+                for year_data in tile_archive.load_pixel_data("h18v04", *pixel)] == expected
+    assert tile_archive.load_pixel_data("h18v04", 1500, 1000)[0].data[2] == [20, 0]
+
+
+def test_tile_archive_grows_and_persists(tile_archive, test_data_helper):
+    """Test adding pixels past the cube capacity and reopening the archive."""
+    from snow_cover_tile_archive import SnowCoverTileArchive
+    
+    pixels = [(row, 2 * row) for row in range(5)]
+    for row, col in pixels:
+        tile_archive.save_pixel_data("h18v04", row, col, test_data_helper.create_pixel_data(2024, [row]))
+    tile_archive.save_pixel_data("h19v04", 500, 500, test_data_helper.create_pixel_data(2023, [0]))
+    tile_archive.close()
+    
+    reopened = SnowCoverTileArchive(tile_archive.archive_dir)
+    reopened.initialize()
+    assert reopened.get_archive_stats()['total_entries'] == 6
+    assert [(row, col) for _, row, col, _ in reopened.iter_pixel_data("h18v04", batch_size=2)] == pixels
+    assert reopened.load_pixel_data("h18v04", 3, 6)[0].data[3] == [85, 0]
+    assert reopened.load_pixel_data("h18v04", 3, 7) == []
+    assert reopened.discover_existing_pixels() == {"h18v04": pixels, "h19v04": [(500, 500)]}
+    reopened.close()
+
+
+# Export Tests
+@pytest.mark.parametrize("export_format", ["parquet", "arrow"])
+def test_export_archive(archive, temp_dir, test_data_helper, export_format):
+    """Test exporting the archive to a dataset partitioned by tile."""
+    pytest.importorskip("pyarrow")
+    import pyarrow.dataset as ds
+    from export_archive import export_archive
+    
+    pixel_data = test_data_helper.create_pixel_data(2024, [0, 5])
+    pixel_data[0].data[7] = [ERROR_OLD_MISSING, 3]
+    archive.save_pixel_data("h18v04", 1500, 1000, pixel_data)
+    archive.save_pixel_data("h18v04", 1501, 1001, test_data_helper.create_pixel_data(2023, [1]))
+    archive.save_pixel_data("h19v04", 500, 500, test_data_helper.create_pixel_data(2024, [2]))
+    
+    output_dir = Path(temp_dir) / "export"
+    rows_by_tile = export_archive(archive, str(output_dir), export_format, row_group_size=2)
+    assert rows_by_tile == {"h18v04": 4, "h19v04": 1}
+    
+    dataset = ds.dataset(str(output_dir), format="parquet" if export_format == "parquet" else "ipc",
+                         partitioning="hive")
+    table = dataset.to_table().sort_by([("tile", "ascending"), ("row", "ascending"),
+                                        ("week", "ascending")])
+    assert table.num_rows == 5
+    assert table.column("tile").to_pylist() == ["h18v04"] * 4 + ["h19v04"]
+    assert table.column("week").to_pylist() == [0, 5, 7, 1, 2]
+    assert table.column("value").to_pylist() == [85, 85, ERROR_OLD_MISSING, 85, 85]
+    assert table.column("persistence").to_pylist() == [0, 0, 3, 0, 0]
+    
+    # Exporting a single tile again replaces only that partition
+    assert export_archive(archive, str(output_dir), export_format, tile="h19v04") == {"h19v04": 1}
+    assert dataset.count_rows() == 5
+
+
+
+# Aggregate Tests
+def test_aggregates_match_node_history(archive):
+    """Test histories against getSnowCoverHistory() in snowCoverHistory.ts for the same archived pixels."""
+    from snow_cover_aggregates import SnowCoverAggregator
+    from snow_cover_sqlite_archive import PixelWeeklyData
+    
+    archive.save_pixel_data("h18v04", 0, 1, [PixelWeeklyData(year=2024, data=[[80, 0], [90, 0], [None, 0], [ERROR_OLD_MISSING, 0]])])
+    archive.save_pixel_data("h18v04", 0, 2, [PixelWeeklyData(year=2024, data=[[60, 0], [70, 0], [75, 1]])])
+    archive.save_pixel_data("h18v04", 0, 3, [PixelWeeklyData(year=2024, data=[[ERROR_OLD_MISSING, 0]] * 3)])
+    archive.save_pixel_data("h18v04", 0, 4, [PixelWeeklyData(year=2024, data=[[40, 1], [10, 0]]),
+                                             PixelWeeklyData(year=2023, data=[[None, 0]] * 52 + [[20, 0]])])
+    archive.save_pixel_data("h18v04", 0, 5, [PixelWeeklyData(year=2024, data=[[40, 1], [10, 0]]),
+                                             PixelWeeklyData(year=2023, data=[[ERROR_OLD_MISSING, 0]] * 52 + [[20, 0]])])
+    aggregator = SnowCoverAggregator(archive)
+    
+    # Years with an unfetched week are dropped as a whole, and the first pixel, left
+    # without years, does not count as a valid pixel
+    assert aggregator.history_for_pixels({("h18v04", 0, 1), ("h18v04", 0, 2)}) == [
+        {'year': 2024, 'days': [[1, 60, 100], [8, 70, 100], [14, 75, 100]]}
+    ]
+    # A complete year of missing data codes counts as valid without observations
+    assert aggregator.history_for_pixels({("h18v04", 0, 2), ("h18v04", 0, 3)}) == [
+        {'year': 2024, 'days': [[1, 60, 50], [8, 70, 50], [14, 75, 50]]}
+    ]
+    # Cloud persistence moves week 1 into the previous year; with the partial 2023
+    # dropped it is the only observation of December 31st
+    assert aggregator.history_for_pixels({("h18v04", 0, 4)}) == [
+        {'year': 2023, 'days': [[365, 40, 100]]}, {'year': 2024, 'days': [[8, 10, 100]]}
+    ]
+    # Duplicate days keep the observation with the least cloud persistence
+    assert aggregator.history_for_pixels({("h18v04", 0, 5)}) == [
+        {'year': 2023, 'days': [[365, 20, 100]]}, {'year': 2024, 'days': [[8, 10, 100]]}
+    ]
+
+
+def test_aggregates_write(archive, temp_dir, test_data_helper):
+    """Test writing per-run and per-ski-area aggregates to SQLite."""
+    import json
+    import sqlite3
+    from pixel_extractor import FeaturePixels
+    from snow_cover_aggregates import SnowCoverAggregator, write_aggregates
+    
+    # Complete years: weeks without snow cover hold a missing data code
+    for pixel_col, weeks in ((1000, [0]), (1001, [0, 1])):
+        pixel_data = test_data_helper.create_pixel_data(2024, weeks)
+        pixel_data[0].data = [week if week[0] is not None else [ERROR_OLD_MISSING, 0] for week in pixel_data[0].data]
+        archive.save_pixel_data("h18v04", 1500, pixel_col, pixel_data)
+    feature_pixels = {
+        "run1": FeaturePixels(pixels={("h18v04", 1500, 1000)}, ski_areas=["area1"]),
+        "run2": FeaturePixels(pixels={("h18v04", 1500, 1001), ("h18v04", 1, 1)}, ski_areas=["area1"]),
+        "run3": FeaturePixels(pixels={("h18v04", 2, 2)}),
+    }
+    
+    aggregates_file = str(Path(temp_dir) / "aggregates.db")
+    aggregator = SnowCoverAggregator(archive, pixel_cache_size=1)
+    assert write_aggregates(aggregates_file, aggregator.aggregate_features(feature_pixels)) == 3
+    
+    conn = sqlite3.connect(aggregates_file)
+    rows = {(kind, feature_id): (pixel_count, json.loads(history)) for kind, feature_id, pixel_count, history
+            in conn.execute("SELECT kind, feature_id, pixel_count, history FROM snow_cover_aggregates")}
+    conn.close()
+    
+    # run3 has no archived pixels; the unarchived pixel of run2 does not count as valid
+    assert set(rows) == {("run", "run1"), ("run", "run2"), ("ski_area", "area1")}
+    assert rows[("run", "run2")] == (2, [{'year': 2024, 'days': [[1, 85, 100], [8, 85, 100]]}])
+    assert rows[("ski_area", "area1")] == (3, [{'year': 2024, 'days': [[1, 85, 100], [8, 85, 50]]}])
+
+
+def test_pixel_map_round_trip(pixel_extractor, sample_geojson_file, temp_dir):
+    """Test writing the pixels of each run for the Node pipeline and reading them back."""
+    import sqlite3
+    from pixel_map import encode_pixels, read_pixel_map, write_pixel_map
+    
+    feature_pixels = pixel_extractor.extract_feature_pixels_from_geojson(sample_geojson_file)
+    pixel_map_file = str(Path(temp_dir) / "pixel_map.db")
+    assert write_pixel_map(pixel_map_file, feature_pixels) == len(feature_pixels)
+    
+    assert read_pixel_map(pixel_map_file) == {feature_id: feature.pixels for feature_id, feature in feature_pixels.items()}
+    
+    conn = sqlite3.connect(pixel_map_file)
+    feature_id, pixel_count, pixels = conn.execute("SELECT feature_id, pixel_count, pixels FROM feature_pixels").fetchone()
+    conn.close()
+    assert pixel_count == len(feature_pixels[feature_id].pixels)
+    assert len(pixels) == 8 * pixel_count
+    
+    # Sorted little-endian uint16 [h_tile, v_tile, pixel_col, pixel_row], as VIIRSPixel on the Node side
+    assert encode_pixels([("h18v04", 1500, 1001), ("h09v05", 2, 1)]) == bytes([
+        9, 0, 5, 0, 1, 0, 2, 0,
+        18, 0, 4, 0, 0xE9, 0x03, 0xDC, 0x05,
+    ])
+
+
+# Fetch Policy Tests
+def test_seasonal_fetch_policy(archive):
+    """Test skipping off-season weeks that never had snow and probing undecided ones."""
+    from datetime import datetime
+    from fetch_policy import SeasonalFetchPolicy, off_season_weeks, NORTHERN_OFF_SEASON_WEEKS, SOUTHERN_OFF_SEASON_WEEKS
+    from utils import calculate_week_index, create_empty_year_data, generate_weekly_dates
+    
+    assert off_season_weeks("h18v04") == NORTHERN_OFF_SEASON_WEEKS
+    assert off_season_weeks("h19v11") == SOUTHERN_OFF_SEASON_WEEKS
+    
+    # Week 30 was snow-free in two years, week 25 had snow once, week 35 was observed only once
+    for pixel_col, snow_week in ((100, None), (101, 25)):
+        history = []
+        for year in (2021, 2022):
+            year_data = create_empty_year_data(year)
+            for week in (25, 30):
+                year_data.data[week] = [40 if (week == snow_week and year == 2021) else 0, 0]
+            if year == 2022:
+                year_data.data[35] = [0, 0]
+            history.append(year_data)
+        archive.save_pixel_data("h18v04", 100, pixel_col, history)
+    
+    policy = SeasonalFetchPolicy(archive)
+    pixels = [(100, 100), (100, 101), (200, 200)]
+    status = policy.week_status("h18v04", pixels)
+    assert (status[25], status[30], status[35]) == ('snow', 'clear', 'unknown')
+    
+    dates = generate_weekly_dates(datetime(2016, 1, 1), datetime(2023, 12, 31))
+    selected = policy.select_dates("h18v04", pixels, dates)
+    weeks = {}
+    for date in selected:
+        weeks.setdefault(calculate_week_index(date, date.year), []).append(date.year)
+    
+    assert 30 not in weeks
+    assert weeks[25] == list(range(2016, 2024))
+    assert weeks[10] == list(range(2016, 2024))
+    # Undecided weeks are only probed in the most recent years
+    assert weeks[35] == [2022, 2023]
+    # All 8 years of week 30 and 6 of 8 years of the 16 other undecided weeks
+    assert len(dates) - len(selected) == 8 + 16 * 6
+    
+    # Without history, southern summer weeks are only probed (weeks 1-12 occur every year)
+    southern_weeks = {calculate_week_index(date, date.year)
+                      for date in policy.select_dates("h19v11", [(1, 1)], dates) if date.year < 2022}
+    assert 20 in southern_weeks
+    assert not southern_weeks & set(range(1, 13))
+
+
+# Fetch Plan Tests
+def test_fetch_plan_orders_by_value():
+    """Test that granules filling more pixels and recent granules come first."""
+    from datetime import datetime
+    from fetch_plan import build_work_plan, group_by_tile
+    
+    pixels = [(row, 0) for row in range(10)]
+    plan = build_work_plan({
+        "h18v04": {datetime(2024, 1, 1): pixels[:4], datetime(2020, 1, 6): pixels},
+        "h19v04": {datetime(2024, 1, 1): pixels, datetime(2023, 12, 25): pixels},
+    }, reference_date=datetime(2024, 1, 1))
+    
+    assert [(unit.tile, unit.date) for unit in plan] == [
+        ("h19v04", datetime(2024, 1, 1)),
+        ("h19v04", datetime(2023, 12, 25)),
+        ("h18v04", datetime(2024, 1, 1)),
+        ("h18v04", datetime(2020, 1, 6)),
+    ]
+    # Four years old, ten pixels are worth 2.5 of today's
+    assert plan[-1].value == pytest.approx(10 * 0.5 ** (1456 / 730))
+    assert list(group_by_tile(plan[1:3])) == ["h19v04", "h18v04"]
+
+
+def test_time_budgeted_run(nsidc_server, temp_dir):
+    """Test that a run out of time writes its finished batches and the next run continues."""
+    from datetime import datetime
+    from types import SimpleNamespace
+    from fetch_snow_data import VIIRSSnowDataProcessor
+    
+    archive_file = str(Path(temp_dir) / "archive.db")
+    pixels_by_tile = {"h18v04": [(10, 20), (1500, 1000)]}
+    
+    def create_processor():
+        processor = VIIRSSnowDataProcessor(archive_file=archive_file, decode_workers=0,
+                                           base_url=nsidc_server.base_url, batch_units=2)
+        processor.start_date, processor.end_date = datetime(2024, 1, 1), datetime(2024, 1, 22)
+        processor.data_fetcher.rate_limit_delay = 0
+        return processor
+    
+    # The budget runs out once the first batch is fetched
+    processor = create_processor()
+    budget = SimpleNamespace(seconds=60, remaining=lambda: 60,
+                             exhausted=lambda: nsidc_server.stats['granule_requests'] >= 2)
+    try:
+        stats = processor.execute_plan(processor.plan_work(pixels_by_tile, ["h18v04"]), budget)
+        assert stats['processed_weeks'] == 2
+        assert processor.metrics.summary()['counters']['granules_deferred'] == 2
+        
+        # The most recent granules were fetched, the older ones are still missing
+        missing = processor.archive_manager.get_missing_weeks_for_pixels(
+            "h18v04", [(10, 20)], processor.start_date, processor.end_date
+        )
+        assert [date for date, _ in missing[(10, 20)]] == [datetime(2024, 1, 1), datetime(2024, 1, 8)]
+    finally:
+        processor.data_fetcher.cleanup()
+        processor.archive_manager.close()
+    
+    processor = create_processor()
+    try:
+        stats = processor.execute_plan(processor.plan_work(pixels_by_tile, ["h18v04"]))
+    finally:
+        processor.data_fetcher.cleanup()
+        processor.archive_manager.close()
+    assert stats['processed_weeks'] == 2
+    assert nsidc_server.stats['granule_requests'] == 4
+
+
+def test_plan_file_with_estimate(nsidc_server, temp_dir):
+    """Test estimating a plan from earlier runs and executing its plan file without planning."""
+    from datetime import datetime
+    from fetch_plan import ThroughputHistory, read_plan_file
+    from fetch_snow_data import VIIRSSnowDataProcessor
+    
+    history = ThroughputHistory(str(Path(temp_dir) / "throughput-history.jsonl"))
+    for granules, seconds in ((10, 20.0), (12, 20.0), (30, 20.0)):
+        history.record({'stages': {'download': {'items': granules, 'bytes': granules * 8_000_000,
+                                                'wall_seconds': seconds}}})
+    history.record({'stages': {'download': {'items': 50, 'bytes': 50 * 200_000, 'wall_seconds': 10.0}}},
+                   remote_reads=True)
+    assert history.estimate() == {'granules_per_second': 0.6, 'bytes_per_granule': 8_000_000, 'runs': 3}
+    assert history.estimate(remote_reads=True)['bytes_per_granule'] == 200_000
+    
+    archive_file = str(Path(temp_dir) / "archive.db")
+    pixels_by_tile = {"h18v04": [(10, 20), (1500, 1000)]}
+    plan_file = str(Path(temp_dir) / "fetch-plan.json")
+    processor = VIIRSSnowDataProcessor(archive_file=archive_file, decode_workers=0,
+                                       base_url=nsidc_server.base_url)
+    processor.start_date, processor.end_date = datetime(2024, 1, 1), datetime(2024, 1, 22)
+    try:
+        processor.archive_manager.update_pixel_weeks("h18v04", {(10, 20): [(datetime(2024, 1, 8), 50, 0)]})
+        plan = processor.plan_work(pixels_by_tile, ["h18v04"])
+        summary = processor.write_plan(plan, pixels_by_tile, plan_file)
+    finally:
+        processor.data_fetcher.cleanup()
+        processor.archive_manager.close()
+    
+    assert summary['tiles'] == {'h18v04': {'granules': 4, 'pixels': 7, 'bytes': 32_000_000}}
+    assert summary['seconds'] == pytest.approx(4 / 0.6, abs=0.1)
+    read_plan, metadata = read_plan_file(plan_file)
+    assert [(unit.tile, unit.date, unit.pixels) for unit in read_plan] == \
+        [(unit.tile, unit.date, unit.pixels) for unit in plan]
+    assert read_plan[-1].pixels == [(1500, 1000)]
+    assert metadata['end_date'] == '2024-01-22'
+    assert metadata['estimate']['granules'] == 4
+    
+    # A later run fetches the planned granules and records its throughput
+    processor = VIIRSSnowDataProcessor(archive_file=archive_file, decode_workers=0,
+                                       base_url=nsidc_server.base_url)
+    processor.data_fetcher.rate_limit_delay = 0
+    assert processor.run(plan_file=plan_file)
+    assert nsidc_server.stats['granule_requests'] == 4
+    assert history.estimate()['runs'] == 4
+
+
+def test_plan_file_resumes_after_budget(nsidc_server, temp_dir):
+    """Test that runs of the same plan file under a time budget continue with the deferred granules."""
+    from datetime import datetime
+    from types import SimpleNamespace
+    from fetch_snow_data import VIIRSSnowDataProcessor
+    
+    archive_file = str(Path(temp_dir) / "archive.db")
+    pixels_by_tile = {"h18v04": [(10, 20), (1500, 1000)]}
+    plan_file = str(Path(temp_dir) / "fetch-plan.json")
+    
+    def create_processor():
+        processor = VIIRSSnowDataProcessor(archive_file=archive_file, decode_workers=0,
+                                           base_url=nsidc_server.base_url, batch_units=2)
+        processor.start_date, processor.end_date = datetime(2024, 1, 1), datetime(2024, 1, 22)
+        processor.data_fetcher.rate_limit_delay = 0
+        return processor
+    
+    processor = create_processor()
+    try:
+        processor.write_plan(processor.plan_work(pixels_by_tile, ["h18v04"]), pixels_by_tile, plan_file)
+    finally:
+        processor.data_fetcher.cleanup()
+        processor.archive_manager.close()
+    
+    def run_plan(budget_granules):
+        # The budget runs out once budget_granules more granules were requested
+        granule_requests = nsidc_server.stats['granule_requests']
+        budget = SimpleNamespace(
+            seconds=60, remaining=lambda: 60,
+            exhausted=lambda: nsidc_server.stats['granule_requests'] - granule_requests >= budget_granules
+        )
+        processor = create_processor()
+        try:
+            return processor.run_plan_file(plan_file, budget=budget)
+        finally:
+            processor.data_fetcher.cleanup()
+            processor.archive_manager.close()
+    
+    def missing_dates():
+        processor = create_processor()
+        try:
+            missing = processor.archive_manager.get_missing_weeks_for_pixels(
+                "h18v04", pixels_by_tile["h18v04"], processor.start_date, processor.end_date
+            )
+        finally:
+            processor.data_fetcher.cleanup()
+            processor.archive_manager.close()
+        return sorted({date for missing_weeks in missing.values() for date, _ in missing_weeks})
+    
+    # The first run fetches the two most recent granules
+    assert run_plan(2)['processed_weeks'] == 2
+    assert missing_dates() == [datetime(2024, 1, 1), datetime(2024, 1, 8)]
+    
+    # The second run fetches the two deferred granules instead of the same first batch
+    assert run_plan(2)['processed_weeks'] == 2
+    assert missing_dates() == []
+    assert nsidc_server.stats['granule_requests'] == 4
+    
+    # Nothing is left for a third run
+    assert run_plan(2)['processed_weeks'] == 0
+    assert nsidc_server.stats['granule_requests'] == 4
+
+
+# Coordination Tests
+def test_shards_partition_tiles():
+    """Test that shards split tiles into disjoint sets covering all tiles."""
+    from coordination import parse_shard, tile_in_shard
+    
+    assert parse_shard("1/4") == (1, 4)
+    for spec in ("4/4", "-1/4", "1", "a/b"):
+        with pytest.raises(ValueError):
+            parse_shard(spec)
+    
+    tiles = [f"h{h:02d}v{v:02d}" for h in range(36) for v in range(18)]
+    shards = [{tile for tile in tiles if tile_in_shard(tile, index, 4)} for index in range(4)]
+    assert sum(len(shard) for shard in shards) == len(tiles)
+    assert set().union(*shards) == set(tiles)
+    assert all(len(shard) > len(tiles) / 8 for shard in shards)
+
+
+def test_merge_archives(archive, temp_dir):
+    """Test that merging fills missing weeks and replaces error codes but keeps observations."""
+    from merge_archives import merge_archive
+    from snow_cover_sqlite_archive import SnowCoverSQLiteArchive
+    from utils import create_empty_year_data
+    
+    target_year = create_empty_year_data(2024)
+    target_year.data[0] = [80, 0]
+    target_year.data[1] = [ERROR_OTHER, 0]
+    archive.save_pixel_data("h18v04", 1, 1, [target_year])
+    
+    source = SnowCoverSQLiteArchive(str(Path(temp_dir) / "node.db"))
+    source.initialize()
+    try:
+        source_year = create_empty_year_data(2024)
+        source_year.data[0] = [10, 0]
+        source_year.data[1] = [60, 2]
+        source_year.data[2] = [ERROR_OLD_MISSING, 0]
+        source.save_pixel_data("h18v04", 1, 1, [source_year, create_empty_year_data(2023)])
+        new_pixel_year = create_empty_year_data(2023)
+        new_pixel_year.data[5] = [0, 0]
+        source.save_pixel_data("h18v04", 2, 2, [new_pixel_year])
+        
+        assert merge_archive(archive, source) == {'pixels': 2, 'updated_pixels': 2, 'weeks': 3}
+        # Merging again changes nothing
+        assert merge_archive(archive, source)['weeks'] == 0
+    finally:
+        source.close()
+    
+    merged = archive.load_pixel_data("h18v04", 1, 1)
+    assert [year_data.year for year_data in merged] == [2024]
+    assert merged[0].data[:3] == [[80, 0], [60, 2], [ERROR_OLD_MISSING, 0]]
+    assert archive.load_pixel_data("h18v04", 2, 2)[0].data[5] == [0, 0]
+
+
+def test_fetch_lease_table(postgres_db_config, lease_job):
+    """Test claiming units, recording progress and reclaiming expired leases."""
+    import time
+    from datetime import datetime
+    from coordination import FetchLeaseTableSync
+    
+    # Worker A does not renew its lease, as if it had crashed
+    worker_a = FetchLeaseTableSync(lease_job, postgres_db_config, lease_seconds=1, worker_id="a",
+                                   renew_interval=60)
+    worker_b = FetchLeaseTableSync(lease_job, postgres_db_config, lease_seconds=1, worker_id="b")
+    worker_a.initialize()
+    worker_b.initialize()
+    try:
+        assert worker_a.register_units([("h18v04", 2023), ("h18v04", 2024)]) == 2
+        assert worker_b.register_units([("h18v04", 2023), ("h18v04", 2024)]) == 0
+        
+        lease_a = worker_a.claim()
+        assert (lease_a.tile, lease_a.year, lease_a.done_dates) == ("h18v04", 2024, set())
+        worker_a.record_dates(lease_a, [datetime(2024, 1, 1)])
+        assert not lease_a.should_stop()
+        
+        lease_b = worker_b.claim()
+        assert (lease_b.tile, lease_b.year) == ("h18v04", 2023)
+        assert worker_b.claim() is None
+        
+        time.sleep(1.2)
+        # A stops starting granules before its lease can be reclaimed; B keeps renewing
+        assert lease_a.should_stop()
+        reclaimed = worker_b.claim()
+        assert (reclaimed.year, reclaimed.attempts, reclaimed.done_dates) == (2024, 2, {datetime(2024, 1, 1)})
+        assert not worker_a.complete(lease_a)
+        
+        assert worker_b.complete(lease_b)
+        assert worker_b.unfinished_count() == 1
+        assert worker_b.complete(reclaimed)
+        assert worker_b.get_stats() == {'done': 2}
+    finally:
+        worker_a.close()
+        worker_b.close()
+
+
+def test_leased_fetch_never_repeats_granules(nsidc_server, temp_dir, postgres_db_config, lease_job):
+    """Test two workers sharing a job: the second continues where the first stopped."""
+    from datetime import datetime
+    from types import SimpleNamespace
+    from fetch_snow_data import VIIRSSnowDataProcessor
+    from merge_archives import merge_archive
+    from snow_cover_sqlite_archive import SnowCoverSQLiteArchive
+    
+    pixels_by_tile = {"h18v04": [(10, 20), (1500, 1000)]}
+    archive_files = [str(Path(temp_dir) / f"node-{node}.db") for node in range(2)]
+    
+    def run_worker(archive_file, budget):
+        processor = VIIRSSnowDataProcessor(archive_file=archive_file, decode_workers=0,
+                                           base_url=nsidc_server.base_url, batch_units=2,
+                                           lease_job=lease_job, lease_db_config=postgres_db_config)
+        processor.start_date, processor.end_date = datetime(2023, 12, 18), datetime(2024, 1, 15)
+        processor.data_fetcher.rate_limit_delay = 0
+        try:
+            return processor.process_leased_units(pixels_by_tile, ["h18v04"], budget, poll_seconds=0.1)
+        finally:
+            processor.data_fetcher.cleanup()
+            processor.archive_manager.close()
+            processor.lease_table.close()
+    
+    # The first worker runs out of time after one batch of the 2024 unit
+    first = run_worker(archive_files[0], SimpleNamespace(
+        exhausted=lambda: nsidc_server.stats['granule_requests'] >= 2
+    ))
+    second = run_worker(archive_files[1], None)
+    assert (first['processed_weeks'], second['processed_weeks']) == (2, 3)
+    assert nsidc_server.stats['granule_requests'] == 5
+    
+    target = SnowCoverSQLiteArchive(str(Path(temp_dir) / "merged.db"))
+    target.initialize()
+    try:
+        for archive_file in archive_files:
+            source = SnowCoverSQLiteArchive(archive_file, read_only=True)
+            source.initialize()
+            merge_archive(target, source)
+            source.close()
+        missing = target.get_missing_weeks_for_pixels(
+            "h18v04", pixels_by_tile["h18v04"], datetime(2023, 12, 18), datetime(2024, 1, 15)
+        )
+    finally:
+        target.close()
+    assert all(weeks == [] for weeks in missing.values())
+
+
+# Worker Service Tests
+def test_worker_service_keeps_processor_warm(temp_dir, pixel_extractor, sample_geojson_file, caplog):
+    """Test streamed jobs on the worker service reuse its processor and granule index."""
+    import json
+    import logging
+    import threading
+    import requests
+    from nsidc_server import NSIDCStandInServer
+    from snow_cover_sqlite_archive import SnowCoverSQLiteArchive
+    from utils import create_empty_year_data
+    from worker_service import SnowCoverWorker, create_server
+    
+    caplog.set_level(logging.INFO)
+    # A second run in the next tile east, searched in the granule index by a later job
+    other_geojson_file = str(Path(temp_dir) / "other_runs.geojson")
+    with open(sample_geojson_file) as f:
+        other_runs = json.load(f)
+    other_runs['features'][0]['geometry']['coordinates'] = [[
+        [16.0, 47.0], [16.001, 47.0], [16.001, 47.001], [16.0, 47.001], [16.0, 47.0]
+    ]]
+    with open(other_geojson_file, 'w') as f:
+        json.dump(other_runs, f)
+    
+    # The runs' pixels are archived except for one week of 2024, so each run's first job fetches one granule
+    archive_file = str(Path(temp_dir) / "archive.db")
+    archive = SnowCoverSQLiteArchive(archive_file)
+    archive.initialize()
+    for geojson_file in (sample_geojson_file, other_geojson_file):
+        for tile, pixel_row, pixel_col in pixel_extractor.extract_unique_pixels_from_geojson(geojson_file):
+            year_data = create_empty_year_data(2024)
+            year_data.data = [[0, 0] for _ in year_data.data]
+            year_data.data[1] = [None, 0]
+            archive.save_pixel_data(tile, pixel_row, pixel_col, [year_data])
+    archive.close()
+    
+    nsidc_server = NSIDCStandInServer(tiles=["h18v04", "h19v04"])
+    nsidc_server.start()
+    worker = SnowCoverWorker()
+    server = create_server(worker, port=0)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{server.server_address[1]}"
+    options = ["--archive-file", archive_file, "--base-url", nsidc_server.base_url,
+               "--from-year", "2024", "--to-year", "2024", "--decode-workers", "0",
+               "--discovery", "cmr", "--cmr-url", nsidc_server.catalog_url]
+    args = [sample_geojson_file, *options]
+    
+    def submit(job_args):
+        with requests.post(f"{url}/jobs", json={'args': job_args}, stream=True, timeout=60) as response:
+            response.raise_for_status()
+            return [json.loads(line) for line in response.iter_lines() if line]
+    
+    try:
+        assert requests.get(f"{url}/health", timeout=5).json()['busy'] is False
+        response = requests.post(f"{url}/jobs", json={'args': ["--from-year", "2000", "--fill-cache"]}, timeout=5)
+        assert response.status_code == 400
+        assert "2012" in response.json()['error']
+        
+        events = submit(args)
+        assert events[0] == {'event': 'accepted', 'queued': False}
+        assert any(event['event'] == 'log' and 'fetch process' in event['message'] for event in events)
+        result = events[-1]
+        assert (result['event'], result['success']) == ('result', True)
+        assert result['metrics']['stages']['download']['items'] == 1
+        processor = worker.processor
+        catalog_requests = nsidc_server.stats['catalog_requests']
+        assert catalog_requests > 0
+        
+        # The second job finds nothing to fetch and runs on the same processor
+        events = submit(args)
+        assert events[-1]['success'] is True
+        assert 'download' not in events[-1]['metrics']['stages']
+        assert worker.processor is processor
+        assert nsidc_server.stats['granule_requests'] == 1
+        assert requests.get(f"{url}/health", timeout=5).json()['jobs'] == 2
+        
+        # The third job, on another request thread, searches the new tile into the same index
+        events = submit([other_geojson_file, *options])
+        assert events[-1]['success'] is True
+        assert worker.processor is processor
+        assert nsidc_server.stats['catalog_requests'] > catalog_requests
+        assert nsidc_server.stats['granule_requests'] == 2
+        assert nsidc_server.stats['listing_requests'] == 0
+        assert not any('falling back' in event.get('message', '') for event in events)
+        
+        # Other processor options need a new processor
+        submit(args + ["--fixed-concurrency"])
+        assert worker.processor is not processor
+    finally:
+        requests.post(f"{url}/shutdown", timeout=5)
+        server.server_close()
+        worker.close()
+        nsidc_server.stop()
+
+
 def test_data_fetcher_filename_patterns(data_fetcher, sample_dates):
     """Test data fetcher filename pattern generation."""
     for date in sample_dates:
@@ -155,8 +842,734 @@ def test_data_fetcher_date_classification(data_fetcher):
     assert not data_fetcher._is_old_date(recent_date)
 
 
+def test_data_fetcher_read_dataset_pixels(synthetic_granule):
+    """Test chunk-wise pixel reads match direct dataset indexing."""
+    import h5py
+    from constants import SNOW_COVER_DATASET
+    from data_fetcher import read_dataset_pixels, pixels_to_arrays, MISSING_PIXEL_VALUE
+    
+    pixels = [(0, 0), (150, 2999), (2999, 5), (1500, 1500), (1501, 1500), (3000, 10), (-1, 4)]
+    rows, cols = pixels_to_arrays(pixels)
+    
+    with h5py.File(synthetic_granule, 'r+') as f:
+        dataset = f[SNOW_COVER_DATASET]
+        expected = [int(dataset[row, col]) for row, col in pixels[:5]]
+        expected += [MISSING_PIXEL_VALUE, MISSING_PIXEL_VALUE]
+        assert read_dataset_pixels(dataset, rows, cols, MISSING_PIXEL_VALUE).tolist() == expected
+        
+        # Contiguous datasets are read through the bounding window
+        contiguous = f.create_dataset('contiguous', data=dataset[:])
+        assert contiguous.chunks is None
+        assert read_dataset_pixels(contiguous, rows, cols, MISSING_PIXEL_VALUE).tolist() == expected
+
+
+def test_data_fetcher_decode_hdf_pixels(synthetic_granule):
+    """Test vectorized decoding matches the per-dataset extraction methods."""
+    from data_fetcher import VIIRSDataFetcher, decode_hdf_pixels, pixels_to_arrays
+    
+    fetcher = VIIRSDataFetcher(decode_workers=0)
+    pixels = [(10, 20), (1500, 1000), (2999, 2999)]
+    values, cloud_persistence = decode_hdf_pixels(str(synthetic_granule), *pixels_to_arrays(pixels))
+    
+    assert values.tolist() == fetcher.extract_pixel_values(synthetic_granule, pixels)
+    assert cloud_persistence.tolist() == fetcher.get_cloud_persistence_value(synthetic_granule, pixels)
+    fetcher.cleanup()
+
+
+@pytest.mark.parametrize("decode_workers", [0, 2])
+def test_data_fetcher_parallel_decode(temp_dir, synthetic_granule, decode_workers):
+    """Test downloads feed the decode stage and missing files get error codes."""
+    import shutil
+    from datetime import datetime
+    from data_fetcher import VIIRSDataFetcher
+    
+    fetcher = VIIRSDataFetcher(decode_workers=decode_workers)
+    available = datetime(2024, 1, 8)
+    missing = datetime(2020, 1, 6)
+    
+    def fake_download(tile, date):
+        if date != available:
+            return None
+        return Path(shutil.copy(synthetic_granule, fetcher.cache_dir / f"{date:%Y%m%d}.h5"))
+    
+    fetcher.download_hdf_file = fake_download
+    pixels = [(10, 20), (1500, 1000)]
+    try:
+        results = fetcher.process_tile_dates_parallel(
+            "h18v04", {available: pixels, missing: pixels}, max_workers=2
+        )
+        assert not list(fetcher.cache_dir.glob("*.h5"))
+        expected = fetcher.process_tile_date("h18v04", available, pixels)
+    finally:
+        fetcher.cleanup()
+    
+    assert results[available] == expected
+    assert results[missing] == {pixel: (ERROR_OLD_MISSING, 0) for pixel in pixels}
+
+
+def test_data_fetcher_local_server(nsidc_server):
+    """Test the full fetch path against the local NSIDC stand-in server."""
+    from datetime import datetime
+    from data_fetcher import VIIRSDataFetcher, decode_hdf_pixels, pixels_to_arrays
+    
+    date = datetime(2024, 1, 8)
+    pixels = [(10, 20), (1500, 1000)]
+    fetcher = VIIRSDataFetcher(decode_workers=0, base_url=nsidc_server.base_url, rate_limit_delay=0)
+    try:
+        results = fetcher.process_tile_date("h18v04", date, pixels)
+    finally:
+        fetcher.cleanup()
+    
+    values, cloud_persistence = decode_hdf_pixels(
+        str(nsidc_server.granule_path("h18v04", date)), *pixels_to_arrays(pixels)
+    )
+    assert results == {
+        pixel: (value, persistence)
+        for pixel, value, persistence in zip(pixels, values.tolist(), cloud_persistence.tolist())
+    }
+    assert nsidc_server.stats['listing_requests'] == 1
+    assert nsidc_server.stats['granule_requests'] == 1
+
+
+def test_data_fetcher_interrupted_download(nsidc_server, monkeypatch):
+    """Test an interrupted download leaves no partial granule for the retry to reuse."""
+    import requests
+    from datetime import datetime
+    from data_fetcher import VIIRSDataFetcher
+    
+    date = datetime(2024, 1, 8)
+    fetcher = VIIRSDataFetcher(decode_workers=0, base_url=nsidc_server.base_url, rate_limit_delay=0)
+    get = fetcher.session.get
+    
+    def interrupted_get(*args, **kwargs):
+        response = get(*args, **kwargs)
+        iter_content = response.iter_content
+        
+        def interrupted_iter_content(chunk_size):
+            yield next(iter_content(chunk_size))
+            raise requests.ConnectionError("Connection reset by peer")
+        
+        response.iter_content = interrupted_iter_content
+        return response
+    
+    try:
+        monkeypatch.setattr(fetcher.session, 'get', interrupted_get)
+        with pytest.raises(requests.ConnectionError):
+            fetcher.download_hdf_file("h18v04", date)
+        assert not list(fetcher.cache_dir.iterdir())
+        
+        monkeypatch.undo()
+        path = fetcher.download_hdf_file("h18v04", date)
+        assert path.read_bytes() == nsidc_server.granule_path("h18v04", date).read_bytes()
+        assert list(fetcher.cache_dir.iterdir()) == [path]
+    finally:
+        fetcher.cleanup()
+
+
+def test_data_fetcher_listing_cache():
+    """Test that a date's directory listing answers the lookups of all its tiles."""
+    from datetime import datetime
+    from data_fetcher import VIIRSDataFetcher
+    from nsidc_server import NSIDCStandInServer
+    
+    date = datetime(2024, 1, 8)
+    with NSIDCStandInServer(tiles=["h18v04", "h19v04"]) as server:
+        fetcher = VIIRSDataFetcher(decode_workers=0, base_url=server.base_url, rate_limit_delay=0)
+        try:
+            found = [fetcher.find_exact_filename(tile, date) for tile in ("h18v04", "h19v04", "h20v04")]
+            assert fetcher.find_exact_filename("h18v04", date) == found[0]
+        finally:
+            fetcher.cleanup()
+        
+        assert [filename.split('.')[2] for filename, url in found[:2]] == ["h18v04", "h19v04"]
+        assert found[2] == (None, None)
+        assert server.stats['listing_requests'] == 1
+        assert fetcher.metrics.summary()['counters']['listing_cache_hits'] == 3
+
+
+def test_data_fetcher_local_server_missing(nsidc_server):
+    """Test missing directories and unknown tiles map to missing data codes."""
+    from datetime import datetime
+    from data_fetcher import VIIRSDataFetcher
+    
+    nsidc_server.missing_rate = 1.0
+    fetcher = VIIRSDataFetcher(decode_workers=0, base_url=nsidc_server.base_url, rate_limit_delay=0)
+    try:
+        assert fetcher.process_tile_date("h18v04", datetime(2020, 1, 6), [(1, 1)]) == {(1, 1): (ERROR_OLD_MISSING, 0)}
+        nsidc_server.missing_rate = 0.0
+        assert fetcher.process_tile_date("h19v04", datetime(2020, 1, 6), [(1, 1)]) == {(1, 1): (ERROR_OLD_MISSING, 0)}
+    finally:
+        fetcher.cleanup()
+
+
+def test_data_fetcher_remote_reads(nsidc_server):
+    """Test reading pixels through HTTP Range requests instead of downloading granules."""
+    from datetime import datetime
+    from data_fetcher import VIIRSDataFetcher, decode_hdf_pixels, pixels_to_arrays
+    
+    date = datetime(2024, 1, 8)
+    pixels = [(10, 20), (15, 25), (2990, 2990)]
+    fetcher = VIIRSDataFetcher(decode_workers=0, base_url=nsidc_server.base_url, rate_limit_delay=0,
+                               remote_reads=True)
+    try:
+        results = fetcher.process_tile_date("h18v04", date, pixels)
+        assert fetcher.process_tile_date("h19v04", date, [(1, 1)]) == {(1, 1): (ERROR_OLD_MISSING, 0)}
+    finally:
+        fetcher.cleanup()
+    
+    granule_path = nsidc_server.granule_path("h18v04", date)
+    values, cloud_persistence = decode_hdf_pixels(str(granule_path), *pixels_to_arrays(pixels))
+    assert results == {
+        pixel: (value, persistence)
+        for pixel, value, persistence in zip(pixels, values.tolist(), cloud_persistence.tolist())
+    }
+    
+    # Only the metadata and the two touched chunks of each dataset are transferred
+    summary = fetcher.metrics.summary()
+    assert nsidc_server.stats['range_requests'] == summary['counters']['range_requests'] > 0
+    assert summary['stages']['download']['bytes'] == nsidc_server.stats['bytes_sent']
+    assert nsidc_server.stats['bytes_sent'] < granule_path.stat().st_size / 10
+
+
+def test_data_fetcher_remote_reads_fallback(nsidc_server):
+    """Test falling back to whole downloads when the server ignores Range headers."""
+    from datetime import datetime
+    from data_fetcher import VIIRSDataFetcher
+    
+    nsidc_server.range_requests = False
+    fetcher = VIIRSDataFetcher(decode_workers=0, base_url=nsidc_server.base_url, rate_limit_delay=0,
+                               remote_reads=True)
+    try:
+        results = fetcher.process_tile_date("h18v04", datetime(2024, 1, 8), [(10, 20)])
+    finally:
+        fetcher.cleanup()
+    
+    # The granule was downloaded and decoded instead
+    assert results[(10, 20)][0] not in (ERROR_OLD_MISSING, ERROR_RECENT_MISSING)
+    assert nsidc_server.stats['granule_requests'] == 2
+    assert fetcher.remote_reads is False
+    assert nsidc_server.stats['range_requests'] == 0
+
+
+def test_granule_discovery_index(nsidc_server, temp_dir):
+    """Test resolving granules with paged catalog searches and reading them from the index."""
+    from datetime import datetime, timedelta
+    from data_fetcher import VIIRSDataFetcher
+    from granule_discovery import CMRGranuleDiscovery, GranuleIndex
+    
+    nsidc_server.tiles.add("h19v04")
+    nsidc_server.missing_rate = 0.2
+    start, end = datetime(2024, 1, 1), datetime(2024, 1, 31)
+    dates = [start + timedelta(days=day) for day in range(31)]
+    available = [date for date in dates if not nsidc_server.is_missing_date(date)]
+    assert 0 < len(available) < len(dates)
+    
+    index = GranuleIndex(str(Path(temp_dir) / "granule-index.db"))
+    index.initialize()
+    discovery = CMRGranuleDiscovery(nsidc_server.catalog_url, page_size=7)
+    try:
+        assert discovery.discover(index, ["h18v04", "h19v04"], start, end) == 2 * len(available)
+        # Both tiles in one search, one request per page
+        assert nsidc_server.stats['catalog_requests'] == -(-2 * len(available) // 7)
+        
+        # Old dates are settled: searching again costs nothing
+        assert discovery.discover(index, ["h18v04", "h19v04"], start, end) == 0
+        assert nsidc_server.stats['catalog_requests'] == -(-2 * len(available) // 7)
+        
+        fetcher = VIIRSDataFetcher(decode_workers=0, base_url=nsidc_server.base_url, rate_limit_delay=0,
+                                   granule_index=index)
+        try:
+            missing_date = next(date for date in dates if nsidc_server.is_missing_date(date))
+            assert fetcher.find_exact_filename("h18v04", missing_date) == (None, None)
+            results = fetcher.process_tile_date("h18v04", available[0], [(10, 20)])
+            # Dates outside the searched range fall back to the directory listing
+            later_date = next(date for date in (end + timedelta(days=day) for day in range(1, 30))
+                              if not nsidc_server.is_missing_date(date))
+            filename, url = fetcher.find_exact_filename("h18v04", later_date)
+        finally:
+            fetcher.cleanup()
+        
+        assert results[(10, 20)][0] not in (ERROR_OLD_MISSING, ERROR_RECENT_MISSING)
+        assert filename and url.endswith(filename)
+        assert nsidc_server.stats['listing_requests'] == 1
+        assert fetcher.metrics.summary()['counters']['granule_index_hits'] == 2
+    finally:
+        index.close()
+    
+    # The index persists across runs
+    reopened = GranuleIndex(str(Path(temp_dir) / "granule-index.db"))
+    reopened.initialize()
+    try:
+        assert reopened.get_stats() == {'granules': 2 * len(available), 'searched_tiles': 2}
+        assert reopened.unsettled_range("h18v04", start, end) is None
+        assert reopened.unsettled_range("h18v04", start, datetime(2024, 3, 1)) == (datetime(2024, 2, 1), datetime(2024, 3, 1))
+    finally:
+        reopened.close()
+
+
+def test_aimd_concurrency_controller(monkeypatch):
+    """Test additive increase on steady windows and multiplicative decrease on throttling."""
+    from types import SimpleNamespace
+    import concurrency
+    from concurrency import AIMDConcurrencyController
+    from metrics import PipelineMetrics
+    
+    clock = SimpleNamespace(now=0.0)
+    monkeypatch.setattr(concurrency, 'time', SimpleNamespace(monotonic=lambda: clock.now))
+    
+    def complete(controller, count, seconds):
+        """Complete granules that each took seconds, running limit at a time."""
+        for _ in range(count):
+            clock.now += seconds / controller.limit
+            controller.task_done(seconds)
+    
+    metrics = PipelineMetrics()
+    controller = AIMDConcurrencyController(initial=4, maximum=6, metrics=metrics)
+    
+    # Each full window of equally fast granules raises throughput and adds one, up to the maximum
+    for expected in (5, 6, 6):
+        complete(controller, controller.limit, 0.1)
+        assert controller.limit == expected
+    
+    # Throttling halves once, however many requests in flight report it
+    controller.observe_response(200)
+    controller.observe_response(429)
+    controller.observe_response(503)
+    assert controller.limit == 3
+    
+    # The throttled window is not compared; then latency far above the best window steps back by one
+    complete(controller, 4, 0.1)
+    assert controller.limit == 3
+    complete(controller, 4, 1.0)
+    assert controller.limit == 2
+    
+    summary = metrics.summary()
+    assert summary['counters']['throttle_signals'] == 2
+    assert summary['concurrency']['max'] == 6
+    assert summary['concurrency']['final'] == 2
+    assert [sample['reason'] for sample in summary['concurrency']['timeline']][-3:] == [
+        'throttled (HTTP 429)', 'throttled window', 'latency inflated'
+    ]
+    
+    fixed = AIMDConcurrencyController(initial=4, adaptive=False)
+    fixed.observe_response(429)
+    complete(fixed, 8, 0.1)
+    assert fixed.limit == fixed.maximum == 4
+
+
+def test_data_fetcher_backs_off_when_throttled(nsidc_server):
+    """Test that 429 responses lower the download concurrency and are not recorded as missing data."""
+    from datetime import datetime, timedelta
+    from concurrency import AIMDConcurrencyController
+    from data_fetcher import VIIRSDataFetcher
+    
+    nsidc_server.throttle_concurrency = 2
+    dates = [datetime(2024, 1, 1) + timedelta(weeks=week) for week in range(6)]
+    for date in dates:
+        nsidc_server.granule_path("h18v04", date)
+    
+    controller = AIMDConcurrencyController(initial=6, maximum=6)
+    fetcher = VIIRSDataFetcher(decode_workers=0, base_url=nsidc_server.base_url, rate_limit_delay=0,
+                               concurrency=controller)
+    try:
+        results = fetcher.process_tile_dates_parallel("h18v04", {date: [(10, 20)] for date in dates})
+    finally:
+        fetcher.cleanup()
+    
+    assert nsidc_server.stats['throttled'] > 0
+    assert controller.limit < 6
+    values = [date_results[(10, 20)][0] for date_results in results.values()]
+    assert len(values) == len(dates)
+    # Throttled granules are retryable errors, not missing granules
+    assert ERROR_OLD_MISSING not in values and ERROR_RECENT_MISSING not in values
+    assert values.count(ERROR_OTHER) == nsidc_server.stats['throttled']
+
+
+# Metrics Tests
+def test_metrics_summary(temp_dir):
+    """Test stage summaries, queue depths and the JSON/Prometheus outputs."""
+    import json
+    from metrics import PipelineMetrics
+    
+    metrics = PipelineMetrics()
+    metrics.record('download', 0.5, nbytes=1000, start=100.0)
+    metrics.record('download', 1.5, nbytes=3000, start=100.5)
+    with pytest.raises(ValueError):
+        with metrics.timed('decode'):
+            raise ValueError("corrupt granule")
+    metrics.observe_queue('decodes_pending', 2)
+    metrics.observe_queue('decodes_pending', 4)
+    metrics.increment('granules_missing')
+    
+    summary = metrics.summary()
+    download = summary['stages']['download']
+    assert download['count'] == 2
+    assert download['unit'] == 'granules'
+    assert download['wall_seconds'] == 2.0
+    assert (download['started_at'], download['ended_at']) == (100.0, 102.0)
+    assert download['items_per_second'] == 1.0
+    assert download['bytes_per_second'] == 2000.0
+    assert download['max_ms'] == 1500.0
+    assert summary['stages']['decode']['errors'] == 1
+    assert summary['queues']['decodes_pending'] == {'samples': 2, 'mean': 3.0, 'max': 4, 'last': 4}
+    assert summary['counters'] == {'granules_missing': 1}
+    
+    metrics.write_json(str(Path(temp_dir) / "metrics.json"))
+    assert json.loads((Path(temp_dir) / "metrics.json").read_text())['stages']['download']['bytes'] == 4000
+    
+    metrics.write_prometheus(str(Path(temp_dir) / "metrics.prom"))
+    prometheus = (Path(temp_dir) / "metrics.prom").read_text()
+    assert '# TYPE snow_cover_stage_bytes_total counter' in prometheus
+    assert 'snow_cover_stage_bytes_total{stage="download"} 4000' in prometheus
+    assert 'snow_cover_queue_depth_max{queue="decodes_pending"} 4' in prometheus
+    assert 'snow_cover_events_total{event="granules_missing"} 1' in prometheus
+
+
+def test_metrics_local_server(nsidc_server):
+    """Test the fetcher records listing, download and decode metrics."""
+    from datetime import datetime
+    from data_fetcher import VIIRSDataFetcher
+    from metrics import PipelineMetrics
+    
+    metrics = PipelineMetrics()
+    fetcher = VIIRSDataFetcher(decode_workers=0, base_url=nsidc_server.base_url,
+                               rate_limit_delay=0, metrics=metrics)
+    try:
+        fetcher.process_tile_dates_parallel("h18v04", {
+            datetime(2024, 1, 8): [(10, 20)],
+            datetime(2024, 1, 15): [(10, 20)],
+        }, max_workers=2)
+    finally:
+        fetcher.cleanup()
+    
+    stages = metrics.summary()['stages']
+    assert stages['listing']['count'] == 2
+    assert stages['download']['count'] == 2
+    assert stages['download']['bytes'] == nsidc_server.stats['bytes_sent']
+    assert stages['decode']['count'] == 2
+    assert stages['decode']['errors'] == 0
+
+
+# Profiling Tests
+@pytest.mark.parametrize("mode", ["cprofile", "sampling"])
+def test_stage_profiler(temp_dir, mode):
+    """Test per-stage profiles, collapsed stacks and memory peaks are written."""
+    import json
+    import time
+    from profiling import StageProfiler
+    
+    def busy_planning():
+        deadline = time.perf_counter() + 0.2
+        buffers = []
+        while time.perf_counter() < deadline:
+            buffers.append(bytearray(1024))
+        return len(buffers)
+    
+    with StageProfiler(mode=mode, sample_interval=0.001) as profiler:
+        for _ in range(2):
+            with profiler.stage('planning'):
+                busy_planning()
+        with profiler.stage('archive_writes'):
+            pass
+        with pytest.raises(RuntimeError):
+            with profiler.stage('fetching'):
+                with profiler.stage('archive_writes'):
+                    pass
+    
+    output_dir = profiler.write(str(Path(temp_dir) / "profiles"))
+    
+    summary = json.loads((output_dir / "profile_summary.json").read_text())
+    planning = summary['stages']['planning']
+    assert summary['mode'] == mode
+    assert planning['calls'] == 2
+    assert planning['wall_seconds'] >= 0.4
+    assert planning['samples'] > 0
+    assert planning['python_peak_bytes'] > 0
+    assert planning['max_rss_bytes'] > 0
+    
+    stacks = (output_dir / "stacks.collapsed").read_text().splitlines()
+    assert any(line.startswith("planning;MainThread;") and "busy_planning" in line for line in stacks)
+    assert all(line.rsplit(" ", 1)[1].isdigit() for line in stacks)
+    
+    assert (output_dir / "planning.prof").exists() == (mode == "cprofile")
+    if mode == "cprofile":
+        assert "busy_planning" in (output_dir / "planning.txt").read_text()
+
+
+# Postgres Cache Tests
+def test_postgres_cache_get_many_set_many(postgres_cache):
+    """Test batched reads and small executemany batches."""
+    postgres_cache.set_many({"a": {"value": 1}, "b": [[85, 0], [None, 0]]})
+    postgres_cache.set("c", "single")
+    
+    assert postgres_cache.get_many(["a", "b", "c", "missing"]) == {
+        "a": {"value": 1}, "b": [[85, 0], [None, 0]], "c": "single"
+    }
+    assert postgres_cache.get_many([]) == {}
+    
+    # Later duplicates of a key win
+    postgres_cache.set_many([("a", 1), ("a", 2)])
+    assert postgres_cache.get("a") == 2
+
+
+def test_postgres_cache_set_many_copy(postgres_cache):
+    """Test large batches are copied and upserted over existing entries."""
+    from postgres_cache import COPY_THRESHOLD
+    
+    count = COPY_THRESHOLD * 2
+    postgres_cache.set_many((f"pixel:{i}", [[i, 0]]) for i in range(count))
+    postgres_cache.set_many((f"pixel:{i}", [[i, 1]]) for i in range(0, count, 2))
+    
+    assert postgres_cache.size() == count
+    assert postgres_cache.get_many(f"pixel:{i}" for i in range(4)) == {
+        "pixel:0": [[0, 1]], "pixel:1": [[1, 0]], "pixel:2": [[2, 1]], "pixel:3": [[3, 0]]
+    }
+
+
+def test_postgres_cache_reuses_prepared_statements(postgres_db_config):
+    """Test repeated calls reuse the statements asyncpg prepared on the connection."""
+    import asyncio
+    import uuid
+    from postgres_cache import GET_SQL, SET_SQL, PostgresCache
+    
+    async def scenario():
+        # One pooled connection, so every call prepares on the same session
+        cache = PostgresCache(f"test_{uuid.uuid4().hex[:8]}", db_config=postgres_db_config, pool_size=1)
+        await cache.initialize()
+        
+        async def statement_names():
+            async with cache._pool.acquire() as conn:
+                rows = await conn.fetch("SELECT name, statement FROM pg_prepared_statements")
+            return {row['statement']: row['name'] for row in rows if row['statement'] in (GET_SQL, SET_SQL)}
+        
+        try:
+            await cache.set("a", 1)
+            await cache.get("a")
+            first = await statement_names()
+            for i in range(5):
+                await cache.set("a", i)
+                await cache.get("a")
+            return first, await statement_names()
+        finally:
+            await cache.clear()
+            await cache.close()
+    
+    first, later = asyncio.run(scenario())
+    assert set(first) == {GET_SQL, SET_SQL}
+    assert later == first
+
+
+def test_postgres_cache_expiry(postgres_db_config):
+    """Test expired entries are hidden from reads and removed in chunks by cleanup."""
+    import time
+    import uuid
+    from postgres_cache import PostgresCacheSync
+    
+    cache = PostgresCacheSync(f"test_{uuid.uuid4().hex[:8]}", ttl_ms=200, db_config=postgres_db_config)
+    cache.initialize()
+    try:
+        cache.set_many({f"old:{i}": i for i in range(7)})
+        time.sleep(0.3)
+        cache.set("fresh", 1)
+        
+        assert cache.get("old:0") is None
+        assert set(cache.get_many(["old:0", "old:1", "fresh"])) == {"fresh"}
+        # Reads do not delete expired entries
+        assert cache.size() == 8
+        
+        assert cache.cleanup(chunk_size=3) == 7
+        assert cache.size() == 1
+        assert cache.cleanup() == 0
+    finally:
+        cache.clear()
+        cache.close()
+
+
+def test_postgres_cache_background_cleanup(postgres_db_config):
+    """Test the background task removes expired entries."""
+    import asyncio
+    import uuid
+    from postgres_cache import PostgresCache
+    
+    async def scenario():
+        cache = PostgresCache(f"test_{uuid.uuid4().hex[:8]}", ttl_ms=50, db_config=postgres_db_config)
+        await cache.initialize()
+        try:
+            await cache.set_many({"a": 1, "b": 2})
+            cache.start_background_cleanup(interval_s=0.05)
+            for _ in range(40):
+                await asyncio.sleep(0.05)
+                if await cache.size() == 0:
+                    break
+            return await cache.size()
+        finally:
+            await cache.clear()
+            await cache.close()
+    
+    assert asyncio.run(scenario()) == 0
+
+
+def test_postgres_cache_sync_threads(postgres_db_config):
+    """Test the sync wrapper can be shared by worker threads and closed cleanly."""
+    import uuid
+    from concurrent.futures import ThreadPoolExecutor
+    from postgres_cache import PostgresCacheSync
+    
+    cache = PostgresCacheSync(f"test_{uuid.uuid4().hex[:8]}", db_config=postgres_db_config, pool_size=4)
+    cache.initialize()
+    
+    def worker(worker_id):
+        for i in range(20):
+            cache.set(f"{worker_id}:{i}", i)
+        return cache.size() >= 20 and all(cache.get(f"{worker_id}:{i}") is not None for i in range(20))
+    
+    try:
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            assert all(executor.map(worker, range(8)))
+        assert cache.size() == 160
+        cache.clear()
+    finally:
+        cache.close()
+    
+    assert not cache._thread.is_alive()
+    cache.close()
+    with pytest.raises(RuntimeError):
+        cache.size()
+
+
+def test_postgres_cache_jsonb_codec(postgres_cache, monkeypatch):
+    """Test JSONB values round-trip as Python objects with and without orjson."""
+    import postgres_cache as postgres_cache_module
+    from postgres_cache import encode_jsonb, decode_jsonb
+    
+    pixel_history = [{"year": 2024, "data": [[85, 0], [None, 2], [250, 1]]}]
+    postgres_cache.set("pixel", pixel_history)
+    assert postgres_cache.get("pixel") == pixel_history
+    postgres_cache.delete("pixel")
+    assert postgres_cache.get("pixel") is None
+    
+    encoded = encode_jsonb(pixel_history)
+    assert encoded.startswith(b"\x01") and b" " not in encoded
+    monkeypatch.setattr(postgres_cache_module, "orjson", None)
+    assert encode_jsonb(pixel_history) == encoded
+    assert decode_jsonb(encoded) == pixel_history
+    with pytest.raises(ValueError):
+        decode_jsonb(b"\x02{}")
+
+
+# GeoTIFF Conversion Tests
+def test_convert_hdf_to_cogs(hdf_to_geotiff, synthetic_granule, temp_dir):
+    """Test COGs converted from a granule keep its tile grid, fill value and pixels."""
+    import h5py
+    import numpy as np
+    from osgeo import gdal
+    from constants import DATA_FIELDS_GROUP, PIXEL_SIZE, TILE_SIZE_METERS
+    from data_fetcher import read_dataset_pixels, pixels_to_arrays, MISSING_PIXEL_VALUE
+    
+    output_dir = Path(temp_dir) / "cogs"
+    output_dir.mkdir()
+    names = ["CGF_NDSI_Snow_Cover", "Cloud_Persistence"]
+    output_files = hdf_to_geotiff.convert_hdf_to_cogs(str(synthetic_granule), str(output_dir), (2, 3))
+    assert output_files == [str(output_dir / f"{synthetic_granule.stem}_{name}.tif") for name in names]
+    
+    rows, cols = pixels_to_arrays([(0, 0), (150, 2999), (2999, 5), (1500, 1500), (2999, 2999)])
+    with h5py.File(synthetic_granule, 'r') as f:
+        for output_file, name in zip(output_files, names):
+            dataset = f[f"{DATA_FIELDS_GROUP}/{name}"]
+            cog = gdal.Open(output_file)
+            assert cog.GetMetadata("IMAGE_STRUCTURE").get("LAYOUT") == "COG"
+            # h18v04 starts at the central meridian, five tiles north of the equator
+            assert cog.GetGeoTransform() == pytest.approx(
+                (0.0, PIXEL_SIZE, 0.0, 5 * TILE_SIZE_METERS, 0.0, -PIXEL_SIZE))
+            
+            band = cog.GetRasterBand(1)
+            assert band.GetNoDataValue() == 255
+            data = band.ReadAsArray()
+            assert np.array_equal(data, dataset[()])
+            assert data[rows, cols].tolist() == \
+                read_dataset_pixels(dataset, rows, cols, MISSING_PIXEL_VALUE).tolist()
+            cog = None
+        snow_cover = f[f"{DATA_FIELDS_GROUP}/{names[0]}"][()]
+    
+    # Batch mode writes one COG per granule, named after it
+    batch_dir = Path(temp_dir) / "batch"
+    hdf_to_geotiff.batch_convert(temp_dir, str(batch_dir), workers=2)
+    assert sorted(path.name for path in batch_dir.iterdir()) == [f"{synthetic_granule.stem}.tif"]
+    cog = gdal.Open(str(batch_dir / f"{synthetic_granule.stem}.tif"))
+    assert np.array_equal(cog.GetRasterBand(1).ReadAsArray(), snow_cover)
+
+
+def test_mosaic_convert(hdf_to_geotiff, pixel_extractor, temp_dir):
+    """Test a mosaic across two tiles holds the tile pixels the pipeline locates for each position."""
+    import h5py
+    import numpy as np
+    from datetime import datetime
+    from osgeo import gdal
+    from constants import SNOW_COVER_DATASET, PIXEL_SIZE, TILE_SIZE_METERS
+    from data_fetcher import read_dataset_pixels, MISSING_PIXEL_VALUE
+    from synthetic_granules import write_synthetic_granule, granule_filename
+    
+    date = datetime(2024, 1, 8)
+    granules = {
+        tile: write_synthetic_granule(Path(temp_dir) / granule_filename(tile, date), tile, date,
+                                      extra_datasets=False)
+        for tile in ("h18v04", "h19v04")
+    }
+    
+    # Straddles the h18v04/h19v04 boundary, which runs near 14.15°E at 45°N
+    output_file = str(Path(temp_dir) / "mosaic.tif")
+    assert hdf_to_geotiff.mosaic_convert(temp_dir, output_file, date, bbox=(13.9, 45.0, 14.4, 45.2)) == [output_file]
+    
+    mosaic = gdal.Open(output_file)
+    geotransform = mosaic.GetGeoTransform()
+    band = mosaic.GetRasterBand(1)
+    assert band.GetNoDataValue() == 255
+    data = band.ReadAsArray()
+    
+    # Snapped to the pixel grid of h18v04, which starts at x = 0 and y = 5 tiles
+    assert (geotransform[1], geotransform[2], geotransform[4], geotransform[5]) == (PIXEL_SIZE, 0.0, 0.0, -PIXEL_SIZE)
+    assert geotransform[0] / PIXEL_SIZE == pytest.approx(round(geotransform[0] / PIXEL_SIZE), abs=1e-6)
+    offset_rows = (5 * TILE_SIZE_METERS - geotransform[3]) / PIXEL_SIZE
+    assert offset_rows == pytest.approx(round(offset_rows), abs=1e-6)
+    
+    tile_pixels = {}
+    for row in range(data.shape[0]):
+        for col in range(data.shape[1]):
+            pixel = pixel_extractor.sinusoidal_to_tile_and_pixel(geotransform[0] + (col + 0.5) * PIXEL_SIZE,
+                                                                 geotransform[3] - (row + 0.5) * PIXEL_SIZE)
+            tile_pixels.setdefault(pixel['tile'], []).append((row, col, pixel['pixel_row'], pixel['pixel_col']))
+    assert set(tile_pixels) == set(granules)
+    
+    for tile, pixels in tile_pixels.items():
+        mosaic_rows, mosaic_cols, rows, cols = (np.array(values) for values in zip(*pixels))
+        with h5py.File(granules[tile], 'r') as f:
+            expected = read_dataset_pixels(f[SNOW_COVER_DATASET], rows, cols, MISSING_PIXEL_VALUE)
+        assert data[mosaic_rows, mosaic_cols].tolist() == expected.tolist()
+
+
+# Startup Tests
+def test_stats_only_run_skips_heavy_imports(temp_dir):
+    """Test that an archive statistics run loads none of the geospatial, HDF or HTTP libraries."""
+    import subprocess
+    
+    script = f"""
+import sys
+sys.path.insert(0, {str(Path(__file__).parent.parent / "src")!r})
+from fetch_snow_data import VIIRSSnowDataProcessor, create_parser, processor_options, run_job, validate_args
+args = create_parser().parse_args(["--stats-only", "--archive-file", {str(Path(temp_dir) / "archive.db")!r}])
+validate_args(args)
+assert run_job(VIIRSSnowDataProcessor(**processor_options(args)), args)
+heavy = ("geopandas", "shapely", "pyproj", "h5py", "numpy", "requests", "asyncpg", "pyarrow")
+print("LOADED", ",".join(module for module in heavy if module in sys.modules))
+"""
+    result = subprocess.run([sys.executable, "-c", script], capture_output=True, text=True)
+    assert result.returncode == 0, result.stderr
+    assert "Archive Statistics:" in result.stdout
+    assert result.stdout.splitlines()[-1] == "LOADED "
+
+
 # Integration Tests
-def test_integration_full_workflow(pixel_extractor, cache_manager, sample_geojson_file):
+def test_integration_full_workflow(pixel_extractor, archive, sample_geojson_file):
     """Test simplified end-to-end workflow."""
     # Extract pixels
     unique_pixels = pixel_extractor.extract_unique_pixels_from_geojson(sample_geojson_file)
@@ -174,7 +1587,7 @@ def test_integration_full_workflow(pixel_extractor, cache_manager, sample_geojso
             start_date = datetime(2024, 1, 1)
             end_date = datetime(2024, 1, 31)
             
-            missing_weeks = cache_manager.get_missing_weeks_for_pixel(
+            missing_weeks = archive.get_missing_weeks_for_pixel(
                 tile, pixel_row, pixel_col, start_date, end_date
             )
             assert isinstance(missing_weeks, list)
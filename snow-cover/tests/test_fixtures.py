@@ -5,6 +5,7 @@ Shared test fixtures and utilities for the opensnowdata test suite.
 Reduces code duplication across test files and provides common test data.
 """
 
+import os
 import tempfile
 import shutil
 import json
@@ -14,10 +15,12 @@ import pytest
 
 import sys
 sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+sys.path.insert(0, str(Path(__file__).parent.parent / "benchmarks"))
 
 from data_fetcher import VIIRSDataFetcher
 from pixel_extractor import VIIRSPixelExtractor
-from cache_manager import PixelCacheManager
+from snow_cover_sqlite_archive import SnowCoverSQLiteArchive
+from snow_cover_tile_archive import SnowCoverTileArchive
 from constants import ERROR_OLD_MISSING, ERROR_RECENT_MISSING, ERROR_OTHER
 
 
@@ -68,15 +71,29 @@ def pixel_extractor():
 
 
 @pytest.fixture
-def data_fetcher(temp_dir):
-    """Create VIIRSDataFetcher instance with temp directory."""
-    return VIIRSDataFetcher(cache_dir=temp_dir)
+def data_fetcher():
+    """Create VIIRSDataFetcher instance (uses its own temp directory)."""
+    fetcher = VIIRSDataFetcher(decode_workers=0)
+    yield fetcher
+    fetcher.cleanup()
 
 
 @pytest.fixture
-def cache_manager(temp_dir):
-    """Create PixelCacheManager instance with temp directory."""
-    return PixelCacheManager(cache_root=temp_dir)
+def archive(temp_dir):
+    """Create an initialized SnowCoverSQLiteArchive in the temp directory."""
+    archive = SnowCoverSQLiteArchive(str(Path(temp_dir) / "snow-cover-archive.db"))
+    archive.initialize()
+    yield archive
+    archive.close()
+
+
+@pytest.fixture
+def tile_archive(temp_dir):
+    """Create an initialized SnowCoverTileArchive with a small initial capacity."""
+    archive = SnowCoverTileArchive(str(Path(temp_dir) / "snow-cover-tiles"), initial_capacity=2)
+    archive.initialize()
+    yield archive
+    archive.close()
 
 
 @pytest.fixture
@@ -89,6 +106,105 @@ def sample_tile_pixels():
     ]
 
 
+@pytest.fixture
+def synthetic_granule(temp_dir):
+    """Create a small synthetic VNP10A1F granule for tile h18v04."""
+    from synthetic_granules import write_synthetic_granule, granule_filename
+    
+    date = datetime(2024, 1, 8)
+    path = Path(temp_dir) / granule_filename("h18v04", date)
+    return write_synthetic_granule(path, "h18v04", date, chunks=(100, 100))
+
+
+@pytest.fixture
+def hdf_to_geotiff():
+    """Load scripts/hdf-to-geotiff.py as a module, skipping the test without GDAL."""
+    pytest.importorskip("osgeo.gdal")
+    import importlib.util
+    
+    script = Path(__file__).parent.parent / "scripts" / "hdf-to-geotiff.py"
+    spec = importlib.util.spec_from_file_location("hdf_to_geotiff", script)
+    module = importlib.util.module_from_spec(spec)
+    # Registered so the process pool of batch_convert can pickle its functions
+    sys.modules[spec.name] = module
+    spec.loader.exec_module(module)
+    return module
+
+
+@pytest.fixture
+def nsidc_server():
+    """Run a local NSIDC stand-in server for tile h18v04."""
+    from nsidc_server import NSIDCStandInServer
+    
+    with NSIDCStandInServer(tiles=["h18v04"]) as server:
+        yield server
+
+
+@pytest.fixture
+def postgres_db_config():
+    """
+    Connection settings for a local PostgreSQL server.
+    
+    Uses POSTGRES_HOST/POSTGRES_PORT/POSTGRES_USER/POSTGRES_PASSWORD (default:
+    localhost:5432 as postgres) and skips the test when no server is reachable.
+    """
+    import asyncio
+    asyncpg = pytest.importorskip("asyncpg")
+    
+    db_config = {
+        'host': os.environ.get('POSTGRES_HOST', 'localhost'),
+        'port': int(os.environ.get('POSTGRES_PORT', '5432')),
+        'user': os.environ.get('POSTGRES_USER', 'postgres'),
+        'database': 'openskidata_test',
+    }
+    if os.environ.get('POSTGRES_PASSWORD'):
+        db_config['password'] = os.environ['POSTGRES_PASSWORD']
+    
+    async def probe():
+        conn = await asyncpg.connect(**{**db_config, 'database': 'postgres'}, timeout=5)
+        await conn.close()
+    
+    try:
+        asyncio.run(probe())
+    except (OSError, asyncio.TimeoutError, asyncpg.PostgresError) as e:
+        pytest.skip(f"PostgreSQL not available: {e}")
+    
+    return db_config
+
+
+@pytest.fixture
+def postgres_cache(postgres_db_config):
+    """PostgresCacheSync with a unique cache type, cleared after the test."""
+    import uuid
+    from postgres_cache import PostgresCacheSync
+    
+    cache = PostgresCacheSync(f"test_{uuid.uuid4().hex[:8]}", db_config=postgres_db_config)
+    cache.initialize()
+    yield cache
+    cache.clear()
+    cache.close()
+
+
+@pytest.fixture
+def lease_job(postgres_db_config):
+    """Unique fetch job name whose lease table rows are deleted after the test."""
+    import asyncio
+    import uuid
+    import asyncpg
+    
+    job = f"test_{uuid.uuid4().hex[:8]}"
+    yield job
+    
+    async def delete_job():
+        conn = await asyncpg.connect(**postgres_db_config)
+        try:
+            await conn.execute("DELETE FROM fetch_leases WHERE job = $1", job)
+        finally:
+            await conn.close()
+    
+    asyncio.run(delete_job())
+
+
 @pytest.fixture
 def sample_dates():
     """Sample dates for testing."""
@@ -168,12 +284,9 @@ def assert_pixel_coords_valid(pixel_coords):
         assert 0 <= pixel['pixel_col'] < 3000
 
 
-def assert_cache_file_valid(cache_path):
-    """Assert that a cache file is valid JSON with correct structure."""
-    assert cache_path.exists()
-    
-    with open(cache_path, 'r') as f:
-        data = json.load(f)
+def assert_archive_entry_valid(archive, tile, pixel_row, pixel_col):
+    """Assert that an archived pixel entry is valid JSON with correct structure."""
+    data = archive.archive.get(archive._create_pixel_key(tile, pixel_row, pixel_col))
     
     assert isinstance(data, list)
     for year_data in data:
@@ -14,6 +14,15 @@ export type SnowCoverFetchPolicy = "full" | "incremental" | "none";
 
 export type SnowCoverConfig = {
   fetchPolicy: SnowCoverFetchPolicy;
+  // SQLite file with per-run snow cover histories precomputed by the Python pipeline
+  aggregatesPath?: string;
+  // SQLite file with the VIIRS pixels of each run extracted by the Python pipeline
+  pixelMapPath?: string;
+  // Seconds after which the Python pipeline stops starting new downloads
+  timeBudgetSeconds?: number;
+  // Running snow-cover/src/worker_service.py (http://host:port or unix:/path/to.sock)
+  // to submit jobs to instead of starting a Python process per run
+  workerURL?: string;
 };
 
 export type RacemapElevationServerConfig = {
@@ -102,6 +111,16 @@ export function configFromEnvironment(): Config {
     );
   }
 
+  const snowCoverTimeBudget = process.env.SNOW_COVER_TIME_BUDGET;
+  if (
+    snowCoverTimeBudget !== undefined &&
+    !(Number.parseFloat(snowCoverTimeBudget) > 0)
+  ) {
+    throw new Error(
+      `Invalid SNOW_COVER_TIME_BUDGET: ${snowCoverTimeBudget}. Must be a positive number of seconds`,
+    );
+  }
+
   const elevationServerURL = process.env["ELEVATION_SERVER_URL"] || null;
   const outputDir = process.env["OUTPUT_DIR"] ?? "data";
 
@@ -130,6 +149,13 @@ export function configFromEnvironment(): Config {
         ? {
             fetchPolicy:
               (snowCoverFetchPolicy as SnowCoverFetchPolicy) ?? "full",
+            aggregatesPath: path.join(workingDir, "snow_cover_aggregates.db"),
+            pixelMapPath: path.join(workingDir, "snow_cover_pixels.db"),
+            timeBudgetSeconds:
+              snowCoverTimeBudget !== undefined
+                ? Number.parseFloat(snowCoverTimeBudget)
+                : undefined,
+            workerURL: process.env.SNOW_COVER_WORKER_URL || undefined,
           }
         : null,
     tiles:
@@ -20,6 +20,14 @@ import { InputSkiAreaType, formatSkiArea } from "./transforms/SkiAreaFormatter";
 import { formatSpots } from "./transforms/SpotFormatter";
 import { generateTiles } from "./transforms/TilesGenerator";
 import { runCommand } from "./utils/ProcessRunner";
+import {
+  readSnowCoverMetrics,
+  recordSnowCoverMetrics,
+} from "./utils/snowCoverMetrics";
+import {
+  isSnowCoverWorkerAvailable,
+  runSnowCoverJob,
+} from "./utils/snowCoverWorker";
 
 import { performanceMonitor } from "./clustering/database/PerformanceMonitor";
 import {
@@ -66,13 +74,36 @@ async function fetchSnowCoverIfEnabled(
   }
 
   await performanceMonitor.withOperation("Processing snow cover", async () => {
-    const args = ["snow-cover/src/fetch_snow_data.py"];
+    const metricsPath = path.join(config.workingDir, "snow_cover_metrics.json");
+    if (existsSync(metricsPath)) {
+      unlinkSync(metricsPath);
+    }
+    // Aggregates and pixels of a previous run would not match the current runs
+    const aggregatesPath = snowCoverConfig.aggregatesPath;
+    const pixelMapPath = snowCoverConfig.pixelMapPath;
+    for (const previousPath of [aggregatesPath, pixelMapPath]) {
+      if (previousPath && existsSync(previousPath)) {
+        unlinkSync(previousPath);
+      }
+    }
+
+    const args = ["--metrics-file", metricsPath];
 
     if (snowCoverConfig.fetchPolicy === "incremental") {
       args.push("--fill-cache");
     } else {
       // 'full' policy - pass the runs geojson path
       args.push(runsPath);
+      if (aggregatesPath) {
+        args.push("--aggregates-file", aggregatesPath);
+      }
+      if (pixelMapPath) {
+        args.push("--pixel-map-file", pixelMapPath);
+      }
+    }
+
+    if (snowCoverConfig.timeBudgetSeconds !== undefined) {
+      args.push("--time-budget", String(snowCoverConfig.timeBudgetSeconds));
     }
 
     // Determine which Python executable to use
@@ -85,9 +116,31 @@ async function fetchSnowCoverIfEnabled(
     }
 
     try {
-      await runCommand(pythonExecutable, args);
+      const workerURL = snowCoverConfig.workerURL;
+      if (workerURL && (await isSnowCoverWorkerAvailable(workerURL))) {
+        console.log(`Running snow cover job on worker ${workerURL}`);
+        const result = await runSnowCoverJob(workerURL, args);
+        if (!result.success) {
+          throw new Error(result.error ?? "job failed on the worker");
+        }
+      } else {
+        if (workerURL) {
+          console.warn(
+            `Snow cover worker ${workerURL} is not reachable, starting a new process`,
+          );
+        }
+        await runCommand(pythonExecutable, [
+          "snow-cover/src/fetch_snow_data.py",
+          ...args,
+        ]);
+      }
     } catch (error) {
       throw new Error(`Snow cover processing failed: ${error}`);
+    } finally {
+      const summary = readSnowCoverMetrics(metricsPath);
+      if (summary) {
+        recordSnowCoverMetrics(summary, performanceMonitor);
+      }
     }
   });
 }
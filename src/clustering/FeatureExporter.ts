@@ -14,6 +14,7 @@ import { PostgresConfig, SnowCoverConfig } from "../Config";
 import toFeatureCollection from "../transforms/FeatureCollection";
 import { filter, map, mapAsync } from "../transforms/StreamTransforms";
 import { toSkiAreaSummary } from "../transforms/toSkiAreaSummary";
+import { loadSnowCoverAggregates } from "../utils/snowCoverAggregates";
 import { getSnowCoverHistoryFromCache } from "../utils/snowCoverHistory";
 import {
   LiftObject,
@@ -44,13 +45,20 @@ export async function exportRunsGeoJSON(
   snowCoverConfig: SnowCoverConfig | null,
   postgresConfig: PostgresConfig,
 ) {
+  // Histories precomputed by the snow cover fetch replace per-run cache reads
+  const precomputedHistories = snowCoverConfig?.aggregatesPath
+    ? loadSnowCoverAggregates(snowCoverConfig.aggregatesPath)
+    : null;
+
   await pipeline(
     asyncIterableToStream(database.streamObjects(FeatureType.Run)),
     mapAsync(async (run: RunObject): Promise<RunFeature | null> => {
       const skiAreas = await resolveSkiAreaSummaries(database, run.skiAreas);
 
       let snowCoverHistory = undefined;
-      if (snowCoverConfig && run.viirsPixels.length > 0) {
+      if (precomputedHistories) {
+        snowCoverHistory = precomputedHistories.get(run._key);
+      } else if (snowCoverConfig && run.viirsPixels.length > 0) {
         try {
           const history = await getSnowCoverHistoryFromCache(
             run.viirsPixels,
@@ -37,7 +37,8 @@ import { getPoints, getPositions } from "../transforms/GeoTransforms";
 import { sortPlaces, uniquePlaces } from "../transforms/PlaceUtils";
 import { mapAsync } from "../transforms/StreamTransforms";
 import { isPlaceholderGeometry } from "../utils/PlaceholderSiteGeometry";
-import { VIIRSPixelExtractor } from "../utils/VIIRSPixelExtractor";
+import { VIIRSPixel, VIIRSPixelExtractor } from "../utils/VIIRSPixelExtractor";
+import { loadSnowCoverPixelMap } from "../utils/snowCoverPixelMap";
 import {
   ClusteringDatabase,
   SearchContext,
@@ -142,6 +143,10 @@ export class SkiAreaClusteringService {
     snowCoverConfig: SnowCoverConfig | null,
   ): Promise<void> {
     const viirsExtractor = new VIIRSPixelExtractor();
+    // Pixels extracted by the snow cover fetch replace extracting them again
+    const pixelMap = snowCoverConfig?.pixelMapPath
+      ? loadSnowCoverPixelMap(snowCoverConfig.pixelMapPath)
+      : null;
 
     await performanceMonitor.withOperation("Loading Graph Data", async () => {
       await Promise.all([
@@ -150,7 +155,7 @@ export class SkiAreaClusteringService {
         ),
         this.loadFeatures(liftsPath, (feature) => this.prepareLift(feature)),
         this.loadFeatures(runsPath, (feature) =>
-          this.prepareRun(feature, viirsExtractor, snowCoverConfig),
+          this.prepareRun(feature, viirsExtractor, snowCoverConfig, pixelMap),
         ),
         this.loadFeatures(spotsPath, (feature) => this.prepareSpot(feature)),
       ]);
@@ -241,6 +246,7 @@ export class SkiAreaClusteringService {
     feature: RunFeature,
     viirsExtractor: VIIRSPixelExtractor,
     snowCoverConfig: SnowCoverConfig | null,
+    pixelMap: Map<string, VIIRSPixel[]> | null,
   ): DraftRun {
     const properties = feature.properties;
     const isInSkiAreaSite = feature.properties.skiAreas.length > 0;
@@ -269,10 +275,11 @@ export class SkiAreaClusteringService {
       });
     })();
 
-    // TODO: optimize
+    // Runs missing from the pixel map, or all runs without one, are extracted here
     const viirsPixels =
       snowCoverConfig !== null
-        ? viirsExtractor.getGeometryPixelCoordinates(feature.geometry)
+        ? (pixelMap?.get(properties.id) ??
+          viirsExtractor.getGeometryPixelCoordinates(feature.geometry))
         : [];
 
     return {
@@ -344,6 +344,36 @@ export class PerformanceMonitor {
     }
   }
 
+  /**
+   * Record an operation that was timed elsewhere (e.g. by a child process)
+   * as a child of the current context
+   * @param operationName - Name of the operation
+   * @param startTime - Start time in milliseconds since the epoch
+   * @param endTime - End time in milliseconds since the epoch
+   */
+  recordOperation(
+    operationName: string,
+    startTime: number,
+    endTime: number,
+  ): void {
+    if (!this.isEnabled) return;
+
+    const parentOperation = this.contextStack[this.contextStack.length - 1];
+    const phase = parentOperation
+      ? this.operationStart.get(parentOperation)?.phase
+      : undefined;
+
+    this.metrics.push({
+      operation: operationName,
+      operationId: `${operationName}_${startTime}_${Math.random()}`,
+      startTime,
+      endTime,
+      duration: endTime - startTime,
+      parentOperation,
+      phase,
+    });
+  }
+
   private startOperation(
     operationId: string,
     parentOperation?: string,
@@ -0,0 +1,43 @@
+import Database from "better-sqlite3";
+import { existsSync } from "fs";
+import { SnowCoverHistory } from "openskidata-format";
+
+export type SnowCoverAggregateKind = "run" | "ski_area";
+
+/**
+ * Load snow cover histories precomputed by
+ * snow-cover/src/fetch_snow_data.py --aggregates-file, keyed by feature ID.
+ *
+ * @param aggregatesPath SQLite file with the snow_cover_aggregates table
+ * @param kind Load run or ski area histories
+ * @returns Histories by feature ID, or null if the file does not exist or cannot be read
+ */
+export function loadSnowCoverAggregates(
+  aggregatesPath: string,
+  kind: SnowCoverAggregateKind = "run",
+): Map<string, SnowCoverHistory> | null {
+  if (!existsSync(aggregatesPath)) {
+    return null;
+  }
+
+  let db: Database.Database | null = null;
+  try {
+    db = new Database(aggregatesPath, { readonly: true });
+    const rows = db
+      .prepare(
+        "SELECT feature_id, history FROM snow_cover_aggregates WHERE kind = ?",
+      )
+      .all(kind) as { feature_id: string; history: string }[];
+
+    return new Map(
+      rows.map((row) => [row.feature_id, JSON.parse(row.history)]),
+    );
+  } catch (error) {
+    console.warn(
+      `Could not read snow cover aggregates ${aggregatesPath}: ${error}`,
+    );
+    return null;
+  } finally {
+    db?.close();
+  }
+}
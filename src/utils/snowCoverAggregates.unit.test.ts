@@ -0,0 +1,43 @@
+import Database from "better-sqlite3";
+import tmp from "tmp";
+import { loadSnowCoverAggregates } from "./snowCoverAggregates";
+
+describe("loadSnowCoverAggregates", () => {
+  let aggregatesPath: string;
+
+  beforeEach(() => {
+    aggregatesPath = `${tmp.dirSync().name}/snow_cover_aggregates.db`;
+  });
+
+  it("should return null when no aggregates were written", () => {
+    expect(loadSnowCoverAggregates(aggregatesPath)).toBeNull();
+  });
+
+  it("should load histories of the requested kind by feature ID", () => {
+    const db = new Database(aggregatesPath);
+    db.exec(`
+      CREATE TABLE snow_cover_aggregates (
+        kind TEXT NOT NULL,
+        feature_id TEXT NOT NULL,
+        pixel_count INTEGER NOT NULL,
+        history TEXT NOT NULL,
+        PRIMARY KEY (kind, feature_id)
+      ) WITHOUT ROWID
+    `);
+    const insert = db.prepare(
+      "INSERT INTO snow_cover_aggregates VALUES (?, ?, ?, ?)",
+    );
+    insert.run("run", "run1", 2, '[{"year":2024,"days":[[1,70,100]]}]');
+    insert.run("ski_area", "area1", 5, '[{"year":2024,"days":[[1,80,60]]}]');
+    db.close();
+
+    const runs = loadSnowCoverAggregates(aggregatesPath)!;
+    expect(Array.from(runs.keys())).toEqual(["run1"]);
+    expect(runs.get("run1")).toEqual([{ year: 2024, days: [[1, 70, 100]] }]);
+
+    const skiAreas = loadSnowCoverAggregates(aggregatesPath, "ski_area")!;
+    expect(skiAreas.get("area1")).toEqual([
+      { year: 2024, days: [[1, 80, 60]] },
+    ]);
+  });
+});
@@ -0,0 +1,89 @@
+import { existsSync, readFileSync } from "fs";
+import { PerformanceMonitor } from "../clustering/database/PerformanceMonitor";
+
+/**
+ * Per-stage summary written by snow-cover/src/fetch_snow_data.py --metrics-file.
+ * Times are in seconds since the epoch, durations in seconds unless suffixed.
+ */
+export interface SnowCoverStageMetrics {
+  unit: string;
+  count: number;
+  items: number;
+  errors: number;
+  busy_seconds: number;
+  wall_seconds: number;
+  items_per_second: number;
+  mean_ms: number;
+  p50_ms: number;
+  p95_ms: number;
+  max_ms: number;
+  started_at?: number;
+  ended_at?: number;
+  bytes?: number;
+  bytes_per_second?: number;
+}
+
+export interface SnowCoverQueueMetrics {
+  samples: number;
+  mean: number;
+  max: number;
+  last: number;
+}
+
+export interface SnowCoverMetricsSummary {
+  started_at: number;
+  duration_seconds: number;
+  stages: Record<string, SnowCoverStageMetrics>;
+  queues: Record<string, SnowCoverQueueMetrics>;
+  counters: Record<string, number>;
+}
+
+export function readSnowCoverMetrics(
+  metricsPath: string,
+): SnowCoverMetricsSummary | null {
+  if (!existsSync(metricsPath)) {
+    return null;
+  }
+
+  try {
+    return JSON.parse(readFileSync(metricsPath, "utf-8"));
+  } catch (error) {
+    console.warn(`Could not read snow cover metrics ${metricsPath}: ${error}`);
+    return null;
+  }
+}
+
+export function formatStageMetrics(
+  stage: string,
+  metrics: SnowCoverStageMetrics,
+): string {
+  let description = `Snow cover ${stage}: ${metrics.items} ${metrics.unit}, ${metrics.items_per_second} ${metrics.unit}/s, p95 ${metrics.p95_ms}ms`;
+  if (metrics.bytes_per_second !== undefined) {
+    description += `, ${(metrics.bytes_per_second / 1e6).toFixed(1)} MB/s`;
+  }
+  if (metrics.errors > 0) {
+    description += `, ${metrics.errors} errors`;
+  }
+  return description;
+}
+
+/**
+ * Record each stage of a snow cover run as a child operation of the current
+ * PerformanceMonitor context, spanning the stage's wall-clock time.
+ */
+export function recordSnowCoverMetrics(
+  summary: SnowCoverMetricsSummary,
+  monitor: PerformanceMonitor,
+): void {
+  const stages = Object.entries(summary.stages)
+    .filter(([, metrics]) => metrics.started_at !== undefined)
+    .sort(([, a], [, b]) => a.started_at! - b.started_at!);
+
+  for (const [stage, metrics] of stages) {
+    monitor.recordOperation(
+      formatStageMetrics(stage, metrics),
+      Math.round(metrics.started_at! * 1000),
+      Math.round(metrics.ended_at! * 1000),
+    );
+  }
+}
@@ -0,0 +1,81 @@
+import { PerformanceMonitor } from "../clustering/database/PerformanceMonitor";
+import {
+  SnowCoverMetricsSummary,
+  formatStageMetrics,
+  recordSnowCoverMetrics,
+} from "./snowCoverMetrics";
+
+const summary: SnowCoverMetricsSummary = {
+  started_at: 1700000000,
+  duration_seconds: 12,
+  stages: {
+    decode: {
+      unit: "granules",
+      count: 4,
+      items: 4,
+      errors: 1,
+      busy_seconds: 2,
+      wall_seconds: 4,
+      items_per_second: 1,
+      mean_ms: 500,
+      p50_ms: 450,
+      p95_ms: 900,
+      max_ms: 900,
+      started_at: 1700000003,
+      ended_at: 1700000007,
+    },
+    download: {
+      unit: "granules",
+      count: 4,
+      items: 4,
+      errors: 0,
+      busy_seconds: 6,
+      wall_seconds: 5,
+      items_per_second: 0.8,
+      mean_ms: 1500,
+      p50_ms: 1400,
+      p95_ms: 2000,
+      max_ms: 2000,
+      started_at: 1700000001,
+      ended_at: 1700000006,
+      bytes: 10000000,
+      bytes_per_second: 2000000,
+    },
+  },
+  queues: {},
+  counters: {},
+};
+
+describe("snowCoverMetrics", () => {
+  it("should describe throughput, transfer rate and errors of a stage", () => {
+    expect(formatStageMetrics("download", summary.stages.download)).toBe(
+      "Snow cover download: 4 granules, 0.8 granules/s, p95 2000ms, 2.0 MB/s",
+    );
+    expect(formatStageMetrics("decode", summary.stages.decode)).toBe(
+      "Snow cover decode: 4 granules, 1 granules/s, p95 900ms, 1 errors",
+    );
+  });
+
+  it("should record stages as child operations ordered by start time", async () => {
+    const monitor = new PerformanceMonitor(true);
+
+    await monitor.withOperation("Processing snow cover", async () => {
+      recordSnowCoverMetrics(summary, monitor);
+    });
+
+    const metrics = monitor.getMetrics();
+    const parent = metrics.find(
+      (metric) => metric.operation === "Processing snow cover",
+    )!;
+    const stages = metrics.filter(
+      (metric) => metric.parentOperation === parent.operationId,
+    );
+
+    expect(stages.map((metric) => metric.operation)).toEqual([
+      formatStageMetrics("download", summary.stages.download),
+      formatStageMetrics("decode", summary.stages.decode),
+    ]);
+    expect(stages[0].startTime).toBe(1700000001000);
+    expect(stages[0].duration).toBe(5000);
+  });
+});
@@ -0,0 +1,61 @@
+import Database from "better-sqlite3";
+import { existsSync } from "fs";
+import { VIIRSPixel } from "./VIIRSPixelExtractor";
+
+// Each pixel is stored as four little-endian uint16 values
+const BYTES_PER_PIXEL = 8;
+
+/**
+ * Decode the pixels of a feature as written by snow-cover/src/pixel_map.py:
+ * little-endian uint16 [hTile, vTile, column, row] quadruples.
+ */
+export function decodePixels(data: Buffer): VIIRSPixel[] {
+  const pixels: VIIRSPixel[] = [];
+  for (
+    let offset = 0;
+    offset + BYTES_PER_PIXEL <= data.length;
+    offset += BYTES_PER_PIXEL
+  ) {
+    pixels.push([
+      data.readUInt16LE(offset),
+      data.readUInt16LE(offset + 2),
+      data.readUInt16LE(offset + 4),
+      data.readUInt16LE(offset + 6),
+    ]);
+  }
+  return pixels;
+}
+
+/**
+ * Load the VIIRS pixels of each run extracted by
+ * snow-cover/src/fetch_snow_data.py --pixel-map-file, keyed by feature ID.
+ *
+ * @param pixelMapPath SQLite file with the feature_pixels table
+ * @returns Pixels by feature ID, or null if the file does not exist or cannot be read
+ */
+export function loadSnowCoverPixelMap(
+  pixelMapPath: string,
+): Map<string, VIIRSPixel[]> | null {
+  if (!existsSync(pixelMapPath)) {
+    return null;
+  }
+
+  let db: Database.Database | null = null;
+  try {
+    db = new Database(pixelMapPath, { readonly: true });
+    const rows = db
+      .prepare("SELECT feature_id, pixels FROM feature_pixels")
+      .all() as { feature_id: string; pixels: Buffer }[];
+
+    return new Map(
+      rows.map((row) => [row.feature_id, decodePixels(row.pixels)]),
+    );
+  } catch (error) {
+    console.warn(
+      `Could not read snow cover pixel map ${pixelMapPath}: ${error}`,
+    );
+    return null;
+  } finally {
+    db?.close();
+  }
+}
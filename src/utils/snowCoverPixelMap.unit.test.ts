@@ -0,0 +1,48 @@
+import Database from "better-sqlite3";
+import tmp from "tmp";
+import { decodePixels, loadSnowCoverPixelMap } from "./snowCoverPixelMap";
+
+describe("loadSnowCoverPixelMap", () => {
+  let pixelMapPath: string;
+
+  beforeEach(() => {
+    pixelMapPath = `${tmp.dirSync().name}/snow_cover_pixels.db`;
+  });
+
+  it("should return null when no pixel map was written", () => {
+    expect(loadSnowCoverPixelMap(pixelMapPath)).toBeNull();
+  });
+
+  it("should decode little-endian uint16 quadruples", () => {
+    expect(
+      decodePixels(
+        Buffer.from([
+          9, 0, 5, 0, 1, 0, 2, 0, 18, 0, 4, 0, 0xe9, 0x03, 0xdc, 0x05,
+        ]),
+      ),
+    ).toEqual([
+      [9, 5, 1, 2],
+      [18, 4, 1001, 1500],
+    ]);
+  });
+
+  it("should load the pixels of each feature by feature ID", () => {
+    const db = new Database(pixelMapPath);
+    db.exec(`
+      CREATE TABLE feature_pixels (
+        feature_id TEXT PRIMARY KEY,
+        pixel_count INTEGER NOT NULL,
+        pixels BLOB NOT NULL
+      ) WITHOUT ROWID
+    `);
+    const insert = db.prepare("INSERT INTO feature_pixels VALUES (?, ?, ?)");
+    insert.run("run1", 1, Buffer.from([18, 0, 4, 0, 0xe9, 0x03, 0xdc, 0x05]));
+    insert.run("run2", 0, Buffer.alloc(0));
+    db.close();
+
+    const pixelMap = loadSnowCoverPixelMap(pixelMapPath)!;
+    expect(pixelMap.get("run1")).toEqual([[18, 4, 1001, 1500]]);
+    expect(pixelMap.get("run2")).toEqual([]);
+    expect(pixelMap.has("run3")).toBe(false);
+  });
+});
@@ -0,0 +1,177 @@
+import { request, RequestOptions } from "http";
+import { SnowCoverMetricsSummary } from "./snowCoverMetrics";
+
+/**
+ * Events streamed by snow-cover/src/worker_service.py while it runs a job,
+ * one JSON object per line.
+ */
+export type SnowCoverWorkerEvent =
+  | { event: "accepted"; queued: boolean }
+  | {
+      event: "log";
+      level: string;
+      logger: string;
+      message: string;
+      time: number;
+    }
+  | {
+      event: "progress";
+      seconds: number;
+      counters: Record<string, number>;
+      stages: Record<string, number>;
+    }
+  | {
+      event: "result";
+      success: boolean;
+      seconds: number;
+      metrics: SnowCoverMetricsSummary | null;
+      error?: string;
+    };
+
+export type SnowCoverJobResult = Extract<
+  SnowCoverWorkerEvent,
+  { event: "result" }
+>;
+
+/**
+ * Request options for a worker URL: http://host:port, or unix:/path/to.sock for
+ * a worker listening on a Unix socket.
+ */
+function workerRequestOptions(
+  workerURL: string,
+  method: string,
+  path: string,
+): RequestOptions {
+  if (workerURL.startsWith("unix:")) {
+    return { socketPath: workerURL.slice("unix:".length), path, method };
+  }
+  const url = new URL(path, workerURL);
+  return {
+    hostname: url.hostname,
+    port: url.port,
+    path: url.pathname,
+    method,
+  };
+}
+
+export async function isSnowCoverWorkerAvailable(
+  workerURL: string,
+  timeoutMs: number = 1000,
+): Promise<boolean> {
+  return new Promise((resolve) => {
+    const req = request(
+      {
+        ...workerRequestOptions(workerURL, "GET", "/health"),
+        timeout: timeoutMs,
+      },
+      (res) => {
+        res.resume();
+        resolve(res.statusCode === 200);
+      },
+    );
+    req.on("timeout", () => req.destroy(new Error("timeout")));
+    req.on("error", () => resolve(false));
+    req.end();
+  });
+}
+
+export function logSnowCoverWorkerEvent(event: SnowCoverWorkerEvent): void {
+  switch (event.event) {
+    case "accepted":
+      if (event.queued) {
+        console.log("Snow cover worker is busy, job queued");
+      }
+      break;
+    case "log":
+      console.log(`${event.logger} - ${event.level} - ${event.message}`);
+      break;
+    case "progress":
+      console.log(
+        `Snow cover progress after ${Math.round(event.seconds)}s: ${Object.entries(
+          event.stages,
+        )
+          .map(([stage, items]) => `${stage} ${items}`)
+          .join(", ")}`,
+      );
+      break;
+  }
+}
+
+/**
+ * Run fetch_snow_data.py arguments as a job on a running worker service,
+ * passing each streamed event to onEvent.
+ */
+export async function runSnowCoverJob(
+  workerURL: string,
+  args: string[],
+  onEvent: (
+    event: SnowCoverWorkerEvent,
+  ) => void = logSnowCoverWorkerEvent,
+): Promise<SnowCoverJobResult> {
+  const body = JSON.stringify({ args });
+
+  return new Promise((resolve, reject) => {
+    const req = request(
+      {
+        ...workerRequestOptions(workerURL, "POST", "/jobs"),
+        headers: {
+          "Content-Type": "application/json",
+          "Content-Length": Buffer.byteLength(body),
+        },
+      },
+      (res) => {
+        res.setEncoding("utf-8");
+        let buffered = "";
+
+        if (res.statusCode !== 200) {
+          res.on("data", (chunk: string) => (buffered += chunk));
+          res.on("end", () =>
+            reject(
+              new Error(
+                `Snow cover worker rejected the job (HTTP ${res.statusCode}): ${buffered}`,
+              ),
+            ),
+          );
+          return;
+        }
+
+        let result: SnowCoverJobResult | null = null;
+        res.on("data", (chunk: string) => {
+          buffered += chunk;
+          let newline: number;
+          while ((newline = buffered.indexOf("\n")) >= 0) {
+            const line = buffered.slice(0, newline).trim();
+            buffered = buffered.slice(newline + 1);
+            if (!line) {
+              continue;
+            }
+            const event: SnowCoverWorkerEvent = JSON.parse(line);
+            onEvent(event);
+            if (event.event === "result") {
+              result = event;
+            }
+          }
+        });
+        res.on("end", () => {
+          if (result) {
+            resolve(result);
+          } else {
+            reject(
+              new Error(
+                "Snow cover worker closed the connection before the job finished",
+              ),
+            );
+          }
+        });
+        res.on("error", reject);
+      },
+    );
+
+    req.on("error", (error) =>
+      reject(
+        new Error(`Failed to submit snow cover job to ${workerURL}: ${error}`),
+      ),
+    );
+    req.end(body);
+  });
+}
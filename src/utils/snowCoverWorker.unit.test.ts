@@ -0,0 +1,86 @@
+import { createServer, Server } from "http";
+import { AddressInfo } from "net";
+import {
+  isSnowCoverWorkerAvailable,
+  runSnowCoverJob,
+  SnowCoverWorkerEvent,
+} from "./snowCoverWorker";
+
+describe("snowCoverWorker", () => {
+  let server: Server;
+  let workerURL: string;
+  let submittedArgs: string[] | null;
+
+  beforeEach(async () => {
+    submittedArgs = null;
+    server = createServer((req, res) => {
+      if (req.method === "GET" && req.url === "/health") {
+        res.writeHead(200, { "Content-Type": "application/json" });
+        res.end(JSON.stringify({ status: "ok", busy: false }));
+        return;
+      }
+
+      let body = "";
+      req.on("data", (chunk) => (body += chunk));
+      req.on("end", () => {
+        submittedArgs = JSON.parse(body).args;
+        if (submittedArgs!.includes("--invalid")) {
+          res.writeHead(400, { "Content-Type": "application/json" });
+          res.end(JSON.stringify({ error: "unrecognized arguments" }));
+          return;
+        }
+        res.writeHead(200, { "Content-Type": "application/x-ndjson" });
+        res.write('{"event": "accepted", "queued": false}\n{"event": "lo');
+        res.write(
+          'g", "level": "INFO", "logger": "fetch_snow_data", "message": "started", "time": 1}\n',
+        );
+        res.end(
+          '{"event": "result", "success": true, "seconds": 0.5, "metrics": null}\n',
+        );
+      });
+    });
+    await new Promise<void>((resolve) => server.listen(0, "127.0.0.1", resolve));
+    workerURL = `http://127.0.0.1:${(server.address() as AddressInfo).port}`;
+  });
+
+  afterEach(async () => {
+    await new Promise((resolve) => server.close(resolve));
+  });
+
+  it("should report whether the worker is reachable", async () => {
+    expect(await isSnowCoverWorkerAvailable(workerURL)).toBe(true);
+    expect(await isSnowCoverWorkerAvailable("http://127.0.0.1:1")).toBe(false);
+  });
+
+  it("should stream job events split across chunks and return the result", async () => {
+    const events: SnowCoverWorkerEvent[] = [];
+    const result = await runSnowCoverJob(
+      workerURL,
+      ["runs.geojson", "--metrics-file", "metrics.json"],
+      (event) => events.push(event),
+    );
+
+    expect(submittedArgs).toEqual([
+      "runs.geojson",
+      "--metrics-file",
+      "metrics.json",
+    ]);
+    expect(events.map((event) => event.event)).toEqual([
+      "accepted",
+      "log",
+      "result",
+    ]);
+    expect(result).toEqual({
+      event: "result",
+      success: true,
+      seconds: 0.5,
+      metrics: null,
+    });
+  });
+
+  it("should reject jobs the worker rejects", async () => {
+    await expect(runSnowCoverJob(workerURL, ["--invalid"])).rejects.toThrow(
+      "HTTP 400",
+    );
+  });
+});